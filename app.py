@@ -4,24 +4,52 @@ from datetime import datetime, timedelta
 import time as time_module
 import copy
 import os
-import sys
 import logging
-from components.data_storage import get_data_manager
+from utils.logs import configure_logging
+from components.data_storage import get_shared_data_manager
+from components.data_cache import get_snapshot, get_projects_snapshot
 from components.timeline_viz import TimelineVisualizer
+from components.alerts import get_alerts
+from components.project_summary import project_rollup
+from components.portfolio_cube import get_cube, voltage_band
+from components.workload import get_workload, over_allocations, PEAK as WORKLOAD_PEAK, ACTIVE as WORKLOAD_ACTIVE, DEFAULT_CAPACITY as DEFAULT_TEAM_CAPACITY
+from components.risk import simulate_project, simulate_portfolio, get_spreads, save_item_spreads, validate_spread, DEFAULT_SPREAD, DEFAULT_SAMPLES as DEFAULT_RISK_SAMPLES, PORTFOLIO_SAMPLES as PORTFOLIO_RISK_SAMPLES, RISK_WORKERS
+from components.scheduling import get_schedule, format_predecessors, predecessors_to_dependencies, parse_predecessors, find_cycle, CycleError, DuplicateItemIdError
 from components.forms import ProjectForm
-from utils.helpers import load_css
-
-# Set up logging for Replit environment - stdout only to avoid file permission issues
-logging.basicConfig(
-    level=logging.WARNING,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+from components import figure_cache
+from utils.helpers import load_css, get_user_preference
+from utils import tracing, metrics, query_trace, profiling
+
+# Set up logging for Replit environment - stdout only to avoid file permission issues (LOG_FILE adds a file)
+configure_logging()
 logger = logging.getLogger('main_app')
 logger.warning("Application starting - Replit deployment configuration")
 
+# Number of recent rerun traces kept per session for the Performance panel
+MAX_STORED_TRACES = 20
+
+# Dashboard chart defaults, also used by warm_up() to build the figures a new session shows first
+DASHBOARD_DEFAULT_START = datetime(2025, 1, 1).date()
+WORKLOAD_MEASURE_LABELS = {
+    WORKLOAD_PEAK: "Peak concurrent items",
+    WORKLOAD_ACTIVE: "Items active in the month"
+}
+
+def remember_trace(trace):
+    """Keep a finished rerun trace in the session for the Performance panel"""
+    traces = st.session_state.setdefault('performance_traces', [])
+    traces.append(trace.to_dict())
+    del traces[:-MAX_STORED_TRACES]
+
+def remember_query_log(log):
+    """Warn about N+1 patterns in a finished query log and keep it in the session for the Performance panel"""
+    query_trace.warn_offenders(log)
+    st.session_state.last_query_log = log.to_dict()
+
+def profile_requested():
+    """Whether this browser session asked for every rerun to be profiled (?profile=1)"""
+    return st.query_params.get('profile', '').lower() in ('1', 'true', 'yes')
+
 # Health check - modify to match Replit's expectation
 def main():
     # Page config must be the first Streamlit command
@@ -32,7 +60,9 @@ def main():
         initial_sidebar_state="collapsed"
     )
 
-    
+    # Periodically export this process's metrics for health_check.py's /metrics
+    metrics.start_exporter()
+
 
   
     # Display deployment debug info if needed
@@ -45,9 +75,10 @@ def main():
     # Initialize session state - more robust initialization with error handling
     try:
         if 'data_manager' not in st.session_state:
-            st.session_state.data_manager = get_data_manager()
+            # Shared by all sessions, so the data is loaded once per process (see warm_up)
+            st.session_state.data_manager = get_shared_data_manager()
     except Exception as e:
-        logger.error(f"Error initializing data manager: {str(e)}")
+        logger.error("Error initializing data manager: %s", e)
         st.error(f"Error initializing application data. Please check if data files exist and have correct permissions.")
         st.stop()
 
@@ -55,7 +86,7 @@ def main():
     try:
         load_css()
     except Exception as e:
-        logger.warning(f"Could not load custom CSS: {str(e)}")
+        logger.warning("Could not load custom CSS: %s", e)
 
     # Header
     st.markdown("""
@@ -65,18 +96,51 @@ def main():
         </div>
     """, unsafe_allow_html=True)
 
-    # Navigation tabs
-    tab1, tab2, tab3, tab4 = st.tabs(["Dashboard", "Critical Path", "Add Project", "Edit Project"])
+    # Navigation - unlike st.tabs, only the active view is executed on a rerun
+    views = {
+        "Dashboard": show_dashboard,  # Dashboard overview
+        "Critical Path": show_critical_path,  # Project timeline view
+        "Add Project": show_project_form,
+        "Edit Project": show_edit_project
+    }
+
+    if 'active_view' not in st.session_state:
+        st.session_state.active_view = "Dashboard"
+
+    selected_view = st.segmented_control(
+        "View",
+        options=list(views.keys()),
+        default="Dashboard",
+        label_visibility="collapsed",
+        key="view_selector"
+    )
+
+    # Clicking the active segment deselects it - keep showing the current view
+    if selected_view:
+        st.session_state.active_view = selected_view
+
+    # Record timing spans and SQL statements for this rerun when enabled in Settings
+    tracing.set_enabled(get_user_preference('performance_panel', False))
+    query_trace.set_enabled(get_user_preference('query_tracing', False))
 
-    with tab1:
-        show_dashboard()  # Dashboard overview
-    with tab2:
-        show_critical_path()  # Project timeline view
-    with tab3:
-        show_project_form()
-    with tab4:
-        show_edit_project()
+    # Each view is a fragment, so its own widgets only rerun that view. Sampled reruns are
+    # profiled (PROFILE_RERUNS, or every rerun with ?profile=1); fragment reruns are
+    # profiled and their queries captured by the decorators on each view
+    with tracing.trace(f"rerun: {st.session_state.active_view}", on_finish=remember_trace), \
+            query_trace.capture_queries(f"rerun: {st.session_state.active_view}") as query_log, \
+            profiling.profile_rerun(st.session_state.active_view, requested=profile_requested()):
+        views[st.session_state.active_view]()
 
+    if query_trace.is_enabled():
+        remember_query_log(query_log)
+
+    if tracing.is_enabled() or query_trace.is_enabled():
+        show_performance_panel()
+
+@st.fragment
+@profiling.profiled('view.show_edit_project', requested=profile_requested)
+@query_trace.captured('view.show_edit_project', on_log=remember_query_log)
+@tracing.traced('view.show_edit_project', on_trace=remember_trace)
 def show_edit_project():
     st.header("Edit Project")
     
@@ -96,27 +160,26 @@ def show_edit_project():
 
     # Add error handling around data access
     try:
-        data = st.session_state.data_manager.get_data()
-        if data.empty:
+        metadata = get_snapshot(st.session_state.data_manager).metadata
+        if not metadata.project_ids:
             st.info("No projects available to edit.")
             return
     except Exception as e:
-        logger.error(f"Error accessing project data: {str(e)}")
+        logger.error("Error accessing project data: %s", e)
         st.error("Could not load project data. Please check your data files.")
         return
 
-    # Create display options combining ID and Name
-    project_options = [f"{row['ID']} - {row['Name']}" for _, row in data.iterrows()]
-    selected_option = st.selectbox("Select Project to Edit", project_options)
+    # Display options combining ID and Name (cached per data version)
+    selected_option = st.selectbox("Select Project to Edit", metadata.project_labels)
 
-    # Extract the ID from the selected option
-    selected_id = selected_option.split(" - ")[0] if selected_option else None
+    # Look up the ID of the selected option
+    selected_id = metadata.label_to_id.get(selected_option) if selected_option else None
 
     if selected_id:
         try:
-            project_data = st.session_state.data_manager.get_project(selected_id)
+            project_data = metadata.projects_by_id[selected_id]
         except Exception as e:
-            logger.error(f"Error retrieving project {selected_id}: {str(e)}")
+            logger.error("Error retrieving project %s: %s", selected_id, e)
             st.error(f"Could not load project details. Please try again.")
             return
 
@@ -163,7 +226,7 @@ def show_edit_project():
                     else:
                         st.error("Failed to delete project. Please try again.")
                 except Exception as e:
-                    logger.error(f"Error deleting project {selected_id}: {str(e)}")
+                    logger.error("Error deleting project %s: %s", selected_id, e)
                     st.error(f"Error deleting project: {str(e)}")
 
         # Custom CSS for styling
@@ -328,7 +391,7 @@ def show_edit_project():
                         st.success("Project overview updated successfully!")
                         st.rerun()
                     except Exception as e:
-                        logger.error(f"Error updating project overview: {str(e)}")
+                        logger.error("Error updating project overview: %s", e)
                         st.error(f"Error updating project: {str(e)}")
 
         # Add spacing
@@ -341,7 +404,7 @@ def show_edit_project():
         try:
             items_df = st.session_state.data_manager.get_project_items(project_data['ID'])
         except Exception as e:
-            logger.error(f"Error retrieving project items: {str(e)}")
+            logger.error("Error retrieving project items: %s", e)
             st.error("Could not load project items. Please try again later.")
             items_df = pd.DataFrame()  # Initialize empty DF in case of error
 
@@ -381,6 +444,11 @@ def show_edit_project():
                 width="small", 
                 format="%d",
                 help="🔒 Auto-calculated (not editable)"
+            ),
+            "Predecessors": st.column_config.TextColumn(
+                "Predecessors",
+                width="small",
+                help="Comma-separated Item IDs that must finish before this item starts"
             )
         }
 
@@ -389,12 +457,18 @@ def show_edit_project():
             items_df = pd.DataFrame(columns=['Team', 'Item Name', 'Start Date', 'End Date', 'Months', 'Item ID', 'Project ID'])
             items_df['Project ID'] = selected_id  # Initialize with the current project ID
 
-        # Add Item ID if it doesn't exist
+        # Add an empty Item ID column if it doesn't exist (IDs are allocated on save)
         if 'Item ID' not in items_df.columns:
-            items_df['Item ID'] = [f"I{i:03d}" for i in range(1, len(items_df) + 1)]
+            items_df['Item ID'] = None
+
+        # Predecessors of each item, from the dependencies in the current snapshot
+        # (object dtype: for a project without items an empty list would become float64)
+        items_df['Predecessors'] = pd.Series(format_predecessors(
+            get_snapshot(st.session_state.data_manager).dependencies, items_df['Item ID'].tolist()),
+            index=items_df.index, dtype=object)
 
         # Ensure all required columns exist
-        display_columns = ['Item ID', 'Team', 'Item Name', 'Start Date', 'End Date', 'Months']
+        display_columns = ['Item ID', 'Team', 'Item Name', 'Start Date', 'End Date', 'Months', 'Predecessors']
         for col in display_columns:
             if col not in items_df.columns:
                 if col == 'Months':
@@ -475,7 +549,7 @@ def show_edit_project():
                     st.session_state[f"last_edit_data_{selected_id}"] = edited_df.copy()
                     st.session_state[f"editor_changed_{selected_id}"] = False
         except Exception as e:
-            logger.error(f"Error displaying data editor: {str(e)}")
+            logger.error("Error displaying data editor: %s", e)
             st.error("Error displaying data. Please try again or contact support.")
             return
 
@@ -511,15 +585,13 @@ def show_edit_project():
                     # Add required columns
                     autosave_data['Project ID'] = selected_id
 
-                    # Ensure Item IDs for new rows
-                    if 'Item ID' in autosave_data.columns and autosave_data['Item ID'].isna().any():
-                        # Only assign IDs to rows that don't have them
-                        for idx, row in autosave_data.iterrows():
-                            if pd.isna(row['Item ID']):
-                                autosave_data.at[idx, 'Item ID'] = f"I{idx+1:03d}"
-
-                    # Save changes
-                    save_result = st.session_state.data_manager.save_project_items(autosave_data)
+                    # Save changes, unless the predecessors are invalid
+                    dependency_error = check_dependencies(selected_id, autosave_data)
+                    if dependency_error:
+                        autosave_message.error(f"Not auto-saved: {dependency_error}")
+                        save_result = None
+                    else:
+                        save_result = st.session_state.data_manager.save_project_items(autosave_data)
 
                     if save_result:
                         st.session_state.last_autosave_time = current_time
@@ -530,10 +602,10 @@ def show_edit_project():
 
                         # Show a toast notification for autosave
                         st.toast(f"Auto-saved at {current_time.strftime('%H:%M:%S')}")
-                    else:
+                    elif save_result is not None:
                         logger.error("Auto-save failed, but no exception was raised")
                 except Exception as e:
-                    logger.error(f"Auto-save error: {str(e)}")
+                    logger.error("Auto-save error: %s", e)
                     autosave_message.error("Error during auto-save. Your changes may not be saved.")
 
             # If we're approaching the autosave time, show countdown (optional enhancement)
@@ -583,9 +655,9 @@ def show_edit_project():
 
                             # For any NA values, set defaults
                             if date_col == 'Start Date':
-                                save_df[date_col].fillna(pd.Timestamp('2025-01-01'), inplace=True)
+                                save_df[date_col] = save_df[date_col].fillna(pd.Timestamp('2025-01-01'))
                             else:  # End Date
-                                save_df[date_col].fillna(pd.Timestamp('2025-02-01'), inplace=True)
+                                save_df[date_col] = save_df[date_col].fillna(pd.Timestamp('2025-02-01'))
 
                         # Ensure no empty item names or teams
                         if 'Item Name' in save_df.columns:
@@ -600,15 +672,13 @@ def show_edit_project():
                         # Add required columns
                         save_df['Project ID'] = selected_id
 
-                        # Ensure Item IDs are assigned correctly
-                        if 'Item ID' in save_df.columns:
-                            missing_ids = save_df['Item ID'].isna()
-                            if missing_ids.any():
-                                for idx in save_df[missing_ids].index:
-                                    save_df.at[idx, 'Item ID'] = f"I{idx+1:03d}"
-
-                        # Save changes and get success flag
-                        save_success = st.session_state.data_manager.save_project_items(save_df)
+                        # Save changes and get success flag, unless the predecessors are invalid
+                        dependency_error = check_dependencies(selected_id, save_df)
+                        if dependency_error:
+                            st.error(f"Changes not saved: {dependency_error}")
+                            save_success = None
+                        else:
+                            save_success = st.session_state.data_manager.save_project_items(save_df)
 
                         if save_success:
                             # Store last save time in session state
@@ -627,22 +697,217 @@ def show_edit_project():
                             )
                             # Add a short delay to ensure the success message is visible
                             time_module.sleep(0.5)
-                        else:
+                        elif save_success is not None:
                             st.error("Error saving data. Check the logs for more information.")
 
                     except Exception as e:
-                        logger.error(f"Error saving data: {str(e)}")
+                        logger.error("Error saving data: %s", e)
                         st.error(f"Error saving data: {str(e)}")
 
+def check_dependencies(project_id, items_df):
+    """
+    Error message if the Predecessors of a project's edited items name
+    unknown items or would create a dependency cycle, else None
+    """
+    if 'Predecessors' not in items_df.columns:
+        return None
+    snapshot = get_snapshot(st.session_state.data_manager)
+    known_ids = set(snapshot.items['Item ID'].astype(str)) | set(items_df['Item ID'].dropna().astype(str))
+    unknown = sorted({
+        predecessor
+        for predecessors in items_df['Predecessors']
+        for predecessor in parse_predecessors(predecessors)
+        if predecessor not in known_ids
+    })
+    if unknown:
+        return f"unknown predecessor Item ID(s): {', '.join(unknown)}"
+
+    # The project's links as edited, plus every other item's stored links
+    project_item_ids = set(snapshot.get_project_items(project_id)['Item ID'].astype(str))
+    other = snapshot.dependencies[~snapshot.dependencies['Item ID'].isin(project_item_ids)]
+    cycle = find_cycle(pd.concat([other, predecessors_to_dependencies(items_df)], ignore_index=True))
+    if cycle:
+        return "the predecessors form a cycle: " + " → ".join(cycle + cycle[:1])
+    return None
+
+def get_cached_figure(cache_key, signature, build_figure):
+    """
+    Reuse the figure stored under cache_key while its inputs are unchanged.
+
+    signature holds everything the figure depends on (data version and chart
+    options), so presentation-only changes such as the chart height don't
+    rebuild it. A figure another session (or warm_up) already built for the
+    same signature is copied from the shared figure cache instead.
+    """
+    cached = st.session_state.get(cache_key)
+    hit = cached is not None and cached[0] == signature
+    metrics.record_cache('figure', hit)
+    if not hit:
+        shared = figure_cache.get(cache_key, signature)
+        metrics.record_cache('shared_figure', shared is not None)
+        if shared is None:
+            shared = build_figure()
+            figure_cache.put(cache_key, signature, shared)
+        cached = (signature, figure_cache.session_copy(shared))
+        st.session_state[cache_key] = cached
+    return cached[1]
+
+def default_deadlines_end(summary):
+    """Default end of the Team Deadlines range: 3 months after the last End Date"""
+    try:
+        max_end_date = summary['End Date'].max()
+        if pd.notna(max_end_date):
+            return (max_end_date + pd.DateOffset(months=3)).date()
+    except Exception as e:
+        logger.error("Error calculating end date: %s", e)
+    return datetime(2026, 1, 1).date()
+
+def deadlines_chart(data_manager, snapshot, filtered_data, team_summary, selected_isos, custom_start, custom_end,
+                    tick_interval):
+    """(cache key, signature, build function) of the Team Deadlines chart for one set of options"""
+    def build_deadlines_chart():
+        # The chart only uses each team's last End Date, which the summary rows hold;
+        # a deadline bar is visible when it ends after the range start
+        chart_items = team_summary
+        if custom_start is not None:
+            chart_items = team_summary[team_summary['End Date'] >= pd.Timestamp(custom_start)]
+        return TimelineVisualizer(data_manager).create_team_deadlines_chart(
+            filtered_data,
+            chart_items,
+            custom_start_date=custom_start,
+            custom_end_date=custom_end,
+            tick_interval=tick_interval,  # Pass the tick interval to the chart
+            # Kept up to date by each write instead of recomputed for the whole portfolio
+            alerts=get_alerts(data_manager).for_projects(filtered_data)
+        )
+
+    signature = (snapshot.version, tuple(selected_isos), custom_start, custom_end, tick_interval)
+    return "dashboard_deadlines_figure", signature, build_deadlines_chart
+
+def workload_counts(data_manager, snapshot, cube, isos, bands, teams, measure, start, end):
+    """Items per team (columns) and month (rows) for the Team Workload heatmap"""
+    if measure == WORKLOAD_ACTIVE:
+        # Items active in a month are pre-aggregated in the portfolio cube
+        return cube.monthly(isos=isos, bands=bands, teams=teams, start=start, end=end)
+
+    # Peaks need item dates to the day, so they come from the item sweep (which loads the items)
+    workload = get_workload(data_manager)
+    project_ids = None
+    if isos or bands:
+        projects = snapshot.projects
+        selected = pd.Series(True, index=projects.index)
+        if isos:
+            selected &= projects['ISO'].isin(isos)
+        if bands:
+            selected &= projects['Voltage'].map(voltage_band).isin(bands)
+        project_ids = projects.loc[selected, 'ID']
+    counts = workload.monthly_counts(project_ids=project_ids, start=start, end=end, measure=measure)
+    if teams:
+        counts = counts[[team for team in counts.columns if team in teams]]
+    return counts
+
+def workload_chart(snapshot, counts, isos, bands, teams, measure, capacity, start, end):
+    """(cache key, signature, build function) of the Team Workload heatmap for one set of options"""
+    signature = (snapshot.version, tuple(isos), tuple(bands), tuple(teams), measure, capacity, start, end)
+    return "dashboard_workload_figure", signature, lambda: TimelineVisualizer().create_team_workload_heatmap(
+        counts, capacity=capacity, value_label=WORKLOAD_MEASURE_LABELS[measure])
+
+def warm_up():
+    """
+    Load the data and build the Dashboard's figures for its default options
+    into the shared caches, so the first session after a start doesn't pay
+    for them (run by serve.py before the server accepts connections).
+    """
+    data_manager = get_shared_data_manager()
+    snapshot = get_snapshot(data_manager)
+    summary = data_manager.get_project_summary()
+    project_rollup(summary, snapshot.projects)
+
+    if not snapshot.projects.empty:
+        team_summary = summary[summary['Project ID'].isin(snapshot.projects['ID'])]
+        if not team_summary.empty:
+            cache_key, signature, build = deadlines_chart(
+                data_manager, snapshot, snapshot.projects, team_summary, [], DASHBOARD_DEFAULT_START,
+                default_deadlines_end(summary), None)
+            figure_cache.put(cache_key, signature, build())
+
+    cube = get_cube(data_manager)
+    if len(get_workload(data_manager)):
+        counts = workload_counts(data_manager, snapshot, cube, [], [], [], WORKLOAD_PEAK, DASHBOARD_DEFAULT_START,
+                                 None)
+        cache_key, signature, build = workload_chart(snapshot, counts, [], [], [], WORKLOAD_PEAK,
+                                                     DEFAULT_TEAM_CAPACITY, DASHBOARD_DEFAULT_START, None)
+        figure_cache.put(cache_key, signature, build())
+
+@st.fragment
+@profiling.profiled('view.show_dashboard', requested=profile_requested)
+@query_trace.captured('view.show_dashboard', on_log=remember_query_log)
+@tracing.traced('view.show_dashboard', on_trace=remember_trace)
 def show_dashboard():
     st.header("Project Dashboard")
 
     # Display summary statistics and metrics
-    col1, col2 = st.columns(2)
+    show_project_summary()
 
     # Add Team Deadlines Chart section to the dashboard
     st.subheader("Team Deadlines Across Projects")
 
+    show_team_deadlines_panel()
+
+    st.subheader("Team Workload Across Projects")
+
+    show_team_workload_panel()
+
+    st.subheader("Schedule Risk Across Projects")
+
+    show_portfolio_risk_panel()
+
+def show_project_summary():
+    """Portfolio metrics and per-project rollups, read from the project summary instead of the items"""
+    try:
+        snapshot = get_projects_snapshot(st.session_state.data_manager)
+        rollup = project_rollup(st.session_state.data_manager.get_project_summary(), snapshot.projects)
+    except Exception as e:
+        logger.error("Error getting project summary: %s", e)
+        st.error("Could not load the project summary.")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Projects", len(rollup))
+    col2.metric("Items", int(rollup['Items'].sum()))
+    col3.metric("Past Target COD", int((rollup['Slack Days'] < 0).sum()),
+                help="Projects whose last item ends after their Target COD")
+
+    with st.expander("Project Summary", expanded=False):
+        st.dataframe(
+            rollup.rename(columns={'ID': 'Project ID', 'Name': 'Project Name'}),
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                'Start Date': st.column_config.DateColumn(format="YYYY-MM-DD"),
+                'End Date': st.column_config.DateColumn(format="YYYY-MM-DD"),
+                'Target COD': st.column_config.DateColumn(format="YYYY-MM-DD"),
+                'Slack Days': st.column_config.NumberColumn(help="Days from the last End Date to Target COD")
+            }
+        )
+
+@st.fragment
+@profiling.profiled('view.show_team_deadlines_panel', requested=profile_requested)
+@query_trace.captured('view.show_team_deadlines_panel', on_log=remember_query_log)
+@tracing.traced('view.show_team_deadlines_panel', on_trace=remember_trace)
+def show_team_deadlines_panel():
+    """Chart configuration and Team Deadlines chart, rerun on their own when an option changes"""
+    # Get data for chart with error handling - projects and the project summary, not the items
+    try:
+        snapshot = get_projects_snapshot(st.session_state.data_manager)
+        project_data = snapshot.projects
+        # Items, first start and last end per project and team, kept up to date by each write
+        summary = st.session_state.data_manager.get_project_summary()
+    except Exception as e:
+        logger.error("Error getting project data: %s", e)
+        st.error("Could not load project data for the dashboard.")
+        return
+
     # Create a container for the chart configuration
     with st.expander("Chart Configuration", expanded=False):
         # Set up filters in columns
@@ -651,17 +916,16 @@ def show_dashboard():
         with filter_col1:
             st.write("**Filter by ISO**")
             try:
-                all_isos = st.session_state.data_manager.get_unique_isos()
                 selected_isos = st.multiselect(
                     "",
-                    options=all_isos,
+                    options=snapshot.metadata.unique_isos,
                     default=None,
                     placeholder="Select ISO(s) to filter projects",
                     label_visibility="collapsed",
                     key="dashboard_deadlines_iso_filter"
                 )
             except Exception as e:
-                logger.error(f"Error getting ISO values: {str(e)}")
+                logger.error("Error getting ISO values: %s", e)
                 st.error("Could not load ISO filter values")
                 selected_isos = []
 
@@ -678,31 +942,14 @@ def show_dashboard():
                 with date_cols[0]:
                     custom_start = st.date_input(
                         "Start Date",
-                        value=datetime(2025, 1, 1).date(),  # Set default to January 2025
+                        value=DASHBOARD_DEFAULT_START,  # Set default to January 2025
                         key="dashboard_deadlines_start_date"
                     )
 
                 with date_cols[1]:
-                    # Get the maximum end date from projects or default to 1 year from start
-                    try:
-                        all_items = pd.DataFrame()
-                        for project_id in st.session_state.data_manager.get_data()['ID'].unique():
-                            project_items = st.session_state.data_manager.get_project_items(project_id)
-                            all_items = pd.concat([all_items, project_items], ignore_index=True)
-
-                        if not all_items.empty:
-                            max_end_date = pd.to_datetime(all_items['End Date']).max()
-                            # Add 3 months buffer to the max date
-                            default_end_date = (max_end_date + pd.DateOffset(months=3)).date()
-                        else:
-                            default_end_date = datetime(2026, 1, 1).date()
-                    except Exception as e:
-                        logger.error(f"Error calculating end date: {str(e)}")
-                        default_end_date = datetime(2026, 1, 1).date()
-
                     custom_end = st.date_input(
                         "End Date",
-                        value=default_end_date,
+                        value=default_deadlines_end(summary),
                         key="dashboard_deadlines_end_date"
                     )
             else:
@@ -748,14 +995,6 @@ def show_dashboard():
             key="dashboard_deadlines_height"
         )
 
-    # Get data for chart with error handling
-    try:
-        project_data = st.session_state.data_manager.get_data()
-    except Exception as e:
-        logger.error(f"Error getting project data: {str(e)}")
-        st.error("Could not load project data for the dashboard.")
-        return
-
     if not project_data.empty:
         # Apply ISO filter if selected
         if selected_isos:
@@ -766,63 +1005,30 @@ def show_dashboard():
         else:
             filtered_data = project_data
 
-        # Get all items data with error handling
-        try:
-            all_items = pd.DataFrame()
-            for project_id in filtered_data['ID'].unique():
-                try:
-                    project_items = st.session_state.data_manager.get_project_items(project_id)
-                    all_items = pd.concat([all_items, project_items], ignore_index=True)
-                except Exception as e:
-                    logger.warning(f"Error loading items for project {project_id}: {str(e)}")
-                    # Continue with next project
-
-            if all_items.empty and len(filtered_data) > 0:
-                st.warning("Could not load project items. Some data may be missing.")
-        except Exception as e:
-            logger.error(f"Error loading project items: {str(e)}")
-            st.error("Could not load project items data.")
-            all_items = pd.DataFrame()
+        # Latest deadline per team of the filtered projects, from the project summary
+        team_summary = summary[summary['Project ID'].isin(filtered_data['ID'])]
+        if team_summary.empty and len(filtered_data) > 0:
+            st.warning("Could not load project items. Some data may be missing.")
 
-        if not all_items.empty:
+        if not team_summary.empty:
             # Add refresh and download buttons ABOVE the chart
             refresh_col, _, download_col = st.columns([1, 1, 1])
 
             with refresh_col:
                 if st.button("🔄 Refresh Chart", key="refresh_dashboard_chart", help="Refresh chart data without resetting settings"):
-                    # Force a re-fetch of data by rerunning just this part
-                    st.rerun()
+                    # Drop the cached figure so it is rebuilt below
+                    st.session_state.pop("dashboard_deadlines_figure", None)
+                    figure_cache.discard("dashboard_deadlines_figure")
 
             with download_col:
-                # Create downloadable DataFrame
-                download_df = pd.DataFrame()
-
-                for project_id in filtered_data['ID'].unique():
-                    project_info = filtered_data[filtered_data['ID'] == project_id].iloc[0]
-                    project_items = all_items[all_items['Project ID'] == project_id]
-
-                    for team in project_items['Team'].unique():
-                        team_items = project_items[project_items['Team'] == team]
-                        if not team_items.empty:
-                            try:
-                                latest_date = pd.to_datetime(team_items['End Date']).max()
-
-                                # Check if latest_date is NaT before calling strftime
-                                deadline_str = "N/A"
-                                if pd.notna(latest_date):
-                                    deadline_str = latest_date.strftime('%Y-%m-%d')
-
-                                new_row = pd.DataFrame({
-                                    'Project ID': [project_id],
-                                    'Project Name': [project_info['Name']],
-                                    'ISO': [project_info['ISO']],
-                                    'Team': [team],
-                                    'Deadline': [deadline_str]
-                                })
-                                download_df = pd.concat([download_df, new_row], ignore_index=True)
-                            except Exception as e:
-                                logger.error(f"Error processing team {team} for project {project_id}: {str(e)}")
-                                # Continue with next team
+                # Latest deadline per project and team, in project order
+                deadlines = team_summary[['Project ID', 'Team', 'End Date']].rename(columns={'End Date': 'Deadline'})
+                download_df = (
+                    filtered_data[['ID', 'Name', 'ISO']]
+                    .rename(columns={'ID': 'Project ID', 'Name': 'Project Name'})
+                    .merge(deadlines, on='Project ID')
+                )
+                download_df['Deadline'] = download_df['Deadline'].dt.strftime('%Y-%m-%d').fillna("N/A")
 
                 st.download_button(
                     label="📥 Download Deadlines Data (CSV)",
@@ -836,90 +1042,242 @@ def show_dashboard():
             st.markdown("---")
 
             try:
-                # Create visualization with progress indicator
+                # Check for required columns in the summary
+                required_cols = ['Project ID', 'Team', 'End Date']
+                missing_cols = [col for col in required_cols if col not in team_summary.columns]
+                if missing_cols:
+                    st.error(f"Missing required data columns: {', '.join(missing_cols)}")
+                    logger.error("Missing required columns in timeline data: %s", missing_cols)
+                    return
+
+                # Log data shape before visualization
+                logger.info("Creating chart with %d projects and %d team deadlines", len(filtered_data), len(team_summary))
+
+                # Create visualization with progress indicator - only when the data or options changed
                 with st.spinner("Generating chart..."):
-                    visualizer = TimelineVisualizer()
+                    result = get_cached_figure(*deadlines_chart(
+                        st.session_state.data_manager, snapshot, filtered_data, team_summary,
+                        selected_isos, custom_start, custom_end, tick_interval
+                    ))
+
+                # Handle return values (can be just a figure or a tuple with figure, alerts, and warning info)
+                if isinstance(result, tuple) and len(result) >= 2:
+                    fig = result[0]
+                    alerts = result[1]
+                    warning_info = result[2] if len(result) > 2 else None
+                else:
+                    fig = result
+                    alerts = []
+                    warning_info = None
+
+                # Only proceed if we got a valid figure back
+                if fig is not None:
+                    # Update chart height and width
+                    fig.update_layout(
+                        height=chart_height,
+                        margin=dict(l=200, r=50, t=100, b=100)  # Increased left margin for project names
+                    )
 
-                    # Double-check we have required data before calling visualization
-                    if filtered_data.empty:
-                        st.info("No project data available to chart. Please add projects first.")
-                    elif all_items.empty:
-                        st.info("No timeline items available. Please add project items in the Edit Project tab.")
-                    else:
-                        # Check for required columns in all_items
-                        required_cols = ['Project ID', 'Team', 'End Date']
-                        missing_cols = [col for col in required_cols if col not in all_items.columns]
-                        if missing_cols:
-                            st.error(f"Missing required data columns: {', '.join(missing_cols)}")
-                            logger.error(f"Missing required columns in timeline data: {missing_cols}")
-                        else:
-                            # Log data shape before visualization
-                            logger.info(f"Creating chart with {len(filtered_data)} projects and {len(all_items)} items")
-
-                            result = visualizer.create_team_deadlines_chart(
-                                filtered_data, 
-                                all_items,
-                                custom_start_date=custom_start,
-                                custom_end_date=custom_end,
-                                tick_interval=tick_interval  # Pass the tick interval to the chart
-                            )
+                    # Display chart
+                    st.plotly_chart(fig, use_container_width=True)
+
+                    # Display sequence warnings AFTER the chart if they exist
+                    if warning_info:
+                        with st.expander("⚠️ Sequencing Warnings", expanded=False):
+                            st.markdown("### Projects with Potential Scheduling Issues")
+                            st.markdown("The following projects have teams with end dates that occur after Construction end date:")
+
+                            for project_name, teams in warning_info["alert_projects"].items():
+                                st.markdown(f"**{project_name}:**")
 
-                            # Handle return values (can be just a figure or a tuple with figure, alerts, and warning info)
-                            if isinstance(result, tuple) and len(result) >= 2:
-                                fig = result[0]
-                                alerts = result[1]
-                                warning_info = result[2] if len(result) > 2 else None
-                            else:
-                                fig = result
-                                alerts = []
-                                warning_info = None
-
-                            # Only proceed if we got a valid figure back
-                            if fig is not None:
-                                # Update chart height and width
-                                fig.update_layout(
-                                    height=chart_height,
-                                    margin=dict(l=200, r=50, t=100, b=100)  # Increased left margin for project names
-                                )
-
-                                # Display chart
-                                st.plotly_chart(fig, use_container_width=True)
-
-                                # Display sequence warnings AFTER the chart if they exist
-                                if warning_info:
-                                    with st.expander("⚠️ Sequencing Warnings", expanded=False):
-                                        st.markdown("### Projects with Potential Scheduling Issues")
-                                        st.markdown("The following projects have teams with end dates that occur after Construction end date:")
-
-                                        for project_name, teams in warning_info["alert_projects"].items():
-                                            st.markdown(f"**{project_name}:**")
-
-                                            # Find detailed warnings for this project
-                                            project_warnings = [w for w in warning_info["alert_details"] if w["proj_name"] == project_name]
-
-                                            # Display warnings in a readable format
-                                            for warning in project_warnings:
-                                                st.markdown(f"- **{warning['team']}** ends **{warning['days_diff']} days** after Construction end date")
-
-                                            st.markdown("---")
-                            else:
-                                st.warning("No data available to create the chart. Try adding project items first.")
+                                # Find detailed warnings for this project
+                                project_warnings = [w for w in warning_info["alert_details"] if w["proj_name"] == project_name]
+
+                                # Display warnings in a readable format
+                                for warning in project_warnings:
+                                    st.markdown(f"- **{warning['team']}** ends **{warning['days_diff']} days** after Construction end date")
+
+                                st.markdown("---")
+                else:
+                    st.warning("No data available to create the chart. Try adding project items first.")
             except Exception as e:
-                logger.error(f"Error creating team deadlines chart: {str(e)}")
+                logger.error("Error creating team deadlines chart: %s", e)
                 st.error("An error occurred while creating the chart. Please check your data.")
         else:
             st.info("No timeline items available for projects.")
     else:
         st.info("No projects available to display.")
 
+@st.fragment
+@profiling.profiled('view.show_team_workload_panel', requested=profile_requested)
+@query_trace.captured('view.show_team_workload_panel', on_log=remember_query_log)
+@tracing.traced('view.show_team_workload_panel', on_trace=remember_trace)
+def show_team_workload_panel():
+    """Heatmap of each team's concurrent items per month across the portfolio, with over-allocated periods"""
+    try:
+        snapshot = get_projects_snapshot(st.session_state.data_manager)
+        # Pre-aggregated by ISO, voltage band, team and month, kept up to date by each write
+        cube = get_cube(st.session_state.data_manager)
+        teams = cube.teams()
+    except Exception as e:
+        logger.error("Error building team workload: %s", e)
+        st.error("Could not load the team workload.")
+        return
+
+    if not teams:
+        st.info("No timeline items with dates available for projects.")
+        return
+
+    with st.expander("Workload Configuration", expanded=False):
+        filter_cols = st.columns(3)
+        with filter_cols[0]:
+            selected_isos = st.multiselect(
+                "Filter by ISO",
+                options=snapshot.metadata.unique_isos,
+                default=None,
+                placeholder="All ISOs",
+                key="dashboard_workload_iso_filter"
+            )
+        with filter_cols[1]:
+            selected_bands = st.multiselect(
+                "Filter by voltage",
+                options=cube.voltage_bands(),
+                default=None,
+                placeholder="All voltages",
+                key="dashboard_workload_voltage_filter"
+            )
+        with filter_cols[2]:
+            selected_teams = st.multiselect(
+                "Filter by team",
+                options=teams,
+                default=None,
+                placeholder="All teams",
+                key="dashboard_workload_team_filter"
+            )
+        config_col2, config_col3 = st.columns(2)
+        with config_col2:
+            measure = st.radio(
+                "Count",
+                options=list(WORKLOAD_MEASURE_LABELS),
+                format_func=WORKLOAD_MEASURE_LABELS.get,
+                key="dashboard_workload_measure",
+                help="Peak: the most items a team had running on any one day of the month. "
+                     "Active: every item running at some point in the month."
+            )
+        with config_col3:
+            capacity = st.number_input(
+                "Team capacity (concurrent items)",
+                min_value=1,
+                value=DEFAULT_TEAM_CAPACITY,
+                step=1,
+                key="dashboard_workload_capacity",
+                help="Months in which a team has more items than this are flagged as over-allocated"
+            )
+        date_cols = st.columns(2)
+        with date_cols[0]:
+            workload_start = st.date_input("Start Date", value=DASHBOARD_DEFAULT_START,
+                                           key="dashboard_workload_start_date")
+        with date_cols[1]:
+            workload_end = st.date_input("End Date", value=None, key="dashboard_workload_end_date",
+                                         help="Leave empty to run to the last item's end date")
+
+    try:
+        counts = workload_counts(st.session_state.data_manager, snapshot, cube, selected_isos, selected_bands,
+                                 selected_teams, measure, workload_start, workload_end)
+    except Exception as e:
+        logger.error("Error building team workload: %s", e)
+        st.error("Could not load the team workload.")
+        return
+
+    totals = cube.totals(isos=selected_isos, bands=selected_bands, teams=selected_teams,
+                         start=workload_start, end=workload_end)
+    total_cols = st.columns(4)
+    total_cols[0].metric("Items starting", f"{totals['Items']:,}")
+    total_cols[1].metric("Item-months", f"{totals['Item Months']:,}")
+    for col, label, date in ((total_cols[2], "First start", totals['First Start']),
+                             (total_cols[3], "Last end", totals['Last End'])):
+        col.metric(label, date.strftime('%Y-%m-%d') if pd.notna(date) else "N/A")
+
+    fig = get_cached_figure(*workload_chart(snapshot, counts, selected_isos, selected_bands, selected_teams, measure,
+                                            capacity, workload_start, workload_end))
+    st.plotly_chart(fig, use_container_width=True)
+
+    periods = over_allocations(counts, capacity)
+    if periods.empty:
+        st.caption(f"No team has more than {capacity} items at once in this range.")
+    else:
+        with st.expander(f"⚠️ Over-allocated Periods ({len(periods)})", expanded=False):
+            periods['From'] = periods['From'].dt.strftime('%b %Y')
+            periods['To'] = periods['To'].dt.strftime('%b %Y')
+            st.dataframe(periods, hide_index=True, use_container_width=True)
+
+@st.fragment
+@profiling.profiled('view.show_portfolio_risk_panel', requested=profile_requested)
+@query_trace.captured('view.show_portfolio_risk_panel', on_log=remember_query_log)
+@tracing.traced('view.show_portfolio_risk_panel', on_trace=remember_trace)
+def show_portfolio_risk_panel():
+    """P50/P80 completion and on-time probability of every project, simulated on request"""
+    try:
+        # The items are only loaded to simulate
+        snapshot = get_projects_snapshot(st.session_state.data_manager)
+    except Exception as e:
+        logger.error("Error getting data for the portfolio risk: %s", e)
+        st.error("Could not load project data.")
+        return
+
+    spreads = get_spreads()
+    signature = (snapshot.version, repr(spreads))
+    cached = st.session_state.get('portfolio_risk')
+
+    if st.button("🎲 Simulate All Projects", key="simulate_portfolio_risk",
+                 help=f"{PORTFOLIO_RISK_SAMPLES:,} samples per project, on up to {RISK_WORKERS} worker process(es)"):
+        try:
+            with st.spinner("Simulating project schedules..."):
+                snapshot = get_snapshot(st.session_state.data_manager)
+                summary = simulate_portfolio(snapshot.projects, snapshot.items, snapshot.dependencies, spreads=spreads)
+            cached = (signature, summary)
+            st.session_state['portfolio_risk'] = cached
+        except Exception as e:
+            logger.error("Error simulating the portfolio: %s", e)
+            st.error("Could not simulate the project schedules.")
+            return
+
+    if cached is None:
+        st.caption("Simulates every project's completion with uncertain item durations and compares it with "
+                   "its Target COD. Set the duration spreads in a project's timeline.")
+        return
+    if cached[0] != signature:
+        st.caption("The data or the duration spreads changed since this simulation. Run it again to refresh.")
+
+    summary = cached[1]
+    at_risk = int((summary['P(On Time)'] < 0.5).sum())
+    st.markdown(f"**{at_risk}** of {len(summary)} projects are more likely than not to miss their Target COD.")
+    st.dataframe(
+        summary,
+        column_config={
+            'P50 Completion': st.column_config.DateColumn(format="YYYY-MM-DD"),
+            'P80 Completion': st.column_config.DateColumn(format="YYYY-MM-DD"),
+            'Target COD': st.column_config.DateColumn(format="YYYY-MM-DD"),
+            'P(On Time)': st.column_config.ProgressColumn(min_value=0.0, max_value=1.0, format="percent")
+        },
+        hide_index=True,
+        use_container_width=True
+    )
+
+@st.fragment
+@profiling.profiled('view.show_critical_path', requested=profile_requested)
+@query_trace.captured('view.show_critical_path', on_log=remember_query_log)
+@tracing.traced('view.show_critical_path', on_trace=remember_trace)
 def show_critical_path():
     st.header("Project Timeline Overview")
 
     # Get all projects with error handling
     try:
-        data = st.session_state.data_manager.get_data()
+        snapshot = get_snapshot(st.session_state.data_manager)
+        data = snapshot.projects
+        metadata = snapshot.metadata
     except Exception as e:
-        logger.error(f"Error retrieving project data: {str(e)}")
+        logger.error("Error retrieving project data: %s", e)
         st.error("Could not load project data. Please try again later.")
         return
 
@@ -941,34 +1299,26 @@ def show_critical_path():
         with filter_row[0]:
             st.write("Filter by ISO")
             try:
-                all_isos = st.session_state.data_manager.get_unique_isos()
                 selected_isos = st.multiselect(
                     "",
-                    options=all_isos,
+                    options=metadata.unique_isos,
                     default=None,
                     placeholder="Select ISO(s) to filter projects",
                     label_visibility="collapsed"
                 )
             except Exception as e:
-                logger.error(f"Error getting ISO values: {str(e)}")
+                logger.error("Error getting ISO values: %s", e)
                 st.error("Could not load ISO filter options")
                 selected_isos = []
 
-        # Filter projects based on selected ISO(s)
-        filtered_data = data.copy()
-
-        # Apply ISO filter if any are selected
-        if selected_isos:
-            filtered_data = filtered_data[filtered_data['ISO'].isin(selected_isos)]
+        # Project options filtered by the selected ISO(s) (cached per data version and filter)
+        project_options = metadata.iso_option_labels(selected_isos)
 
         # Show count of filtered projects
-        if len(filtered_data) == 0:
+        if len(project_options) == 0:
             st.warning("No projects match your filter criteria. Try adjusting your filters.")
         else:
-            st.caption(f"Found {len(filtered_data)} matching project(s)")
-
-        # Create project options from filtered data
-        project_options = [f"{row['ID']} - {row['Name']} ({row['ISO']})" for _, row in filtered_data.iterrows()]
+            st.caption(f"Found {len(project_options)} matching project(s)")
 
         # Project selection section
         st.write("Select a Project to View")
@@ -997,157 +1347,287 @@ def show_critical_path():
         project_id = st.session_state.selected_project.split(" - ")[0]
         project_name = st.session_state.selected_project.split(" - ")[1].split(" (")[0]
 
-        # Get project items with error handling
-        try:
-            items_df = st.session_state.data_manager.get_project_items(project_id)
-        except Exception as e:
-            logger.error(f"Error retrieving project items for {project_id}: {str(e)}")
-            st.error("Could not load project items. Please try again later.")
-            items_df = pd.DataFrame()
+        show_timeline_panel(project_id, project_name)
+    else:
+        st.info("Please select a project to view its timeline.")
 
-        if not items_df.empty:
-            # Create timeline visualization
-            visualizer = TimelineVisualizer()
+@st.fragment
+@profiling.profiled('view.show_timeline_panel', requested=profile_requested)
+@query_trace.captured('view.show_timeline_panel', on_log=remember_query_log)
+@tracing.traced('view.show_timeline_panel', on_trace=remember_trace)
+def show_timeline_panel(project_id, project_name):
+    """Chart configuration and Gantt chart for one project, rerun on their own when an option changes"""
+    # Get project items with error handling
+    try:
+        snapshot = get_snapshot(st.session_state.data_manager)
+        items_df = snapshot.get_project_items(project_id)
+    except Exception as e:
+        logger.error("Error retrieving project items for %s: %s", project_id, e)
+        st.error("Could not load project items. Please try again later.")
+        return
 
-            # Prepare data for Gantt chart
-            plot_data = items_df.copy()
-            plot_data['Task'] = plot_data['Item Name']
-            plot_data['Start'] = pd.to_datetime(plot_data['Start Date'], errors='coerce')
-            plot_data['Finish'] = pd.to_datetime(plot_data['End Date'], errors='coerce')
-            plot_data['Duration'] = (plot_data['Finish'] - plot_data['Start']).dt.days.fillna(0)
-            plot_data['Team'] = plot_data['Team'].fillna('Unknown')
+    if items_df.empty:
+        st.info("No timeline items available for this project.")
+        return
 
-            # Calculate min and max dates from data for default date range
-            min_date = plot_data['Start'].min()
-            max_date = plot_data['Finish'].max() + pd.DateOffset(months=6)
+    # Calculate min and max dates from data for default date range
+    min_date = pd.to_datetime(items_df['Start Date'], errors='coerce').min()
+    max_date = pd.to_datetime(items_df['End Date'], errors='coerce').max() + pd.DateOffset(months=6)
 
-            # Add chart configuration options in an expander
-            with st.expander("Chart Configuration"):
-                st.subheader("Axis Settings")
+    # Add chart configuration options in an expander
+    with st.expander("Chart Configuration"):
+        st.subheader("Axis Settings")
 
-                # Update to 2 columns
-                col1, col2 = st.columns(2)
+        # Update to 2 columns
+        col1, col2 = st.columns(2)
 
-                with col1:
-                    # X-axis date range controls
-                    st.write("**X-Axis (Timeline) Range**")
-                    use_custom_dates = st.checkbox("Use custom date range", value=False)
-
-                    if use_custom_dates:
-                        custom_start = st.date_input(
-                            "Start Date", 
-                            value=min_date.date() if not pd.isna(min_date) else datetime.now().date(),
-                            key="gantt_start_date"
-                        )
+        with col1:
+            # X-axis date range controls
+            st.write("**X-Axis (Timeline) Range**")
+            use_custom_dates = st.checkbox("Use custom date range", value=False)
 
-                        custom_end = st.date_input(
-                            "End Date", 
-                            value=max_date.date() if not pd.isna(max_date) else (datetime.now() + timedelta(days=180)).date(),
-                            key="gantt_end_date"
-                        )
-                    else:
-                        custom_start = None
-                        custom_end = None
-
-                    # Time interval controls with improved feedback
-                    st.write("**Time Interval**")
-                    interval_options = {
-                        "Auto": {"value": None, "description": "Automatically adjust based on date range"},
-                        "Monthly": {"value": 1, "description": "Show ticks every month"},
-                        "Quarterly": {"value": 3, "description": "Show ticks every 3 months"},
-                        "Semi-Annual": {"value": 6, "description": "Show ticks every 6 months"},
-                        "Annual": {"value": 12, "description": "Show ticks every 12 months"}
-                    }
-
-                    # Create a column layout to place description below the slider
-                    slider_col, _ = st.columns([10, 1])
-
-                    with slider_col:
-                        # Use the select_slider with just the option names
-                        selected_interval = st.select_slider(
-                            "Select time interval for x-axis ticks",
-                            options=list(interval_options.keys()),
-                            value="Auto"
-                        )
+            if use_custom_dates:
+                custom_start = st.date_input(
+                    "Start Date", 
+                    value=min_date.date() if not pd.isna(min_date) else datetime.now().date(),
+                    key="gantt_start_date"
+                )
 
-                        # Show the description of the currently selected option
-                        st.caption(f"**{selected_interval}**: {interval_options[selected_interval]['description']}")
+                custom_end = st.date_input(
+                    "End Date", 
+                    value=max_date.date() if not pd.isna(max_date) else (datetime.now() + timedelta(days=180)).date(),
+                    key="gantt_end_date"
+                )
+            else:
+                custom_start = None
+                custom_end = None
+
+            # Time interval controls with improved feedback
+            st.write("**Time Interval**")
+            interval_options = {
+                "Auto": {"value": None, "description": "Automatically adjust based on date range"},
+                "Monthly": {"value": 1, "description": "Show ticks every month"},
+                "Quarterly": {"value": 3, "description": "Show ticks every 3 months"},
+                "Semi-Annual": {"value": 6, "description": "Show ticks every 6 months"},
+                "Annual": {"value": 12, "description": "Show ticks every 12 months"}
+            }
 
-                    # Get the actual value for the visualization
-                    tick_interval = interval_options[selected_interval]["value"]
+            # Create a column layout to place description below the slider
+            slider_col, _ = st.columns([10, 1])
 
-                with col2:
-                    # Y-axis controls
-                    st.write("**Y-Axis Settings**")
-                    show_task_labels = st.checkbox("Show task labels", value=True)
-
-                # Chart height control within the configuration section
-                st.write("**Chart Height**")
-                chart_height = st.slider(
-                    "Chart Height", 
-                    min_value=400, 
-                    max_value=800, 
-                    value=650,  # Default to 650px as requested
-                    step=50,
-                    key=f"timeline_chart_height_{project_id}"
+            with slider_col:
+                # Use the select_slider with just the option names
+                selected_interval = st.select_slider(
+                    "Select time interval for x-axis ticks",
+                    options=list(interval_options.keys()),
+                    value="Auto"
                 )
 
-                # At the end of the expander, add a divider
-                st.markdown("---")
+                # Show the description of the currently selected option
+                st.caption(f"**{selected_interval}**: {interval_options[selected_interval]['description']}")
 
-            # Display timeline with settings
-            st.subheader(f"Timeline for {project_name} ({project_id})")
+            # Get the actual value for the visualization
+            tick_interval = interval_options[selected_interval]["value"]
 
-            # Add refresh button and height control to the timeline chart
-            refresh_col, height_col, download_col = st.columns([1, 1, 1])
+        with col2:
+            # Y-axis controls
+            st.write("**Y-Axis Settings**")
+            show_task_labels = st.checkbox("Show task labels", value=True)
 
-            with refresh_col:
-                if st.button("🔄 Refresh Chart", key=f"refresh_timeline_{project_id}", help="Refresh chart data without resetting settings"):
-                    st.rerun()
+            st.write("**Schedule Risk**")
+            show_risk = st.checkbox(
+                "Show P50/P80 finish bands",
+                value=False,
+                key="timeline_show_risk",
+                help=f"Simulate the project {DEFAULT_RISK_SAMPLES:,} times with uncertain item durations "
+                     "and compare the completion dates with the Target COD"
+            )
 
-            try:
-                timeline_fig = visualizer.create_timeline(
-                    plot_data,
-                    custom_start_date=custom_start,
-                    custom_end_date=custom_end,
-                    show_task_labels=show_task_labels,
-                    tick_interval=tick_interval
-                )
+        # Chart height control within the configuration section
+        st.write("**Chart Height**")
+        chart_height = st.slider(
+            "Chart Height", 
+            min_value=400, 
+            max_value=800, 
+            value=650,  # Default to 650px as requested
+            step=50,
+            key=f"timeline_chart_height_{project_id}"
+        )
 
-                # Apply custom height from slider
-                timeline_fig.update_layout(height=chart_height)
+        # At the end of the expander, add a divider
+        st.markdown("---")
 
-                st.plotly_chart(
-                    timeline_fig,
-                    use_container_width=True
-                )
+    # Critical path of the whole program, cached per data version
+    critical_items = set()
+    schedule = None
+    try:
+        schedule = get_schedule(st.session_state.data_manager)
+        critical_items = schedule.critical_items()
+    except CycleError as e:
+        st.warning(f"Critical path not available - {e}. Edit the items' predecessors to break the cycle.")
+    except DuplicateItemIdError as e:
+        st.warning(f"Critical path not available - {e}. Give each item its own Item ID.")
+    except Exception as e:
+        logger.error("Error computing critical path: %s", e)
 
-                # Add download button after the chart is displayed
-                with download_col:
-                    # Prepare CSV data
-                    csv_data = items_df.to_csv(index=False)
-                    st.download_button(
-                        label="📥 Download Timeline Data (CSV)",
-                        data=csv_data,
-                        file_name=f"{project_name}_timeline_data.csv",
-                        mime="text/csv",
-                        key="download_timeline_csv"
-                    )
+    # Monte Carlo completion dates, kept until the data or the duration spreads change
+    risk = None
+    if show_risk:
+        try:
+            risk = get_project_risk(snapshot, project_id, items_df)
+        except CycleError:
+            pass  # The cycle is reported above
+        except Exception as e:
+            logger.error("Error simulating schedule risk for %s: %s", project_id, e)
+            st.error("Could not simulate the schedule risk.")
+
+    # Display timeline with settings
+    st.subheader(f"Timeline for {project_name} ({project_id})")
+
+    if risk is not None and risk.samples:
+        summary = (f"Simulated completion ({risk.samples:,} samples): P50 {risk.p50:%Y-%m-%d}, "
+                   f"P80 {risk.p80:%Y-%m-%d}.")
+        if risk.probability is not None:
+            summary += f" Target COD {risk.target:%Y-%m-%d}: {risk.probability:.0%} chance of finishing on time."
+        st.caption(summary)
+
+    if schedule is not None:
+        chain = schedule.critical_chain(project_id)
+        if chain:
+            names = dict(zip(items_df['Item ID'], items_df['Item Name'].astype(str).str.replace('\n', ' ')))
+            st.caption("Critical path (outlined in red): " + " → ".join(names.get(item_id, item_id) for item_id in chain))
+
+    # Add refresh button and height control to the timeline chart
+    refresh_col, height_col, download_col = st.columns([1, 1, 1])
+
+    with refresh_col:
+        if st.button("🔄 Refresh Chart", key=f"refresh_timeline_{project_id}", help="Refresh chart data without resetting settings"):
+            # Drop the cached figure so it is rebuilt below
+            st.session_state.pop("critical_path_timeline_figure", None)
+            figure_cache.discard("critical_path_timeline_figure")
+
+    try:
+        # Create timeline visualization - only when the data or options changed
+        timeline_fig = get_cached_figure(
+            "critical_path_timeline_figure",
+            (snapshot.version, project_id, custom_start, custom_end, show_task_labels, tick_interval,
+             st.session_state['project_risk'][0] if risk is not None else None),
+            lambda: TimelineVisualizer().create_timeline(
+                # With a custom range, only the items active in it are fetched and drawn
+                items_df if custom_start is None else st.session_state.data_manager.get_items_in_window(
+                    custom_start, custom_end, [project_id]),
+                custom_start_date=custom_start,
+                custom_end_date=custom_end,
+                show_task_labels=show_task_labels,
+                tick_interval=tick_interval,
+                critical_items=critical_items,
+                risk=risk
+            )
+        )
+
+        # Apply custom height from slider
+        timeline_fig.update_layout(height=chart_height)
+
+        st.plotly_chart(
+            timeline_fig,
+            use_container_width=True
+        )
+
+        if show_risk:
+            show_duration_spreads(project_id, items_df)
+
+        if schedule is not None:
+            with st.expander("Schedule Float"):
+                schedule_df = schedule.to_frame(items_df['Item ID'].astype(str).tolist())
+                schedule_df.insert(1, 'Item Name', schedule_df['Item ID'].map(
+                    dict(zip(items_df['Item ID'], items_df['Item Name']))))
+                st.caption("Early and late dates from the item dependencies. Float is in days; "
+                           "items with no total float are on the critical path.")
+                st.dataframe(schedule_df.sort_values('Early Start'), hide_index=True, use_container_width=True)
+
+        # Add download button after the chart is displayed
+        with download_col:
+            # Prepare CSV data
+            csv_data = items_df.to_csv(index=False)
+            st.download_button(
+                label="📥 Download Timeline Data (CSV)",
+                data=csv_data,
+                file_name=f"{project_name}_timeline_data.csv",
+                mime="text/csv",
+                key="download_timeline_csv"
+            )
+    except Exception as e:
+        logger.error("Error creating timeline chart: %s", e)
+        st.error("An error occurred while creating the timeline. Please check your data.")
+
+def get_project_risk(snapshot, project_id, items_df):
+    """Monte Carlo completion of one project, kept in the session until the data or the duration spreads change"""
+    spreads = get_spreads()
+    signature = (snapshot.version, project_id, repr(spreads))
+    cached = st.session_state.get('project_risk')
+    if cached is None or cached[0] != signature:
+        project = snapshot.metadata.projects_by_id.get(project_id, {})
+        risk = simulate_project(items_df, snapshot.dependencies, project.get('Target COD'),
+                                spreads=spreads, seed=0)
+        cached = (signature, risk)
+        st.session_state['project_risk'] = cached
+    return cached[1]
+
+def show_duration_spreads(project_id, items_df):
+    """Editor for the duration spreads of one project's items (team defaults unless overridden)"""
+    with st.expander("Duration Uncertainty"):
+        st.caption("Each item's duration is simulated as its planned duration times a factor between the "
+                   "optimistic and pessimistic values, most often the most likely one. Items use their "
+                   "team's spread unless changed here.")
+        teams, overrides = get_spreads()
+        item_ids = items_df['Item ID'].astype(str).tolist()
+        defaults = [teams.get(team, DEFAULT_SPREAD) for team in items_df['Team']]
+        spreads = [overrides.get(item_id, default) for item_id, default in zip(item_ids, defaults)]
+        spreads_df = pd.DataFrame({
+            'Item ID': item_ids,
+            'Item Name': items_df['Item Name'].astype(str).str.replace('\n', ' ').tolist(),
+            'Team': items_df['Team'].tolist(),
+            'Optimistic': [spread[0] for spread in spreads],
+            'Most Likely': [spread[1] for spread in spreads],
+            'Pessimistic': [spread[2] for spread in spreads]
+        })
+        factor = st.column_config.NumberColumn(min_value=0.0, step=0.05, format="%.2f")
+        edited = st.data_editor(
+            spreads_df,
+            disabled=['Item ID', 'Item Name', 'Team'],
+            column_config={'Optimistic': factor, 'Most Likely': factor, 'Pessimistic': factor},
+            hide_index=True,
+            use_container_width=True,
+            key=f"duration_spreads_{project_id}"
+        )
+        if st.button("Save Duration Spreads", key=f"save_duration_spreads_{project_id}"):
+            changed = {}
+            rows = zip(edited['Item ID'], edited['Optimistic'], edited['Most Likely'], edited['Pessimistic'], defaults)
+            for item_id, low, mode, high, default in rows:
+                error = validate_spread((low, mode, high))
+                if error:
+                    st.error(f"{item_id}: {error}")
+                    return
+                if (low, mode, high) != tuple(default):
+                    changed[item_id] = (low, mode, high)
+            try:
+                save_item_spreads(changed, item_ids)
+                st.success(f"Saved duration spreads ({len(changed)} item(s) differ from their team's default).")
             except Exception as e:
-                logger.error(f"Error creating timeline chart: {str(e)}")
-                st.error("An error occurred while creating the timeline. Please check your data.")
-        else:
-            st.info("No timeline items available for this project.")
-    else:
-        st.info("Please select a project to view its timeline.")
+                logger.error("Error saving duration spreads: %s", e)
+                st.error("Could not save the duration spreads.")
 
+@st.fragment
+@profiling.profiled('view.show_project_form', requested=profile_requested)
+@query_trace.captured('view.show_project_form', on_log=remember_query_log)
+@tracing.traced('view.show_project_form', on_trace=remember_trace)
 def show_project_form():
     st.header("Add New Project")
     try:
         form = ProjectForm()
         form.render()
     except Exception as e:
-        logger.error(f"Error rendering project form: {str(e)}")
+        logger.error("Error rendering project form: %s", e)
         st.error("Could not load the project form. Please try again later.")
 
 def show_team_dependencies():
@@ -1168,12 +1648,12 @@ def show_team_dependencies():
                 else:
                     st.info("No dependency data available to visualize.")
             except Exception as e:
-                logger.error(f"Error creating dependency chart: {str(e)}")
+                logger.error("Error creating dependency chart: %s", e)
                 st.error("Error visualizing team dependencies. Please check your data.")
         else:
             st.info("No project data available to show dependencies.")
     except Exception as e:
-        logger.error(f"Error loading data for dependencies: {str(e)}")
+        logger.error("Error loading data for dependencies: %s", e)
         st.error("Could not load dependency data.")
 
 def show_export_page():
@@ -1192,13 +1672,102 @@ def show_export_page():
         else:
             st.info("No data available to export.")
     except Exception as e:
-        logger.error(f"Error exporting data: {str(e)}")
+        logger.error("Error exporting data: %s", e)
         st.error("Could not export data. Please try again later.")
 
+def show_performance_panel():
+    """Span waterfall and aggregates, and the SQL statements of the last rerun, as enabled in Settings"""
+    with st.expander("⏱️ Performance", expanded=False):
+        if tracing.is_enabled():
+            show_rerun_traces()
+        if query_trace.is_enabled():
+            show_query_log(st.session_state.get('last_query_log'))
+
+def show_query_log(query_log):
+    """Statements of the last full rerun, grouped by shape, with N+1 offenders highlighted"""
+    st.markdown("**SQL queries (last full rerun)**")
+    if not query_log or not query_log['count']:
+        st.caption("No SQL statements were run in the last rerun.")
+        return
+
+    st.caption(f"{query_log['count']} statements, {query_log['total_ms']:.1f} ms total")
+    for offender in query_log['offenders']:
+        st.warning(f"N+1 pattern: {offender['count']}x ({offender['total_ms']:.1f} ms) `{offender['shape']}`")
+
+    queries = pd.DataFrame(query_log['queries'])
+    by_shape = (
+        queries.groupby('shape')
+        .agg(count=('shape', 'size'), total_ms=('duration_ms', 'sum'), max_ms=('duration_ms', 'max'))
+        .sort_values('count', ascending=False)
+        .reset_index()
+    )
+    st.dataframe(by_shape, hide_index=True, use_container_width=True)
+
+def show_rerun_traces():
+    """Span waterfall of recent reruns and process-wide span aggregates"""
+    import plotly.graph_objects as go
+
+    traces = st.session_state.get('performance_traces', [])
+    if not traces:
+        st.info("No reruns recorded yet.")
+        return
+
+    # Most recent first; fragment-only reruns appear as their own entries
+    options = list(range(len(traces) - 1, -1, -1))
+    selected = st.selectbox(
+        "Rerun",
+        options=options,
+        format_func=lambda i: (
+            f"{datetime.fromtimestamp(traces[i]['started_at']).strftime('%H:%M:%S')} - "
+            f"{traces[i]['label']} ({traces[i]['duration_ms']:.0f} ms)"
+        ),
+        key="performance_trace_selector"
+    )
+    trace = traces[selected]
+    spans = trace['spans']
+
+    if spans:
+        # One bar per span, offset by its start and indented by nesting depth
+        labels = [f"{i + 1:02d} {'· ' * span['depth']}{span['name']}" for i, span in enumerate(spans)]
+        fig = go.Figure(go.Bar(
+            y=labels,
+            x=[span['duration_ms'] for span in spans],
+            base=[span['start_ms'] for span in spans],
+            orientation='h',
+            marker_color=['#1976D2' if span['depth'] == 0 else '#64B5F6' for span in spans],
+            hovertext=[
+                f"{span['name']}<br>{span['duration_ms']:.1f} ms"
+                + (f"<br>{span['rows']} rows" if span['rows'] is not None else "")
+                for span in spans
+            ],
+            hoverinfo='text'
+        ))
+        fig.update_layout(
+            height=max(200, 24 * len(spans) + 80),
+            margin=dict(l=10, r=10, t=30, b=30),
+            xaxis_title="ms since rerun start",
+            yaxis=dict(autorange='reversed'),
+            showlegend=False
+        )
+        st.plotly_chart(fig, use_container_width=True)
+        st.dataframe(pd.DataFrame(spans), hide_index=True, use_container_width=True)
+    else:
+        st.caption("No spans were recorded in this rerun.")
+
+    st.markdown("**Recent aggregates (all sessions)**")
+    aggregates = tracing.get_aggregates()
+    if aggregates:
+        st.dataframe(
+            pd.DataFrame.from_dict(aggregates, orient='index').rename_axis('span').reset_index(),
+            hide_index=True,
+            use_container_width=True
+        )
+    st.caption(f"Aggregates are exported to {tracing.get_export_path()} every {tracing.EXPORT_INTERVAL:.0f} seconds.")
+
 if __name__ == "__main__":
     try:
         main()
     except Exception as e:
         # Log any uncaught exceptions at the top level
-        logger.error(f"Unhandled exception in application: {str(e)}")
+        logger.error("Unhandled exception in application: %s", e)
         st.error("An unexpected error occurred. Please try refreshing the page or contact support.")
\ No newline at end of file
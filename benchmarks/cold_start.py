@@ -0,0 +1,220 @@
+"""
+Time to first render of a freshly started app, with and without the warm-up.
+
+For each storage backend, against a generated portfolio:
+
+    startup        seconds from launching the server until /_stcore/health
+                   answers: `streamlit run app.py` (cold) or serve.py (warm,
+                   which runs app.warm_up() before listening)
+    first_render   seconds for the first session's run of the default view
+                   (the Dashboard) in a fresh process, with nothing loaded
+                   (cold) or after app.warm_up() (warm), timed with AppTest
+
+startup + first_render is the time from launch until the first user sees a
+rendered page. Each measurement runs in a new process, so imports and data
+loads are not shared between them.
+
+Usage:
+    python -m benchmarks.cold_start --projects 1000
+    python -m benchmarks.cold_start --backends csv --repeat 3 --output cold_start.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import logging
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+import urllib.request
+
+# Add parent directory to path to allow imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.generator import write_portfolio
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, 'app.py')
+SERVE_PATH = os.path.join(ROOT, 'serve.py')
+BACKENDS = ['csv', 'sqlite']
+MODES = ['cold', 'warm']
+
+logger = logging.getLogger('benchmarks')
+
+
+def _environment(config):
+    env = dict(os.environ, DATA_DIR=config['data_dir'], LOG_LEVEL='ERROR')
+    env.pop('DATABASE_URL', None)
+    if config.get('database_url'):
+        env['DATABASE_URL'] = config['database_url']
+    return env
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def time_startup(config, mode, timeout=300):
+    """Seconds from launching the server until its health endpoint answers"""
+    port = _free_port()
+    options = ['--server.port', str(port), '--server.address', '127.0.0.1', '--server.headless', 'true',
+               '--server.fileWatcherType', 'none', '--browser.gatherUsageStats', 'false']
+    if mode == 'warm':
+        command = [sys.executable, SERVE_PATH, *options]
+    else:
+        command = [sys.executable, '-m', 'streamlit', 'run', APP_PATH, *options]
+
+    start = time.perf_counter()
+    server = subprocess.Popen(command, cwd=config['work_dir'], env=_environment(config),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"{mode} server exited with code {server.returncode}")
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health', timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.05)
+        raise RuntimeError(f"{mode} server did not answer within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def _first_render_worker(config, mode, results):
+    """Run in a fresh process: optionally warm up, then time the first session's run"""
+    try:
+        os.chdir(config['work_dir'])
+        os.environ.pop('DATABASE_URL', None)
+        os.environ.update(_environment(config))
+        # A running server has Streamlit imported before the first session connects
+        from streamlit.testing.v1 import AppTest
+        from streamlit.logger import set_log_level
+        set_log_level('error')
+        logging.disable(logging.WARNING)
+
+        sys.path.insert(0, ROOT)
+        warm_up_seconds = 0.0
+        if mode == 'warm':
+            start = time.perf_counter()
+            import app
+            app.warm_up()
+            warm_up_seconds = time.perf_counter() - start
+
+        session = AppTest.from_file(APP_PATH, default_timeout=config['timeout'])
+        start = time.perf_counter()
+        session.run()
+        first_render = time.perf_counter() - start
+        start = time.perf_counter()
+        session.run()
+        rerun = time.perf_counter() - start
+
+        errors = [str(exception.value) for exception in session.exception]
+        results.put({'warm_up_seconds': warm_up_seconds, 'first_render_seconds': first_render,
+                     'rerun_seconds': rerun, 'errors': errors})
+    except Exception as e:
+        results.put({'errors': [repr(e)]})
+
+
+def time_first_render(config, mode):
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    worker = context.Process(target=_first_render_worker, args=(config, mode, results))
+    worker.start()
+    result = results.get(timeout=config['timeout'] * 3)
+    worker.join(timeout=10)
+    return result
+
+
+def _prepare_backend(backend, work_dir, portfolio_dir):
+    """Copy the portfolio for one backend and return the config for it"""
+    data_dir = os.path.join(work_dir, 'data')
+    shutil.copytree(portfolio_dir, data_dir)
+    config = {'work_dir': work_dir, 'data_dir': data_dir}
+
+    if backend == 'sqlite':
+        from components.db_manager import DBManager
+        # Import the CSV files up front, so no run pays for the migration
+        config['database_url'] = f"sqlite:///{os.path.join(work_dir, 'cold_start.db')}"
+        DBManager(db_url=config['database_url'], data_dir=data_dir).engine.dispose()
+    return config
+
+
+def run_cold_start(backend, projects, repeat=1, seed=0, timeout=300):
+    """Startup and first render times of each mode for one backend, the best of repeat runs"""
+    work_dir = tempfile.mkdtemp(prefix=f'timeline_cold_start_{backend}_')
+    try:
+        portfolio_dir = os.path.join(work_dir, 'portfolio')
+        write_portfolio(portfolio_dir, projects, seed=seed)
+        config = _prepare_backend(backend, work_dir, portfolio_dir)
+        config['timeout'] = timeout
+
+        modes = {}
+        for mode in MODES:
+            startups, renders, errors = [], [], []
+            for _ in range(repeat):
+                startups.append(time_startup(config, mode, timeout=timeout))
+                result = time_first_render(config, mode)
+                errors.extend(result.get('errors', []))
+                if 'first_render_seconds' in result:
+                    renders.append(result)
+            best = min(renders, key=lambda r: r['first_render_seconds'], default={})
+            modes[mode] = {
+                'startup_seconds': min(startups),
+                'warm_up_seconds': best.get('warm_up_seconds'),
+                'first_render_seconds': best.get('first_render_seconds'),
+                'rerun_seconds': best.get('rerun_seconds'),
+                'time_to_first_render_seconds': (min(startups) + best['first_render_seconds']) if best else None,
+                'errors': errors
+            }
+            logger.info("%s %s: %s", backend, mode, modes[mode])
+        return {'backend': backend, 'projects': projects, 'repeat': repeat, 'modes': modes}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def print_report(document):
+    print(f"\n{document['backend']}: {document['projects']} projects (best of {document['repeat']})")
+    print(f"{'mode':<8}{'startup s':>12}{'first render s':>16}{'rerun s':>10}{'to first render s':>20}")
+    for mode, stats in document['modes'].items():
+        def seconds(value):
+            return f"{value:.2f}" if value is not None else "n/a"
+        print(f"{mode:<8}{seconds(stats['startup_seconds']):>12}{seconds(stats['first_render_seconds']):>16}"
+              f"{seconds(stats['rerun_seconds']):>10}{seconds(stats['time_to_first_render_seconds']):>20}")
+        for error in stats['errors']:
+            print(f"  {mode} error: {error}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the time to first render of a fresh app process")
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=BACKENDS, help='Storage backends to test')
+    parser.add_argument('--projects', type=int, default=1000, help='Projects in the generated portfolio')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per mode; the fastest is reported')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the portfolio')
+    parser.add_argument('--timeout', type=float, default=300, help='Timeout for a start or a script run, in seconds')
+    parser.add_argument('--output', help='Also write the results JSON to this file')
+    args = parser.parse_args()
+
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    documents = []
+    for backend in args.backends:
+        document = run_cold_start(backend, args.projects, repeat=args.repeat, seed=args.seed, timeout=args.timeout)
+        print_report(document)
+        documents.append(document)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'results': documents}, f, indent=2)
+            f.write("\n")
@@ -0,0 +1,156 @@
+"""
+Deterministic generator of synthetic project portfolios.
+
+Produces projects.csv / items.csv with the same schema as data/ and a
+similar mix of ISOs, voltages, teams, item names and date formats, at any
+scale from a handful of projects to 100k. The same seed always produces
+the same files, so benchmark runs are comparable.
+
+Usage:
+    python -m benchmarks.generator --projects 1000 --output /tmp/portfolio
+"""
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path to allow imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ISOS = ['ERCOT', 'MISO', 'PJM', 'CAISO', 'SPP', 'NYISO']
+ISO_WEIGHTS = [0.55, 0.2, 0.1, 0.07, 0.05, 0.03]
+
+VOLTAGES = [138.0, 345.0, 120.0, 137.7, 230.0, 69.0]
+VOLTAGE_WEIGHTS = [0.45, 0.3, 0.08, 0.02, 0.1, 0.05]
+
+CAPACITIES = [100.0, 150.0, 200.0, 300.0, 500.0]
+DURATIONS = [2.0, 4.0, 2.0000000000000004]
+
+# Item names per team, including the wrapped names found in data/items.csv
+TEAM_ITEMS = {
+    'Development': ['Tax abatement', 'Permitting\n  1', 'Land Lease\n  Execution', 'Zoning\n  Approval',
+                    'Environmental\n  Study', 'COD'],
+    'Interconnection': ['SGIA\n  Securitization', 'Inverter Firm\n  Up Date', 'IA Execution',
+                        'DP2 to Phase 3\n  Completion', 'Interconnection\n  3', 'Backfeed'],
+    'Procurement': ['Breaker\n  Procurement', 'MPT\n  Procurement', 'Battery\n  Procurement',
+                    'EPC Agreement\n  Execution', 'Inverter\n  Procurement'],
+    'Construction': ['Construction\n  Preparation', 'Site Work\n  (Civil Package)', 'Construction',
+                     'Substation\n  Energization', 'Mechanical\n  Completion']
+}
+TEAMS = list(TEAM_ITEMS.keys())
+TEAM_WEIGHTS = [0.23, 0.27, 0.25, 0.25]
+
+PROJECT_WORDS = ['Ewood', 'Prairie', 'Reef', 'Road', 'Millwater', 'Basin', 'Ridge', 'Aqueduct', 'Callus',
+                 'Pickle', 'Lake', 'Hack', 'Balcony', 'Czar', 'Grand', 'Side', 'Mesa', 'Creek']
+
+# Share of dates written in a non-ISO format, as happens with pasted data
+MESSY_DATE_SHARE = 0.02
+
+
+def _format_dates(dates, rng, iso_format, messy_format):
+    """Format dates mostly as iso_format, with a small share in messy_format"""
+    formatted = pd.Series(dates).dt.strftime(iso_format)
+    messy = rng.random(len(formatted)) < MESSY_DATE_SHARE
+    if messy.any():
+        formatted[messy] = pd.Series(dates[messy]).dt.strftime(messy_format).values
+    return formatted.values
+
+
+def generate_portfolio(num_projects, seed=0):
+    """
+    Generate a synthetic portfolio.
+
+    Args:
+        num_projects (int): Number of projects to generate
+        seed (int): Random seed - the same seed always gives the same portfolio
+
+    Returns:
+        tuple: (projects_df, items_df) in the CSV schema used by DataManager
+    """
+    rng = np.random.default_rng(seed)
+
+    # Projects
+    numbers = np.arange(1, num_projects + 1)
+    project_ids = np.char.add('JP', np.char.zfill(numbers.astype(str), 4))
+    words = np.array(PROJECT_WORDS)
+    names = np.char.add(
+        np.char.add(words[rng.integers(0, len(words), num_projects)], ' '),
+        words[rng.integers(0, len(words), num_projects)]
+    )
+
+    # Target COD on the first of a month between 2025 and 2030
+    cod_months = rng.integers(0, 72, num_projects)
+    target_cod = pd.to_datetime('2025-01-01') + pd.to_timedelta(cod_months * 30.44, unit='D')
+    target_cod = target_cod.to_period('M').to_timestamp()
+    # Mix the two Target COD formats found in projects.csv
+    target_cod_text = np.where(
+        rng.random(num_projects) < 0.9,
+        target_cod.strftime('%Y-%m-%d 00:00:00'),
+        target_cod.strftime('%Y-%m-%d')
+    )
+
+    projects_df = pd.DataFrame({
+        'ID': project_ids,
+        'Name': names,
+        'ISO': rng.choice(ISOS, num_projects, p=ISO_WEIGHTS),
+        'Voltage': rng.choice(VOLTAGES, num_projects, p=VOLTAGE_WEIGHTS),
+        'Capacity': rng.choice(CAPACITIES, num_projects),
+        'Duration': rng.choice(DURATIONS, num_projects),
+        'Target COD': target_cod_text
+    })
+
+    # Items - between 12 and 33 per project, like data/items.csv
+    item_counts = rng.integers(12, 34, num_projects)
+    num_items = int(item_counts.sum())
+    item_project = np.repeat(np.arange(num_projects), item_counts)
+
+    teams = rng.choice(TEAMS, num_items, p=TEAM_WEIGHTS)
+    item_names = np.empty(num_items, dtype=object)
+    for team, names_for_team in TEAM_ITEMS.items():
+        mask = teams == team
+        item_names[mask] = np.array(names_for_team, dtype=object)[rng.integers(0, len(names_for_team), mask.sum())]
+
+    # Items run up to about four years before the project's Target COD
+    cod = target_cod.values[item_project]
+    start_offset_days = rng.integers(30, 1460, num_items)
+    duration_days = np.where(
+        rng.random(num_items) < 0.25,
+        rng.integers(0, 31, num_items),      # Short, milestone-like items
+        rng.integers(31, 1100, num_items)    # Multi-month items
+    )
+    start = cod - start_offset_days.astype('timedelta64[D]')
+    end = start + duration_days.astype('timedelta64[D]')
+    months = np.maximum(1, duration_days // 30 + 1)
+
+    items_df = pd.DataFrame({
+        'Team': teams,
+        'Item Name': item_names,
+        'Start Date': _format_dates(start, rng, '%Y-%m-%d', '%m/%d/%Y'),
+        'End Date': _format_dates(end, rng, '%Y-%m-%d', '%m/%d/%Y'),
+        'Months': months,
+        'Project ID': project_ids[item_project],
+        'Item ID': [f"I{n:03d}" for n in range(1, num_items + 1)]
+    })
+
+    return projects_df, items_df
+
+
+def write_portfolio(directory, num_projects, seed=0):
+    """Generate a portfolio and write projects.csv and items.csv into directory"""
+    os.makedirs(directory, exist_ok=True)
+    projects_df, items_df = generate_portfolio(num_projects, seed=seed)
+    projects_df.to_csv(os.path.join(directory, 'projects.csv'), index=False)
+    items_df.to_csv(os.path.join(directory, 'items.csv'), index=False)
+    return projects_df, items_df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic project portfolio")
+    parser.add_argument('--projects', type=int, default=100, help='Number of projects to generate')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('--output', required=True, help='Directory to write projects.csv and items.csv to')
+    args = parser.parse_args()
+
+    projects, items = write_portfolio(args.output, args.projects, seed=args.seed)
+    print(f"Wrote {len(projects)} projects and {len(items)} items to {args.output}")
@@ -0,0 +1,331 @@
+"""
+Multi-session load test that drives the real app with Streamlit's AppTest.
+
+Each simulated session runs app.py in its own process, against a shared
+generated portfolio, and performs a random mix of user actions:
+switching views, selecting projects in the Critical Path view, and editing
+and saving rows in the Edit Project data editor. All sessions start
+together, so writes and reloads contend the way they do when many users are
+on the app at once.
+
+Reports per-action p50/p95/p99 latency and throughput for CSV and SQLite
+storage.
+
+Usage:
+    python -m benchmarks.load_test --sessions 20 --actions 30 --projects 200
+    python -m benchmarks.load_test --backends sqlite --output load.json
+"""
+import os
+import sys
+import json
+import time
+import queue
+import random
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+import traceback
+import multiprocessing
+import numpy as np
+
+# Add parent directory to path to allow imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.generator import write_portfolio
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+BACKENDS = ['csv', 'sqlite']
+
+VIEWS = ["Dashboard", "Critical Path", "Add Project", "Edit Project"]
+
+# Relative frequency of each session action
+ACTION_WEIGHTS = {
+    'switch_view': 0.35,
+    'select_project': 0.35,
+    'edit_row': 0.3
+}
+
+logger = logging.getLogger('benchmarks')
+
+
+class LoadSession:
+    """
+    One simulated user: an AppTest instance plus the actions it can perform.
+
+    Every action is one or more script runs; each run is timed and recorded
+    under the name of the action that caused it.
+    """
+
+    def __init__(self, session_id, rng, timeout=120):
+        from streamlit.testing.v1 import AppTest
+
+        self.session_id = session_id
+        self.rng = rng
+        self.app = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.current_view = None
+        self.edits = 0
+        self.samples = []
+
+    def _timed(self, action, run):
+        """Run one script rerun and record its latency (and whether it raised)"""
+        start = time.perf_counter()
+        ok = True
+        try:
+            run()
+            # Exceptions inside the script are reported on the tree rather than raised
+            if self.app.exception:
+                ok = False
+                logger.debug("Session %s %s: %s", self.session_id, action, self.app.exception[0].message)
+        except Exception as e:
+            ok = False
+            logger.debug("Session %s %s failed: %s", self.session_id, action, e)
+        self.samples.append((action, time.perf_counter() - start, ok, time.time()))
+        return ok
+
+    def open(self):
+        """First page load"""
+        self._timed('initial_load', self.app.run)
+        self.current_view = "Dashboard"
+
+    def switch_view(self, view=None):
+        """Click a navigation segment (a random other view by default)"""
+        if view is None:
+            view = self.rng.choice([v for v in VIEWS if v != self.current_view])
+        selector = self.app.button_group(key="view_selector")
+        if self._timed('switch_view', lambda: selector.set_value(view).run()):
+            self.current_view = view
+
+    def _ensure_view(self, view):
+        if self.current_view != view:
+            self.switch_view(view)
+
+    def select_project(self):
+        """Pick a different project in the Critical Path selector"""
+        self._ensure_view("Critical Path")
+        selector = self.app.selectbox(key="project_selector")
+        options = [option for option in selector.options if option != selector.value]
+        if options:
+            choice = self.rng.choice(options)
+            self._timed('select_project', lambda: selector.set_value(choice).run())
+
+    def edit_row(self):
+        """
+        Edit one item name in the Edit Project data editor, then save.
+
+        AppTest has no data editor widget, so the edit is sent the way the
+        frontend sends it: as the editor's JSON widget state, included with
+        the edit rerun and again with the Save click rerun.
+        """
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        self._ensure_view("Edit Project")
+        project_selector = self.app.selectbox[0]
+        if len(project_selector.options) > 1 and self.rng.random() < 0.5:
+            choice = self.rng.choice(project_selector.options)
+            self._timed('select_edit_project', lambda: project_selector.set_value(choice).run())
+
+        editors = [node for node in self.app if node.type == 'dataframe' and 'items_editor_' in node.proto.id]
+        if not editors:
+            return
+        editor = editors[0]
+        num_rows = len(editor.value)
+        if num_rows == 0:
+            return
+
+        self.edits += 1
+        row = self.rng.randrange(num_rows)
+        edit_state = WidgetState()
+        edit_state.id = editor.proto.id
+        edit_state.string_value = json.dumps({
+            'edited_rows': {str(row): {'Item Name': f"Load test {self.session_id}-{self.edits}"}},
+            'added_rows': [],
+            'deleted_rows': []
+        })
+
+        def run_with_edit():
+            states = self.app._tree.get_widget_states()
+            states.widgets.append(edit_state)
+            self.app._run(states)
+
+        if not self._timed('edit_row', run_with_edit):
+            return
+
+        project_id = editor.proto.id.split('items_editor_', 1)[1]
+        self.app.button(key=f"save_items_{project_id}_btn").click()
+        self._timed('save_items', run_with_edit)
+
+    def random_action(self):
+        actions = list(ACTION_WEIGHTS)
+        action = self.rng.choices(actions, weights=[ACTION_WEIGHTS[a] for a in actions])[0]
+        getattr(self, action)()
+
+
+def _session_worker(session_id, config, barrier, results):
+    """Process entry point: run one session and put its samples on the results queue"""
+    try:
+        os.chdir(config['work_dir'])
+        os.environ['DATA_DIR'] = config['data_dir']
+        if config.get('database_url'):
+            os.environ['DATABASE_URL'] = config['database_url']
+        else:
+            os.environ.pop('DATABASE_URL', None)
+
+        # Keep Streamlit's and the app's own logging out of the report
+        from streamlit.logger import set_log_level
+        set_log_level('error')
+        logging.disable(logging.WARNING)
+
+        # Warm up imports with a throwaway session, as a running server would already have
+        LoadSession(-1, random.Random(0), timeout=config['timeout']).open()
+
+        session = LoadSession(session_id, random.Random(config['seed'] * 1000 + session_id),
+                              timeout=config['timeout'])
+        barrier.wait()
+        session.open()
+        for _ in range(config['actions']):
+            session.random_action()
+            if config['think_time']:
+                time.sleep(session.rng.uniform(0, config['think_time']))
+        results.put((session_id, session.samples, None))
+    except Exception:
+        # Release the other sessions if this one failed before the start
+        barrier.abort()
+        results.put((session_id, [], traceback.format_exc()))
+
+
+def _prepare_backend(backend, work_dir, portfolio_dir):
+    """Copy the portfolio for one backend and return the worker config for it"""
+    data_dir = os.path.join(work_dir, 'data')
+    shutil.copytree(portfolio_dir, data_dir)
+    config = {'work_dir': work_dir, 'data_dir': data_dir}
+
+    if backend == 'sqlite':
+        from components.db_manager import DBManager
+        # Import the CSV files once up front so sessions don't race on the empty database
+        config['database_url'] = f"sqlite:///{os.path.join(work_dir, 'load.db')}"
+        DBManager(db_url=config['database_url'], data_dir=data_dir).engine.dispose()
+    return config
+
+
+def summarize(samples, wall_seconds):
+    """Per-action latency percentiles and throughput from (action, seconds, ok, finished_at) samples"""
+    summary = {}
+    for action in sorted({sample[0] for sample in samples}):
+        latencies = np.array([s[1] for s in samples if s[0] == action])
+        errors = sum(1 for s in samples if s[0] == action and not s[2])
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        summary[action] = {
+            'count': int(len(latencies)),
+            'errors': errors,
+            'mean_ms': float(latencies.mean() * 1000),
+            'p50_ms': float(p50 * 1000),
+            'p95_ms': float(p95 * 1000),
+            'p99_ms': float(p99 * 1000),
+            'throughput_per_s': float(len(latencies) / wall_seconds) if wall_seconds else None
+        }
+    return summary
+
+
+def run_load_test(backend, sessions, actions, projects, seed=0, think_time=0.0, timeout=120):
+    """Run one load test against a backend and return its results document"""
+    work_dir = tempfile.mkdtemp(prefix=f'timeline_load_{backend}_')
+    try:
+        portfolio_dir = os.path.join(work_dir, 'portfolio')
+        write_portfolio(portfolio_dir, projects, seed=seed)
+        config = _prepare_backend(backend, work_dir, portfolio_dir)
+        config.update({'actions': actions, 'seed': seed, 'think_time': think_time, 'timeout': timeout})
+
+        context = multiprocessing.get_context('spawn')
+        # The extra party is this process, which releases everyone once all sessions are ready
+        barrier = context.Barrier(sessions + 1)
+        results = context.Queue()
+        workers = [context.Process(target=_session_worker, args=(i, config, barrier, results))
+                   for i in range(sessions)]
+        for worker in workers:
+            worker.start()
+
+        try:
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            logger.error("%s: a session failed to start", backend)
+        started_at = time.time()
+        logger.info("%s: %s sessions started", backend, sessions)
+
+        samples = []
+        failures = []
+        for _ in range(sessions):
+            try:
+                session_id, session_samples, error = results.get(timeout=timeout * (actions + 1))
+            except queue.Empty:
+                failures.append("Timed out waiting for a session")
+                break
+            samples.extend(session_samples)
+            if error:
+                failures.append(f"Session {session_id}:\n{error}")
+        for worker in workers:
+            worker.join(timeout=10)
+            if worker.is_alive():
+                worker.terminate()
+
+        finished_at = max((s[3] for s in samples), default=started_at)
+        wall_seconds = finished_at - started_at
+        return {
+            'backend': backend,
+            'sessions': sessions,
+            'actions_per_session': actions,
+            'projects': projects,
+            'wall_seconds': wall_seconds,
+            'total_runs': len(samples),
+            'runs_per_s': len(samples) / wall_seconds if wall_seconds else None,
+            'actions': summarize(samples, wall_seconds),
+            'failures': failures
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def print_report(document):
+    """Print a latency table for one load test result"""
+    print(f"\n{document['backend']}: {document['sessions']} sessions x {document['actions_per_session']} actions, "
+          f"{document['projects']} projects - {document['total_runs']} runs in {document['wall_seconds']:.1f}s "
+          f"({document['runs_per_s'] or 0:.1f} runs/s)")
+    print(f"{'action':<22}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'per s':>8}")
+    for action, stats in document['actions'].items():
+        print(f"{action:<22}{stats['count']:>7}{stats['errors']:>8}{stats['p50_ms']:10.1f}"
+              f"{stats['p95_ms']:10.1f}{stats['p99_ms']:10.1f}{stats['throughput_per_s']:8.2f}")
+    for failure in document['failures']:
+        print(failure, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run concurrent simulated sessions against app.py")
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=BACKENDS, help='Storage backends to test')
+    parser.add_argument('--sessions', type=int, default=10, help='Concurrent simulated sessions')
+    parser.add_argument('--actions', type=int, default=20, help='Actions per session after the first load')
+    parser.add_argument('--projects', type=int, default=100, help='Projects in the generated portfolio')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the portfolio and the action mix')
+    parser.add_argument('--think-time', type=float, default=0.0,
+                        help='Maximum random pause between actions, in seconds')
+    parser.add_argument('--timeout', type=float, default=120, help='Timeout for a single script run, in seconds')
+    parser.add_argument('--output', help='Also write the results JSON to this file')
+    args = parser.parse_args()
+
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    documents = []
+    for backend in args.backends:
+        document = run_load_test(backend, args.sessions, args.actions, args.projects, seed=args.seed,
+                                 think_time=args.think_time, timeout=args.timeout)
+        print_report(document)
+        documents.append(document)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'results': documents}, f, indent=2)
+            f.write("\n")
@@ -0,0 +1,116 @@
+"""
+Benchmark of the time logging adds to loading and saving items.
+
+Times DataManager.get_all_items and save_project_items on a generated
+portfolio with logging at WARNING (production), at INFO, and switched off
+entirely. The difference from the "off" run is the time spent on logging.
+Records are written to os.devnull, so formatting and emitting are included
+but terminal output isn't.
+
+The generated portfolio has a small share of dates in a second format,
+which get_all_items can't parse, so the per-row warning paths are exercised.
+
+Differences of a few tens of milliseconds are within run-to-run noise on a
+shared machine (including negative overheads): run it more than once before
+reading anything into them.
+
+Usage:
+    python -m benchmarks.log_overhead --projects 1000 --repeat 5
+"""
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+
+# Add parent directory to path to allow imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.generator import write_portfolio
+from utils.logs import configure_logging
+
+LEVELS = [('off', None), ('warning', logging.WARNING), ('info', logging.INFO)]
+
+
+class _CountingHandler(logging.Handler):
+    """Counts the records that reach the handlers"""
+
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+
+    def emit(self, record):
+        self.count += 1
+
+
+def _best_ms(func, repeat):
+    # The fastest run is the least disturbed by other work on the machine
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return min(durations) * 1000
+
+
+def run(num_projects=1000, repeat=5, seed=0):
+    """Return one result dict per (operation, level)"""
+    from components.data_manager import DataManager
+
+    work_dir = tempfile.mkdtemp(prefix='timeline_logbench_')
+    devnull = open(os.devnull, 'w')
+    results = []
+    try:
+        _, items_df = write_portfolio(work_dir, num_projects, seed=seed)
+        manager = DataManager(data_dir=work_dir)
+        sample_id = items_df['Project ID'].iloc[len(items_df) // 2]
+        sample_items = manager.get_project_items(sample_id).copy()
+
+        operations = [
+            ('get_all_items', manager.get_all_items),
+            ('save_project_items', lambda: manager.save_project_items(sample_items))
+        ]
+        for level_name, level in LEVELS:
+            counter = _CountingHandler()
+            if level is None:
+                logging.disable(logging.CRITICAL)
+            else:
+                logging.disable(logging.NOTSET)
+                configure_logging(level=level, stream=devnull, force=True)
+                logging.getLogger().addHandler(counter)
+            for operation, func in operations:
+                func()  # Warm-up
+                counter.count = 0
+                best_ms = _best_ms(func, repeat)
+                results.append({'operation': operation, 'level': level_name, 'best_ms': best_ms,
+                                'records_per_call': counter.count / repeat})
+            logging.getLogger().removeHandler(counter)
+    finally:
+        logging.disable(logging.NOTSET)
+        devnull.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    # Overhead relative to the run with logging switched off
+    baseline = {r['operation']: r['best_ms'] for r in results if r['level'] == 'off'}
+    for result in results:
+        result['overhead_ms'] = result['best_ms'] - baseline[result['operation']]
+    return results
+
+
+def print_results(results):
+    print(f"{'operation':<22} {'level':<8} {'best ms':>10} {'overhead ms':>12} {'records/call':>13}")
+    for r in results:
+        print(f"{r['operation']:<22} {r['level']:<8} {r['best_ms']:10.2f} {r['overhead_ms']:12.2f} "
+              f"{r['records_per_call']:13.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the time logging adds to item loads and saves")
+    parser.add_argument('--projects', type=int, default=1000, help='Portfolio size')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per operation and level')
+    parser.add_argument('--seed', type=int, default=0, help='Portfolio generator seed')
+    args = parser.parse_args()
+
+    print_results(run(args.projects, args.repeat, args.seed))
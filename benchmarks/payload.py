@@ -0,0 +1,124 @@
+"""
+Size of the figures the app sends to the browser.
+
+st.plotly_chart serializes a figure with plotly.io.to_json and sends the
+JSON over the websocket on every run that draws it, so the bytes here are
+paid on every rerun of a view, not once. For a generated portfolio this
+reports, per figure, the JSON bytes, the gzipped bytes (for comparison
+with a compressed transport) and the number of traces, layout shapes and
+annotations:
+
+    timeline     the Project Timeline of the project with the most items,
+                 with its critical path and simulated finish bands
+    deadlines    the Dashboard's Team Deadlines chart for its default options
+    workload     the Dashboard's Team Workload heatmap for its default options
+
+Usage:
+    python -m benchmarks.payload --projects 1000
+    python -m benchmarks.payload --projects 100 --output payload.json
+"""
+import os
+import sys
+import gzip
+import json
+import shutil
+import logging
+import argparse
+import tempfile
+
+# Add parent directory to path to allow imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.generator import write_portfolio
+
+logger = logging.getLogger('benchmarks')
+
+
+def measure(fig):
+    """JSON bytes as st.plotly_chart sends them, gzipped bytes and element counts of a figure"""
+    import plotly.io as pio
+
+    spec = pio.to_json(fig, validate=False).encode()
+    return {
+        'bytes': len(spec),
+        'gzip_bytes': len(gzip.compress(spec)),
+        'traces': len(fig.data),
+        'shapes': len(fig.layout.shapes),
+        'annotations': len(fig.layout.annotations)
+    }
+
+
+def build_figures(data_dir):
+    """{name: figure} of the measured figures, built the way the app builds them"""
+    os.environ['DATA_DIR'] = data_dir
+    os.environ.pop('DATABASE_URL', None)
+    import app
+    from components.data_manager import DataManager
+    from components.data_cache import get_snapshot
+    from components.risk import simulate_project
+    from components.scheduling import get_schedule
+    from components.timeline_viz import TimelineVisualizer
+    from components.portfolio_cube import get_cube
+
+    data_manager = DataManager(data_dir=data_dir)
+    snapshot = get_snapshot(data_manager)
+    figures = {}
+
+    items = snapshot.items
+    project_id = items['Project ID'].value_counts().index[0]
+    project_items = items[items['Project ID'] == project_id]
+    project = snapshot.metadata.projects_by_id.get(project_id, {})
+    risk = simulate_project(project_items, snapshot.dependencies, project.get('Target COD'), seed=0)
+    figures['timeline'] = TimelineVisualizer(data_manager).create_timeline(
+        project_items, critical_items=get_schedule(data_manager).critical_items(), risk=risk)
+
+    summary = data_manager.get_project_summary()
+    team_summary = summary[summary['Project ID'].isin(snapshot.projects['ID'])]
+    _, _, build = app.deadlines_chart(data_manager, snapshot, snapshot.projects, team_summary, [],
+                                      app.DASHBOARD_DEFAULT_START, app.default_deadlines_end(summary), None)
+    deadlines = build()
+    # With sequencing alerts the chart comes with their details
+    figures['deadlines'] = deadlines[0] if isinstance(deadlines, tuple) else deadlines
+
+    counts = app.workload_counts(data_manager, snapshot, get_cube(data_manager), [], [], [],
+                                 app.WORKLOAD_PEAK, app.DASHBOARD_DEFAULT_START, None)
+    _, _, build = app.workload_chart(snapshot, counts, [], [], [], app.WORKLOAD_PEAK, app.DEFAULT_TEAM_CAPACITY,
+                                     app.DASHBOARD_DEFAULT_START, None)
+    figures['workload'] = build()
+    return figures
+
+
+def run_payload(projects, seed=0):
+    work_dir = tempfile.mkdtemp(prefix='timeline_payload_')
+    try:
+        data_dir = os.path.join(work_dir, 'data')
+        write_portfolio(data_dir, projects, seed=seed)
+        figures = build_figures(data_dir)
+        return {'projects': projects, 'figures': {name: measure(fig) for name, fig in figures.items()}}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def print_report(document):
+    print(f"\n{document['projects']} projects")
+    print(f"{'figure':<12}{'bytes':>12}{'gzip bytes':>12}{'traces':>8}{'shapes':>8}{'annotations':>13}")
+    for name, stats in document['figures'].items():
+        print(f"{name:<12}{stats['bytes']:>12,}{stats['gzip_bytes']:>12,}{stats['traces']:>8}"
+              f"{stats['shapes']:>8}{stats['annotations']:>13}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the serialized size of the app's figures")
+    parser.add_argument('--projects', type=int, default=1000, help='Projects in the generated portfolio')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the portfolio')
+    parser.add_argument('--output', help='Also write the results JSON to this file')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    document = run_payload(args.projects, seed=args.seed)
+    print_report(document)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2)
+            f.write("\n")
@@ -0,0 +1,300 @@
+"""
+Benchmark runner for the data managers and chart builders.
+
+For each portfolio scale it generates a synthetic portfolio (see
+benchmarks/generator.py) and times load, filter, save and delete on
+DataManager (CSV) and DBManager (SQLite), plus
+TimelineVisualizer.create_timeline and create_team_deadlines_chart, the
+team workload counts behind the workload heatmap and the portfolio cube.
+Results are written as JSON and can be compared against a stored baseline.
+
+Usage:
+    python -m benchmarks.run_benchmarks --scales 10 100 1000 --output results.json
+    python -m benchmarks.run_benchmarks --baseline benchmarks/baseline.json --fail-on-regression
+    python -m benchmarks.run_benchmarks --save-baseline
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+from datetime import datetime
+
+# Add parent directory to path to allow imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.generator import write_portfolio
+
+DEFAULT_SCALES = [10, 100, 1000]
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+logger = logging.getLogger('benchmarks')
+
+
+def time_operation(func, repeat=3, max_total_seconds=30):
+    """
+    Time func() up to `repeat` times.
+
+    Stops repeating early once the runs so far exceed max_total_seconds, so
+    large scales still finish in reasonable time. Raises RuntimeError if
+    func() returns False, the way the data managers report a failed write,
+    so a failing operation is recorded as an error rather than timed.
+    """
+    durations = []
+    rows = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        durations.append(time.perf_counter() - start)
+        if result is False:
+            raise RuntimeError("operation returned False (see the log for the error)")
+        if rows is None:
+            rows = _count_rows(result)
+        if sum(durations) > max_total_seconds:
+            break
+    return {
+        'median_s': statistics.median(durations),
+        'min_s': min(durations),
+        'runs': len(durations),
+        'rows': rows
+    }
+
+
+def _count_rows(result):
+    """Row count of a DataFrame/list result (or of the first element of a tuple)"""
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    try:
+        return len(result)
+    except TypeError:
+        return None
+
+
+def _manager_operations(manager, projects_df, items_df):
+    """The data-manager operations to time, in the order they are run"""
+    project_ids = projects_df['ID'].tolist()
+    sample_id = project_ids[len(project_ids) // 2]
+    sample_items = items_df[items_df['Project ID'] == sample_id].copy()
+    # Delete a different project on each repeat
+    delete_ids = iter(reversed(project_ids))
+
+    return [
+        ('load_projects', lambda: (manager.reload_data(), manager.get_data())[1]),
+        ('load_all_items', manager.get_all_items),
+        ('filter', lambda: manager.filter_data(isos=['ERCOT', 'MISO'], voltages=[138.0, 345.0])),
+        ('get_project_items', lambda: manager.get_project_items(sample_id)),
+        ('save_project_items', lambda: manager.save_project_items(sample_items)),
+        ('add_project_item', lambda: manager.add_project_item(sample_id, {
+            'Item Name': 'Benchmark item',
+            'Team': 'Construction',
+            'Start Date': '2026-01-01',
+            'End Date': '2026-06-30'
+        })),
+        ('delete_project', lambda: manager.delete_project(next(delete_ids))),
+    ]
+
+
+def run_scale(scale, work_dir, repeat, budget, seed, previous, skip):
+    """Run every benchmark for one portfolio scale and return the result records"""
+    from components.data_manager import DataManager
+    from components.db_manager import DBManager
+    from components.timeline_viz import TimelineVisualizer
+    from components.workload import TeamWorkload
+    from components.portfolio_cube import PortfolioCube
+
+    results = []
+    data_dir = os.path.join(work_dir, f"portfolio_{scale}")
+
+    start = time.perf_counter()
+    projects_df, items_df = write_portfolio(data_dir, scale, seed=seed)
+    logger.info("Generated %s projects / %s items in %.1fs", scale, len(items_df), time.perf_counter() - start)
+
+    def record(backend, operation, func):
+        key = (backend, operation)
+        if operation in skip:
+            return
+        # Skip operations whose linear projection from the previous scale exceeds the budget
+        if key in previous:
+            last_scale, last_seconds = previous[key]
+            projected = last_seconds * scale / last_scale
+            if projected > budget:
+                logger.info("Skipping %s.%s at %s: projected %.1fs > budget", backend, operation, scale, projected)
+                results.append({'backend': backend, 'scale': scale, 'operation': operation,
+                                'skipped': f"projected {projected:.1f}s exceeds budget {budget}s"})
+                previous[key] = (scale, projected)
+                return
+        try:
+            timing = time_operation(func, repeat=repeat, max_total_seconds=budget)
+        except Exception as e:
+            logger.error("%s.%s failed at scale %s: %s", backend, operation, scale, e)
+            results.append({'backend': backend, 'scale': scale, 'operation': operation, 'error': str(e)})
+            return
+        previous[key] = (scale, timing['median_s'])
+        results.append({'backend': backend, 'scale': scale, 'operation': operation, **timing})
+        logger.info("%6s %7s %-28s %10.2f ms", backend, scale, operation, timing['median_s'] * 1000)
+
+    # Chart builders run on unmodified data, before the write benchmarks
+    csv_manager = DataManager(data_dir=data_dir)
+    all_items = csv_manager.get_all_items()
+    projects = csv_manager.get_data()
+    sample_id = projects['ID'].iloc[len(projects) // 2]
+    project_items = all_items[all_items['Project ID'] == sample_id]
+    visualizer = TimelineVisualizer()
+
+    record('viz', 'create_timeline', lambda: visualizer.create_timeline(project_items))
+    record('viz', 'create_team_deadlines_chart',
+           lambda: visualizer.create_team_deadlines_chart(projects, all_items))
+    record('viz', 'team_workload', lambda: TeamWorkload(all_items).monthly_counts())
+    record('viz', 'create_team_workload_heatmap',
+           lambda: visualizer.create_team_workload_heatmap(TeamWorkload(all_items).monthly_counts()))
+    cube = PortfolioCube()
+    record('viz', 'portfolio_cube_build', lambda: cube.rebuild(projects, all_items))
+    slice_isos = projects['ISO'].dropna().unique()[:2].tolist()
+    record('viz', 'portfolio_cube_slice',
+           lambda: (cube.monthly(isos=slice_isos, teams=['Construction']), cube.totals(isos=slice_isos)))
+    record('viz', 'portfolio_cube_set_project', lambda: cube.set_project(sample_id, project_items))
+
+    # CSV storage - constructing the manager is the initial load
+    csv_dir = os.path.join(work_dir, f"csv_{scale}")
+    shutil.copytree(data_dir, csv_dir)
+    record('csv', 'init', lambda: DataManager(data_dir=csv_dir).get_data())
+    csv_manager = DataManager(data_dir=csv_dir)
+    for operation, func in _manager_operations(csv_manager, projects_df, items_df):
+        record('csv', operation, func)
+
+    # SQLite storage - constructing the manager imports the CSV files
+    db_dir = os.path.join(work_dir, f"sqlite_{scale}")
+    shutil.copytree(data_dir, db_dir)
+    db_url = f"sqlite:///{os.path.join(db_dir, 'bench.db')}"
+    start = time.perf_counter()
+    db_manager = DBManager(db_url=db_url, data_dir=db_dir)
+    import_seconds = time.perf_counter() - start
+    results.append({'backend': 'sqlite', 'scale': scale, 'operation': 'init_import',
+                    'median_s': import_seconds, 'min_s': import_seconds, 'runs': 1, 'rows': len(items_df)})
+    for operation, func in _manager_operations(db_manager, projects_df, items_df):
+        record('sqlite', operation, func)
+    db_manager.engine.dispose()
+
+    return results
+
+
+def run_benchmarks(scales=None, repeat=3, budget=60, seed=0, skip=()):
+    """Run the benchmark suite at each scale and return the results document"""
+    scales = scales or DEFAULT_SCALES
+    results = []
+    previous = {}
+    work_dir = tempfile.mkdtemp(prefix='timeline_bench_')
+    try:
+        # Warm-up pass so lazy imports and first-call costs don't land in the smallest scale
+        run_scale(10, os.path.join(work_dir, 'warmup'), 1, budget, seed, {}, set(skip))
+        for scale in sorted(scales):
+            results.extend(run_scale(scale, work_dir, repeat, budget, seed, previous, set(skip)))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'scales': sorted(scales),
+            'repeat': repeat,
+            'seed': seed
+        },
+        'results': results
+    }
+
+
+def compare_results(current, baseline, tolerance=0.25, noise_floor=0.005):
+    """
+    Compare two results documents.
+
+    Returns a list of (backend, scale, operation, baseline_s, current_s, ratio,
+    is_regression) tuples. An operation regresses when it is more than
+    `tolerance` slower than the baseline and the difference is above the
+    noise floor (in seconds), or when it failed (current_s and ratio None).
+    """
+    baseline_index = {
+        (r['backend'], r['scale'], r['operation']): r['median_s']
+        for r in baseline.get('results', []) if 'median_s' in r
+    }
+    comparison = []
+    for record in current.get('results', []):
+        key = (record['backend'], record['scale'], record['operation'])
+        if 'error' in record and key in baseline_index:
+            comparison.append((*key, baseline_index[key], None, None, True))
+            continue
+        if 'median_s' not in record or key not in baseline_index:
+            continue
+        base = baseline_index[key]
+        ratio = record['median_s'] / base if base > 0 else float('inf')
+        is_regression = ratio > 1 + tolerance and record['median_s'] - base > noise_floor
+        comparison.append((*key, base, record['median_s'], ratio, is_regression))
+    return comparison
+
+
+def print_comparison(comparison):
+    """Print a comparison table and return the number of regressions"""
+    print(f"{'backend':<8}{'scale':>8}  {'operation':<30}{'baseline ms':>12}{'current ms':>12}{'ratio':>8}")
+    regressions = 0
+    for backend, scale, operation, base, current, ratio, is_regression in comparison:
+        flag = "  REGRESSION" if is_regression else ""
+        regressions += is_regression
+        if current is None:
+            print(f"{backend:<8}{scale:>8}  {operation:<30}{base * 1000:12.2f}{'error':>12}{'':>8}{flag}")
+            continue
+        print(f"{backend:<8}{scale:>8}  {operation:<30}{base * 1000:12.2f}{current * 1000:12.2f}{ratio:8.2f}{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark data managers and chart builders at several scales")
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES,
+                        help='Portfolio sizes in projects (10 to 100000)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per operation')
+    parser.add_argument('--budget', type=float, default=60,
+                        help='Seconds per operation; slower projected operations are skipped')
+    parser.add_argument('--seed', type=int, default=0, help='Portfolio generator seed')
+    parser.add_argument('--skip', nargs='*', default=[], help='Operations to skip')
+    parser.add_argument('--output', help='Write results JSON to this file (default: stdout)')
+    parser.add_argument('--baseline', help='Compare results against this baseline JSON')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown ratio before flagging')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit with status 1 on regressions')
+    parser.add_argument('--save-baseline', action='store_true', help=f'Write results to {DEFAULT_BASELINE}')
+    args = parser.parse_args()
+
+    # Progress goes to stderr; the app modules keep their own logging setup
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    # The chart builders touch st.session_state, which warns outside a Streamlit run
+    from streamlit.logger import set_log_level
+    set_log_level('error')
+
+    document = run_benchmarks(args.scales, repeat=args.repeat, budget=args.budget, seed=args.seed, skip=args.skip)
+
+    output = json.dumps(document, indent=2)
+    if args.save_baseline:
+        with open(DEFAULT_BASELINE, 'w') as f:
+            f.write(output + "\n")
+        print(f"Baseline written to {DEFAULT_BASELINE}", file=sys.stderr)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+    elif not args.save_baseline and not args.baseline:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = print_comparison(compare_results(document, baseline, tolerance=args.tolerance))
+        print(f"{regressions} regression(s)")
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
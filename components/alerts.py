@@ -0,0 +1,143 @@
+"""
+Sequencing alerts: projects in which Procurement, Development or
+Interconnection finish after Construction.
+
+Alerts only depend on each team's last End Date per project, so those
+deadlines are kept as derived state on the data manager. Writes made
+through the manager (save_project_items, add_project_item,
+delete_project) update the one project they touched (see
+components.derived_state); any other change of the data version - a write
+from another process, a restore, a migration - makes the next read
+rebuild everything. rebuild_alerts() forces a full rebuild as a
+maintenance operation.
+"""
+import logging
+import threading
+import pandas as pd
+from utils.metrics import record_cache
+from components.derived_state import manager_lock
+
+# Logging is configured by the entry point (utils.logs.configure_logging)
+logger = logging.getLogger('alerts')
+
+# Teams that should finish before Construction, in report order
+SEQUENCED_TEAMS = ['Procurement', 'Development', 'Interconnection']
+
+
+def _team_deadlines(items):
+    """Team -> last End Date of one project's items (teams without a valid date are left out)"""
+    ends = pd.to_datetime(items['End Date'], errors='coerce')
+    deadlines = ends.groupby(items['Team'].to_numpy()).max().dropna()
+    return deadlines.to_dict()
+
+
+def _project_alerts(deadlines):
+    """(team, days after Construction) for the teams that finish after Construction"""
+    construction = deadlines.get('Construction')
+    if construction is None:
+        return []
+    return [(team, (deadlines[team] - construction).days)
+            for team in SEQUENCED_TEAMS if team in deadlines and deadlines[team] > construction]
+
+
+class SequencingAlerts:
+    """Per-project team deadlines and the alerts derived from them, as of one data version"""
+
+    def __init__(self):
+        self.version = None
+        self.deadlines = {}
+        self.alerts = {}
+        self.lock = threading.Lock()
+
+    def rebuild(self, items):
+        """Recompute every project from all items (one groupby)"""
+        ends = pd.to_datetime(items['End Date'], errors='coerce')
+        latest = ends.groupby([items['Project ID'].to_numpy(), items['Team'].to_numpy()]).max().dropna()
+        self.deadlines = {}
+        for (project_id, team), deadline in latest.items():
+            self.deadlines.setdefault(project_id, {})[team] = deadline
+        self.alerts = {}
+        for project_id, deadlines in self.deadlines.items():
+            self._refresh(project_id)
+
+    def _refresh(self, project_id):
+        alerts = _project_alerts(self.deadlines.get(project_id, {}))
+        if alerts:
+            self.alerts[project_id] = alerts
+        else:
+            self.alerts.pop(project_id, None)
+
+    def set_project(self, project_id, items):
+        """Replace one project's deadlines with those of its (complete) items"""
+        self.deadlines[project_id] = _team_deadlines(items)
+        self._refresh(project_id)
+
+    def add_item(self, project_id, team, end_date):
+        end_date = pd.to_datetime(end_date, errors='coerce')
+        if pd.isna(end_date):
+            return
+        deadlines = self.deadlines.setdefault(project_id, {})
+        if team not in deadlines or end_date > deadlines[team]:
+            deadlines[team] = end_date
+            self._refresh(project_id)
+
+    def remove_project(self, project_id):
+        self.deadlines.pop(project_id, None)
+        self.alerts.pop(project_id, None)
+
+    def for_projects(self, projects):
+        """
+        (alert_projects, alert_details) of the given projects frame, in its
+        order, in the format create_team_deadlines_chart reports them
+        """
+        with self.lock:
+            alert_projects = {}
+            alert_details = []
+            for project_id, project_name in zip(projects['ID'], projects['Name']):
+                alerts = self.alerts.get(project_id)
+                if not alerts:
+                    continue
+                alert_projects[project_name] = [team for team, _ in alerts]
+                alert_details.extend({
+                    "proj_name": project_name,
+                    "team": team,
+                    "days_diff": days_diff,
+                    "message": f"{team} ends {days_diff} days after Construction"
+                } for team, days_diff in alerts)
+            return alert_projects, alert_details
+
+
+def _get_store(data_manager):
+    store = getattr(data_manager, '_alerts', None)
+    if store is None:
+        store = SequencingAlerts()
+        data_manager._alerts = store
+    return store
+
+
+def get_alerts(data_manager):
+    """The manager's SequencingAlerts, rebuilt only if the data changed other than through tracked writes"""
+    from components.data_cache import get_snapshot
+
+    with manager_lock(data_manager):
+        store = _get_store(data_manager)
+        version = data_manager.get_data_version()
+        with store.lock:
+            hit = store.version is not None and store.version == version
+            record_cache('alerts', hit)
+            if not hit:
+                snapshot = get_snapshot(data_manager)
+                store.rebuild(snapshot.items)
+                store.version = snapshot.version
+                logger.info("Rebuilt sequencing alerts for %d projects: %d with alerts",
+                            len(store.deadlines), len(store.alerts))
+    return store
+
+
+def rebuild_alerts(data_manager):
+    """Maintenance: recompute the alerts of every project from the stored items"""
+    with manager_lock(data_manager):
+        store = _get_store(data_manager)
+        with store.lock:
+            store.version = None
+        return get_alerts(data_manager)
@@ -0,0 +1,283 @@
+"""
+Read-only JSON API over the data manager, served by health_check.py under /api/:
+
+    /api/projects                  projects
+    /api/projects/<id>/items       one project's items
+    /api/deadlines                 items, first Start Date and last End Date (the deadline) per project and team
+    /api/summary                   per-project rollup with Target COD and Slack Days
+
+Every route takes fields=<comma separated columns>, limit=<rows> and
+cursor=<next_cursor of the previous page>; /api/deadlines also takes
+project= and team= filters. Pages are keyed on the row keys (ID, Item ID,
+Project ID and Team) rather than offsets, so a write between two pages
+doesn't repeat or skip the rows that didn't change.
+
+Responses carry an ETag made from the data version and the request, so a
+poll with a matching If-None-Match costs one version lookup and a 304 -
+nothing is loaded or serialized. The frames behind each route are loaded
+once per data version and shared by all request threads.
+"""
+import base64
+import binascii
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from urllib.parse import parse_qs, unquote
+import pandas as pd
+from components import project_summary
+from components.data_cache import get_snapshot
+
+# Logging is configured by the entry point (utils.logs.configure_logging)
+logger = logging.getLogger('api')
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+# Encoded pages kept for clients that poll without If-None-Match
+BODY_CACHE_SIZE = 256
+
+PAGE_PARAMS = ('fields', 'limit', 'cursor')
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Route:
+    """A route's frame (see ReadApi._load), its key columns and extra filter parameters"""
+
+    def __init__(self, frame, keys, filters=()):
+        self.frame = frame
+        self.keys = keys
+        self.filters = filters
+
+
+ROUTES = {
+    'projects': Route('projects', ['ID']),
+    'items': Route('items', ['Item ID']),
+    'deadlines': Route('deadlines', ['Project ID', 'Team'], filters=('project', 'team')),
+    'summary': Route('summary', ['ID'])
+}
+
+
+def _match_route(path):
+    """(route name, project ID or None) for a request path, raising ApiError(404) for unknown paths"""
+    parts = [unquote(part) for part in path.strip('/').split('/')]
+    if parts == ['api', 'projects']:
+        return 'projects', None
+    if len(parts) == 4 and parts[:2] == ['api', 'projects'] and parts[3] == 'items' and parts[2]:
+        return 'items', parts[2]
+    if parts == ['api', 'deadlines']:
+        return 'deadlines', None
+    if parts == ['api', 'summary']:
+        return 'summary', None
+    raise ApiError(404, f"Unknown API path {path}")
+
+
+def _parse_params(query, route):
+    """The query's parameters as a {name: value} dict, validated for the route"""
+    allowed = PAGE_PARAMS + route.filters
+    params = {}
+    for name, values in parse_qs(query, keep_blank_values=True).items():
+        if name not in allowed:
+            raise ApiError(400, f"Unknown parameter '{name}' (expected one of {', '.join(allowed)})")
+        params[name] = values[-1]
+
+    try:
+        limit = int(params.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError(400, "limit must be an integer")
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ApiError(400, f"limit must be between 1 and {MAX_LIMIT}")
+    params['limit'] = limit
+
+    if params.get('cursor'):
+        params['cursor'] = decode_cursor(params['cursor'], len(route.keys))
+    else:
+        params.pop('cursor', None)
+
+    if 'fields' in params:
+        params['fields'] = [field.strip() for field in params['fields'].split(',') if field.strip()]
+    return params
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, length):
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        raise ApiError(400, "Invalid cursor")
+    if not isinstance(key, list) or len(key) != length or not all(isinstance(value, str) for value in key):
+        raise ApiError(400, "Invalid cursor")
+    return key
+
+
+def make_etag(version, path, params):
+    """Strong ETag for a response: changes with the data version and with anything in the request"""
+    request = json.dumps([path, sorted(params.items())], default=str)
+    return '"' + hashlib.sha1(f"{version!r}|{request}".encode()).hexdigest()[:24] + '"'
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or any(tag.removeprefix('W/') == etag for tag in tags)
+
+
+def _sorted(frame, keys):
+    """frame sorted on its key columns, compared as strings like the cursors"""
+    frame = frame.copy()
+    for key in keys:
+        frame[key] = frame[key].astype(str)
+    return frame.sort_values(keys, kind='stable').reset_index(drop=True)
+
+
+def _after(frame, keys, cursor):
+    """Rows of a key-sorted frame that come after the cursor key"""
+    after = pd.Series(False, index=frame.index)
+    equal = pd.Series(True, index=frame.index)
+    for key, value in zip(keys, cursor):
+        after |= equal & (frame[key] > value)
+        equal &= frame[key] == value
+    return frame[after]
+
+
+def _records(frame):
+    """JSON-ready rows: dates as YYYY-MM-DD, missing values as null"""
+    frame = frame.copy()
+    for column in frame.columns:
+        if pd.api.types.is_datetime64_any_dtype(frame[column]):
+            frame[column] = frame[column].dt.strftime('%Y-%m-%d')
+    frame = frame.astype(object)
+    return frame.where(frame.notna(), None).to_dict('records')
+
+
+class ReadApi:
+    """
+    Answers API requests from any number of threads. Loading goes through
+    one lock, so concurrent requests after a write wait for a single read of
+    the data instead of each reading it.
+    """
+
+    def __init__(self, manager_factory=None):
+        self._manager_factory = manager_factory
+        self._manager = None
+        self._manager_lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        # frame name -> (data version, frame)
+        self._frames = {}
+        self._bodies = OrderedDict()
+        self._bodies_lock = threading.Lock()
+
+    def _get_manager(self):
+        with self._manager_lock:
+            if self._manager is None:
+                if self._manager_factory is None:
+                    from components.data_storage import get_shared_data_manager
+                    self._manager_factory = get_shared_data_manager
+                self._manager = self._manager_factory()
+            return self._manager
+
+    def _current_version(self):
+        # Only stats the CSV files or reads one row, so it doesn't wait for a load in progress
+        version = self._get_manager().get_data_version()
+        if version is None:
+            raise ApiError(503, "Could not read the data version")
+        return version
+
+    def _load(self, name, version):
+        """
+        (version, frame) for a route's frame, loaded at most once per data
+        version. The version returned is the one read before loading, so a
+        write during the load can only make the response look older than its
+        data (and refetched on the next poll), never newer.
+        """
+        with self._load_lock:
+            cached = self._frames.get(name)
+            if cached is not None and cached[0] == version:
+                return cached
+            manager = self._get_manager()
+            version = manager.get_data_version()
+            if name == 'projects':
+                frame = _sorted(get_snapshot(manager).projects, ['ID'])
+            elif name == 'items':
+                frame = _sorted(get_snapshot(manager).items, ['Project ID', 'Item ID'])
+            elif name == 'deadlines':
+                frame = _sorted(manager.get_project_summary(), ['Project ID', 'Team'])
+            else:
+                summary = manager.get_project_summary()
+                frame = _sorted(project_summary.project_rollup(summary, get_snapshot(manager).projects), ['ID'])
+            self._frames[name] = (version, frame)
+            logger.info("Loaded API frame %s at version %s: %d rows", name, version, len(frame))
+            return version, frame
+
+    def _page(self, route_name, project_id, params, version):
+        """(version, body) for one page of a route"""
+        route = ROUTES[route_name]
+        if route_name == 'items':
+            version, projects = self._load('projects', version)
+            if project_id not in set(projects['ID']):
+                raise ApiError(404, f"Unknown project {project_id}")
+        version, frame = self._load(route.frame, version)
+
+        if route_name == 'items':
+            frame = frame[frame['Project ID'] == project_id]
+        if params.get('project'):
+            frame = frame[frame['Project ID'] == params['project']]
+        if params.get('team'):
+            frame = frame[frame['Team'] == params['team']]
+        if 'cursor' in params:
+            frame = _after(frame, route.keys, params['cursor'])
+
+        fields = params.get('fields')
+        if fields:
+            unknown = [field for field in fields if field not in frame.columns]
+            if unknown:
+                raise ApiError(400, f"Unknown fields {', '.join(unknown)} (available: {', '.join(frame.columns)})")
+
+        limit = params['limit']
+        page = frame.iloc[:limit]
+        next_cursor = None
+        if len(frame) > limit:
+            next_cursor = encode_cursor([str(value) for value in page.iloc[-1][route.keys]])
+        data = _records(page[fields] if fields else page)
+        body = json.dumps({'data': data, 'count': len(data), 'next_cursor': next_cursor}, default=str)
+        return version, body.encode()
+
+    def handle(self, path, query, if_none_match=None):
+        """
+        Answer one GET request: (status, body, headers). A matching
+        If-None-Match gets a 304 without loading or serializing anything.
+        """
+        try:
+            route_name, project_id = _match_route(path)
+            params = _parse_params(query, ROUTES[route_name])
+            version = self._current_version()
+            etag = make_etag(version, path, params)
+            if etag_matches(if_none_match, etag):
+                return 304, b'', {'ETag': etag}
+
+            with self._bodies_lock:
+                body = self._bodies.get(etag)
+                if body is not None:
+                    self._bodies.move_to_end(etag)
+            if body is None:
+                loaded_version, body = self._page(route_name, project_id, params, version)
+                etag = make_etag(loaded_version, path, params)
+                with self._bodies_lock:
+                    self._bodies[etag] = body
+                    while len(self._bodies) > BODY_CACHE_SIZE:
+                        self._bodies.popitem(last=False)
+            return 200, body, {'ETag': etag}
+        except ApiError as e:
+            return e.status, json.dumps({'error': str(e)}).encode(), {}
+        except Exception as e:
+            logger.error("Error answering API request %s: %s", path, e)
+            return 503, json.dumps({'error': "Data could not be read"}).encode(), {}
@@ -0,0 +1,481 @@
+"""
+Streaming full and incremental backups of projects, items and item
+dependencies, and restore.
+
+A backup is a ZIP archive in BACKUP_DIR (default "backups") holding
+projects.csv, items.csv and dependencies.csv in the CSV storage format
+(dependencies.csv with the successor item's Project ID added) plus
+manifest.json. Rows are read and written in chunks of CHUNK_ROWS, straight
+from the tables or CSV files into the compressed archive, so memory use
+doesn't grow with the portfolio (on CSV storage, apart from the item to
+project map used to assign dependencies to projects).
+
+The manifest records a fingerprint of every project (its row plus its
+items and the dependencies of its items). An incremental backup holds only the projects whose fingerprint
+changed since the previous backup, and names that backup as its base.
+Restoring an incremental backup follows the chain of bases back to a
+full backup and takes each project from the newest archive that has it.
+
+Restore replaces all projects, items and dependencies: in one transaction
+on a database, and by atomically replacing the CSV files on CSV storage.
+Archives of format 1 have no dependencies, so restoring one clears them.
+"""
+import io
+import os
+import sys
+import json
+import time
+import zipfile
+import logging
+import argparse
+from datetime import datetime
+import pandas as pd
+import sqlalchemy as sa
+from components.bulk_loader import CsvBulkLoader, CSV_SOURCES, CHUNK_ROWS, LOAD_LOCK, parse_dates
+from utils.logs import log_rows
+
+# Logging is configured by the entry point (utils.logs.configure_logging)
+logger = logging.getLogger('backup')
+
+BACKUP_DIR = os.environ.get('BACKUP_DIR', 'backups')
+FORMAT_VERSION = 2
+# Format 1 archives have no dependencies.csv
+SUPPORTED_FORMATS = (1, FORMAT_VERSION)
+MANIFEST = 'manifest.json'
+
+# Archive tables, in restore order
+TABLES = ('projects', 'items', 'dependencies')
+# Archive columns, in the CSV storage format (dependencies also carry the successor item's project)
+COLUMNS = {
+    'projects': ['ID', 'Name', 'ISO', 'Voltage', 'Capacity', 'Duration', 'Target COD'],
+    'items': ['Item ID', 'Project ID', 'Item Name', 'Team', 'Start Date', 'End Date', 'Months'],
+    'dependencies': ['Project ID', 'Item ID', 'Predecessor ID']
+}
+# Column holding the project ID a row belongs to
+PROJECT_COLUMN = {'projects': 'ID', 'items': 'Project ID', 'dependencies': 'Project ID'}
+DATE_COLUMNS = {'projects': ['Target COD'], 'items': ['Start Date', 'End Date'], 'dependencies': []}
+FLOAT_COLUMNS = {'projects': ['Voltage', 'Capacity', 'Duration'], 'items': [], 'dependencies': []}
+INT_COLUMNS = {'projects': [], 'items': ['Months'], 'dependencies': []}
+
+HASH_MASK = (1 << 64) - 1
+
+
+class BackupStats:
+    """What a backup or restore wrote and how long it took"""
+
+    def __init__(self, path, kind):
+        self.path = path
+        self.kind = kind
+        self.projects = 0
+        self.items = 0
+        self.dependencies = 0
+        self.skipped = 0
+        self.seconds = 0.0
+
+    def to_dict(self):
+        return {
+            'path': self.path,
+            'kind': self.kind,
+            'projects': self.projects,
+            'items': self.items,
+            'dependencies': self.dependencies,
+            'skipped': self.skipped,
+            'seconds': round(self.seconds, 3)
+        }
+
+    def __str__(self):
+        skipped = f", {self.skipped:,} invalid rows skipped" if self.skipped else ''
+        return (f"{self.kind} {os.path.basename(self.path)}: {self.projects:,} projects, "
+                f"{self.items:,} items and {self.dependencies:,} dependencies in {self.seconds:.2f}s{skipped}")
+
+
+def _format_dates(values):
+    """ISO strings for parseable dates (date only at midnight); other values are kept as they are"""
+    parsed = parse_dates(values)
+    formatted = parsed.dt.strftime('%Y-%m-%d %H:%M:%S')
+    midnight = parsed.notna() & (parsed == parsed.dt.normalize())
+    formatted[midnight] = formatted[midnight].str[:10]
+    return formatted.where(parsed.notna(), values)
+
+
+def normalize_chunk(table_name, chunk):
+    """
+    Put a chunk of rows from either backend into the archive format, so the
+    same data has the same text (and fingerprint) wherever it was read from
+    """
+    chunk = chunk.reindex(columns=COLUMNS[table_name])
+    for column in DATE_COLUMNS[table_name]:
+        chunk[column] = _format_dates(chunk[column])
+    for column in FLOAT_COLUMNS[table_name] + INT_COLUMNS[table_name]:
+        numeric = pd.to_numeric(chunk[column], errors='coerce')
+        # Columns with non-numeric values are left as text
+        if numeric.isna().sum() == chunk[column].isna().sum():
+            chunk[column] = numeric.astype('Int64' if column in INT_COLUMNS[table_name] else float)
+    return chunk
+
+
+def fingerprint_chunk(table_name, chunk):
+    """Sum of row hashes per project ID of a normalized chunk ({project ID: int})"""
+    if chunk.empty:
+        return {}
+    hashes = pd.util.hash_pandas_object(chunk.astype(str), index=False)
+    # uint64 sums wrap around, which is what combining hashes needs
+    sums = hashes.groupby(chunk[PROJECT_COLUMN[table_name]].astype(str).to_numpy()).sum()
+    return {project_id: int(value) for project_id, value in sums.items()}
+
+
+class BackupSource:
+    """Reads normalized chunks of projects, items and dependencies from a data manager's storage"""
+
+    def __init__(self, data_manager, chunk_rows=CHUNK_ROWS):
+        self.data_manager = data_manager
+        self.chunk_rows = chunk_rows
+        self.engine = getattr(data_manager, 'engine', None)
+        self.connection = None
+        self.item_projects = None
+
+    def __enter__(self):
+        if self.engine is not None:
+            # One connection (and, on PostgreSQL, one snapshot) for every pass over the tables
+            self.connection = self.engine.connect()
+            if self.engine.dialect.name == 'postgresql':
+                self.connection = self.connection.execution_options(isolation_level='REPEATABLE READ')
+            self.connection.begin()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def chunks(self, table_name):
+        if self.connection is not None:
+            renames = {db: csv for csv, db in CSV_SOURCES[table_name][1].items()}
+            renames['Project_ID'] = 'Project ID'
+            table = getattr(self.data_manager, table_name)
+            query = sa.select(table).order_by(*table.primary_key.columns)
+            if table_name == 'dependencies':
+                # Links are assigned to the successor item's project (links of missing items are dropped)
+                items = self.data_manager.items
+                query = (sa.select(items.c.Project_ID, table.c.Item_ID, table.c.Predecessor_ID)
+                         .join(items, items.c.Item_ID == table.c.Item_ID)
+                         .order_by(*table.primary_key.columns))
+            result = self.connection.execution_options(stream_results=True, yield_per=self.chunk_rows).execute(query)
+            columns = [renames.get(key, key) for key in result.keys()]
+            for rows in result.partitions():
+                yield normalize_chunk(table_name, pd.DataFrame(rows, columns=columns))
+        else:
+            path = {'projects': self.data_manager.file_path, 'items': self.data_manager.items_path,
+                    'dependencies': self.data_manager.dependencies_path}[table_name]
+            if not os.path.exists(path):
+                return
+            dependencies = table_name == 'dependencies'
+            for chunk in pd.read_csv(path, chunksize=self.chunk_rows, dtype=str if dependencies else None):
+                if dependencies:
+                    chunk = self._with_projects(chunk.dropna())
+                yield normalize_chunk(table_name, chunk)
+
+    def _with_projects(self, chunk):
+        """Dependencies with the successor item's Project ID (links of missing items are dropped)"""
+        if self.item_projects is None:
+            self.item_projects = pd.Series(dtype=str)
+            if os.path.exists(self.data_manager.items_path):
+                items = pd.read_csv(self.data_manager.items_path, usecols=['Item ID', 'Project ID'], dtype=str)
+                self.item_projects = items.drop_duplicates('Item ID').set_index('Item ID')['Project ID']
+        chunk = chunk.assign(**{'Project ID': chunk['Item ID'].map(self.item_projects)})
+        return chunk[chunk['Project ID'].notna()]
+
+    def fingerprints(self):
+        """Fingerprint of every project (its row plus its items and their dependencies), as hex strings"""
+        totals = {}
+        for table_name in TABLES:
+            for chunk in self.chunks(table_name):
+                for project_id, value in fingerprint_chunk(table_name, chunk).items():
+                    totals[project_id] = (totals.get(project_id, 0) + value) & HASH_MASK
+        return {project_id: f"{value:016x}" for project_id, value in totals.items()}
+
+
+def read_manifest(path):
+    """The manifest of a backup archive, raising ValueError if it isn't one"""
+    try:
+        with zipfile.ZipFile(path) as archive:
+            manifest = json.loads(archive.read(MANIFEST))
+    except (KeyError, zipfile.BadZipFile, json.JSONDecodeError) as e:
+        raise ValueError(f"{os.path.basename(path)} is not a backup archive: {e}")
+    if manifest.get('format') not in SUPPORTED_FORMATS:
+        raise ValueError(f"{os.path.basename(path)} has unsupported backup format {manifest.get('format')}")
+    return manifest
+
+
+def list_backups(backup_dir=None):
+    """Manifests of the backups in backup_dir, newest first, each with its 'path' added"""
+    backup_dir = backup_dir or BACKUP_DIR
+    if not os.path.isdir(backup_dir):
+        return []
+    backups = []
+    for name in os.listdir(backup_dir):
+        if not name.endswith('.zip'):
+            continue
+        path = os.path.join(backup_dir, name)
+        try:
+            manifest = read_manifest(path)
+        except ValueError as e:
+            logger.warning("Skipping %s", e)
+            continue
+        manifest.pop('fingerprints', None)
+        manifest['path'] = path
+        backups.append(manifest)
+    return sorted(backups, key=lambda manifest: manifest['created_at'], reverse=True)
+
+
+def _write_table(archive, table_name, chunks, include=None, check=None):
+    """Stream chunks into an archive member, keeping only rows of projects in include; returns rows written"""
+    rows = 0
+    with archive.open(f"{table_name}.csv", 'w', force_zip64=True) as member:
+        with io.TextIOWrapper(member, encoding='utf-8', newline='') as text:
+            text.write(','.join(COLUMNS[table_name]) + '\n')
+            for chunk in chunks:
+                if include is not None:
+                    chunk = chunk[chunk[PROJECT_COLUMN[table_name]].astype(str).isin(include)]
+                chunk.to_csv(text, header=False, index=False)
+                rows += len(chunk)
+                if check is not None:
+                    check()
+    return rows
+
+
+def create_backup(data_manager, incremental=False, backup_dir=None, chunk_rows=CHUNK_ROWS, check=None):
+    """
+    Write a backup archive to backup_dir and return its BackupStats.
+
+    With incremental, only projects changed since the newest backup in
+    backup_dir are written (a full backup is made if there is none).
+    check() is called after every chunk, e.g. to cancel a background job.
+    """
+    backup_dir = backup_dir or BACKUP_DIR
+    os.makedirs(backup_dir, exist_ok=True)
+    start = time.perf_counter()
+    base = list_backups(backup_dir)[0] if incremental else None
+    kind = 'incremental' if base is not None else 'full'
+
+    created_at = datetime.now()
+    name = f"backup_{created_at.strftime('%Y%m%d_%H%M%S_%f')}_{kind}.zip"
+    path = os.path.join(backup_dir, name)
+    stats = BackupStats(path, kind)
+
+    with BackupSource(data_manager, chunk_rows) as source:
+        # Fingerprints are read first, so an incremental backup knows what to include
+        fingerprints = source.fingerprints()
+        if check is not None:
+            check()
+        included = None
+        deleted = []
+        if base is not None:
+            previous = read_manifest(base['path'])['fingerprints']
+            included = {project_id for project_id, value in fingerprints.items()
+                        if previous.get(project_id) != value}
+            deleted = sorted(set(previous) - set(fingerprints))
+
+        # Written under a temporary name, so a failed backup never becomes the newest one
+        partial = path + '.partial'
+        try:
+            with zipfile.ZipFile(partial, 'w', zipfile.ZIP_DEFLATED) as archive:
+                stats.projects = _write_table(archive, 'projects', source.chunks('projects'), included, check)
+                stats.items = _write_table(archive, 'items', source.chunks('items'), included, check)
+                stats.dependencies = _write_table(archive, 'dependencies', source.chunks('dependencies'),
+                                                  included, check)
+                archive.writestr(MANIFEST, json.dumps({
+                    'format': FORMAT_VERSION,
+                    'kind': kind,
+                    'created_at': created_at.isoformat(),
+                    'base': os.path.basename(base['path']) if base is not None else None,
+                    'projects': stats.projects,
+                    'items': stats.items,
+                    'dependencies': stats.dependencies,
+                    'included': sorted(included) if included is not None else None,
+                    'deleted': deleted,
+                    'fingerprints': fingerprints
+                }))
+            os.replace(partial, path)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+
+    stats.seconds = time.perf_counter() - start
+    logger.info("Backed up %s", stats)
+    return stats
+
+
+def backup_chain(path):
+    """Archives needed to restore path, newest first, each as (path, manifest)"""
+    chain = []
+    seen = set()
+    while path is not None:
+        if path in seen:
+            raise ValueError(f"Backup chain of {os.path.basename(path)} has a cycle")
+        seen.add(path)
+        if not os.path.exists(path):
+            raise ValueError(f"Base backup {os.path.basename(path)} is missing")
+        manifest = read_manifest(path)
+        chain.append((path, manifest))
+        path = os.path.join(os.path.dirname(path), manifest['base']) if manifest['base'] else None
+    return chain
+
+
+def _restore_chunks(chain, table_name, owners, chunk_rows):
+    """Rows of table_name from every archive in the chain, each project's rows taken from its owner"""
+    for position, (path, manifest) in enumerate(chain):
+        with zipfile.ZipFile(path) as archive:
+            if table_name == 'dependencies' and manifest['format'] == 1:
+                continue
+            with archive.open(f"{table_name}.csv") as member:
+                for chunk in pd.read_csv(member, chunksize=chunk_rows):
+                    project_ids = chunk[PROJECT_COLUMN[table_name]].astype(str)
+                    yield chunk[project_ids.map(owners).eq(position)]
+
+
+def restore_backup(data_manager, path, chunk_rows=CHUNK_ROWS, check=None):
+    """
+    Replace all projects, items and dependencies with the contents of a backup (following
+    the chain of an incremental one) and return BackupStats.
+
+    On a database everything happens in one transaction; on CSV storage the
+    files are rewritten next to the originals and swapped in at the end.
+    """
+    start = time.perf_counter()
+    chain = backup_chain(path)
+    manifest = chain[0][1]
+    stats = BackupStats(path, manifest['kind'])
+
+    # Each project comes from the newest archive in the chain that includes it
+    owners = {}
+    for position, (_, archive_manifest) in enumerate(chain):
+        included = archive_manifest['included']
+        for project_id in (included if included is not None else archive_manifest['fingerprints']):
+            if project_id in manifest['fingerprints']:
+                owners.setdefault(project_id, position)
+    missing = set(manifest['fingerprints']) - set(owners)
+    if missing:
+        raise ValueError(f"Backup chain of {os.path.basename(path)} has no data for {len(missing)} projects")
+
+    with LOAD_LOCK:
+        if getattr(data_manager, 'engine', None) is not None:
+            _restore_database(data_manager, chain, owners, chunk_rows, check, stats)
+        else:
+            _restore_csv(data_manager, chain, owners, chunk_rows, check, stats)
+
+    stats.seconds = time.perf_counter() - start
+    logger.info("Restored %s", stats)
+    return stats
+
+
+def _restore_database(db_manager, chain, owners, chunk_rows, check, stats):
+    loader = CsvBulkLoader(db_manager, chunk_rows=chunk_rows)
+    restored_projects = set()
+    with db_manager.engine.begin() as connection:
+        connection.execute(sa.delete(db_manager.dependencies))
+        connection.execute(sa.delete(db_manager.items))
+        connection.execute(sa.delete(db_manager.projects))
+        # Reseeded from the restored items on the next allocation
+        connection.execute(sa.delete(db_manager.sequences).where(db_manager.sequences.c.Name == 'item_id'))
+
+        for chunk in _restore_chunks(chain, 'projects', owners, chunk_rows):
+            loaded, skipped = loader.load_chunk(connection, 'projects', chunk)
+            restored_projects.update(chunk['ID'].astype(str))
+            stats.projects += loaded
+            stats.skipped += skipped
+            if check is not None:
+                check()
+
+        for chunk in _restore_chunks(chain, 'items', owners, chunk_rows):
+            # Items of projects that don't exist (possible in CSV storage) can't satisfy the foreign key
+            orphans = ~chunk['Project ID'].astype(str).isin(restored_projects)
+            if orphans.any():
+                log_rows(logger, logging.WARNING, "Skipped items of unknown projects", chunk[orphans],
+                         ['Item ID', 'Project ID'])
+                stats.skipped += int(orphans.sum())
+                chunk = chunk[~orphans]
+            loaded, skipped = loader.load_chunk(connection, 'items', chunk)
+            stats.items += loaded
+            stats.skipped += skipped
+            if check is not None:
+                check()
+
+        for chunk in _restore_chunks(chain, 'dependencies', owners, chunk_rows):
+            loaded, _ = loader.load_chunk(connection, 'dependencies', chunk.drop(columns='Project ID'))
+            stats.dependencies += loaded
+            if check is not None:
+                check()
+        # Links to items that weren't restored (a predecessor in a project taken from an older archive)
+        items = db_manager.items
+        orphaned = connection.execute(sa.delete(db_manager.dependencies).where(
+            ~db_manager.dependencies.c.Predecessor_ID.in_(sa.select(items.c.Item_ID)) |
+            ~db_manager.dependencies.c.Item_ID.in_(sa.select(items.c.Item_ID)))).rowcount
+        if orphaned:
+            logger.warning("Skipped %d dependencies on items that weren't restored", orphaned)
+            stats.dependencies -= orphaned
+            stats.skipped += orphaned
+
+        db_manager._bump_data_version(connection)
+
+
+def _restore_csv(data_manager, chain, owners, chunk_rows, check, stats):
+    targets = {'projects': data_manager.file_path, 'items': data_manager.items_path,
+               'dependencies': data_manager.dependencies_path}
+    partials = {table_name: target + '.restore' for table_name, target in targets.items()}
+    try:
+        for table_name in TABLES:
+            # dependencies.csv doesn't have the archive's Project ID
+            columns = [column for column in COLUMNS[table_name]
+                       if table_name != 'dependencies' or column != 'Project ID']
+            with open(partials[table_name], 'w', newline='') as f:
+                f.write(','.join(columns) + '\n')
+                for chunk in _restore_chunks(chain, table_name, owners, chunk_rows):
+                    chunk[columns].to_csv(f, header=False, index=False)
+                    setattr(stats, table_name, getattr(stats, table_name) + len(chunk))
+                    if check is not None:
+                        check()
+    except BaseException:
+        for partial in partials.values():
+            if os.path.exists(partial):
+                os.remove(partial)
+        raise
+
+    # Items first, so no moment has projects without their items
+    os.replace(partials['items'], targets['items'])
+    os.replace(partials['dependencies'], targets['dependencies'])
+    os.replace(partials['projects'], targets['projects'])
+    # Reseeded from the restored items on the next allocation
+    counter_path = data_manager.id_allocator.counter_path
+    if os.path.exists(counter_path):
+        os.remove(counter_path)
+    data_manager.reload_data()
+
+
+if __name__ == "__main__":
+    from utils.logs import configure_logging
+    from components.data_storage import get_data_manager
+
+    configure_logging(level=logging.INFO, stream=sys.stderr)
+
+    parser = argparse.ArgumentParser(description="Back up or restore projects, items and dependencies")
+    parser.add_argument('--backup-dir', default=BACKUP_DIR, help='Directory of the backup archives')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    backup_parser = subparsers.add_parser('backup', help='Write a new backup archive')
+    backup_parser.add_argument('--incremental', action='store_true',
+                               help='Only projects changed since the newest backup')
+    restore_parser = subparsers.add_parser('restore', help='Replace all data with a backup')
+    restore_parser.add_argument('archive', help='Backup archive to restore')
+    subparsers.add_parser('list', help='List the backup archives')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        for backup in list_backups(args.backup_dir):
+            print(f"{os.path.basename(backup['path'])}  {backup['kind']:<11}  "
+                  f"{backup['projects']:>8,} projects  {backup['items']:>10,} items  "
+                  f"{backup.get('dependencies', 0):>10,} dependencies")
+    elif args.command == 'backup':
+        print(create_backup(get_data_manager(), incremental=args.incremental, backup_dir=args.backup_dir))
+    else:
+        print(restore_backup(get_data_manager(), args.archive))
@@ -0,0 +1,302 @@
+"""
+Chunked, resumable bulk load of projects.csv, items.csv and dependencies.csv into the database.
+
+The CSV files are read in chunks of CHUNK_ROWS rows, so memory use doesn't
+grow with the file. Each chunk is loaded with COPY on PostgreSQL
+(psycopg2) and with a DBAPI executemany elsewhere, in the same
+transaction as a checkpoint row in the `sequences` table. If a load is
+interrupted, the next one skips the rows already committed. Secondary
+indexes are dropped before a load and rebuilt once it finishes.
+
+Resuming assumes the CSV files haven't changed since the interrupted load.
+"""
+import io
+import os
+import time
+import logging
+import threading
+import pandas as pd
+import sqlalchemy as sa
+from utils.logs import log_rows
+
+# Logging is configured by the entry point (utils.logs.configure_logging)
+logger = logging.getLogger('bulk_loader')
+
+# Rows read, converted and loaded per transaction
+CHUNK_ROWS = 50000
+# Checkpoint rows in the sequences table are named <prefix><table>
+CHECKPOINT_PREFIX = 'migration:'
+# Held for the whole of a load so that two loads in this process (a background
+# migration and a data manager importing on startup) never run at once
+LOAD_LOCK = threading.RLock()
+# Format of SQLAlchemy's SQLite DateTime storage, used when bypassing its type processing
+SQLITE_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+# table -> (CSV file, CSV to database column renames, date columns)
+CSV_SOURCES = {
+    'projects': ('projects.csv', {'Target COD': 'Target_COD'}, ['Target_COD']),
+    'items': ('items.csv', {
+        'Item ID': 'Item_ID',
+        'Project ID': 'Project_ID',
+        'Item Name': 'Item_Name',
+        'Start Date': 'Start_Date',
+        'End Date': 'End_Date'
+    }, ['Start_Date', 'End_Date']),
+    'dependencies': ('dependencies.csv', {'Item ID': 'Item_ID', 'Predecessor ID': 'Predecessor_ID'}, [])
+}
+# Tables whose CSV file is optional (no warning when it is missing)
+OPTIONAL_SOURCES = {'dependencies'}
+
+
+def parse_dates(values):
+    """
+    Parse a column of date strings. ISO dates (with or without a time) are
+    parsed in one vectorized pass; only the rest fall back to per-value
+    format inference. Unparseable values become NaT.
+    """
+    parsed = pd.to_datetime(values, format='ISO8601', errors='coerce')
+    leftover = parsed.isna() & values.notna()
+    if leftover.any():
+        parsed[leftover] = pd.to_datetime(values[leftover], format='mixed', errors='coerce')
+    return parsed
+
+
+class LoadStats:
+    """Rows loaded into one table and how long it took"""
+
+    def __init__(self, table, resumed_from=0):
+        self.table = table
+        self.resumed_from = resumed_from
+        self.rows = 0
+        self.skipped = 0
+        self.chunks = 0
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+    def to_dict(self):
+        return {
+            'table': self.table,
+            'rows': self.rows,
+            'skipped': self.skipped,
+            'chunks': self.chunks,
+            'resumed_from': self.resumed_from,
+            'seconds': round(self.seconds, 3),
+            'rows_per_second': round(self.rows_per_second)
+        }
+
+    def __str__(self):
+        resumed = f", resumed after {self.resumed_from:,} rows" if self.resumed_from else ''
+        skipped = f", {self.skipped:,} invalid rows skipped" if self.skipped else ''
+        return (f"{self.table}: {self.rows:,} rows in {self.seconds:.2f}s "
+                f"({self.rows_per_second:,.0f} rows/s{resumed}{skipped})")
+
+
+class CsvBulkLoader:
+    """
+    Loads the CSV files in a data directory into a DBManager's tables.
+
+    progress(stats) is called after every committed chunk.
+    """
+
+    def __init__(self, db_manager, data_dir=None, chunk_rows=CHUNK_ROWS, progress=None):
+        self.db = db_manager
+        self.engine = db_manager.engine
+        self.data_dir = data_dir or db_manager.data_dir
+        self.chunk_rows = chunk_rows
+        self.progress = progress
+        self.tables = {'projects': db_manager.projects, 'items': db_manager.items,
+                       'dependencies': db_manager.dependencies}
+
+    # Checkpoints
+
+    def get_checkpoint(self, connection, table_name):
+        """Rows of table_name's CSV already loaded by an interrupted load (None if there is none)"""
+        sequences = self.db.sequences
+        return connection.execute(
+            sa.select(sequences.c.Value).where(sequences.c.Name == CHECKPOINT_PREFIX + table_name)
+        ).scalar()
+
+    def _set_checkpoint(self, connection, table_name, rows):
+        sequences = self.db.sequences
+        name = CHECKPOINT_PREFIX + table_name
+        result = connection.execute(sa.update(sequences).where(sequences.c.Name == name).values(Value=rows))
+        if result.rowcount == 0:
+            connection.execute(sa.insert(sequences).values(Name=name, Value=rows))
+
+    def _clear_checkpoint(self, connection, table_name):
+        sequences = self.db.sequences
+        connection.execute(sa.delete(sequences).where(sequences.c.Name == CHECKPOINT_PREFIX + table_name))
+
+    # Indexes
+
+    def drop_indexes(self, table):
+        for index in table.indexes:
+            index.drop(self.engine, checkfirst=True)
+
+    def create_indexes(self, table=None):
+        """Create the secondary indexes of one table (or of all tables) if they are missing"""
+        for current in ([table] if table is not None else self.tables.values()):
+            for index in current.indexes:
+                index.create(self.engine, checkfirst=True)
+
+    # Loading
+
+    def clear(self):
+        """Delete all projects, items and dependencies, any checkpoints, and the Item ID counter (forced migration)"""
+        sequences = self.db.sequences
+        with self.engine.begin() as connection:
+            connection.execute(sa.delete(self.db.dependencies))
+            connection.execute(sa.delete(self.db.items))
+            connection.execute(sa.delete(self.db.projects))
+            connection.execute(sa.delete(sequences).where(sequences.c.Name.like(CHECKPOINT_PREFIX + '%')))
+            # Reseeded from the imported items on the next allocation
+            connection.execute(sa.delete(sequences).where(sequences.c.Name == 'item_id'))
+            self.db._bump_data_version(connection)
+
+    def needs_load(self, table_name):
+        """True if the table is empty or an earlier load of it was interrupted"""
+        table = self.tables[table_name]
+        with self.engine.connect() as connection:
+            if self.get_checkpoint(connection, table_name) is not None:
+                return True
+            return connection.execute(sa.select(sa.func.count()).select_from(table)).scalar() == 0
+
+    def _prepare_chunk(self, table_name, chunk):
+        """Rename, convert and order a CSV chunk as database rows; returns (rows, invalid rows)"""
+        table = self.tables[table_name]
+        _, renames, date_columns = CSV_SOURCES[table_name]
+        raw = chunk.rename(columns=renames)
+        chunk = raw.copy()
+
+        for column in date_columns:
+            chunk[column] = parse_dates(raw[column])
+        if table_name == 'items':
+            chunk['Item_Name'] = chunk['Item_Name'].fillna('Untitled Item')
+            chunk['Team'] = chunk['Team'].fillna('Development')
+            chunk['Months'] = pd.to_numeric(chunk['Months'], errors='coerce').fillna(1).astype(int)
+
+        # Rows with unparseable dates can't go into the NOT NULL columns
+        invalid = chunk[date_columns].isna().any(axis=1)
+        return chunk.loc[~invalid, [column.name for column in table.columns]], raw[invalid]
+
+    def _insert(self, connection, table, rows):
+        """Bulk insert a prepared chunk: COPY on PostgreSQL, executemany otherwise"""
+        dbapi_connection = connection.connection.dbapi_connection
+        preparer = connection.dialect.identifier_preparer
+        columns = ', '.join(preparer.quote(column) for column in rows.columns)
+
+        if connection.dialect.name == 'postgresql':
+            cursor = dbapi_connection.cursor()
+            if hasattr(cursor, 'copy_expert'):
+                buffer = io.StringIO()
+                rows.to_csv(buffer, index=False, header=False, date_format='%Y-%m-%d %H:%M:%S')
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f"COPY {preparer.format_table(table)} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+                cursor.close()
+                return
+            cursor.close()
+
+        if connection.dialect.paramstyle == 'qmark':
+            # SQLite: plain tuples through the driver, skipping per-value type processing
+            # Column-wise tolist() is much faster than itertuples on Arrow-backed strings
+            values = []
+            for column in rows.columns:
+                if pd.api.types.is_datetime64_any_dtype(rows[column]):
+                    values.append(rows[column].dt.strftime(SQLITE_DATETIME_FORMAT).tolist())
+                else:
+                    values.append(rows[column].tolist())
+            placeholders = ', '.join('?' for _ in rows.columns)
+            connection.exec_driver_sql(
+                f"INSERT INTO {preparer.format_table(table)} ({columns}) VALUES ({placeholders})",
+                list(zip(*values))
+            )
+        else:
+            connection.execute(sa.insert(table), rows.to_dict('records'))
+
+    def load_chunk(self, connection, table_name, chunk):
+        """
+        Insert a chunk of CSV-format rows in the caller's transaction.
+        Rows with invalid dates are skipped (and logged); returns (rows loaded, rows skipped).
+        """
+        table = self.tables[table_name]
+        rows, invalid = self._prepare_chunk(table_name, chunk)
+        log_rows(logger, logging.WARNING, f"Skipped {table_name} rows with invalid dates", invalid,
+                 [column.name for column in table.primary_key.columns] + CSV_SOURCES[table_name][2])
+        if len(rows):
+            self._insert(connection, table, rows)
+        return len(rows), len(invalid)
+
+    def load_table(self, table_name):
+        """
+        Load one table from its CSV file, resuming after the checkpointed rows.
+        Returns LoadStats, or None if the CSV file doesn't exist.
+        """
+        table = self.tables[table_name]
+        filename, _, _ = CSV_SOURCES[table_name]
+        path = os.path.join(self.data_dir, filename)
+        if not os.path.exists(path):
+            logger.log(logging.DEBUG if table_name in OPTIONAL_SOURCES else logging.WARNING,
+                       "%s not found, skipping import of %s", path, table_name)
+            return None
+
+        with self.engine.connect() as connection:
+            done = self.get_checkpoint(connection, table_name) or 0
+        stats = LoadStats(table_name, resumed_from=done)
+        if done:
+            logger.info("Resuming import of %s after %d rows", table_name, done)
+
+        start = time.perf_counter()
+        self.drop_indexes(table)
+        position = 0
+        for chunk in pd.read_csv(path, chunksize=self.chunk_rows):
+            chunk_end = position + len(chunk)
+            if chunk_end <= done:
+                position = chunk_end
+                continue
+            if position < done:
+                chunk = chunk.iloc[done - position:]
+
+            # The chunk and its checkpoint commit together, so a retry never loads rows twice
+            with self.engine.begin() as connection:
+                loaded, skipped = self.load_chunk(connection, table_name, chunk)
+                self._set_checkpoint(connection, table_name, chunk_end)
+
+            position = chunk_end
+            stats.rows += loaded
+            stats.skipped += skipped
+            stats.chunks += 1
+            stats.seconds = time.perf_counter() - start
+            if self.progress is not None:
+                self.progress(stats)
+
+        self.create_indexes(table)
+        with self.engine.begin() as connection:
+            self._clear_checkpoint(connection, table_name)
+            self.db._bump_data_version(connection)
+        stats.seconds = time.perf_counter() - start
+        logger.info("Imported %s", stats)
+        return stats
+
+    def load_all(self, only_empty=True):
+        """
+        Load projects, then items and their dependencies. With only_empty, tables that already have
+        rows are left alone unless an earlier load of them was interrupted.
+        """
+        results = []
+        for table_name in ('projects', 'items', 'dependencies'):
+            if only_empty and not self.needs_load(table_name):
+                continue
+            if table_name == 'items':
+                # Item_ID is the primary key: fix CSVs that repeat an Item ID across projects first
+                from components.data_manager import renumber_duplicate_item_ids_in_csv
+                renumber_duplicate_item_ids_in_csv(self.data_dir)
+            stats = self.load_table(table_name)
+            if stats is not None:
+                results.append(stats)
+        # Databases created before an index was added get it here
+        self.create_indexes()
+        return results
@@ -0,0 +1,240 @@
+import logging
+import numpy as np
+import pandas as pd
+from utils.metrics import record_cache
+from components.derived_state import manager_lock
+
+# Set up logging
+logger = logging.getLogger('data_cache')
+
+
+class DerivedMetadata:
+    """
+    Lookups derived from a snapshot's projects: distinct filter values,
+    selectbox option labels and an ID to project map.
+
+    Built once per data version, so widgets don't each query or scan the
+    projects on every rerun.
+    """
+
+    def __init__(self, projects):
+        self.unique_isos = sorted(projects['ISO'].dropna().unique().tolist())
+        self.unique_voltages = sorted(projects['Voltage'].dropna().unique().tolist())
+        self.project_ids = projects['ID'].tolist()
+
+        # Option labels, built in one vectorized pass
+        ids = projects['ID'].astype(str)
+        names = projects['Name'].astype(str)
+        self.project_labels = (ids + " - " + names).tolist()
+        self.label_to_id = dict(zip(self.project_labels, self.project_ids))
+        self._iso_labels = ids + " - " + names + " (" + projects['ISO'].astype(str) + ")"
+        self._iso_labels_by_filter = {}
+        self._isos = projects['ISO']
+
+        self.projects_by_id = {record['ID']: record for record in projects.to_dict('records')}
+
+    def iso_option_labels(self, isos=None):
+        """'ID - Name (ISO)' labels for the projects in the given ISOs (all if empty)"""
+        key = tuple(sorted(isos)) if isos else ()
+        if key not in self._iso_labels_by_filter:
+            labels = self._iso_labels[self._isos.isin(key)] if key else self._iso_labels
+            self._iso_labels_by_filter[key] = labels.tolist()
+        return self._iso_labels_by_filter[key]
+
+
+def _bound(value):
+    """A window bound as nanoseconds since the epoch (None stays None)"""
+    return None if value is None else pd.Timestamp(value).value
+
+
+class ItemIntervalIndex:
+    """
+    Index over the items' (Start Date, End Date) intervals for "items active
+    in a window" queries.
+
+    Items are grouped by duration - durations within a factor of two of each
+    other share a class - and sorted by start within each class. In a class
+    whose longest item is L long, the items overlapping [start, end] can only
+    start between start - L and end, so each class costs two binary searches
+    plus a scan of candidates that are mostly matches: O(log n + k) overall.
+    Items with a missing date are never returned.
+    """
+
+    def __init__(self, items):
+        starts = pd.to_datetime(items['Start Date'], errors='coerce').to_numpy(dtype='datetime64[ns]')
+        ends = pd.to_datetime(items['End Date'], errors='coerce').to_numpy(dtype='datetime64[ns]')
+        positions = np.flatnonzero(~(np.isnat(starts) | np.isnat(ends)))
+        starts = starts[positions].view(np.int64)
+        ends = ends[positions].view(np.int64)
+
+        # Duration class: log2 of the length in days, with sub-day (or negative) lengths in class 0
+        days = np.maximum(ends - starts, 0) / (86400 * 10**9)
+        classes = np.ceil(np.log2(np.maximum(days, 1))).astype(np.int64)
+        order = np.lexsort((starts, classes))
+        classes = classes[order]
+        bounds = np.flatnonzero(np.diff(classes)) + 1
+
+        self.size = len(positions)
+        self._classes = []
+        for class_order in np.split(order, bounds) if len(order) else []:
+            class_starts, class_ends = starts[class_order], ends[class_order]
+            self._classes.append((class_starts, class_ends, positions[class_order],
+                                  max(int((class_ends - class_starts).max()), 0)))
+
+    def query(self, start=None, end=None):
+        """
+        Positions (in item order) of the items that start on or before end
+        and end on or after start. A None bound leaves that side open.
+        """
+        start, end = _bound(start), _bound(end)
+        matches = []
+        for starts, ends, positions, longest in self._classes:
+            low = 0 if start is None else np.searchsorted(starts, start - longest, side='left')
+            high = len(starts) if end is None else np.searchsorted(starts, end, side='right')
+            found = positions[low:high]
+            if start is not None:
+                found = found[ends[low:high] >= start]
+            matches.append(found)
+        if not matches:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(matches))
+
+
+class ProjectsSnapshot:
+    """
+    All projects, without their items, as of one data version - for views
+    that read the per-project summary instead of the items.
+
+    Shared like a DataSnapshot, so the frame must be treated as read-only.
+    """
+
+    def __init__(self, version, projects):
+        self.version = version
+        self.projects = projects
+        self._metadata = None
+
+    @property
+    def metadata(self):
+        """Derived metadata for this snapshot, computed on first use"""
+        if self._metadata is None:
+            self._metadata = DerivedMetadata(self.projects)
+        return self._metadata
+
+
+class DataSnapshot(ProjectsSnapshot):
+    """
+    All projects and items as of one data version.
+
+    Snapshots are shared between reruns (and the fragments inside a rerun),
+    so the frames must be treated as read-only - copy before modifying.
+    """
+
+    def __init__(self, version, projects, items, dependencies=None):
+        super().__init__(version, projects)
+        self.items = items
+        # Item ID / Predecessor ID links between items
+        self.dependencies = dependencies if dependencies is not None else pd.DataFrame(
+            columns=['Item ID', 'Predecessor ID'])
+        self._item_positions = None
+        self._interval_index = None
+
+    def _project_positions(self):
+        if self._item_positions is None:
+            if self.items.empty:
+                self._item_positions = {}
+            else:
+                self._item_positions = self.items.groupby('Project ID', sort=False).indices
+        return self._item_positions
+
+    def get_project_items(self, project_id):
+        """Items of one project, using a Project ID index built on first use"""
+        positions = self._project_positions().get(project_id)
+        if positions is None:
+            return self.items.iloc[0:0]
+        return self.items.iloc[positions]
+
+    def items_in_window(self, start=None, end=None, project_ids=None):
+        """
+        Items active at some point between start and end (either may be None
+        for an open bound), optionally only those of some projects.
+
+        Uses an ItemIntervalIndex built on first use. When the projects hold
+        only a small share of all items, their own items are filtered instead.
+        """
+        if project_ids is not None:
+            project_positions = self._project_positions()
+            groups = [project_positions[project_id] for project_id in set(project_ids)
+                      if project_id in project_positions]
+            if sum(len(group) for group in groups) * 8 < len(self.items):
+                positions = np.sort(np.concatenate(groups)) if groups else np.empty(0, dtype=np.int64)
+                items = self.items.iloc[positions]
+                starts = pd.to_datetime(items['Start Date'], errors='coerce')
+                ends = pd.to_datetime(items['End Date'], errors='coerce')
+                inside = starts.notna() & ends.notna()
+                if end is not None:
+                    inside &= starts <= pd.Timestamp(end)
+                if start is not None:
+                    inside &= ends >= pd.Timestamp(start)
+                return items[inside]
+
+        if self._interval_index is None:
+            self._interval_index = ItemIntervalIndex(self.items)
+        items = self.items.iloc[self._interval_index.query(start, end)]
+        if project_ids is not None:
+            items = items[items['Project ID'].isin(project_ids)]
+        return items
+
+
+def get_snapshot(data_manager):
+    """
+    Return the data snapshot for the manager's current data version.
+
+    The snapshot is kept on the data manager and only reloaded when
+    get_data_version() changes, so reruns that don't follow a write reuse the
+    already-loaded frames instead of reading every project's items again.
+    """
+    version = data_manager.get_data_version()
+    snapshot = getattr(data_manager, '_snapshot', None)
+
+    hit = snapshot is not None and version is not None and snapshot.version == version
+    record_cache('snapshot', hit)
+
+    if not hit:
+        with manager_lock(data_manager):
+            # Another thread may have loaded it while this one waited for the lock
+            version = data_manager.get_data_version()
+            snapshot = getattr(data_manager, '_snapshot', None)
+            if snapshot is None or version is None or snapshot.version != version:
+                # Pick up writes made by other sessions before loading
+                data_manager.reload_data()
+                snapshot = DataSnapshot(version, data_manager.get_data(), data_manager.get_all_items(),
+                                        data_manager.get_all_dependencies())
+                data_manager._snapshot = snapshot
+                logger.info("Loaded data snapshot %s: %d projects, %d items, %d dependencies", version,
+                            len(snapshot.projects), len(snapshot.items), len(snapshot.dependencies))
+
+    return snapshot
+
+
+def get_projects_snapshot(data_manager):
+    """
+    Return a ProjectsSnapshot for the manager's current data version.
+
+    The full snapshot is used when it is current. Otherwise only the projects
+    are read again, so a write doesn't make the views that don't need items
+    reload all of them.
+    """
+    version = data_manager.get_data_version()
+    for snapshot in (getattr(data_manager, '_snapshot', None), getattr(data_manager, '_projects_snapshot', None)):
+        if snapshot is not None and version is not None and snapshot.version == version:
+            record_cache('projects_snapshot', True)
+            return snapshot
+    record_cache('projects_snapshot', False)
+
+    with manager_lock(data_manager):
+        version = data_manager.get_data_version()
+        # Pick up writes made by other sessions before reading (for CSV storage, only projects.csv is read)
+        data_manager.reload_data()
+        snapshot = ProjectsSnapshot(version, data_manager.get_data())
+        data_manager._projects_snapshot = snapshot
+    return snapshot
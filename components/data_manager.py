@@ -1,20 +1,133 @@
 import pandas as pd
 from datetime import datetime
-import streamlit as st
 import logging
-
-# Set up logging
-logging.basicConfig(
-    filename='app.log',
-    level=logging.WARNING,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+import os
+import shutil
+import tempfile
+import threading
+from components.id_allocator import FileIdAllocator, assign_item_ids, renumber_duplicate_item_ids
+from components.data_cache import get_snapshot
+from components.derived_state import write_token, record_write, locked_methods
+from components import project_summary
+from utils.tracing import trace_methods
+from utils.metrics import DATA_LOAD_SECONDS, DATA_SAVE_SECONDS, observe_methods
+from components.scheduling import predecessors_to_dependencies
+from utils.logs import lazy, log_rows, RowSummary
+
+# Logging is configured by the entry point (utils.logs.configure_logging)
 logger = logging.getLogger('data_manager')
 
+# Serializes appends and rewrites of the CSV files within this process
+_csv_write_lock = threading.RLock()
+
+ITEM_COLUMNS = ['Item ID', 'Project ID', 'Item Name', 'Team', 'Start Date', 'End Date', 'Months']
+DEPENDENCY_COLUMNS = ['Item ID', 'Predecessor ID']
+
+
+def append_csv_rows(path, rows_df, default_columns):
+    """
+    Append rows to a CSV file without rewriting it.
+
+    Columns are written in the order of the file's existing header so the new
+    lines line up with the old ones. A header is written only for a new file.
+    """
+    with _csv_write_lock:
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            columns = pd.read_csv(path, nrows=0).columns.tolist()
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b'\n'
+            write_header = False
+        else:
+            columns = list(default_columns)
+            needs_newline = False
+            write_header = True
+
+        rows_df = rows_df.reindex(columns=columns)
+        with open(path, 'a', newline='') as f:
+            if needs_newline:
+                f.write('\n')
+            rows_df.to_csv(f, header=write_header, index=False)
+
+
+def rewrite_csv(path, df):
+    """
+    Replace a CSV file with the rows of df.
+
+    The rows are written to a temporary file next to it, which then replaces
+    it, so readers never see a partly written file. Callers that read the
+    file before rewriting it hold _csv_write_lock around both, so that rows
+    appended in between are not lost.
+    """
+    with _csv_write_lock:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                                        prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', newline='') as f:
+                df.to_csv(f, index=False)
+            if os.path.exists(path):
+                shutil.copymode(path, tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def renumber_duplicate_item_ids_in_csv(data_dir):
+    """
+    One-time fix for an items.csv where an Item ID is used by more than one
+    item (see id_allocator.renumber_duplicate_item_ids), rewriting items.csv
+    and dependencies.csv. Returns the number of items renumbered.
+    """
+    items_path = os.path.join(data_dir, "items.csv")
+    dependencies_path = os.path.join(data_dir, "dependencies.csv")
+    with _csv_write_lock:
+        try:
+            # Only the Item ID column is read to check: this runs every time a manager is created
+            item_ids = pd.read_csv(items_path, usecols=['Item ID'], dtype=str)['Item ID'].str.strip()
+        except (FileNotFoundError, pd.errors.EmptyDataError, ValueError):
+            return 0
+        if not item_ids[item_ids.notna() & (item_ids != '')].duplicated().any():
+            return 0
+
+        # Read as text, so the values that aren't renumbered are written back unchanged
+        items_df = pd.read_csv(items_path, dtype=str, keep_default_na=False)
+        try:
+            dependencies = pd.read_csv(dependencies_path, dtype=str).dropna()
+        except (FileNotFoundError, pd.errors.EmptyDataError):
+            dependencies = None
+        allocator = FileIdAllocator(os.path.join(data_dir, "item_id_counter.txt"), items_path)
+        items_df, dependencies, count = renumber_duplicate_item_ids(items_df, dependencies, allocator)
+        if dependencies is not None:
+            rewrite_csv(dependencies_path, dependencies)
+        rewrite_csv(items_path, items_df)
+    return count
+
+@trace_methods('DataManager')
+@observe_methods(DATA_LOAD_SECONDS, ['load_data', 'get_all_items', 'get_items_in_window', 'get_project_summary'],
+                 backend='csv')
+@observe_methods(DATA_SAVE_SECONDS, ['save_data', 'add_project', 'update_project', 'delete_project',
+                                     'save_project_items', 'add_project_item'], backend='csv')
+@locked_methods(['reload_data', 'load_data', 'save_data', 'add_project', 'update_project', 'delete_project',
+                 'get_data', 'get_project', 'get_project_ids', 'get_unique_isos', 'get_unique_voltages',
+                 'filter_data', 'save_project_items', 'add_project_item', 'get_project_items',
+                 'get_items_in_window', 'get_all_items', 'get_project_summary', 'get_all_dependencies',
+                 'replace_dependencies', 'get_team_colors'])
 class DataManager:
-    def __init__(self):
-        self.file_path = "data/projects.csv"
-        self.items_path = "data/items.csv"
+    def __init__(self, data_dir="data"):
+        # Held by the methods above, so the manager can be shared by several threads
+        self.lock = threading.RLock()
+        self.file_path = os.path.join(data_dir, "projects.csv")
+        self.items_path = os.path.join(data_dir, "items.csv")
+        self.dependencies_path = os.path.join(data_dir, "dependencies.csv")
+        self.id_allocator = FileIdAllocator(
+            os.path.join(os.path.dirname(self.items_path), "item_id_counter.txt"),
+            self.items_path
+        )
+        self.summary_file = project_summary.SummaryFile(os.path.join(data_dir, "project_summary.json"))
+        # Item IDs must be unique across projects (older data allocated them per project)
+        renumber_duplicate_item_ids_in_csv(data_dir)
         self.load_data()
         
     def reload_data(self):
@@ -34,21 +147,37 @@ class DataManager:
             self.save_data()
 
     def save_data(self):
-        self.data.to_csv(self.file_path, index=False)
+        rewrite_csv(self.file_path, self.data)
 
     def add_project(self, project_data):
+        """Add a new project by appending a single line to projects.csv"""
+        token = write_token(self)
         new_project = pd.DataFrame([project_data])
+        if 'Target COD' in new_project.columns:
+            new_project['Target COD'] = pd.to_datetime(new_project['Target COD'], format='mixed')
+
+        append_csv_rows(self.file_path, new_project, self.data.columns)
         self.data = pd.concat([self.data, new_project], ignore_index=True)
-        self.save_data()
+        record_write(self, token, cube=lambda cube: cube.set_project_attributes(
+            project_data['ID'], project_data.get('ISO'), project_data.get('Voltage')))
+        return True
 
     def update_project(self, project_id, project_data):
-        row_idx = self.data.index[self.data['ID'] == project_id].tolist()[0]
-        for column in self.data.columns:
-            self.data.at[row_idx, column] = project_data[column]
+        token = write_token(self)
+        # Change a copy: frames returned by get_data() may still be read by other threads
+        data = self.data.copy()
+        row_idx = data.index[data['ID'] == project_id].tolist()[0]
+        for column in data.columns:
+            data.at[row_idx, column] = project_data[column]
+        self.data = data
         self.save_data()
+        record_write(self, token, cube=lambda cube: cube.set_project_attributes(
+            project_id, project_data.get('ISO'), project_data.get('Voltage')))
 
     def delete_project(self, project_id):
         """Delete a project and all its associated items"""
+        token = write_token(self)
+        summary_version = project_summary.file_version(self.items_path)
         try:
             # Handle projects.csv
             # Remove the project from the projects DataFrame
@@ -57,25 +186,33 @@ class DataManager:
 
             self.data = self.data[self.data['ID'] != project_id]
             # Save the changes to projects.csv
-            self.data.to_csv(self.file_path, index=False)
+            self.save_data()
 
             # Handle items.csv
             try:
-                import os
-                if os.path.exists(self.items_path):
-                    items_df = pd.read_csv(self.items_path)
-                    if 'Project ID' in items_df.columns:
-                        # Remove all items associated with this project
-                        items_df = items_df[items_df['Project ID'] != project_id]
-                        items_df.to_csv(self.items_path, index=False)
+                with _csv_write_lock:
+                    if os.path.exists(self.items_path):
+                        items_df = pd.read_csv(self.items_path)
+                        if 'Project ID' in items_df.columns:
+                            # Remove all items associated with this project, and their dependencies
+                            project_items = items_df['Project ID'] == project_id
+                            self.replace_dependencies(items_df.loc[project_items, 'Item ID'],
+                                                      other_item_ids=items_df.loc[~project_items, 'Item ID'],
+                                                      removed_item_ids=items_df.loc[project_items, 'Item ID'])
+                            items_df = items_df[~project_items]
+                            rewrite_csv(self.items_path, items_df)
             except Exception as e:
-                logger.error(f"Error removing project items: {e}")
+                logger.error("Error removing project items: %s", e)
                 # Continue even if items deletion fails
 
+            record_write(self, token, alerts=lambda alerts: alerts.remove_project(project_id),
+                         cube=lambda cube: cube.remove_project(project_id))
+            self._update_summary(summary_version,
+                                 lambda summary: project_summary.remove_project(summary, project_id))
             return True
 
         except Exception as e:
-            logger.error(f"Error deleting project: {e}")
+            logger.error("Error deleting project: %s", e)
             return False
 
     def get_data(self):
@@ -85,13 +222,13 @@ class DataManager:
         return self.data[self.data['ID'] == project_id].iloc[0]
 
     def get_project_ids(self):
-        return self.data['ID'].tolist()
+        return get_snapshot(self).metadata.project_ids
 
     def get_unique_isos(self):
-        return sorted(self.data['ISO'].unique().tolist())
+        return get_snapshot(self).metadata.unique_isos
 
     def get_unique_voltages(self):
-        return sorted(self.data['Voltage'].unique().tolist())
+        return get_snapshot(self).metadata.unique_voltages
 
     def filter_data(self, isos=None, voltages=None):
         filtered = self.data.copy()
@@ -105,14 +242,15 @@ class DataManager:
         """
         Save project items with enhanced error handling and date format fixing
         """
+        token = write_token(self)
+        summary_version = project_summary.file_version(self.items_path)
         try:
-            # Log the data we're trying to save
-            logger.info(f"Attempting to save {len(items_df)} items")
-
             # Validate incoming dataframe
             if items_df is None or not isinstance(items_df, pd.DataFrame):
-                logger.error(f"Invalid input: items_df is {type(items_df)}")
+                logger.error("Invalid input: items_df is %s", type(items_df))
                 return False
+
+            logger.info("Attempting to save %d items", len(items_df))
                 
             if items_df.empty:
                 logger.warning("Empty dataframe provided to save_project_items")
@@ -122,17 +260,17 @@ class DataManager:
             items_df = items_df.copy()
             
             # Debug log the original dataframe
-            logger.info(f"Original data has {len(items_df)} rows with columns: {items_df.columns.tolist()}")
+            logger.debug("Original data has %d rows with columns: %s", len(items_df), lazy(items_df.columns.tolist))
             
             # Remove any completely empty rows
             items_df = items_df.dropna(how='all')
-            logger.info(f"After removing empty rows: {len(items_df)} rows remain")
+            logger.debug("After removing empty rows: %d rows remain", len(items_df))
                 
             # Check for required columns
             required_columns = ['Project ID', 'Item Name', 'Team']
             missing_columns = [col for col in required_columns if col not in items_df.columns]
             if missing_columns:
-                logger.error(f"Missing required columns: {missing_columns}")
+                logger.error("Missing required columns: %s", missing_columns)
                 return False
 
             # Test file writing permissions
@@ -141,23 +279,15 @@ class DataManager:
                 data_dir = os.path.dirname(self.items_path)
                 if not os.path.exists(data_dir):
                     os.makedirs(data_dir)
-                    logger.info(f"Created directory: {data_dir}")
+                    logger.info("Created directory: %s", data_dir)
 
                 with open(os.path.join(data_dir, 'test_write.txt'), 'w') as f:
                     f.write('Test write operation')
-                logger.info("File write test successful")
+                logger.debug("File write test successful")
             except Exception as e:
-                logger.error(f"File write test failed: {e}")
+                logger.error("File write test failed: %s", e)
                 raise Exception(f"Cannot write to data directory: {e}")
 
-            # Read existing items to preserve data
-            try:
-                existing_items = pd.read_csv(self.items_path)
-                logger.info(f"Read {len(existing_items)} existing items")
-            except FileNotFoundError:
-                logger.info("No existing items file found, creating new one")
-                existing_items = pd.DataFrame(columns=['Item ID', 'Project ID', 'Item Name', 'Team', 'Start Date', 'End Date', 'Months'])
-
             # Get the project ID from the new items
             project_id = items_df['Project ID'].iloc[0] if 'Project ID' in items_df.columns and not items_df.empty else None
             
@@ -165,7 +295,7 @@ class DataManager:
                 logger.error("No valid Project ID found in the data")
                 return False
                 
-            logger.info(f"Processing items for Project ID: {project_id}")
+            logger.debug("Processing items for Project ID: %s", project_id)
 
             # Fill any blank or NaN values in Item Name with placeholders
             if 'Item Name' in items_df.columns:
@@ -178,69 +308,65 @@ class DataManager:
                 items_df['Team'] = items_df['Team'].fillna('Development')
                 items_df.loc[items_df['Team'] == '', 'Team'] = 'Development'
 
-            # Add Item ID if it doesn't exist or contains NaN values
-            if 'Item ID' not in items_df.columns:
-                logger.info("Adding Item IDs to new rows")
-                items_df['Item ID'] = [f"I{i:03d}" for i in range(1, len(items_df) + 1)]
-            else:
-                # Fill any missing Item IDs with new ones
-                missing_ids_mask = items_df['Item ID'].isna()
-                if missing_ids_mask.any():
-                    logger.info(f"Adding missing Item IDs to {missing_ids_mask.sum()} rows")
-                    for idx in items_df[missing_ids_mask].index:
-                        items_df.at[idx, 'Item ID'] = f"I{idx:03d}"
+            # Allocate globally unique Item IDs for new rows in one batch
+            items_df = assign_item_ids(items_df, self.id_allocator)
+
+            # Predecessors (comma-separated Item IDs) are stored in dependencies.csv, not items.csv
+            dependencies = None
+            if 'Predecessors' in items_df.columns:
+                dependencies = predecessors_to_dependencies(items_df)
+                items_df = items_df.drop(columns=['Predecessors'])
 
             # Ensure required columns exist in the DataFrame
             required_columns = ['Item ID', 'Project ID', 'Item Name', 'Team', 'Start Date', 'End Date', 'Months']
             for col in required_columns:
                 if col not in items_df.columns:
                     items_df[col] = '' if col not in ['Months'] else 1
-                    logger.info(f"Added missing column to new data: {col}")
+                    logger.debug("Added missing column to new data: %s", col)
 
             # Process dates - improved handling for various formats
             for date_col in ['Start Date', 'End Date']:
                 # Log original date values for debugging
-                logger.info(f"Original {date_col} values: {items_df[date_col].tolist()}")
+                logger.debug("Original %s values: %s", date_col, lazy(items_df[date_col].tolist))
                 
                 # First try standard conversion
                 try:
                     items_df[date_col] = pd.to_datetime(items_df[date_col], errors='coerce')
                 except Exception as e:
-                    logger.warning(f"Error in first date conversion for {date_col}: {str(e)}")
+                    logger.warning("Error in first date conversion for %s: %s", date_col, e)
                 
                 # If we have any NaT values after conversion, try more aggressively
                 if items_df[date_col].isna().any():
-                    logger.info(f"Attempting additional date format conversions for {date_col}")
+                    logger.debug("Attempting additional date format conversions for %s", date_col)
                     
                     # Try multiple formats for date strings
                     date_formats = ['%Y-%m-%d', '%m/%d/%Y', '%d-%m-%Y', '%Y/%m/%d', '%m-%d-%Y']
                     
                     # Process each cell individually for problematic dates
-                    for idx in items_df[items_df[date_col].isna()].index:
-                        original_value = items_df.loc[idx, date_col]
-                        if isinstance(original_value, str) and original_value.strip():
-                            for fmt in date_formats:
-                                try:
-                                    parsed_date = datetime.strptime(original_value.strip(), fmt)
-                                    items_df.loc[idx, date_col] = parsed_date
-                                    logger.info(f"Successfully parsed date '{original_value}' with format {fmt}")
-                                    break
-                                except ValueError:
-                                    continue
+                    with RowSummary(logger, f"Parsed {date_col} values with a fallback format", logging.DEBUG) as reparsed:
+                        for idx in items_df[items_df[date_col].isna()].index:
+                            original_value = items_df.loc[idx, date_col]
+                            if isinstance(original_value, str) and original_value.strip():
+                                for fmt in date_formats:
+                                    try:
+                                        parsed_date = datetime.strptime(original_value.strip(), fmt)
+                                        items_df.loc[idx, date_col] = parsed_date
+                                        reparsed.add(f"{original_value!r} as {fmt}")
+                                        break
+                                    except ValueError:
+                                        continue
                 
                 # Set default values for missing dates if there's an item name
                 mask = (items_df[date_col].isna() | (items_df[date_col] == ''))
                 if mask.any():
-                    logger.info(f"Setting default dates for {mask.sum()} entries in {date_col}")
-                    today = datetime.now().date()
+                    # A Timestamp, which datetime64 columns accept (a date is rejected by pandas 3)
+                    today = pd.Timestamp(datetime.now().date())
                     if date_col == 'Start Date':
                         default_date = today  # Use today as default start
-                        items_df.loc[mask, date_col] = default_date
-                        logger.info(f"Set default {date_col} for {mask.sum()} items to {default_date}")
                     else:  # End Date
                         default_date = today + pd.Timedelta(days=60)  # 2 months after today
-                        items_df.loc[mask, date_col] = default_date
-                        logger.info(f"Set default {date_col} for {mask.sum()} items to {default_date}")
+                    items_df.loc[mask, date_col] = default_date
+                    logger.info("Set default %s for %d items to %s", date_col, mask.sum(), default_date)
 
             # Recalculate Months based on valid dates
             items_df['Months'] = items_df.apply(
@@ -258,52 +384,154 @@ class DataManager:
                 lambda x: x.strftime('%Y-%m-%d') if pd.notna(x) else '2025-02-01'
             )
 
-            # Remove existing items for this project
-            existing_items = existing_items[existing_items['Project ID'] != project_id]
-            logger.info(f"Removed existing items for project {project_id}")
-
-            # Concatenate with existing items for other projects
-            updated_items = pd.concat([existing_items, items_df], ignore_index=True)
-            logger.info(f"Combined data now has {len(updated_items)} rows")
-
-            # Ensure we're not saving empty data by mistake
-            if updated_items.empty:
-                logger.error("Attempted to save empty dataframe")
-                return False
-
-            # Before saving, do a final check for required data
-            for idx, row in updated_items.iterrows():
-                if pd.isna(row.get('Item Name')) or str(row.get('Item Name')).strip() == '':
-                    updated_items.at[idx, 'Item Name'] = 'Untitled Item'
-                if pd.isna(row.get('Team')) or str(row.get('Team')).strip() == '':
-                    updated_items.at[idx, 'Team'] = 'Development'
+            # Hold the lock from reading items.csv until it is rewritten, so items
+            # appended meanwhile are not lost
+            with _csv_write_lock:
+                # Read existing items to preserve data
+                try:
+                    existing_items = pd.read_csv(self.items_path)
+                    logger.debug("Read %d existing items", len(existing_items))
+                except FileNotFoundError:
+                    logger.info("No existing items file found, creating new one")
+                    existing_items = pd.DataFrame(columns=['Item ID', 'Project ID', 'Item Name', 'Team', 'Start Date', 'End Date', 'Months'])
+
+                # Remove existing items for this project
+                previous_item_ids = existing_items.loc[existing_items['Project ID'] == project_id, 'Item ID']
+                existing_items = existing_items[existing_items['Project ID'] != project_id]
+                logger.debug("Removed existing items for project %s", project_id)
+
+                # Concatenate with existing items for other projects
+                updated_items = pd.concat([existing_items, items_df], ignore_index=True)
+                logger.debug("Combined data now has %d rows", len(updated_items))
+
+                # Ensure we're not saving empty data by mistake
+                if updated_items.empty:
+                    logger.error("Attempted to save empty dataframe")
+                    return False
+
+                # Before saving, do a final check for required data
+                for idx, row in updated_items.iterrows():
+                    if pd.isna(row.get('Item Name')) or str(row.get('Item Name')).strip() == '':
+                        updated_items.at[idx, 'Item Name'] = 'Untitled Item'
+                    if pd.isna(row.get('Team')) or str(row.get('Team')).strip() == '':
+                        updated_items.at[idx, 'Team'] = 'Development'
             
-            # Log what we're about to save for debugging
-            logger.info(f"Saving data with columns: {updated_items.columns.tolist()}")
-            logger.info(f"Data sample (first 5 rows): {updated_items.head().to_dict()}")
+                # Log what we're about to save for debugging
+                logger.debug("Saving data with columns: %s", lazy(updated_items.columns.tolist))
+                logger.debug("Data sample (first 5 rows): %s", lazy(lambda: updated_items.head().to_dict()))
             
-            # Save the updated DataFrame
-            updated_items.to_csv(self.items_path, index=False)
-            logger.info(f"Successfully saved {len(updated_items)} items to {self.items_path}")
+                # Save the updated DataFrame
+                rewrite_csv(self.items_path, updated_items)
+                logger.info("Successfully saved %d items to %s", len(updated_items), self.items_path)
+
+                # Items no longer in the project lose their links either way round
+                removed_item_ids = previous_item_ids[
+                    ~previous_item_ids.astype(str).isin(items_df['Item ID'].astype(str))]
+                if dependencies is not None:
+                    self.replace_dependencies(pd.concat([previous_item_ids, items_df['Item ID']]), dependencies,
+                                              other_item_ids=existing_items['Item ID'],
+                                              removed_item_ids=removed_item_ids)
+                elif not removed_item_ids.empty:
+                    self.replace_dependencies(removed_item_ids, other_item_ids=existing_items['Item ID'],
+                                              removed_item_ids=removed_item_ids)
             
             # Verify the save operation by reading back the file
             try:
                 verification = pd.read_csv(self.items_path)
-                logger.info(f"Verification: Read back {len(verification)} items")
+                logger.debug("Verification: Read back %d items", len(verification))
                 if len(verification) != len(updated_items):
-                    logger.warning(f"Verification failed: Saved {len(updated_items)} items but read back {len(verification)}")
+                    logger.warning("Verification failed: Saved %d items but read back %d", len(updated_items), len(verification))
             except Exception as e:
-                logger.error(f"Verification error: {str(e)}")
-            
+                logger.error("Verification error: %s", e)
+
+            record_write(self, token, alerts=lambda alerts: alerts.set_project(project_id, items_df),
+                         cube=lambda cube: cube.set_project(project_id, items_df))
+            self._update_summary(summary_version,
+                                 lambda summary: project_summary.replace_project(summary, project_id, items_df))
             return True
 
         except Exception as e:
-            logger.error(f"Error in save_project_items: {str(e)}")
-            import traceback
-            logger.error(traceback.format_exc())
+            logger.exception("Error in save_project_items: %s", e)
             return False
 
+    def add_project_item(self, project_id, item_data):
+        """Add a single item to a project by appending one line to items.csv"""
+        token = write_token(self)
+        summary_version = project_summary.file_version(self.items_path)
+        try:
+            item = dict(item_data)
+            item['Project ID'] = project_id
+            item['Item ID'] = self.id_allocator.allocate()[0]
+
+            # Ensure no empty item name or team
+            if pd.isna(item.get('Item Name')) or str(item.get('Item Name')).strip() == '':
+                item['Item Name'] = 'Untitled Item'
+            if pd.isna(item.get('Team')) or str(item.get('Team')).strip() == '':
+                item['Team'] = 'Development'
+
+            # Normalize dates, defaulting missing ones like save_project_items does
+            today = pd.Timestamp(datetime.now().date())
+            start = pd.to_datetime(item.get('Start Date'), errors='coerce')
+            end = pd.to_datetime(item.get('End Date'), errors='coerce')
+            if pd.isna(start):
+                start = today
+            if pd.isna(end):
+                end = today + pd.Timedelta(days=60)
+
+            item['Start Date'] = start.strftime('%Y-%m-%d')
+            item['End Date'] = end.strftime('%Y-%m-%d')
+            item['Months'] = max(1, ((end - start).days // 30) + 1)
+
+            append_csv_rows(self.items_path, pd.DataFrame([item]), ITEM_COLUMNS)
+            logger.info("Appended item %s to project %s", item['Item ID'], project_id)
+            record_write(self, token, alerts=lambda alerts: alerts.add_item(project_id, item['Team'], end),
+                         cube=lambda cube: cube.add_item(project_id, item['Team'], start, end))
+            self._add_summary_item(summary_version, project_id, item['Team'], start, end)
+            return True
+        except Exception as e:
+            logger.error("Error adding project item: %s", e)
+            return False
+
+    def get_data_version(self):
+        """
+        Cheap token that changes whenever projects.csv, items.csv or dependencies.csv changes.
+
+        Based on file modification time and size, so writes made by other
+        sessions or processes are picked up as well.
+        """
+        version = []
+        for path in (self.file_path, self.items_path, self.dependencies_path):
+            try:
+                stat = os.stat(path)
+                version.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                version.append(None)
+        return tuple(version)
+
+    def check_storage(self):
+        """Read the first rows of both CSV files, raising if storage can't be read (readiness probe)"""
+        pd.read_csv(self.file_path, nrows=1)
+        pd.read_csv(self.items_path, nrows=1)
+        return True
+
     def get_project_items(self, project_id):
+        """
+        Items of one project, from the cached data snapshot (items.csv is only
+        read again after the data version changes)
+        """
+        # A copy: the snapshot's frames are shared and callers may modify theirs
+        return get_snapshot(self).get_project_items(project_id).copy()
+
+    def get_items_in_window(self, start=None, end=None, project_ids=None):
+        """
+        Items active at some point between start and end (either may be None
+        for an open bound), optionally only those of some projects. Answered
+        from the interval index of the cached data snapshot.
+        """
+        return get_snapshot(self).items_in_window(start, end, project_ids)
+
+    def get_all_items(self):
+        """Get the items of all projects with a single read of items.csv"""
         try:
             items_df = pd.read_csv(self.items_path)
 
@@ -317,12 +545,10 @@ class DataManager:
             items_df['Start Date'] = pd.to_datetime(items_df['Start Date'], errors='coerce')
             items_df['End Date'] = pd.to_datetime(items_df['End Date'], errors='coerce')
 
-            # Log any date parsing issues
-            parse_issues = items_df[items_df['Start Date'].isnull() | items_df['End Date'].isnull()]
-            if not parse_issues.empty:
-                logger.warning(f"Some date values could not be parsed in {len(parse_issues)} items")
-                for _, row in parse_issues.iterrows():
-                    logger.warning(f"Unparsed item: {row['Item Name']}, Project ID: {project_id}")
+            # Log any date parsing issues as one summary record
+            log_rows(logger, logging.WARNING, "Some date values could not be parsed",
+                     items_df[items_df['Start Date'].isnull() | items_df['End Date'].isnull()],
+                     ['Item Name', 'Project ID'])
 
             # Calculate Months based on dates
             items_df['Months'] = items_df.apply(
@@ -333,16 +559,84 @@ class DataManager:
             )
 
             # Log long durations instead of displaying warnings
-            long_durations = items_df[items_df['Months'] > 360]
-            if not long_durations.empty:
-                logger.warning(f"Found {len(long_durations)} items with extremely long durations (>30 years)")
-                for _, row in long_durations.iterrows():
-                    logger.warning(f"Long duration item: {row['Item Name']}, Duration: {row['Months']} months")
-
-            # Filter for the specific project and return
-            return items_df[items_df['Project ID'] == project_id]
+            log_rows(logger, logging.WARNING, "Items with extremely long durations (>30 years)",
+                     items_df[items_df['Months'] > 360], ['Item Name', 'Project ID', 'Months'])
+
+            return items_df
         except FileNotFoundError:
-            return pd.DataFrame(columns=['Item ID', 'Project ID', 'Item Name', 'Team', 'Start Date', 'End Date', 'Months'])
+            return pd.DataFrame(columns=ITEM_COLUMNS)
+
+    def get_project_summary(self):
+        """
+        Items, first Start Date and last End Date per project and team, read
+        from project_summary.json (rebuilt from items.csv when it is out of date)
+        """
+        try:
+            version = project_summary.file_version(self.items_path)
+            summary = self.summary_file.read(version)
+            if summary is None:
+                summary = project_summary.summarize_items(self.get_all_items())
+                self.summary_file.write(summary, version)
+                logger.info("Rebuilt project summary: %d project teams", len(summary))
+            return summary
+        except Exception as e:
+            logger.error("Error getting project summary: %s", e)
+            return project_summary.empty_summary()
+
+    def _update_summary(self, version, update):
+        """
+        Apply update(summary) to the stored summary after a write to
+        items.csv that started at the given version. A summary that was
+        already out of date is left for the next read to rebuild.
+        """
+        try:
+            summary = self.summary_file.read(version)
+            if summary is not None:
+                self.summary_file.write(update(summary), project_summary.file_version(self.items_path))
+        except Exception as e:
+            logger.error("Error updating project summary: %s", e)
+
+    def _add_summary_item(self, version, project_id, team, start_date, end_date):
+        """Count one appended item in the stored summary, through its delta log rather than a rewrite"""
+        try:
+            self.summary_file.add_item(version, project_summary.file_version(self.items_path),
+                                       project_id, team, start_date, end_date)
+        except Exception as e:
+            logger.error("Error updating project summary: %s", e)
+
+    def get_all_dependencies(self):
+        """Get all item dependencies (Item ID, Predecessor ID) from dependencies.csv"""
+        try:
+            return pd.read_csv(self.dependencies_path, dtype=str).dropna()
+        except (FileNotFoundError, pd.errors.EmptyDataError):
+            return pd.DataFrame(columns=DEPENDENCY_COLUMNS)
+
+    def replace_dependencies(self, item_ids, dependencies=None, other_item_ids=None, removed_item_ids=None):
+        """
+        Replace the dependencies of the given items (links where they are the
+        successor) with the rows of dependencies, rewriting dependencies.csv.
+        removed_item_ids are items that no longer exist: links where they are
+        the predecessor of another item are removed as well.
+
+        other_item_ids are the Item IDs of other projects' items: links of an
+        ID that one of them uses as well may be that project's, so they are kept.
+        """
+        item_ids = set(pd.Series(item_ids, dtype=object).dropna().astype(str))
+        removed_item_ids = set(pd.Series(removed_item_ids, dtype=object).dropna().astype(str))
+        if other_item_ids is not None:
+            other_item_ids = set(pd.Series(other_item_ids, dtype=object).dropna().astype(str))
+            item_ids -= other_item_ids
+            removed_item_ids -= other_item_ids
+        existing = self.get_all_dependencies()
+        removed = existing['Item ID'].isin(item_ids) | existing['Predecessor ID'].isin(removed_item_ids)
+        if not removed.any() and (dependencies is None or dependencies.empty):
+            # Nothing to remove or add - keep the file (and the data version) as it is
+            return
+        kept = existing[~removed]
+        if dependencies is not None and not dependencies.empty:
+            kept = pd.concat([kept, dependencies[DEPENDENCY_COLUMNS]], ignore_index=True)
+        rewrite_csv(self.dependencies_path, kept.drop_duplicates())
+        logger.info("Saved dependencies of %d items", len(item_ids))
 
     def get_team_colors(self):
         return {
@@ -1,33 +1,56 @@
 import os
 import logging
+import threading
 
-# Set up logging
-logging.basicConfig(
-    filename='app.log',
-    level=logging.WARNING,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Logging is configured by the entry point (utils.logs.configure_logging)
 logger = logging.getLogger('data_storage')
 
 def get_data_manager():
     """
     Factory function to create the appropriate data manager
-    Uses PostgreSQL if available, otherwise falls back to CSV storage
+    Uses PostgreSQL if available, otherwise falls back to CSV storage.
+    DATA_DIR overrides the directory holding the CSV files (default "data").
     """
+    data_dir = os.environ.get('DATA_DIR', 'data')
+
     # Check if DATABASE_URL environment variable is set
     if os.environ.get('DATABASE_URL'):
         try:
             # Try to import and use the database manager
             from components.db_manager import DBManager
             logger.info("Using PostgreSQL database for data storage")
-            return DBManager()
+            return DBManager(data_dir=data_dir)
         except Exception as e:
-            logger.error(f"Error initializing database: {e}. Falling back to CSV storage.")
+            logger.error("Error initializing database: %s. Falling back to CSV storage.", e)
             # Fall back to CSV storage if there's an error
             from components.data_manager import DataManager
-            return DataManager()
+            return DataManager(data_dir=data_dir)
     else:
         # Use CSV storage if DATABASE_URL is not set
         logger.info("DATABASE_URL not found. Using CSV storage")
         from components.data_manager import DataManager
-        return DataManager()
+        return DataManager(data_dir=data_dir)
+
+
+# Data managers shared by every session of this process, by storage configuration
+_shared_managers = {}
+_shared_lock = threading.Lock()
+
+def get_shared_data_manager():
+    """
+    The data manager shared by every session (and request thread) of this
+    process, so the data and everything derived from it - the snapshot,
+    alerts, workload, portfolio cube - are loaded once per data version
+    instead of once per session. Its methods and the rebuilds of that derived
+    state run under the manager's lock (see components.derived_state).
+    get_data_manager() creates a private one.
+    """
+    key = (os.environ.get('DATABASE_URL'), os.environ.get('DATA_DIR', 'data'))
+    with _shared_lock:
+        manager = _shared_managers.get(key)
+        if manager is None:
+            manager = get_data_manager()
+            # Don't keep a CSV fallback from a failed database connection, so the next caller retries it
+            if key[0] is None or hasattr(manager, 'engine'):
+                _shared_managers[key] = manager
+        return manager
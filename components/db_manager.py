@@ -1,23 +1,43 @@
 import os
+import threading
 import pandas as pd
 from datetime import datetime
 import logging
 import sqlalchemy as sa
-from sqlalchemy import create_engine, MetaData, Table, Column, String, Float, DateTime, Integer, ForeignKey
+from sqlalchemy import create_engine, MetaData, Table, Column, String, Float, DateTime, Integer, ForeignKey, Index
 from sqlalchemy.sql import select, insert, update, delete
+from components.id_allocator import DBIdAllocator, assign_item_ids
+from components.data_cache import get_snapshot
+from components.derived_state import write_token, record_write, locked_methods
+from components import project_summary
+from components.bulk_loader import CsvBulkLoader, LOAD_LOCK
+from components.scheduling import predecessors_to_dependencies
+from utils.tracing import trace_methods
+from utils.metrics import DATA_LOAD_SECONDS, DATA_SAVE_SECONDS, observe_methods, instrument_engine
+from utils import query_trace
 
-# Set up logging
-logging.basicConfig(
-    filename='app.log',
-    level=logging.WARNING,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Logging is configured by the entry point (utils.logs.configure_logging)
 logger = logging.getLogger('db_manager')
 
+@trace_methods('DBManager')
+@observe_methods(DATA_LOAD_SECONDS, ['get_data', 'get_all_items', 'get_project_items', 'get_items_in_window',
+                                     'get_project_summary'], backend='db')
+@observe_methods(DATA_SAVE_SECONDS, ['add_project', 'update_project', 'delete_project',
+                                     'save_project_items', 'add_project_item'], backend='db')
+@locked_methods(['reload_data', 'get_project_summary', 'get_data', 'get_project', 'get_project_ids',
+                 'get_unique_isos', 'get_unique_voltages', 'filter_data', 'add_project', 'update_project',
+                 'delete_project', 'get_all_dependencies', 'get_project_items', 'get_all_items',
+                 'get_items_in_window', 'save_project_items', 'get_team_colors', 'add_project_item'])
 class DBManager:
-    def __init__(self):
-        """Initialize the database connection and create tables if they don't exist"""
-        self.db_url = os.environ.get('DATABASE_URL')
+    def __init__(self, db_url=None, data_dir="data", import_csv=True):
+        """
+        Initialize the database connection and create tables if they don't exist.
+        With import_csv, empty tables are loaded from the CSV files in data_dir.
+        """
+        # Held by the methods above, so the manager can be shared by several threads
+        self.lock = threading.RLock()
+        self.db_url = db_url or os.environ.get('DATABASE_URL')
+        self.data_dir = data_dir
         if not self.db_url:
             logger.error("DATABASE_URL environment variable not found")
             raise ValueError("DATABASE_URL environment variable not found")
@@ -25,25 +45,29 @@ class DBManager:
         # Create database engine
         try:
             self.engine = create_engine(self.db_url)
+            instrument_engine(self.engine)
+            query_trace.instrument_engine(self.engine)
             self.metadata = MetaData()
             logger.info("Database engine created successfully")
         except Exception as e:
-            logger.error(f"Error creating database engine: {e}")
+            logger.error("Error creating database engine: %s", e)
             raise
         
         # Define tables
         self.define_tables()
+        self.id_allocator = DBIdAllocator(self.engine, self.sequences, self.items)
         
         # Create tables if they don't exist
         try:
             self.metadata.create_all(self.engine)
             logger.info("Database tables created successfully")
         except Exception as e:
-            logger.error(f"Error creating database tables: {e}")
+            logger.error("Error creating database tables: %s", e)
             raise
 
         # Initialize data from CSV files if tables are empty
-        self.initialize_data_from_csv()
+        if import_csv:
+            self.initialize_data_from_csv()
 
     def define_tables(self):
         """Define the database tables"""
@@ -68,70 +92,182 @@ class DBManager:
             Column('Team', String(50), nullable=False),
             Column('Start_Date', DateTime, nullable=False),
             Column('End_Date', DateTime, nullable=False),
-            Column('Months', Integer, nullable=False)
+            Column('Months', Integer, nullable=False),
+            # Secondary indexes are rebuilt after bulk loads (see CsvBulkLoader)
+            Index('ix_items_project_id', 'Project_ID'),
+            # Range predicates of get_items_in_window
+            Index('ix_items_start_date_end_date', 'Start_Date', 'End_Date'),
+            Index('ix_items_end_date', 'End_Date')
+        )
+
+        # Finish-to-start links between items (Item_ID starts after Predecessor_ID finishes)
+        self.dependencies = Table(
+            'dependencies', self.metadata,
+            Column('Item_ID', String(20), primary_key=True),
+            Column('Predecessor_ID', String(20), primary_key=True),
+            Index('ix_dependencies_predecessor_id', 'Predecessor_ID')
+        )
+
+        # Items, first start and last end per project and team (components.project_summary),
+        # as of the data version in the 'summary_version' sequence
+        self.project_team_summary = Table(
+            'project_team_summary', self.metadata,
+            Column('Project_ID', String(20), primary_key=True),
+            Column('Team', String(50), primary_key=True),
+            Column('Items', Integer, nullable=False),
+            Column('Start_Date', DateTime),
+            Column('End_Date', DateTime)
+        )
+
+        # Named counters (e.g. the global Item ID sequence)
+        self.sequences = Table(
+            'sequences', self.metadata,
+            Column('Name', String(50), primary_key=True),
+            Column('Value', Integer, nullable=False)
         )
 
     def initialize_data_from_csv(self):
-        """Initialize database with data from CSV files if the tables are empty"""
+        """Bulk load the CSV files into empty tables, resuming an interrupted load"""
+        # A migration running in this process is already loading the tables
+        if not LOAD_LOCK.acquire(blocking=False):
+            logger.info("CSV import in progress elsewhere, skipping startup import")
+            return
         try:
-            # Check if projects table is empty
-            with self.engine.connect() as connection:
-                project_count = connection.execute(sa.select(sa.func.count()).select_from(self.projects)).scalar()
-                
-                if project_count == 0:
-                    # Import from CSV
-                    try:
-                        projects_df = pd.read_csv("data/projects.csv")
-                        
-                        # Rename Target COD to match column name
-                        projects_df = projects_df.rename(columns={"Target COD": "Target_COD"})
-                        
-                        # Convert to proper data types
-                        projects_df['Target_COD'] = pd.to_datetime(projects_df['Target_COD'], format='mixed')
-                        
-                        # Insert into database
-                        projects_df.to_sql('projects', self.engine, if_exists='append', index=False)
-                        logger.info(f"Imported {len(projects_df)} projects from CSV")
-                    except FileNotFoundError:
-                        logger.warning("projects.csv file not found, skipping import")
-                    except Exception as e:
-                        logger.error(f"Error importing projects from CSV: {e}")
-                
-                # Check if items table is empty
-                item_count = connection.execute(sa.select(sa.func.count()).select_from(self.items)).scalar()
-                
-                if item_count == 0:
-                    # Import from CSV
-                    try:
-                        items_df = pd.read_csv("data/items.csv")
-                        
-                        # Rename columns to match database schema
-                        items_df = items_df.rename(columns={
-                            "Item ID": "Item_ID",
-                            "Project ID": "Project_ID",
-                            "Start Date": "Start_Date",
-                            "End Date": "End_Date"
-                        })
-                        
-                        # Convert to proper data types
-                        items_df['Start_Date'] = pd.to_datetime(items_df['Start_Date'], format='mixed')
-                        items_df['End_Date'] = pd.to_datetime(items_df['End_Date'], format='mixed')
-                        
-                        # Insert into database
-                        items_df.to_sql('items', self.engine, if_exists='append', index=False)
-                        logger.info(f"Imported {len(items_df)} items from CSV")
-                    except FileNotFoundError:
-                        logger.warning("items.csv file not found, skipping import")
-                    except Exception as e:
-                        logger.error(f"Error importing items from CSV: {e}")
-        
+            CsvBulkLoader(self).load_all()
         except Exception as e:
-            logger.error(f"Error initializing data from CSV: {e}")
+            logger.error("Error initializing data from CSV: %s", e)
+        finally:
+            LOAD_LOCK.release()
 
     def reload_data(self):
         """Force reload data - in database context, this is a no-op"""
         return True
 
+    def get_data_version(self):
+        """Current data version, bumped by every write (one primary-key lookup)"""
+        try:
+            with self.engine.connect() as connection:
+                version = connection.execute(
+                    sa.select(self.sequences.c.Value)
+                    .where(self.sequences.c.Name == 'data_version')
+                ).scalar()
+                return version or 0
+        except Exception as e:
+            logger.error("Error getting data version: %s", e)
+            return None
+
+    def check_storage(self):
+        """Run a one-row read on the projects table, raising if the database can't be read (readiness probe)"""
+        with self.engine.connect() as connection:
+            connection.execute(sa.select(self.projects.c.ID).limit(1)).fetchall()
+        return True
+
+    def _bump_data_version(self, connection):
+        """Increment the data version inside the caller's transaction"""
+        result = connection.execute(
+            update(self.sequences)
+            .where(self.sequences.c.Name == 'data_version')
+            .values(Value=self.sequences.c.Value + 1)
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(self.sequences).values(Name='data_version', Value=1))
+
+    def _versions(self, connection):
+        """(data version, version the project summary reflects or None)"""
+        values = dict(connection.execute(
+            sa.select(self.sequences.c.Name, self.sequences.c.Value)
+            .where(self.sequences.c.Name.in_(['data_version', 'summary_version']))
+        ).fetchall())
+        return values.get('data_version', 0), values.get('summary_version')
+
+    def _set_summary_version(self, connection, version):
+        result = connection.execute(
+            update(self.sequences)
+            .where(self.sequences.c.Name == 'summary_version')
+            .values(Value=version)
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(self.sequences).values(Name='summary_version', Value=version))
+
+    def _update_summary(self, connection, apply=None):
+        """
+        Keep the project summary in step with a write: run apply(connection)
+        and move the summary to the new data version, inside the write's
+        transaction and after _bump_data_version. A summary that was already
+        behind is left for get_project_summary to rebuild.
+        """
+        # One statement moves the summary version up to the data version, only if it was one behind
+        data_version = self.sequences.alias('data_version')
+        new_version = (sa.select(data_version.c.Value)
+                       .where(data_version.c.Name == 'data_version')
+                       .scalar_subquery())
+        result = connection.execute(
+            update(self.sequences)
+            .where(self.sequences.c.Name == 'summary_version', self.sequences.c.Value == new_version - 1)
+            .values(Value=new_version)
+        )
+        if result.rowcount == 0:
+            return
+        if apply is not None:
+            apply(connection)
+
+    def _replace_summary_rows(self, connection, project_id, items_df):
+        connection.execute(
+            delete(self.project_team_summary)
+            .where(self.project_team_summary.c.Project_ID == project_id)
+        )
+        summary = project_summary.summarize_items(items_df)
+        if not summary.empty:
+            connection.execute(insert(self.project_team_summary), [
+                {'Project_ID': row_project, 'Team': team, 'Items': int(count),
+                 'Start_Date': start.to_pydatetime() if pd.notna(start) else None,
+                 'End_Date': end.to_pydatetime() if pd.notna(end) else None}
+                for row_project, team, count, start, end in summary.itertuples(index=False)
+            ])
+
+    def _add_summary_item(self, connection, project_id, team, start, end):
+        summary = self.project_team_summary
+        result = connection.execute(
+            update(summary)
+            .where(summary.c.Project_ID == project_id, summary.c.Team == team)
+            .values(
+                Items=summary.c.Items + 1,
+                Start_Date=sa.case((sa.or_(summary.c.Start_Date.is_(None), summary.c.Start_Date > start), start),
+                                   else_=summary.c.Start_Date),
+                End_Date=sa.case((sa.or_(summary.c.End_Date.is_(None), summary.c.End_Date < end), end),
+                                 else_=summary.c.End_Date)
+            )
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(summary).values(
+                Project_ID=project_id, Team=team, Items=1, Start_Date=start, End_Date=end))
+
+    def get_project_summary(self):
+        """
+        Items, first Start Date and last End Date per project and team, read
+        from the project_team_summary table with one query (rebuilt from the
+        items with one INSERT ... SELECT when it is behind the data version)
+        """
+        summary = self.project_team_summary
+        try:
+            with self.engine.begin() as connection:
+                version, summary_version = self._versions(connection)
+                if summary_version != version:
+                    connection.execute(delete(summary))
+                    connection.execute(insert(summary).from_select(
+                        ['Project_ID', 'Team', 'Items', 'Start_Date', 'End_Date'],
+                        sa.select(self.items.c.Project_ID, self.items.c.Team, sa.func.count(),
+                                  sa.func.min(self.items.c.Start_Date), sa.func.max(self.items.c.End_Date))
+                        .group_by(self.items.c.Project_ID, self.items.c.Team)
+                    ))
+                    self._set_summary_version(connection, version)
+                    logger.info("Rebuilt project summary as of data version %s", version)
+                rows = connection.execute(sa.select(summary)).fetchall()
+            return project_summary.normalize(pd.DataFrame(rows, columns=project_summary.SUMMARY_COLUMNS))
+        except Exception as e:
+            logger.error("Error getting project summary: %s", e)
+            return project_summary.empty_summary()
+
     def get_data(self):
         """Get all projects as a DataFrame"""
         try:
@@ -145,7 +281,7 @@ class DBManager:
                 
                 return df
         except Exception as e:
-            logger.error(f"Error getting project data: {e}")
+            logger.error("Error getting project data: %s", e)
             return pd.DataFrame(columns=['ID', 'Name', 'ISO', 'Voltage', 'Capacity', 'Duration', 'Target COD'])
 
     def get_project(self, project_id):
@@ -158,47 +294,38 @@ class DBManager:
                 
                 if project:
                     # Convert to dictionary with keys matching original CSV format
-                    project_dict = dict(project)
+                    project_dict = dict(project._mapping)
                     project_dict['Target COD'] = project_dict.pop('Target_COD')
                     return project_dict
                 else:
-                    logger.warning(f"Project ID {project_id} not found")
+                    logger.warning("Project ID %s not found", project_id)
                     return None
         except Exception as e:
-            logger.error(f"Error getting project {project_id}: {e}")
+            logger.error("Error getting project %s: %s", project_id, e)
             return None
 
     def get_project_ids(self):
-        """Get list of all project IDs"""
+        """Get list of all project IDs (cached per data version)"""
         try:
-            with self.engine.connect() as connection:
-                query = sa.select(self.projects.c.ID)
-                result = connection.execute(query)
-                return [row[0] for row in result]
+            return get_snapshot(self).metadata.project_ids
         except Exception as e:
-            logger.error(f"Error getting project IDs: {e}")
+            logger.error("Error getting project IDs: %s", e)
             return []
 
     def get_unique_isos(self):
-        """Get list of unique ISO values"""
+        """Get list of unique ISO values (cached per data version)"""
         try:
-            with self.engine.connect() as connection:
-                query = sa.select(self.projects.c.ISO).distinct()
-                result = connection.execute(query)
-                return sorted([row[0] for row in result])
+            return get_snapshot(self).metadata.unique_isos
         except Exception as e:
-            logger.error(f"Error getting unique ISOs: {e}")
+            logger.error("Error getting unique ISOs: %s", e)
             return []
 
     def get_unique_voltages(self):
-        """Get list of unique voltage values"""
+        """Get list of unique voltage values (cached per data version)"""
         try:
-            with self.engine.connect() as connection:
-                query = sa.select(self.projects.c.Voltage).distinct()
-                result = connection.execute(query)
-                return sorted([row[0] for row in result])
+            return get_snapshot(self).metadata.unique_voltages
         except Exception as e:
-            logger.error(f"Error getting unique voltages: {e}")
+            logger.error("Error getting unique voltages: %s", e)
             return []
 
     def filter_data(self, isos=None, voltages=None):
@@ -221,11 +348,12 @@ class DBManager:
                 
                 return df
         except Exception as e:
-            logger.error(f"Error filtering project data: {e}")
+            logger.error("Error filtering project data: %s", e)
             return pd.DataFrame(columns=['ID', 'Name', 'ISO', 'Voltage', 'Capacity', 'Duration', 'Target COD'])
 
     def add_project(self, project_data):
         """Add a new project"""
+        token = write_token(self)
         try:
             # Convert project_data to match database schema
             db_project = project_data.copy()
@@ -235,15 +363,20 @@ class DBManager:
             with self.engine.connect() as connection:
                 # Insert the new project
                 connection.execute(insert(self.projects).values(**db_project))
+                self._bump_data_version(connection)
+                self._update_summary(connection)
                 connection.commit()
-                logger.info(f"Added project {project_data['ID']}")
-                return True
+                logger.info("Added project %s", project_data['ID'])
+            record_write(self, token, cube=lambda cube: cube.set_project_attributes(
+                project_data['ID'], project_data.get('ISO'), project_data.get('Voltage')))
+            return True
         except Exception as e:
-            logger.error(f"Error adding project: {e}")
+            logger.error("Error adding project: %s", e)
             return False
 
     def update_project(self, project_id, project_data):
         """Update an existing project"""
+        token = write_token(self)
         try:
             # Convert project_data to match database schema
             db_project = project_data.copy()
@@ -257,18 +390,24 @@ class DBManager:
                     .where(self.projects.c.ID == project_id)
                     .values(**db_project)
                 )
+                self._bump_data_version(connection)
+                self._update_summary(connection)
                 connection.commit()
-                logger.info(f"Updated project {project_id}")
-                return True
+                logger.info("Updated project %s", project_id)
+            record_write(self, token, cube=lambda cube: cube.set_project_attributes(
+                project_id, project_data.get('ISO'), project_data.get('Voltage')))
+            return True
         except Exception as e:
-            logger.error(f"Error updating project {project_id}: {e}")
+            logger.error("Error updating project %s: %s", project_id, e)
             return False
 
     def delete_project(self, project_id):
         """Delete a project and all its associated items"""
+        token = write_token(self)
         try:
             with self.engine.connect() as connection:
-                # First delete all items associated with this project
+                # First delete the dependencies and items associated with this project
+                self._delete_removed_item_dependencies(connection, project_id)
                 connection.execute(
                     delete(self.items)
                     .where(self.items.c.Project_ID == project_id)
@@ -280,13 +419,54 @@ class DBManager:
                     .where(self.projects.c.ID == project_id)
                 )
                 
+                self._bump_data_version(connection)
+                self._update_summary(connection, lambda connection: connection.execute(
+                    delete(self.project_team_summary)
+                    .where(self.project_team_summary.c.Project_ID == project_id)
+                ))
                 connection.commit()
-                logger.info(f"Deleted project {project_id} and all its items")
-                return True
+                logger.info("Deleted project %s and all its items", project_id)
+            record_write(self, token, alerts=lambda alerts: alerts.remove_project(project_id),
+                         cube=lambda cube: cube.remove_project(project_id))
+            return True
         except Exception as e:
-            logger.error(f"Error deleting project {project_id}: {e}")
+            logger.error("Error deleting project %s: %s", project_id, e)
             return False
 
+    def _delete_project_dependencies(self, connection, project_id):
+        """Delete the dependencies of a project's items (run before its items are deleted)"""
+        connection.execute(
+            delete(self.dependencies)
+            .where(self.dependencies.c.Item_ID.in_(
+                sa.select(self.items.c.Item_ID).where(self.items.c.Project_ID == project_id)
+            ))
+        )
+
+    def _delete_removed_item_dependencies(self, connection, project_id, kept_item_ids=()):
+        """
+        Delete the dependencies of a project's items other than kept_item_ids,
+        where they are either the successor or the predecessor (run before they are deleted)
+        """
+        removed_items = sa.select(self.items.c.Item_ID).where(self.items.c.Project_ID == project_id)
+        kept_item_ids = [str(item_id) for item_id in kept_item_ids]
+        if kept_item_ids:
+            removed_items = removed_items.where(self.items.c.Item_ID.not_in(kept_item_ids))
+        connection.execute(
+            delete(self.dependencies)
+            .where(self.dependencies.c.Item_ID.in_(removed_items) |
+                   self.dependencies.c.Predecessor_ID.in_(removed_items))
+        )
+
+    def get_all_dependencies(self):
+        """Get all item dependencies (Item ID, Predecessor ID) with a single query"""
+        try:
+            with self.engine.connect() as connection:
+                result = connection.execute(sa.select(self.dependencies))
+                return pd.DataFrame(result.fetchall(), columns=['Item ID', 'Predecessor ID'])
+        except Exception as e:
+            logger.error("Error getting dependencies: %s", e)
+            return pd.DataFrame(columns=['Item ID', 'Predecessor ID'])
+
     def get_project_items(self, project_id):
         """Get all items for a specific project"""
         try:
@@ -309,11 +489,69 @@ class DBManager:
                 
                 return df
         except Exception as e:
-            logger.error(f"Error getting items for project {project_id}: {e}")
+            logger.error("Error getting items for project %s: %s", project_id, e)
             return pd.DataFrame(columns=['Item ID', 'Project ID', 'Item Name', 'Team', 'Start Date', 'End Date', 'Months'])
 
+    def get_all_items(self):
+        """Get the items of all projects with a single query"""
+        try:
+            with self.engine.connect() as connection:
+                result = connection.execute(sa.select(self.items))
+                df = pd.DataFrame(result.fetchall(), columns=result.keys())
+
+                if df.empty:
+                    return pd.DataFrame(columns=['Item ID', 'Project ID', 'Item Name', 'Team', 'Start Date', 'End Date', 'Months'])
+
+                # Rename columns to match the original CSV format
+                return df.rename(columns={
+                    "Item_ID": "Item ID",
+                    "Project_ID": "Project ID",
+                    "Item_Name": "Item Name",
+                    "Start_Date": "Start Date",
+                    "End_Date": "End Date"
+                })
+        except Exception as e:
+            logger.error("Error getting all items: %s", e)
+            return pd.DataFrame(columns=['Item ID', 'Project ID', 'Item Name', 'Team', 'Start Date', 'End Date', 'Months'])
+
+    def get_items_in_window(self, start=None, end=None, project_ids=None):
+        """
+        Items active at some point between start and end (either may be None
+        for an open bound), optionally only those of some projects. The range
+        is filtered in the database, on the Start_Date/End_Date indexes.
+        """
+        columns = ['Item ID', 'Project ID', 'Item Name', 'Team', 'Start Date', 'End Date', 'Months']
+        try:
+            query = sa.select(self.items)
+            if end is not None:
+                query = query.where(self.items.c.Start_Date <= pd.Timestamp(end).to_pydatetime())
+            if start is not None:
+                query = query.where(self.items.c.End_Date >= pd.Timestamp(start).to_pydatetime())
+            if project_ids is not None:
+                query = query.where(self.items.c.Project_ID.in_(list(project_ids)))
+
+            with self.engine.connect() as connection:
+                result = connection.execute(query)
+                df = pd.DataFrame(result.fetchall(), columns=result.keys())
+
+            if df.empty:
+                return pd.DataFrame(columns=columns)
+
+            # Rename columns to match the original CSV format
+            return df.rename(columns={
+                "Item_ID": "Item ID",
+                "Project_ID": "Project ID",
+                "Item_Name": "Item Name",
+                "Start_Date": "Start Date",
+                "End_Date": "End Date"
+            })
+        except Exception as e:
+            logger.error("Error getting items between %s and %s: %s", start, end, e)
+            return pd.DataFrame(columns=columns)
+
     def save_project_items(self, items_df):
         """Save project items (update existing and add new ones)"""
+        token = write_token(self)
         try:
             if items_df.empty:
                 logger.warning("Empty dataframe provided to save_project_items")
@@ -345,7 +583,8 @@ class DBManager:
                     # Set default values for missing dates
                     mask = df[date_col].isna()
                     if mask.any():
-                        today = datetime.now().date()
+                        # A Timestamp, which datetime64 columns accept (a date is rejected by pandas 3)
+                        today = pd.Timestamp(datetime.now().date())
                         if date_col == 'Start Date':
                             df.loc[mask, date_col] = today
                         else:  # End Date
@@ -359,17 +598,11 @@ class DBManager:
                 axis=1
             )
             
-            # Make sure Item ID exists and is valid
-            if 'Item ID' not in df.columns or df['Item ID'].isna().any():
-                # Generate Item IDs if needed
-                if 'Item ID' not in df.columns:
-                    df['Item ID'] = [f"I{i:03d}" for i in range(1, len(df) + 1)]
-                else:
-                    # Fill any missing Item IDs
-                    missing_ids = df['Item ID'].isna()
-                    if missing_ids.any():
-                        for idx in df[missing_ids].index:
-                            df.at[idx, 'Item ID'] = f"I{idx+1:03d}"
+            # Allocate globally unique Item IDs for new rows in one batch
+            df = assign_item_ids(df, self.id_allocator)
+
+            # Predecessors (comma-separated Item IDs) are stored in the dependencies table
+            dependencies = predecessors_to_dependencies(df) if 'Predecessors' in df.columns else None
             
             # Rename columns to match database schema
             db_df = df.rename(columns={
@@ -381,33 +614,39 @@ class DBManager:
             })
             
             with self.engine.connect() as connection:
+                if dependencies is not None:
+                    self._delete_project_dependencies(connection, project_id)
+                self._delete_removed_item_dependencies(connection, project_id, db_df['Item_ID'])
+
                 # Delete existing items for this project
                 connection.execute(
                     delete(self.items)
                     .where(self.items.c.Project_ID == project_id)
                 )
                 
-                # Insert new items
-                for _, row in db_df.iterrows():
-                    values = {
-                        'Item_ID': row['Item_ID'],
-                        'Project_ID': row['Project_ID'],
-                        'Item_Name': row['Item_Name'],
-                        'Team': row['Team'],
-                        'Start_Date': row['Start_Date'],
-                        'End_Date': row['End_Date'],
-                        'Months': row['Months']
-                    }
-                    connection.execute(insert(self.items).values(**values))
+                # Insert new items with one executemany (to_dict gives native Python values)
+                if not db_df.empty:
+                    connection.execute(insert(self.items), db_df[[
+                        'Item_ID', 'Project_ID', 'Item_Name', 'Team', 'Start_Date', 'End_Date', 'Months'
+                    ]].to_dict('records'))
+
+                if dependencies is not None and not dependencies.empty:
+                    connection.execute(insert(self.dependencies), [
+                        {'Item_ID': item_id, 'Predecessor_ID': predecessor}
+                        for item_id, predecessor in dependencies.drop_duplicates().itertuples(index=False)
+                    ])
                 
+                self._bump_data_version(connection)
+                self._update_summary(connection, lambda connection: self._replace_summary_rows(
+                    connection, project_id, df))
                 connection.commit()
-                logger.info(f"Saved {len(db_df)} items for project {project_id}")
-                return True
+                logger.info("Saved %d items for project %s", len(db_df), project_id)
+            record_write(self, token, alerts=lambda alerts: alerts.set_project(project_id, df),
+                         cube=lambda cube: cube.set_project(project_id, df))
+            return True
                 
         except Exception as e:
-            logger.error(f"Error in save_project_items: {str(e)}")
-            import traceback
-            logger.error(traceback.format_exc())
+            logger.exception("Error in save_project_items: %s", e)
             return False
 
     def get_team_colors(self):
@@ -420,37 +659,49 @@ class DBManager:
         }
     
     def add_project_item(self, project_id, item_data):
-        """Add a single item to a project"""
+        """Add a single item to a project with one INSERT"""
+        token = write_token(self)
         try:
-            # Get existing items for this project
-            items_df = self.get_project_items(project_id)
-            
-            # Generate a new Item ID
-            if items_df.empty:
-                new_item_id = f"I001"
-            else:
-                # Find the highest item ID number and increment
-                item_ids = items_df['Item ID'].tolist()
-                item_numbers = [int(item_id[1:]) for item_id in item_ids if item_id.startswith('I') and item_id[1:].isdigit()]
-                if item_numbers:
-                    new_item_number = max(item_numbers) + 1
-                else:
-                    new_item_number = 1
-                new_item_id = f"I{new_item_number:03d}"
-            
-            # Add required fields to item_data
-            item_data['Item ID'] = new_item_id
-            item_data['Project ID'] = project_id
-            
-            # Create a dataframe with the new item
-            new_item_df = pd.DataFrame([item_data])
-            
-            # Combine with existing items
-            combined_df = pd.concat([items_df, new_item_df], ignore_index=True)
-            
-            # Save all items
-            return self.save_project_items(combined_df)
-            
+            item = dict(item_data)
+
+            # Ensure no empty item name or team
+            item_name = item.get('Item Name')
+            if pd.isna(item_name) or str(item_name).strip() == '':
+                item_name = 'Untitled Item'
+            team = item.get('Team')
+            if pd.isna(team) or str(team).strip() == '':
+                team = 'Development'
+
+            # Normalize dates, defaulting missing ones like save_project_items does
+            today = pd.Timestamp(datetime.now().date())
+            start = pd.to_datetime(item.get('Start Date'), errors='coerce')
+            end = pd.to_datetime(item.get('End Date'), errors='coerce')
+            if pd.isna(start):
+                start = today
+            if pd.isna(end):
+                end = today + pd.Timedelta(days=60)
+
+            values = {
+                'Item_ID': self.id_allocator.allocate()[0],
+                'Project_ID': project_id,
+                'Item_Name': item_name,
+                'Team': team,
+                'Start_Date': start.to_pydatetime(),
+                'End_Date': end.to_pydatetime(),
+                'Months': max(1, ((end - start).days // 30) + 1)
+            }
+
+            with self.engine.begin() as connection:
+                connection.execute(insert(self.items).values(**values))
+                self._bump_data_version(connection)
+                self._update_summary(connection, lambda connection: self._add_summary_item(
+                    connection, project_id, team, values['Start_Date'], values['End_Date']))
+
+            logger.info("Added item %s to project %s", values['Item_ID'], project_id)
+            record_write(self, token, alerts=lambda alerts: alerts.add_item(project_id, team, end),
+                         cube=lambda cube: cube.add_item(project_id, team, start, end))
+            return True
+
         except Exception as e:
-            logger.error(f"Error adding project item: {e}")
+            logger.error("Error adding project item: %s", e)
             return False
@@ -0,0 +1,90 @@
+"""
+Write tracking for the derived state kept on a data manager (sequencing
+alerts, the portfolio cube).
+
+Each store has a version (the data version it reflects) and a lock. A
+write through the manager takes a write_token() before it starts and calls
+record_write() once it succeeded, with one update per store it affects;
+stores it doesn't affect are moved to the new version unchanged. If
+anything else changed the data in between, the stores are marked stale and
+rebuilt on their next read instead.
+
+A data manager may be shared by several threads (see
+data_storage.get_shared_data_manager), so its methods run under its own
+reentrant lock (locked_methods), and the derived state is rebuilt under it
+as well. The manager's lock is always taken before a store's lock.
+"""
+import logging
+import functools
+import contextlib
+
+# Logging is configured by the entry point (utils.logs.configure_logging)
+logger = logging.getLogger('derived_state')
+
+# Stores kept on the data manager as _<name>
+STORES = ('alerts', 'cube')
+
+
+def locked_methods(methods):
+    """Class decorator running the named methods under the instance's lock (self.lock, a threading.RLock)"""
+    def decorator(cls):
+        for method in methods:
+            setattr(cls, method, _locked(getattr(cls, method)))
+        return cls
+    return decorator
+
+
+def _locked(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def manager_lock(data_manager):
+    """The data manager's lock, or a no-op context for objects without one"""
+    lock = getattr(data_manager, 'lock', None)
+    return lock if lock is not None else contextlib.nullcontext()
+
+
+def write_token(data_manager):
+    """
+    Data version before a write, passed back to record_write() afterwards
+    (None when no derived state has been computed yet, so there is nothing to keep up to date)
+    """
+    if all(getattr(data_manager, f'_{name}', None) is None for name in STORES):
+        return None
+    return data_manager.get_data_version()
+
+
+def record_write(data_manager, token, **updates):
+    """
+    Apply updates to the stores after a successful write that started at
+    version token, e.g. record_write(manager, token, alerts=lambda alerts: ...).
+    """
+    if token is None:
+        return
+    try:
+        version = data_manager.get_data_version()
+    except Exception as e:
+        logger.error("Error getting the data version after a write: %s", e)
+        version = None
+    # Database versions count writes, so a gap means another process wrote as well
+    in_sequence = version is not None and (not isinstance(token, int) or version == token + 1)
+    for name in STORES:
+        store = getattr(data_manager, f'_{name}', None)
+        if store is None:
+            continue
+        update = updates.get(name)
+        with store.lock:
+            try:
+                if in_sequence and store.version == token:
+                    if update is not None:
+                        update(store)
+                    store.version = version
+                else:
+                    store.version = None
+            except Exception as e:
+                logger.error("Error updating %s after a write: %s", name, e)
+                store.version = None
@@ -0,0 +1,60 @@
+"""
+Figures shared by every session of the process.
+
+get_cached_figure() in app.py keeps a session's figures in its session
+state; on a miss there it looks here before building, so a figure is built
+once per data version and set of chart options for the whole process, and
+the warm-up at server start (app.warm_up) can build the default ones before
+the first session connects. Entries are keyed on the same (cache key,
+signature) the session cache compares, and the least recently used ones are
+dropped beyond SHARED_FIGURE_CACHE_SIZE.
+"""
+import os
+import threading
+import logging
+from collections import OrderedDict
+
+# Logging is configured by the entry point (utils.logs.configure_logging)
+logger = logging.getLogger('figure_cache')
+
+MAX_FIGURES = int(os.environ.get('SHARED_FIGURE_CACHE_SIZE', 32))
+
+_figures = OrderedDict()
+_lock = threading.Lock()
+
+
+def get(cache_key, signature):
+    """The figure (or figure tuple) stored for cache_key and signature, None if there is none"""
+    with _lock:
+        result = _figures.get((cache_key, signature))
+        if result is not None:
+            _figures.move_to_end((cache_key, signature))
+        return result
+
+
+def put(cache_key, signature, result):
+    with _lock:
+        _figures[(cache_key, signature)] = result
+        _figures.move_to_end((cache_key, signature))
+        while len(_figures) > MAX_FIGURES:
+            _figures.popitem(last=False)
+
+
+def session_copy(result):
+    """
+    A copy of a shared result for one session: views change the layout of
+    their figure (e.g. its height) before drawing it, which must not reach
+    other sessions drawing the same figure.
+    """
+    import plotly.graph_objects as go
+
+    if isinstance(result, tuple):
+        return tuple(go.Figure(part) if isinstance(part, go.Figure) else part for part in result)
+    return go.Figure(result) if isinstance(result, go.Figure) else result
+
+
+def discard(cache_key):
+    """Drop every stored figure of cache_key (a view's Refresh button)"""
+    with _lock:
+        for key in [key for key in _figures if key[0] == cache_key]:
+            del _figures[key]
@@ -0,0 +1,223 @@
+import os
+import threading
+import logging
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no fcntl
+    fcntl = None
+
+# Set up logging
+logger = logging.getLogger('id_allocator')
+
+ITEM_ID_PREFIX = "I"
+
+
+def format_item_id(number):
+    """Format a numeric item sequence value as an Item ID (I001, I002, ...)"""
+    return f"{ITEM_ID_PREFIX}{number:03d}"
+
+
+def parse_item_number(item_id):
+    """Return the numeric part of an Item ID, or None if it has another format"""
+    if not isinstance(item_id, str):
+        return None
+    item_id = item_id.strip()
+    if item_id.startswith(ITEM_ID_PREFIX) and item_id[len(ITEM_ID_PREFIX):].isdigit():
+        return int(item_id[len(ITEM_ID_PREFIX):])
+    return None
+
+
+def max_item_number(item_ids):
+    """Highest numeric Item ID in an iterable of IDs (0 if there are none)"""
+    numbers = [parse_item_number(item_id) for item_id in item_ids]
+    return max([n for n in numbers if n is not None], default=0)
+
+
+def missing_item_id_mask(items_df):
+    """Boolean mask of rows that still need an Item ID"""
+    if 'Item ID' not in items_df.columns:
+        return pd.Series(True, index=items_df.index)
+    ids = items_df['Item ID']
+    return ids.isna() | (ids.astype(str).str.strip() == '')
+
+
+def assign_item_ids(items_df, allocator):
+    """
+    Fill in Item IDs for rows that don't have one yet.
+
+    All missing IDs are allocated in a single call, so pasting many rows into the
+    editor costs one counter update rather than one per row.
+    """
+    mask = missing_item_id_mask(items_df)
+    if 'Item ID' not in items_df.columns:
+        items_df['Item ID'] = None
+    count = int(mask.sum())
+    if count:
+        items_df['Item ID'] = items_df['Item ID'].astype(object)
+        items_df.loc[mask, 'Item ID'] = allocator.allocate(count)
+        logger.info("Allocated %d new Item IDs", count)
+    return items_df
+
+
+def renumber_duplicate_item_ids(items_df, dependencies, allocator):
+    """
+    Give every repeat of an Item ID a new ID, keeping the first row with it.
+
+    Older data allocated Item IDs per project, so the same ID can belong to
+    items of several projects. Dependency links are moved along with their
+    items: a link is kept in each project that has both of its items (the
+    project editor showed it there), or for links between projects, with
+    each item that had the successor ID. Returns (items_df, dependencies,
+    number of items renumbered).
+    """
+    has_id = ~missing_item_id_mask(items_df)
+    repeated = has_id & items_df['Item ID'].duplicated(keep='first')
+    count = int(repeated.sum())
+    if not count:
+        return items_df, dependencies, 0
+
+    items_df = items_df.copy()
+    old_ids = items_df['Item ID'].astype(object)
+    items_df['Item ID'] = old_ids
+    items_df.loc[repeated, 'Item ID'] = allocator.allocate(count)
+    logger.warning("Renumbered %d items whose Item ID was already used by another item", count)
+
+    if dependencies is None or dependencies.empty:
+        return items_df, dependencies, count
+
+    # (Project ID, old Item ID) -> Item ID, for the first item with that pair
+    ids = pd.DataFrame({'Project ID': items_df['Project ID'], 'Old ID': old_ids, 'New ID': items_df['Item ID']})
+    ids = ids[has_id].drop_duplicates(['Project ID', 'Old ID'])
+
+    links = dependencies.reset_index(drop=True).rename_axis('Link').reset_index()
+    # One row per project that has an item with the successor ID
+    moved = links.merge(ids, left_on='Item ID', right_on='Old ID')
+    moved = moved.merge(ids.rename(columns={'Old ID': 'Predecessor ID', 'New ID': 'New Predecessor ID'}),
+                        on=['Project ID', 'Predecessor ID'], how='left')
+    in_project = moved['New Predecessor ID'].notna()
+    # Where some project has both items, the link belongs to those projects only
+    moved = moved[in_project | ~in_project.groupby(moved['Link']).transform('any')]
+    moved = pd.DataFrame({
+        'Item ID': moved['New ID'],
+        'Predecessor ID': moved['New Predecessor ID'].fillna(moved['Predecessor ID'])
+    })
+    # Links whose successor isn't an item stay as they were
+    orphans = links.loc[~links['Link'].isin(ids.merge(links, left_on='Old ID', right_on='Item ID')['Link']),
+                        ['Item ID', 'Predecessor ID']]
+    dependencies = pd.concat([moved, orphans], ignore_index=True).drop_duplicates()
+    return items_df, dependencies.reset_index(drop=True), count
+
+
+class FileIdAllocator:
+    """
+    Item ID allocator backed by a persisted counter file.
+
+    The counter holds the last allocated number. Each allocation reads and
+    rewrites that single value under a thread lock and an exclusive file lock,
+    so concurrent sessions and processes never hand out the same ID. The
+    counter is seeded once from the highest ID already present in items.csv.
+    """
+
+    def __init__(self, counter_path, items_path):
+        self.counter_path = counter_path
+        self.items_path = items_path
+        self._lock = threading.Lock()
+
+    def _seed_value(self):
+        """Highest existing Item ID number, used when the counter file is new"""
+        try:
+            item_ids = pd.read_csv(self.items_path, usecols=['Item ID'])['Item ID']
+            return max_item_number(item_ids)
+        except (FileNotFoundError, ValueError, pd.errors.EmptyDataError):
+            return 0
+
+    def allocate(self, count=1):
+        """Reserve `count` consecutive Item IDs and return them as a list"""
+        if count <= 0:
+            return []
+
+        with self._lock:
+            data_dir = os.path.dirname(self.counter_path)
+            if data_dir and not os.path.exists(data_dir):
+                os.makedirs(data_dir)
+
+            with open(self.counter_path, 'a+') as counter_file:
+                if fcntl is not None:
+                    fcntl.flock(counter_file, fcntl.LOCK_EX)
+                try:
+                    counter_file.seek(0)
+                    raw_value = counter_file.read().strip()
+                    current = int(raw_value) if raw_value else self._seed_value()
+                    last = current + count
+
+                    counter_file.seek(0)
+                    counter_file.truncate()
+                    counter_file.write(str(last))
+                    counter_file.flush()
+                    os.fsync(counter_file.fileno())
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(counter_file, fcntl.LOCK_UN)
+
+        return [format_item_id(n) for n in range(current + 1, last + 1)]
+
+
+class DBIdAllocator:
+    """
+    Item ID allocator backed by a counter row in the `sequences` table.
+
+    Allocation is a single UPDATE ... SET Value = Value + n inside a
+    transaction. The row lock (PostgreSQL) or write lock (SQLite) serializes
+    concurrent allocators, and the row is seeded once from the highest Item ID
+    already stored in the items table.
+    """
+
+    def __init__(self, engine, sequences_table, items_table, name='item_id'):
+        self.engine = engine
+        self.sequences = sequences_table
+        self.items = items_table
+        self.name = name
+
+    def _seed_value(self, connection):
+        """Highest existing Item ID number, used when the counter row is new"""
+        import sqlalchemy as sa
+        result = connection.execute(sa.select(self.items.c.Item_ID))
+        return max_item_number(row[0] for row in result)
+
+    def allocate(self, count=1):
+        """Reserve `count` consecutive Item IDs and return them as a list"""
+        import sqlalchemy as sa
+
+        if count <= 0:
+            return []
+
+        counter = self.sequences
+        for _ in range(3):
+            try:
+                with self.engine.begin() as connection:
+                    result = connection.execute(
+                        sa.update(counter)
+                        .where(counter.c.Name == self.name)
+                        .values(Value=counter.c.Value + count)
+                    )
+                    if result.rowcount == 0:
+                        # First allocation - seed the counter from the existing items
+                        connection.execute(
+                            sa.insert(counter).values(
+                                Name=self.name,
+                                Value=self._seed_value(connection) + count
+                            )
+                        )
+                    last = connection.execute(
+                        sa.select(counter.c.Value).where(counter.c.Name == self.name)
+                    ).scalar()
+                break
+            except sa.exc.IntegrityError:
+                # Another process seeded the counter first; retry the UPDATE
+                logger.info("Item ID counter was seeded concurrently, retrying")
+        else:
+            raise RuntimeError("Could not allocate Item IDs")
+
+        return [format_item_id(n) for n in range(last - count + 1, last + 1)]
@@ -0,0 +1,322 @@
+"""
+Pre-aggregated portfolio cube for slicing the portfolio by ISO, voltage
+band, team and month without scanning items.
+
+Every cell - one (ISO, Voltage Band, Team, Month) - holds:
+- Items: items starting in the month, so a sum over months counts each item once
+- Item Months: items running at some point in the month; summed over months, the item-months
+- First Start: the earliest start of the items starting in the month
+- Last End: the latest end of the items ending in the month
+
+The cube also keeps each project's contribution: one row per team and
+month the project has items in. A write replaces the rows of the project
+it touched and recomputes only the cells those rows fall in (see
+components.derived_state); any other change of the data version makes the
+next read rebuild the cube from all items.
+"""
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from utils.metrics import record_cache
+from components.derived_state import manager_lock
+from components.workload import TEAM_ORDER
+
+# Logging is configured by the entry point (utils.logs.configure_logging)
+logger = logging.getLogger('portfolio_cube')
+
+# (lowest voltage in kV, label), ascending
+VOLTAGE_BANDS = [(0, '< 100 kV'), (100, '100-199 kV'), (200, '200-299 kV'), (300, '300-499 kV'), (500, '500+ kV')]
+# ISO or voltage band of items whose project is missing or has no value
+UNKNOWN = 'Unknown'
+
+CELL_COLUMNS = ['ISO', 'Voltage Band', 'Team', 'Month']
+MEASURES = {'Items': 'sum', 'Item Months': 'sum', 'First Start': 'min', 'Last End': 'max'}
+# Per-project contribution rows
+ROW_COLUMNS = ['Project ID', 'Team', 'Month'] + list(MEASURES)
+
+
+def voltage_band(voltage):
+    """Label of the band a voltage (kV) falls in"""
+    voltage = pd.to_numeric(voltage, errors='coerce')
+    if pd.isna(voltage):
+        return UNKNOWN
+    label = VOLTAGE_BANDS[0][1]
+    for floor, name in VOLTAGE_BANDS:
+        if voltage >= floor:
+            label = name
+    return label
+
+
+def band_order(bands):
+    """Voltage bands in ascending order, unknown last"""
+    labels = [name for _, name in VOLTAGE_BANDS]
+    return sorted(bands, key=lambda band: labels.index(band) if band in labels else len(labels))
+
+
+def _month(value):
+    """Month number (months since 1970-01) of a date"""
+    return int(np.datetime64(pd.Timestamp(value), 'M').astype(np.int64))
+
+
+def _month_starts(months):
+    return pd.DatetimeIndex(np.asarray(months, dtype=np.int64).astype('datetime64[M]').astype('datetime64[ns]'),
+                            name='Month')
+
+
+def _contributions(items):
+    """
+    (Project ID, Team, Month) rows of a set of items with their Items,
+    Item Months, First Start and Last End. Items with a missing date are
+    left out; an end before the start counts as a one-day item.
+    """
+    starts = pd.to_datetime(items['Start Date'], errors='coerce').to_numpy(dtype='datetime64[ns]')
+    ends = pd.to_datetime(items['End Date'], errors='coerce').to_numpy(dtype='datetime64[ns]')
+    valid = ~(np.isnat(starts) | np.isnat(ends))
+    if not valid.any():
+        return pd.DataFrame(columns=ROW_COLUMNS)
+    starts = starts[valid]
+    ends = np.maximum(ends[valid], starts)
+
+    project_codes, projects = pd.factorize(items['Project ID'].to_numpy()[valid])
+    team_codes, teams = pd.factorize(items['Team'].fillna('Unknown').to_numpy()[valid])
+    groups = project_codes.astype(np.int64) * len(teams) + team_codes
+    start_months = starts.astype('datetime64[M]').astype(np.int64)
+    end_months = ends.astype('datetime64[M]').astype(np.int64)
+    first_month = start_months.min()
+    span = end_months.max() - first_month + 2
+    start_keys = groups * span + (start_months - first_month)
+    end_keys = groups * span + (end_months - first_month)
+
+    # Item months: +1 in the start month and -1 after the end month, swept in key order. A group's
+    # deltas sum to zero, so the running count is back at zero after the group's last month.
+    keys, inverse = np.unique(np.concatenate((start_keys, end_keys + 1)), return_inverse=True)
+    deltas = np.concatenate((np.ones(len(start_keys), dtype=np.int64), -np.ones(len(end_keys), dtype=np.int64)))
+    running = np.cumsum(np.bincount(inverse, weights=deltas, minlength=len(keys)).astype(np.int64))
+    active = running > 0
+    lengths = np.diff(keys)[active[:-1]]
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    cell_keys = np.repeat(keys[:-1][active[:-1]], lengths) + offsets
+    item_months = np.repeat(running[:-1][active[:-1]], lengths)
+
+    # Cell keys come out of the sweep in ascending order, so binary search finds a month's cell
+    started = pd.Series(starts).groupby(start_keys).agg(['size', 'min'])
+    ended = pd.Series(ends).groupby(end_keys).max()
+    count = np.zeros(len(cell_keys), dtype=np.int64)
+    first_start = np.full(len(cell_keys), np.datetime64('NaT'), dtype='datetime64[ns]')
+    last_end = np.full(len(cell_keys), np.datetime64('NaT'), dtype='datetime64[ns]')
+    positions = np.searchsorted(cell_keys, started.index.to_numpy())
+    count[positions] = started['size'].to_numpy()
+    first_start[positions] = started['min'].to_numpy()
+    last_end[np.searchsorted(cell_keys, ended.index.to_numpy())] = ended.to_numpy()
+
+    group_of_cell = cell_keys // span
+    # Categoricals, so millions of rows don't each hold a string
+    return pd.DataFrame({
+        'Project ID': pd.Categorical.from_codes(group_of_cell // len(teams), categories=pd.Index(projects)),
+        'Team': pd.Categorical.from_codes(group_of_cell % len(teams), categories=pd.Index(teams)),
+        'Month': cell_keys % span + first_month,
+        'Items': count,
+        'Item Months': item_months,
+        'First Start': first_start,
+        'Last End': last_end
+    })
+
+
+def _aggregate(rows, keys):
+    if rows.empty:
+        return pd.DataFrame(columns=keys + list(MEASURES))
+    return rows.groupby(keys, sort=False).agg(MEASURES).reset_index()
+
+
+class PortfolioCube:
+    """Cube cells and per-project contributions as of one data version"""
+
+    def __init__(self):
+        self.version = None
+        # Project ID -> (ISO, Voltage Band)
+        self.attributes = {}
+        # (ISO, Voltage Band) -> contribution rows of the projects in it, so a write only
+        # rewrites the rows of one group
+        self.groups = {}
+        self.cells = pd.DataFrame(columns=CELL_COLUMNS + list(MEASURES))
+        self.lock = threading.Lock()
+
+    def _group(self, project_id):
+        return self.attributes.get(project_id, (UNKNOWN, UNKNOWN))
+
+    def rebuild(self, projects, items):
+        """Recompute every cell from all projects and items"""
+        self.attributes = {}
+        for project_id, iso, voltage in zip(projects['ID'], projects['ISO'], projects['Voltage']):
+            self.attributes[project_id] = (iso if pd.notna(iso) else UNKNOWN, voltage_band(voltage))
+        rows = _contributions(items)
+        # One lookup per project, not per row
+        projects = rows['Project ID'].astype('category')
+        groups = [self._group(project_id) for project_id in projects.cat.categories]
+        codes = projects.cat.codes.to_numpy()
+        for position, column in enumerate(['ISO', 'Voltage Band']):
+            labels, label_codes = np.unique(np.array([group[position] for group in groups] or [UNKNOWN], dtype=object),
+                                            return_inverse=True)
+            rows[column] = pd.Categorical.from_codes(label_codes[codes] if len(codes) else codes,
+                                                     categories=pd.Index(labels))
+        self.groups = {group: group_rows[ROW_COLUMNS].reset_index(drop=True)
+                       for group, group_rows in rows.groupby(['ISO', 'Voltage Band'], sort=False)}
+        self.cells = _aggregate(rows, CELL_COLUMNS)
+
+    def _replace_rows(self, group, project_id, rows):
+        """
+        Replace a project's contribution rows in one (ISO, Voltage Band)
+        group and recompute the cells its old and new rows fall in
+        """
+        current = self.groups.get(group, pd.DataFrame(columns=ROW_COLUMNS))
+        old = (current['Project ID'] == project_id).to_numpy()
+        touched = pd.concat([current.loc[old, ['Team', 'Month']], rows[['Team', 'Month']]]).drop_duplicates()
+        if touched.empty:
+            return
+        current = pd.concat([current[~old], rows[ROW_COLUMNS]], ignore_index=True) if len(rows) else current[~old]
+        if current.empty:
+            self.groups.pop(group, None)
+        else:
+            self.groups[group] = current
+
+        touched_keys = pd.MultiIndex.from_frame(touched)
+        candidates = current[pd.MultiIndex.from_frame(current[['Team', 'Month']]).isin(touched_keys)]
+        refreshed = _aggregate(candidates, ['Team', 'Month'])
+        refreshed.insert(0, 'Voltage Band', group[1])
+        refreshed.insert(0, 'ISO', group[0])
+        cells = self.cells
+        stale = ((cells['ISO'] == group[0]) & (cells['Voltage Band'] == group[1])).to_numpy(copy=True)
+        stale[stale] = pd.MultiIndex.from_frame(cells.loc[stale, ['Team', 'Month']]).isin(touched_keys)
+        self.cells = pd.concat([cells[~stale], refreshed[CELL_COLUMNS + list(MEASURES)]], ignore_index=True)
+
+    def _project_rows(self, project_id):
+        current = self.groups.get(self._group(project_id))
+        if current is None:
+            return pd.DataFrame(columns=ROW_COLUMNS)
+        return current[current['Project ID'] == project_id]
+
+    def set_project(self, project_id, items):
+        """Replace one project's contribution with that of its (complete) items"""
+        self._replace_rows(self._group(project_id), project_id, _contributions(items))
+
+    def add_item(self, project_id, team, start_date, end_date):
+        item = pd.DataFrame([{'Project ID': project_id, 'Team': team,
+                              'Start Date': start_date, 'End Date': end_date}])
+        combined = pd.concat([self._project_rows(project_id), _contributions(item)], ignore_index=True)
+        self._replace_rows(self._group(project_id), project_id,
+                           _aggregate(combined, ['Project ID', 'Team', 'Month']))
+
+    def set_project_attributes(self, project_id, iso=None, voltage=None):
+        """
+        Record a new or changed project's ISO and voltage (None: unchanged),
+        moving its contribution if they changed
+        """
+        old_group = self._group(project_id)
+        group = (old_group[0] if iso is None else iso if pd.notna(iso) else UNKNOWN,
+                 old_group[1] if voltage is None else voltage_band(voltage))
+        if project_id in self.attributes and group == old_group:
+            return
+        rows = self._project_rows(project_id)
+        self.attributes[project_id] = group
+        if len(rows) and group != old_group:
+            self._replace_rows(old_group, project_id, rows.iloc[0:0])
+            self._replace_rows(group, project_id, rows)
+
+    def remove_project(self, project_id):
+        self._replace_rows(self._group(project_id), project_id, pd.DataFrame(columns=ROW_COLUMNS))
+        self.attributes.pop(project_id, None)
+
+    def _select(self, isos=None, bands=None, teams=None, start=None, end=None):
+        """Cells matching the filters (None or empty: no filter), between the months of start and end"""
+        cells = self.cells
+        mask = np.ones(len(cells), dtype=bool)
+        if isos:
+            mask &= cells['ISO'].isin(isos).to_numpy()
+        if bands:
+            mask &= cells['Voltage Band'].isin(bands).to_numpy()
+        if teams:
+            mask &= cells['Team'].isin(teams).to_numpy()
+        if start is not None:
+            mask &= cells['Month'].to_numpy() >= _month(start)
+        if end is not None:
+            mask &= cells['Month'].to_numpy() <= _month(end)
+        return cells[mask]
+
+    def monthly(self, isos=None, bands=None, teams=None, start=None, end=None, measure='Item Months'):
+        """
+        A measure per team and month of the selected cells, as a frame
+        indexed by month start with one column per team (teams in
+        TEAM_ORDER first). Months run from start to end, by default from the
+        first to the last month with items.
+        """
+        with self.lock:
+            selected = self._select(isos, bands, teams, start, end)
+            all_teams = self.cells['Team'].unique().tolist()
+            columns = sorted(all_teams if not teams else [team for team in all_teams if team in teams],
+                             key=lambda team: (TEAM_ORDER.index(team) if team in TEAM_ORDER else len(TEAM_ORDER),
+                                               str(team)))
+            if selected.empty and (start is None or end is None):
+                return pd.DataFrame(columns=columns, dtype=np.int64)
+            first = _month(start) if start is not None else int(selected['Month'].min())
+            last = _month(end) if end is not None else int(selected['Month'].max())
+            months = np.arange(first, last + 1)
+            if selected.empty:
+                table = pd.DataFrame(0, index=months, columns=columns)
+            else:
+                table = (selected.groupby(['Month', 'Team'])[measure].sum().unstack(fill_value=0)
+                         .reindex(index=months, columns=columns, fill_value=0))
+            table.index = _month_starts(months)
+            table.columns = pd.Index(columns)
+            return table.astype(np.int64) if measure in ('Items', 'Item Months') else table
+
+    def totals(self, isos=None, bands=None, teams=None, start=None, end=None):
+        """
+        Items (starting in the range), Item Months, First Start and Last End
+        of the selected cells
+        """
+        with self.lock:
+            selected = self._select(isos, bands, teams, start, end)
+            return {
+                'Items': int(selected['Items'].sum()),
+                'Item Months': int(selected['Item Months'].sum()),
+                'First Start': pd.to_datetime(selected['First Start']).min() if len(selected) else pd.NaT,
+                'Last End': pd.to_datetime(selected['Last End']).max() if len(selected) else pd.NaT
+            }
+
+    def teams(self):
+        """Teams with items in the cube, in TEAM_ORDER first"""
+        with self.lock:
+            return sorted(self.cells['Team'].unique().tolist(), key=lambda team: (
+                TEAM_ORDER.index(team) if team in TEAM_ORDER else len(TEAM_ORDER), str(team)))
+
+    def voltage_bands(self):
+        with self.lock:
+            return band_order({band for _, band in self.attributes.values()})
+
+
+def _get_store(data_manager):
+    store = getattr(data_manager, '_cube', None)
+    if store is None:
+        store = PortfolioCube()
+        data_manager._cube = store
+    return store
+
+
+def get_cube(data_manager):
+    """The manager's PortfolioCube, rebuilt only if the data changed other than through tracked writes"""
+    from components.data_cache import get_snapshot
+
+    with manager_lock(data_manager):
+        store = _get_store(data_manager)
+        version = data_manager.get_data_version()
+        with store.lock:
+            hit = store.version is not None and store.version == version
+            record_cache('portfolio_cube', hit)
+            if not hit:
+                snapshot = get_snapshot(data_manager)
+                store.rebuild(snapshot.projects, snapshot.items)
+                store.version = snapshot.version
+                logger.info("Built portfolio cube: %d cells from %d project rows", len(store.cells),
+                            sum(len(rows) for rows in store.groups.values()))
+    return store
@@ -0,0 +1,221 @@
+"""
+Per-project rollups kept up to date by each write: for every project and
+team, the number of items, the first Start Date and the last End Date.
+
+Views that only need rollups (the Dashboard's deadlines chart, its CSV
+download and default date range, per-project slack to Target COD) read
+this summary instead of the items. With a database it is the
+project_team_summary table, changed in the same transaction as the items
+(DBManager). With CSV storage it is project_summary.json, stamped with the
+version of items.csv it reflects, plus a log of the single items appended
+since (SummaryFile). A summary that is behind
+the data - after a restore, a migration or a write from an older build -
+is rebuilt from all items on the next read.
+"""
+import json
+import logging
+import os
+import pandas as pd
+
+# Logging is configured by the entry point (utils.logs.configure_logging)
+logger = logging.getLogger('project_summary')
+
+SUMMARY_COLUMNS = ['Project ID', 'Team', 'Items', 'Start Date', 'End Date']
+# Columns of the items added through the delta log
+ADDED_COLUMNS = ['Project ID', 'Team', 'Start Date', 'End Date']
+# Size of the delta log beyond which a read folds it into the summary file
+COMPACT_BYTES = 256 * 1024
+
+
+def empty_summary():
+    return normalize(pd.DataFrame(columns=SUMMARY_COLUMNS))
+
+
+def normalize(summary):
+    """Summary columns with datetime dates and integer counts"""
+    summary = summary.reindex(columns=SUMMARY_COLUMNS)
+    summary['Items'] = summary['Items'].fillna(0).astype('int64')
+    for column in ('Start Date', 'End Date'):
+        summary[column] = pd.to_datetime(summary[column], errors='coerce')
+    return summary.reset_index(drop=True)
+
+
+def summarize_items(items):
+    """(Project ID, Team) rows of a set of items: Items, first Start Date and last End Date"""
+    if items.empty:
+        return empty_summary()
+    frame = pd.DataFrame({
+        'Project ID': items['Project ID'].to_numpy(),
+        'Team': items['Team'].fillna('Unknown').to_numpy(),
+        'Start Date': pd.to_datetime(items['Start Date'], errors='coerce').to_numpy(),
+        'End Date': pd.to_datetime(items['End Date'], errors='coerce').to_numpy()
+    })
+    summary = frame.groupby(['Project ID', 'Team'], sort=False).agg(**{
+        'Items': ('Team', 'size'),
+        'Start Date': ('Start Date', 'min'),
+        'End Date': ('End Date', 'max')
+    })
+    return normalize(summary.reset_index())
+
+
+def replace_project(summary, project_id, items):
+    """summary with one project's rows replaced by those of its (complete) items"""
+    kept = summary[summary['Project ID'] != project_id]
+    return normalize(pd.concat([kept, summarize_items(items)], ignore_index=True))
+
+
+def remove_project(summary, project_id):
+    return summary[summary['Project ID'] != project_id].reset_index(drop=True)
+
+
+def add_items(summary, items):
+    """summary with more items (Project ID, Team, Start Date and End Date rows) counted in"""
+    added = summarize_items(items)
+    if added.empty:
+        return summary
+    combined = pd.concat([summary, added], ignore_index=True).groupby(['Project ID', 'Team'], sort=False).agg(**{
+        'Items': ('Items', 'sum'),
+        'Start Date': ('Start Date', 'min'),
+        'End Date': ('End Date', 'max')
+    })
+    return normalize(combined.reset_index())
+
+
+def project_rollup(summary, projects):
+    """
+    One row per project: ID, Name, ISO, Items, Start Date, End Date, Target
+    COD and Slack Days (days from the last End Date to Target COD, negative
+    when the schedule runs past it). Projects without items have 0 Items and
+    no dates.
+    """
+    per_project = summary.groupby('Project ID', sort=False).agg(**{
+        'Items': ('Items', 'sum'),
+        'Start Date': ('Start Date', 'min'),
+        'End Date': ('End Date', 'max')
+    })
+    rollup = projects[['ID', 'Name', 'ISO', 'Target COD']].merge(
+        per_project, left_on='ID', right_index=True, how='left')
+    rollup['Items'] = rollup['Items'].fillna(0).astype('int64')
+    rollup['Target COD'] = pd.to_datetime(rollup['Target COD'], errors='coerce')
+    rollup['Slack Days'] = (rollup['Target COD'] - rollup['End Date']).dt.days.astype('Int64')
+    return rollup[['ID', 'Name', 'ISO', 'Items', 'Start Date', 'End Date', 'Target COD', 'Slack Days']]
+
+
+def _isoformat(value):
+    return value.isoformat() if pd.notna(value) else None
+
+
+def file_version(path):
+    """(modification time, size) of a file, None if it doesn't exist"""
+    try:
+        stat = os.stat(path)
+        return [stat.st_mtime_ns, stat.st_size]
+    except FileNotFoundError:
+        return None
+
+
+class SummaryFile:
+    """
+    The summary of a CSV store, in a JSON file next to items.csv. It holds
+    the file_version() of items.csv it reflects; a summary whose version
+    differs is out of date and not returned.
+
+    A single appended item doesn't rewrite the file: add_item() appends a
+    line to a delta log (<path>.log) that moves the summary from one
+    items.csv version to the next. Reads replay the lines that continue
+    from the file's version, and fold them into the file when they are
+    read from disk or the log has grown past COMPACT_BYTES.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.log_path = path + '.log'
+        # (version, summary, items added since) last read or written by this process
+        self._cached = None
+
+    def read(self, version):
+        """The summary as of the given items.csv version, None if there is no such summary"""
+        if version is None:
+            return None
+        if self._cached is not None and self._cached[0] == version:
+            _, summary, added = self._cached
+            if not added:
+                return summary
+            summary = add_items(summary, pd.DataFrame(added, columns=ADDED_COLUMNS))
+            if self._log_size() > COMPACT_BYTES:
+                self.write(summary, version)
+            else:
+                self._cached = (version, summary, [])
+            return summary
+        try:
+            with open(self.path) as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("Could not read project summary %s: %s", self.path, e)
+            return None
+        stored_version, added = self._replay(stored.get('items_version'))
+        if stored_version != version:
+            return None
+        summary = normalize(pd.DataFrame(stored.get('rows', []), columns=SUMMARY_COLUMNS))
+        if added:
+            summary = add_items(summary, pd.DataFrame(added, columns=ADDED_COLUMNS))
+            self.write(summary, version)
+        else:
+            self._cached = (version, summary, [])
+        return summary
+
+    def add_item(self, version, new_version, project_id, team, start_date, end_date):
+        """Log one item appended to items.csv, which moved it from version to new_version"""
+        if version is None or new_version is None or not os.path.exists(self.path):
+            # Nothing to continue from: the next read rebuilds the summary anyway
+            return
+        start_date = pd.to_datetime(start_date, errors='coerce')
+        end_date = pd.to_datetime(end_date, errors='coerce')
+        line = json.dumps({'from': version, 'to': new_version,
+                           'item': [project_id, team, _isoformat(start_date), _isoformat(end_date)]})
+        with open(self.log_path, 'a') as f:
+            f.write(line + '\n')
+        if self._cached is not None and self._cached[0] == version:
+            _, summary, added = self._cached
+            self._cached = (new_version, summary, added + [[project_id, team, start_date, end_date]])
+
+    def _replay(self, version):
+        """(version reached, items added) by the log lines that continue from version"""
+        added = []
+        try:
+            with open(self.log_path) as f:
+                for line in f:
+                    try:
+                        delta = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A line cut short by a crash; later lines can't continue from it
+                        break
+                    if delta.get('from') == version:
+                        added.append(delta['item'])
+                        version = delta['to']
+        except FileNotFoundError:
+            pass
+        return version, added
+
+    def _log_size(self):
+        try:
+            return os.path.getsize(self.log_path)
+        except FileNotFoundError:
+            return 0
+
+    def write(self, summary, version):
+        """Store the summary as of the given items.csv version (replacing the file atomically)"""
+        if version is None:
+            return
+        rows = [[project_id, team, int(count), _isoformat(start), _isoformat(end)]
+                for project_id, team, count, start, end in summary[SUMMARY_COLUMNS].itertuples(index=False)]
+        partial = self.path + '.tmp'
+        with open(partial, 'w') as f:
+            json.dump({'items_version': version, 'rows': rows}, f)
+        os.replace(partial, self.path)
+        # The log only ever continues from the version in the file
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
+        self._cached = (version, summary, [])
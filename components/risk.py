@@ -0,0 +1,321 @@
+"""
+Monte Carlo schedule risk: P50/P80 completion dates per project and the
+probability of finishing by the Target COD.
+
+Each item's duration is its planned duration times a factor drawn from a
+triangular distribution (optimistic, most likely, pessimistic). Every team
+has a default spread, and single items can override it; both are kept in
+the duration_risk section of settings.json. A sample of the project
+schedule pushes items later behind their predecessors (finish-to-start,
+as in components/scheduling.py) and finishes with the last item.
+
+All samples are simulated together as NumPy arrays of shape (items,
+samples). The only Python loop is over the dependency levels - the items
+whose predecessors have all been placed - so a project without
+dependencies is a handful of array operations. simulate_portfolio() runs
+the projects on a process pool.
+"""
+import os
+import zlib
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from components.scheduling import CycleError, find_cycle
+
+# Logging is configured by the entry point (utils.logs.configure_logging)
+logger = logging.getLogger('risk')
+
+# Duration factors (optimistic, most likely, pessimistic) applied to the planned duration
+DEFAULT_SPREAD = (0.9, 1.0, 1.3)
+TEAM_SPREADS = {
+    'Construction': (0.9, 1.0, 1.4),
+    'Procurement': (0.9, 1.0, 1.5),
+    'Interconnection': (0.85, 1.0, 1.6),
+    'Development': (0.9, 1.0, 1.3)
+}
+DEFAULT_SAMPLES = 10000
+PORTFOLIO_SAMPLES = 2000
+# Worker processes for simulate_portfolio (default: one per CPU)
+RISK_WORKERS = int(os.environ.get('RISK_WORKERS', 0)) or os.cpu_count() or 1
+SETTINGS_SECTION = 'duration_risk'
+NANOSECONDS_PER_DAY = 86400 * 10**9
+
+
+def get_spreads():
+    """
+    (team spreads, item overrides) from settings.json, with the team
+    defaults of TEAM_SPREADS for teams that aren't configured
+    """
+    from utils.helpers import load_settings
+
+    settings = load_settings().get(SETTINGS_SECTION, {})
+    teams = dict(TEAM_SPREADS)
+    teams.update({team: tuple(spread) for team, spread in settings.get('teams', {}).items()})
+    items = {item_id: tuple(spread) for item_id, spread in settings.get('items', {}).items()}
+    return teams, items
+
+
+def save_item_spreads(overrides, item_ids):
+    """
+    Replace the overrides of the given items with overrides (Item ID ->
+    (optimistic, most likely, pessimistic)); other items keep theirs.
+    """
+    from utils.helpers import load_settings, set_setting
+
+    settings = dict(load_settings().get(SETTINGS_SECTION, {}))
+    items = {item_id: spread for item_id, spread in settings.get('items', {}).items() if item_id not in set(item_ids)}
+    items.update({item_id: [float(value) for value in spread] for item_id, spread in overrides.items()})
+    settings['items'] = items
+    set_setting(SETTINGS_SECTION, settings)
+
+
+def validate_spread(spread):
+    """Error message for an invalid (optimistic, most likely, pessimistic) spread, or None"""
+    low, mode, high = spread
+    if any(pd.isna(value) for value in spread):
+        return "all three factors are required"
+    if low < 0:
+        return "factors can't be negative"
+    if not low <= mode <= high:
+        return "factors must satisfy optimistic ≤ most likely ≤ pessimistic"
+    return None
+
+
+def _item_spreads(items, spreads):
+    """Optimistic, most likely and pessimistic factor arrays for the items"""
+    teams, overrides = spreads if spreads is not None else get_spreads()
+    params = np.array([overrides.get(item_id) or teams.get(team, DEFAULT_SPREAD)
+                       for item_id, team in zip(items['Item ID'].tolist(), items['Team'].tolist())],
+                      dtype=float).reshape(-1, 3)
+    return params[:, 0], params[:, 1], params[:, 2]
+
+
+def _sample_triangular(rng, low, mode, high, samples):
+    """(items, samples) float32 draws from per-item triangular distributions by inverting the CDF"""
+    low, mode, high = (np.asarray(values, dtype=np.float32)[:, None] for values in (low, mode, high))
+    width = high - low
+    with np.errstate(divide='ignore', invalid='ignore'):
+        split = np.where(width > 0, (mode - low) / width, np.float32(0))
+    draws = rng.random((len(low), samples), dtype=np.float32)
+    below = draws < split
+    # Both branches in place on the uniform draws
+    lower = low + np.sqrt(draws * width * (mode - low))
+    draws = high - np.sqrt((1 - draws) * width * (high - mode))
+    np.copyto(draws, lower, where=below)
+    return draws
+
+
+def _segments(bounds, nodes):
+    """Concatenated positions bounds[node]:bounds[node + 1] of the given nodes"""
+    first, lengths = bounds[nodes], bounds[nodes + 1] - bounds[nodes]
+    offsets = np.cumsum(lengths) - lengths
+    return np.repeat(first - offsets, lengths) + np.arange(lengths.sum()), offsets
+
+
+def _levels(count, predecessors, successors):
+    """
+    Dependency level of every item - one more than its deepest predecessor,
+    0 without predecessors - or None if the links contain a cycle
+    """
+    level = np.zeros(count, dtype=np.int64)
+    remaining = np.bincount(successors, minlength=count)
+    order = np.argsort(predecessors, kind='stable')
+    successors = successors[order]
+    bounds = np.searchsorted(predecessors[order], np.arange(count + 1))
+
+    current = np.flatnonzero(remaining == 0)
+    placed = len(current)
+    depth = 0
+    while len(current):
+        # Successors whose last predecessor is in the current level
+        released = successors[_segments(bounds, current)[0]]
+        np.subtract.at(remaining, released, 1)
+        released = np.unique(released)
+        current = released[remaining[released] == 0]
+        depth += 1
+        level[current] = depth
+        placed += len(current)
+    return level if placed == count else None
+
+
+class ProjectRisk:
+    """Simulated completion of one project"""
+
+    def __init__(self, project_id, finishes, target=None, item_ids=None, item_finishes=None):
+        self.project_id = project_id
+        self.samples = len(finishes)
+        self.target = pd.Timestamp(target) if target is not None and pd.notna(target) else None
+        p50, p80 = np.percentile(finishes, [50, 80]) if len(finishes) else (np.nan, np.nan)
+        self.p50 = _to_timestamp(p50)
+        self.p80 = _to_timestamp(p80)
+        # Share of samples finishing on or before the Target COD
+        self.probability = None
+        if self.target is not None and len(finishes):
+            self.probability = float(np.mean(finishes <= self.target.value / NANOSECONDS_PER_DAY))
+        # Per-item P50/P80 finish dates (Item ID, P50 Finish, P80 Finish)
+        self.item_finishes = None
+        if item_ids is not None:
+            self.item_finishes = pd.DataFrame({
+                'Item ID': item_ids,
+                'P50 Finish': _to_timestamps(item_finishes[0]),
+                'P80 Finish': _to_timestamps(item_finishes[1])
+            })
+
+    def to_dict(self):
+        return {
+            'Project ID': self.project_id,
+            'P50 Completion': self.p50,
+            'P80 Completion': self.p80,
+            'Target COD': self.target,
+            'P(On Time)': self.probability
+        }
+
+
+def _to_timestamp(days):
+    """Days since the epoch as a date, rounded to the day"""
+    return pd.NaT if pd.isna(days) else pd.Timestamp(int(round(days)) * NANOSECONDS_PER_DAY)
+
+
+def _to_timestamps(days):
+    return pd.to_datetime(np.round(np.asarray(days)).astype(np.int64) * NANOSECONDS_PER_DAY)
+
+
+def simulate_project(items, dependencies=None, target=None, samples=DEFAULT_SAMPLES, spreads=None,
+                     seed=None, item_bands=True, project_id=None):
+    """
+    Simulate one project's schedule `samples` times and return a ProjectRisk.
+
+    items needs Item ID, Team, Start Date and End Date columns; items with a
+    missing date are left out. dependencies (Item ID, Predecessor ID) links
+    outside items are ignored. spreads is (team spreads, item overrides) as
+    returned by get_spreads() (read from settings.json if None). With
+    item_bands, the P50/P80 finish of every item is reported too. Raises
+    CycleError if the links form a cycle.
+    """
+    if project_id is None and 'Project ID' in items.columns and len(items):
+        project_id = items['Project ID'].iloc[0]
+
+    starts = pd.to_datetime(items['Start Date'], errors='coerce')
+    ends = pd.to_datetime(items['End Date'], errors='coerce')
+    valid = (starts.notna() & ends.notna()).to_numpy()
+    items = items[valid]
+    start_days = starts[valid].to_numpy(dtype='datetime64[ns]').view(np.int64) / NANOSECONDS_PER_DAY
+    planned = np.maximum(ends[valid].to_numpy(dtype='datetime64[ns]').view(np.int64) / NANOSECONDS_PER_DAY
+                         - start_days, 0)
+    item_ids = items['Item ID'].astype(str).tolist()
+    if not item_ids:
+        return ProjectRisk(project_id, np.empty(0), target)
+
+    # Days since the project's first start, small enough for float32
+    origin = start_days.min()
+    start_days = (start_days - origin).astype(np.float32)
+    planned = planned.astype(np.float32)
+
+    rng = np.random.default_rng(seed)
+    low, mode, high = _item_spreads(items, spreads)
+    finish = _sample_triangular(rng, low, mode, high, samples)
+    finish *= planned[:, None]
+
+    # Links between this project's items, as positions
+    predecessors = successors = np.empty(0, dtype=np.int64)
+    if dependencies is not None and len(dependencies):
+        index = pd.Index(item_ids)
+        successors = index.get_indexer(dependencies['Item ID'].astype(str))
+        predecessors = index.get_indexer(dependencies['Predecessor ID'].astype(str))
+        inside = (successors >= 0) & (predecessors >= 0) & (successors != predecessors)
+        successors, predecessors = successors[inside], predecessors[inside]
+
+    if not len(successors):
+        finish += start_days[:, None]
+    else:
+        level = _levels(len(item_ids), predecessors, successors)
+        if level is None:
+            raise CycleError(find_cycle(pd.DataFrame({'Item ID': np.array(item_ids)[successors],
+                                                      'Predecessor ID': np.array(item_ids)[predecessors]})))
+        # Links grouped by successor, so each successor's predecessors form one segment
+        order = np.argsort(successors, kind='stable')
+        successors, predecessors = successors[order], predecessors[order]
+        link_starts = np.searchsorted(successors, np.arange(len(item_ids) + 1))
+        by_level = np.argsort(level, kind='stable')
+        level_starts = np.searchsorted(level[by_level], np.arange(level.max() + 2))
+
+        for depth in range(level.max() + 1):
+            nodes = by_level[level_starts[depth]:level_starts[depth + 1]]
+            early = np.broadcast_to(start_days[nodes][:, None], (len(nodes), samples)).copy()
+            if depth:
+                # Latest finish of each node's predecessors, per sample
+                links, offsets = _segments(link_starts, nodes)
+                pushed = np.maximum.reduceat(finish[predecessors[links]], offsets, axis=0)
+                np.maximum(early, pushed, out=early)
+            finish[nodes] += early
+
+    completion = finish.max(axis=0).astype(np.float64) + origin
+    bands = np.percentile(finish, [50, 80], axis=1).astype(np.float64) + origin if item_bands else None
+    return ProjectRisk(project_id, completion, target, item_ids if item_bands else None, bands)
+
+
+def _project_seed(seed, project_id):
+    """Seed of one project, the same however the projects are split between workers"""
+    return np.random.SeedSequence([seed, zlib.crc32(str(project_id).encode())])
+
+
+def _simulate_batch(batch, samples, spreads, seed):
+    """Summaries of a batch of (project ID, items, dependencies, target) tuples"""
+    results = []
+    for project_id, items, dependencies, target in batch:
+        try:
+            risk = simulate_project(items, dependencies, target, samples, spreads,
+                                    seed=_project_seed(seed, project_id), item_bands=False, project_id=project_id)
+            results.append(risk.to_dict())
+        except CycleError as e:
+            logger.warning("Skipping schedule risk of project %s: %s", project_id, e)
+    return results
+
+
+def simulate_portfolio(projects, items, dependencies=None, samples=PORTFOLIO_SAMPLES, spreads=None,
+                       seed=0, workers=None):
+    """
+    P50/P80 completion and the probability of meeting Target COD for every
+    project, as a frame with one row per project that has dated items.
+
+    Projects are split into batches and simulated on a process pool of
+    `workers` processes (RISK_WORKERS); with one worker they run in this
+    process. Results don't depend on the number of workers.
+    """
+    spreads = spreads if spreads is not None else get_spreads()
+    workers = workers or RISK_WORKERS
+    targets = dict(zip(projects['ID'], projects['Target COD'])) if 'Target COD' in projects.columns else {}
+
+    links = {}
+    if dependencies is not None and len(dependencies):
+        owners = dict(zip(items['Item ID'].astype(str), items['Project ID']))
+        project_of_link = dependencies['Item ID'].astype(str).map(owners)
+        links = {project_id: group for project_id, group in dependencies.groupby(project_of_link, sort=False)}
+
+    columns = ['Item ID', 'Team', 'Start Date', 'End Date']
+    tasks = [
+        (project_id, group[columns], links.get(project_id), targets.get(project_id))
+        for project_id, group in items[items['Project ID'].isin(projects['ID'])].groupby('Project ID', sort=False)
+    ]
+
+    if workers <= 1 or len(tasks) < 2:
+        results = _simulate_batch(tasks, samples, spreads, seed)
+    else:
+        # A few batches per worker keeps the pool busy without pickling every project separately
+        batch_count = min(len(tasks), workers * 4)
+        batches = [tasks[i::batch_count] for i in range(batch_count)]
+        results = []
+        # Spawned, not forked: forking the threaded Streamlit server can deadlock the children
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            for batch_results in pool.map(_simulate_batch, batches, [samples] * batch_count,
+                                          [spreads] * batch_count, [seed] * batch_count):
+                results.extend(batch_results)
+
+    summary = pd.DataFrame(results, columns=['Project ID', 'P50 Completion', 'P80 Completion', 'Target COD',
+                                             'P(On Time)'])
+    names = dict(zip(projects['ID'], projects['Name']))
+    summary.insert(1, 'Project Name', summary['Project ID'].map(names))
+    order = {project_id: position for position, project_id in enumerate(projects['ID'])}
+    return summary.sort_values('Project ID', key=lambda ids: ids.map(order)).reset_index(drop=True)
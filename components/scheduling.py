@@ -0,0 +1,464 @@
+"""
+Critical path method (CPM) scheduling over item dependencies.
+
+Dependencies are finish-to-start links (an item starts once all its
+predecessors have finished). The forward pass gives each item an early
+start - its planned start, pushed later by its predecessors - and the
+backward pass a late finish: its project's finish, pulled earlier by its
+successors. Total float is the slack between the two; items with no
+float form the critical chain that sets the project's finish.
+
+Both passes visit the items once in topological order, so a schedule is
+linear in items plus dependencies. When only some items' dates change,
+Schedule.update_item() repairs the passes from those items outward
+instead of recomputing everything.
+"""
+import copy
+import heapq
+import logging
+from collections import deque
+import numpy as np
+import pandas as pd
+from components.derived_state import manager_lock
+
+# Logging is configured by the entry point (utils.logs.configure_logging)
+logger = logging.getLogger('scheduling')
+
+DEPENDENCY_COLUMNS = ['Item ID', 'Predecessor ID']
+# Floats at or below this many days count as zero (critical)
+FLOAT_TOLERANCE = 1e-6
+NANOSECONDS_PER_DAY = 86400 * 10**9
+
+
+class CycleError(ValueError):
+    """The dependencies contain a cycle; cycle lists its Item IDs in order"""
+
+    def __init__(self, cycle):
+        self.cycle = cycle
+        super().__init__("Dependency cycle: " + " → ".join(cycle + cycle[:1]))
+
+
+class DuplicateItemIdError(ValueError):
+    """Several items share an Item ID, so links to it are ambiguous; item_ids lists those IDs"""
+
+    def __init__(self, item_ids):
+        self.item_ids = item_ids
+        shown = ", ".join(item_ids[:5]) + (", ..." if len(item_ids) > 5 else "")
+        super().__init__(f"{len(item_ids)} Item IDs are used by more than one item ({shown})")
+
+
+def parse_predecessors(value):
+    """Item IDs in a comma-separated Predecessors cell, without blanks or repeats"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return []
+    ids = []
+    for part in str(value).replace(';', ',').split(','):
+        part = part.strip()
+        if part and part not in ids:
+            ids.append(part)
+    return ids
+
+
+def predecessors_to_dependencies(items_df):
+    """Dependency rows from the Item ID and Predecessors columns of an items frame"""
+    rows = [
+        (item_id, predecessor)
+        for item_id, predecessors in zip(items_df['Item ID'], items_df['Predecessors'])
+        if isinstance(item_id, str) and item_id
+        for predecessor in parse_predecessors(predecessors)
+        if predecessor != item_id
+    ]
+    return pd.DataFrame(rows, columns=DEPENDENCY_COLUMNS)
+
+
+def format_predecessors(dependencies, item_ids):
+    """Comma-separated predecessor IDs for each of item_ids, as a list of strings"""
+    if dependencies is None or dependencies.empty:
+        return [''] * len(item_ids)
+    wanted = dependencies[dependencies['Item ID'].isin(list(item_ids))]
+    grouped = wanted.groupby('Item ID', sort=False)['Predecessor ID'].agg(', '.join).to_dict()
+    return [grouped.get(item_id, '') for item_id in item_ids]
+
+
+def _topological_order(count, predecessors, successors):
+    """Kahn's algorithm; returns (order, None), or (None, nodes of a cycle)"""
+    in_degree = [len(preds) for preds in predecessors]
+    queue = deque(node for node in range(count) if in_degree[node] == 0)
+    order = []
+    while queue:
+        node = queue.popleft()
+        order.append(node)
+        for successor in successors[node]:
+            in_degree[successor] -= 1
+            if in_degree[successor] == 0:
+                queue.append(successor)
+    if len(order) < count:
+        return None, _find_cycle([node for node in range(count) if in_degree[node] > 0], predecessors, in_degree)
+    return order, None
+
+
+def _find_cycle(remaining, predecessors, in_degree):
+    """
+    One cycle among the nodes Kahn's algorithm couldn't order. Every such
+    node has a predecessor that is also unordered, so walking predecessors
+    must revisit a node.
+    """
+    seen = {}
+    node = remaining[0]
+    path = []
+    while node not in seen:
+        seen[node] = len(path)
+        path.append(node)
+        node = next(pred for pred in predecessors[node] if in_degree[pred] > 0)
+    cycle = path[seen[node]:]
+    cycle.reverse()
+    return cycle
+
+
+def find_cycle(dependencies):
+    """Item IDs of a cycle in a dependencies frame, in order, or None if it has none"""
+    if dependencies is None or dependencies.empty:
+        return None
+    ids = pd.unique(pd.concat([dependencies['Item ID'], dependencies['Predecessor ID']]))
+    index = {item_id: position for position, item_id in enumerate(ids)}
+    predecessors = [[] for _ in ids]
+    successors = [[] for _ in ids]
+    for item_id, predecessor in zip(dependencies['Item ID'], dependencies['Predecessor ID']):
+        predecessors[index[item_id]].append(index[predecessor])
+        successors[index[predecessor]].append(index[item_id])
+    _, cycle = _topological_order(len(ids), predecessors, successors)
+    return [ids[node] for node in cycle] if cycle is not None else None
+
+
+def _to_days(values):
+    """Datetimes as float days since the epoch (NaT becomes NaN)"""
+    values = pd.to_datetime(values, errors='coerce')
+    days = values.to_numpy(dtype='datetime64[ns]').astype(np.int64) / NANOSECONDS_PER_DAY
+    days[values.isna().to_numpy()] = np.nan
+    return days
+
+
+def _to_datetimes(days):
+    return pd.to_datetime(np.round(np.asarray(days) * NANOSECONDS_PER_DAY).astype(np.int64))
+
+
+class Schedule:
+    """
+    CPM schedule of a set of items.
+
+    items needs Item ID, Project ID, Start Date and End Date columns;
+    dependencies has Item ID and Predecessor ID columns. Links to items
+    that aren't in items are ignored. Items with missing dates get a zero
+    duration at the earliest known date, so they never drive the schedule.
+    Raises CycleError if the dependencies contain a cycle.
+    """
+
+    def __init__(self, items, dependencies=None):
+        # Data version and inputs the schedule reflects (set by get_schedule)
+        self.version = None
+        self.dependencies = None
+        self.dates = None
+        self.item_ids = items['Item ID'].astype(str).tolist()
+        repeated = pd.Index(self.item_ids).duplicated()
+        if repeated.any():
+            raise DuplicateItemIdError(sorted(set(np.array(self.item_ids)[repeated].tolist())))
+        self.index = {item_id: position for position, item_id in enumerate(self.item_ids)}
+        count = len(self.item_ids)
+
+        start = _to_days(items['Start Date'])
+        finish = _to_days(items['End Date'])
+        fallback = np.nanmin(start) if count and not np.isnan(start).all() else 0.0
+        start = np.where(np.isnan(start), fallback, start)
+        finish = np.where(np.isnan(finish), start, finish)
+        self.planned_start = start.tolist()
+        self.duration = np.maximum(finish - start, 0.0).tolist()
+
+        codes, projects = pd.factorize(items['Project ID'].astype(str))
+        self.projects = projects.tolist()
+        self.project_of = codes.tolist()
+        self.project_members = [[] for _ in self.projects]
+        for node, project in enumerate(self.project_of):
+            self.project_members[project].append(node)
+
+        self.predecessors = [[] for _ in range(count)]
+        self.successors = [[] for _ in range(count)]
+        self.links = 0
+        if dependencies is not None and not dependencies.empty:
+            # Positions looked up in one vectorized pass (-1 for unknown items)
+            positions = pd.Index(self.item_ids)
+            nodes = positions.get_indexer(dependencies['Item ID'].astype(str))
+            preds = positions.get_indexer(dependencies['Predecessor ID'].astype(str))
+            valid = (nodes >= 0) & (preds >= 0) & (nodes != preds)
+            for node, pred in zip(nodes[valid].tolist(), preds[valid].tolist()):
+                self.predecessors[node].append(pred)
+                self.successors[pred].append(node)
+            self.links = int(valid.sum())
+
+        self.order, cycle = _topological_order(count, self.predecessors, self.successors)
+        if cycle is not None:
+            raise CycleError([self.item_ids[node] for node in cycle])
+        self.rank = [0] * count
+        for position, node in enumerate(self.order):
+            self.rank[node] = position
+
+        self._forward()
+        self._backward()
+
+    # Full passes
+
+    def _forward(self):
+        early_start = [0.0] * len(self.order)
+        early_finish = [0.0] * len(self.order)
+        planned_start, duration, predecessors = self.planned_start, self.duration, self.predecessors
+        for node in self.order:
+            value = planned_start[node]
+            for pred in predecessors[node]:
+                if early_finish[pred] > value:
+                    value = early_finish[pred]
+            early_start[node] = value
+            early_finish[node] = value + duration[node]
+        self.early_start = early_start
+        self.early_finish = early_finish
+
+        finish = np.full(len(self.projects), -np.inf)
+        if self.order:
+            np.maximum.at(finish, np.asarray(self.project_of), np.asarray(early_finish))
+        self.project_finish = finish.tolist()
+
+    def _backward(self):
+        late_finish = [0.0] * len(self.order)
+        duration, successors, project_of, project_finish = (
+            self.duration, self.successors, self.project_of, self.project_finish)
+        for node in reversed(self.order):
+            value = project_finish[project_of[node]]
+            for succ in successors[node]:
+                late_start = late_finish[succ] - duration[succ]
+                if late_start < value:
+                    value = late_start
+            late_finish[node] = value
+        self.late_finish = late_finish
+
+    # Incremental updates
+
+    def _early(self, node):
+        value = self.planned_start[node]
+        for pred in self.predecessors[node]:
+            if self.early_finish[pred] > value:
+                value = self.early_finish[pred]
+        return value
+
+    def _late(self, node):
+        value = self.project_finish[self.project_of[node]]
+        for succ in self.successors[node]:
+            late_start = self.late_finish[succ] - self.duration[succ]
+            if late_start < value:
+                value = late_start
+        return value
+
+    def update_item(self, item_id, start_date, end_date):
+        """
+        Change one item's planned dates and repair the schedule: the forward
+        pass is redone only for items downstream of it whose early dates move,
+        and the backward pass only upstream of it and in projects whose finish
+        moved. Returns the number of items whose early or late dates changed.
+        """
+        return self.update_items({item_id: (start_date, end_date)})
+
+    def update_items(self, changes):
+        """update_item() for several items at once: {Item ID: (start date, end date)}"""
+        changed_nodes = []
+        for item_id, (start_date, end_date) in changes.items():
+            node = self.index[item_id]
+            start, finish = _to_days(pd.Series([start_date, end_date]))
+            if np.isnan(start):
+                start = self.planned_start[node]
+            if np.isnan(finish):
+                finish = start
+            self.planned_start[node] = float(start)
+            self.duration[node] = max(float(finish - start), 0.0)
+            changed_nodes.append(node)
+
+        touched = set()
+
+        # Forward pass, in topological order, from the changed items
+        heap = [(self.rank[node], node) for node in changed_nodes]
+        heapq.heapify(heap)
+        queued = set(changed_nodes)
+        moved_projects = set()
+        while heap:
+            _, node = heapq.heappop(heap)
+            queued.discard(node)
+            early_start = self._early(node)
+            early_finish = early_start + self.duration[node]
+            if early_start == self.early_start[node] and early_finish == self.early_finish[node]:
+                continue
+            self.early_start[node] = early_start
+            self.early_finish[node] = early_finish
+            touched.add(node)
+            moved_projects.add(self.project_of[node])
+            for succ in self.successors[node]:
+                if succ not in queued:
+                    queued.add(succ)
+                    heapq.heappush(heap, (self.rank[succ], succ))
+
+        # Project finishes that may have moved
+        seeds = set(changed_nodes)
+        for node in changed_nodes:
+            seeds.update(self.predecessors[node])
+        for project in moved_projects:
+            members = self.project_members[project]
+            finish = max(self.early_finish[node] for node in members)
+            if finish != self.project_finish[project]:
+                self.project_finish[project] = finish
+                seeds.update(members)
+
+        # Backward pass, in reverse topological order, from the affected items
+        heap = [(-self.rank[node], node) for node in seeds]
+        heapq.heapify(heap)
+        queued = set(seeds)
+        while heap:
+            _, node = heapq.heappop(heap)
+            queued.discard(node)
+            late_finish = self._late(node)
+            # A changed duration moves the item's late start even if its late finish stays
+            if late_finish == self.late_finish[node] and node not in changed_nodes:
+                continue
+            if late_finish != self.late_finish[node]:
+                touched.add(node)
+            self.late_finish[node] = late_finish
+            for pred in self.predecessors[node]:
+                if pred not in queued:
+                    queued.add(pred)
+                    heapq.heappush(heap, (-self.rank[pred], pred))
+
+        return len(touched)
+
+    def copy(self):
+        """Copy whose dates can be updated without changing this schedule"""
+        schedule = copy.copy(self)
+        for name in ('planned_start', 'duration', 'early_start', 'early_finish', 'late_finish', 'project_finish'):
+            setattr(schedule, name, list(getattr(self, name)))
+        return schedule
+
+    # Results
+
+    def total_float(self):
+        """Total float in days per item, as an array in item order"""
+        return np.asarray(self.late_finish) - np.asarray(self.early_finish)
+
+    def critical_items(self):
+        """Item IDs with no total float"""
+        floats = self.total_float()
+        return {self.item_ids[node] for node in np.flatnonzero(floats <= FLOAT_TOLERANCE)}
+
+    def critical_chain(self, project_id):
+        """
+        Critical Item IDs of one project, ordered by early start: the chain
+        of items that sets the project's finish
+        """
+        floats = self.total_float()
+        project = self.projects.index(project_id) if project_id in self.projects else None
+        if project is None:
+            return []
+        nodes = [node for node in self.project_members[project] if floats[node] <= FLOAT_TOLERANCE]
+        nodes.sort(key=lambda node: (self.early_start[node], self.rank[node]))
+        return [self.item_ids[node] for node in nodes]
+
+    def to_frame(self, item_ids=None):
+        """Early/late dates, total and free float (days) and Critical flag per item"""
+        nodes = np.arange(len(self.item_ids)) if item_ids is None else np.array(
+            [self.index[item_id] for item_id in item_ids if item_id in self.index], dtype=int)
+        early_start = np.asarray(self.early_start)[nodes] if len(nodes) else np.array([])
+        early_finish = np.asarray(self.early_finish)[nodes] if len(nodes) else np.array([])
+        late_finish = np.asarray(self.late_finish)[nodes] if len(nodes) else np.array([])
+        duration = np.asarray(self.duration)[nodes] if len(nodes) else np.array([])
+
+        # Free float: slack before the earliest successor (or the project finish) is delayed
+        free = []
+        for node in nodes:
+            limit = self.project_finish[self.project_of[node]]
+            for succ in self.successors[node]:
+                if self.early_start[succ] < limit:
+                    limit = self.early_start[succ]
+            free.append(limit - self.early_finish[node])
+
+        total = late_finish - early_finish
+        return pd.DataFrame({
+            'Item ID': [self.item_ids[node] for node in nodes],
+            'Early Start': _to_datetimes(early_start),
+            'Early Finish': _to_datetimes(early_finish),
+            'Late Start': _to_datetimes(late_finish - duration),
+            'Late Finish': _to_datetimes(late_finish),
+            'Total Float': np.round(total, 1),
+            'Free Float': np.round(np.asarray(free, dtype=float), 1),
+            'Critical': total <= FLOAT_TOLERANCE
+        })
+
+
+# Past this many changed items, rebuilding the schedule is as quick as repairing it
+MAX_INCREMENTAL_CHANGES = 500
+
+
+def _changed_items(schedule, items, dependencies):
+    """
+    Positions of items whose dates differ from those schedule was built or
+    last updated with, or None if the items or dependencies themselves changed
+    """
+    if schedule.dependencies is not dependencies and not schedule.dependencies.equals(dependencies):
+        return None
+    if len(items) != len(schedule.item_ids) or items['Item ID'].astype(str).tolist() != schedule.item_ids:
+        return None
+    if pd.factorize(items['Project ID'].astype(str))[0].tolist() != schedule.project_of:
+        return None
+    start, finish = _to_days(items['Start Date']), _to_days(items['End Date'])
+    same_start = (start == schedule.dates[0]) | (np.isnan(start) & np.isnan(schedule.dates[0]))
+    same_finish = (finish == schedule.dates[1]) | (np.isnan(finish) & np.isnan(schedule.dates[1]))
+    return np.flatnonzero(~(same_start & same_finish))
+
+
+def get_schedule(data_manager):
+    """
+    Schedule of all items in the data manager's current snapshot.
+
+    Kept on the data manager like the snapshot. After a write that only
+    moved some items' dates, the previous schedule is repaired with
+    update_items() instead of being rebuilt. Raises CycleError or
+    DuplicateItemIdError.
+    """
+    from components.data_cache import get_snapshot
+
+    with manager_lock(data_manager):
+        snapshot = get_snapshot(data_manager)
+        schedule = getattr(data_manager, '_schedule', None)
+        if schedule is not None and schedule.version == snapshot.version:
+            return schedule
+
+        # A cycle or repeated Item ID stays an error until the data changes
+        failed = getattr(data_manager, '_schedule_error', None)
+        if failed is not None and failed[0] == snapshot.version:
+            raise failed[1]
+
+        items, dependencies = snapshot.items, snapshot.dependencies
+        changed = _changed_items(schedule, items, dependencies) if schedule is not None else None
+        if changed is not None and len(changed) <= MAX_INCREMENTAL_CHANGES:
+            if len(changed):
+                # Repair a copy, as other threads may still be reading the current schedule
+                schedule = schedule.copy()
+                touched = schedule.update_items({
+                    schedule.item_ids[node]: (items['Start Date'].iloc[node], items['End Date'].iloc[node])
+                    for node in changed
+                })
+                logger.info("Updated schedule for %d changed items (%d items moved)", len(changed), touched)
+        else:
+            try:
+                schedule = Schedule(items, dependencies)
+            except (CycleError, DuplicateItemIdError) as e:
+                data_manager._schedule_error = (snapshot.version, e)
+                raise
+            logger.info("Built schedule of %d items and %d dependencies", len(schedule.item_ids), schedule.links)
+
+        schedule.version = snapshot.version
+        schedule.dependencies = dependencies
+        schedule.dates = (_to_days(items['Start Date']), _to_days(items['End Date']))
+        data_manager._schedule = schedule
+        return schedule
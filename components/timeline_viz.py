@@ -1,16 +1,30 @@
-import plotly.figure_factory as ff
-import plotly.express as px
 import plotly.graph_objects as go
+import numpy as np
 import pandas as pd
 import streamlit as st
 from datetime import datetime, timedelta
 import logging
+from utils.tracing import traced
+from utils.metrics import FIGURE_BUILD_SECONDS
+from utils.logs import lazy, RowSummary
 
 # Set up logging
 logger = logging.getLogger('timeline_visualizer')
 
+
+def _epoch_ms(dates):
+    """
+    Dates as float milliseconds since the epoch. Plotly sends float arrays
+    as binary typed arrays (a list of ISO strings otherwise), and date axes
+    read numbers as epoch milliseconds.
+    """
+    return pd.to_datetime(dates).to_numpy(dtype='datetime64[ms]').astype('int64').astype(float)
+
+
 class TimelineVisualizer:
-    def __init__(self):
+    def __init__(self, data_manager=None):
+        # Source of the team colors; the session's data manager when not given
+        self.data_manager = data_manager
         self.colors = {
             'Not Started': '#E3F2FD',  # Light blue
             'In Progress': '#64B5F6',  # Medium blue
@@ -28,6 +42,16 @@ class TimelineVisualizer:
         """Return team colors for consistency"""
         return self.team_colors
 
+    def _data_manager_team_colors(self):
+        """Team colors of the data manager, falling back to the defaults"""
+        data_manager = self.data_manager
+        if data_manager is None and hasattr(st.session_state, 'data_manager'):
+            data_manager = st.session_state.data_manager
+        if hasattr(data_manager, 'get_team_colors'):
+            return data_manager.get_team_colors()
+        return self.team_colors
+
+    @traced()
     def parse_dates(self, df, date_col):
         """Centralized date parsing for better maintainability"""
         dates = pd.to_datetime(df[date_col], errors='coerce')
@@ -44,14 +68,24 @@ class TimelineVisualizer:
 
         return dates
 
+    @traced()
+    @FIGURE_BUILD_SECONDS.time(chart='timeline')
     def create_timeline(self, data, custom_start_date=None, custom_end_date=None, 
-                        show_task_labels=True, tick_interval=None):
+                        show_task_labels=True, tick_interval=None, critical_items=None, risk=None):
+        """
+        Gantt chart of one project's items. Items whose Item ID is in
+        critical_items (the critical chain) are outlined in red. With risk
+        (a components.risk.ProjectRisk), each item gets a band from its P50
+        to its P80 simulated finish, and the project's P50/P80 completion
+        and Target COD are marked.
+        """
         df_plot = data.copy()
+        critical_items = critical_items or set()
 
         # Ensure required columns
         required_cols = ['Item Name', 'Start Date', 'End Date', 'Team', 'Months']
         if not all(col in df_plot.columns for col in required_cols):
-            logger.error(f"DataFrame missing required columns: {required_cols}")
+            logger.error("DataFrame missing required columns: %s", required_cols)
             st.error("Cannot create timeline due to missing data columns.")
             return go.Figure()
 
@@ -66,7 +100,7 @@ class TimelineVisualizer:
             if plot_data['Start'].isnull().any() or plot_data['Finish'].isnull().any():
                 # Log issues instead of displaying warnings
                 num_issues = plot_data['Start'].isnull().sum() + plot_data['Finish'].isnull().sum()
-                logger.warning(f"Timeline has {num_issues} date parsing issues that were auto-fixed")
+                logger.warning("Timeline has %d date parsing issues that were auto-fixed", num_issues)
 
                 # Store min and max dates to avoid redundant calculations
                 min_date_found = plot_data['Start'].min() if not pd.isna(plot_data['Start'].min()) else pd.Timestamp('now')
@@ -77,7 +111,7 @@ class TimelineVisualizer:
                 # Use the latest date in the dataset or start + 1 month as fallback for end dates
                 plot_data['Finish'] = plot_data['Finish'].fillna(max_date_found)
         except Exception as e:
-            logger.error(f"Error parsing dates: {e}")
+            logger.error("Error parsing dates: %s", e)
             st.error("Error creating timeline. Please check the data format.")
             return go.Figure()
 
@@ -96,11 +130,8 @@ class TimelineVisualizer:
             logger.warning("No valid tasks to display after parsing")
             return go.Figure()
 
-        # Get team colors - try to access from session state first
-        if hasattr(st.session_state, 'data_manager') and hasattr(st.session_state.data_manager, 'get_team_colors'):
-            team_colors = st.session_state.data_manager.get_team_colors()
-        else:
-            team_colors = self.team_colors
+        # Get team colors - from the data manager first
+        team_colors = self._data_manager_team_colors()
 
         # Store global data range variables to avoid redundant calculations
         data_min_date = plot_data['Start'].min() 
@@ -112,9 +143,6 @@ class TimelineVisualizer:
 
         fig = go.Figure()
 
-        # Collect all teams in the data
-        all_data_teams = set(plot_data['Team'].unique())
-
         # Create a set to track teams that have been added to the legend
         teams_in_legend = set()
 
@@ -136,13 +164,19 @@ class TimelineVisualizer:
                 teams_in_legend.add(team_name)
 
         # Calculate months before displaying
-        plot_data['Months'] = plot_data.apply(
-            lambda x: max(1, ((pd.to_datetime(x['Finish']) - pd.to_datetime(x['Start'])).days // 30) + 1)
-            if pd.notna(x['Start']) and pd.notna(x['Finish'])
-            else 1,
-            axis=1
-        )
-
+        months = (plot_data['Finish'] - plot_data['Start']).dt.days // 30 + 1
+        plot_data['Months'] = months.clip(lower=1).fillna(1).astype(int)
+
+        # Per-item values for the traces in one vectorized pass. Dates go out as epoch milliseconds
+        # (binary typed arrays) and hover dates as preformatted strings, rather than as timestamps
+        plot_data['Position'] = plot_data['Task'].map(task_positions)
+        plot_data['Start Label'] = plot_data['Start'].dt.strftime('%Y-%m-%d')
+        plot_data['End Label'] = plot_data['Finish'].dt.strftime('%Y-%m-%d')
+        if 'Item ID' in plot_data.columns:
+            plot_data['Critical'] = plot_data['Item ID'].isin(critical_items)
+        else:
+            plot_data['Critical'] = False
+        hover_columns = ['Start Label', 'End Label', 'Months']
 
         # Determine the date range dynamically from the data or use custom dates
         if custom_start_date:
@@ -161,137 +195,93 @@ class TimelineVisualizer:
         short_duration_tasks = plot_data[plot_data['Duration'].isnull() | (plot_data['Duration'] <= one_month)]
         long_duration_tasks = plot_data[plot_data['Duration'] > one_month]
 
-        # Ensure long_duration_tasks has valid durations
-        long_duration_tasks = long_duration_tasks[long_duration_tasks['Duration'].notnull()]
-
-        # Add bars for long-duration tasks with fixed calculation of bar width
+        # One bar trace per team for the long-duration tasks
         for team in long_duration_tasks['Team'].unique():
             team_data = long_duration_tasks[long_duration_tasks['Team'] == team]
-            if not team_data.empty:
-                y_positions = [task_positions[task] for task in team_data['Task']]
-
-                # Create lists for valid data
-                valid_starts = []
-                valid_durations = []  # This will hold time differences, not end dates
-                valid_tasks = []
-                valid_months = []
-                valid_y_positions = []
-                valid_end_dates = []  # For hover data
-
-                # Process each task
-                for start, finish, task, months, pos in zip(
-                    team_data['Start'], team_data['Finish'], 
-                    team_data['Task'], team_data['Months'], y_positions):
-
-                    # Ensure valid timestamps
-                    start_ts = pd.Timestamp(start) if not isinstance(start, pd.Timestamp) else start
-                    finish_ts = pd.Timestamp(finish) if not isinstance(finish, pd.Timestamp) else finish
-
-                    # Check if dates are valid (not NaT)
-                    if pd.notna(start_ts) and pd.notna(finish_ts):
-                        # For Plotly horizontal bars, we need the duration, not the end date
-                        duration_ms = (finish_ts - start_ts).total_seconds() * 1000  # in milliseconds for Plotly
-
-                        valid_starts.append(start_ts)
-                        valid_durations.append(duration_ms)
-                        valid_tasks.append(task)
-                        valid_months.append(months)
-                        valid_y_positions.append(pos)
-                        valid_end_dates.append(finish_ts)
-
-                # Create the horizontal bars with proper parameters
-                if valid_starts and valid_durations:
-                    # Enhanced hover template
-                    hover_template = (
-                        '<b>Task:</b> %{text}<br>' +
-                        '<b>Start:</b> %{base|%Y-%m-%d}<br>' +
-                        '<b>End:</b> %{customdata|%Y-%m-%d}<br>' +
-                        '<b>Team:</b> ' + team + '<br>' +
-                        '<b>Duration:</b> %{meta} months'
-                    )
-
-                    fig.add_trace(go.Bar(
-                        x=valid_durations,  # Use duration, not end date
-                        y=valid_y_positions,
-                        base=valid_starts,  # Start position remains the same
-                        orientation='h',
-                        marker_color=team_colors.get(team, '#999999'),
-                        name=team,
-                        text=valid_tasks,
-                        customdata=valid_end_dates,  # Store end dates for hover
-                        meta=valid_months,  # Store months for hover template
-                        hovertemplate=hover_template,
-                        width=0.8,
-                        showlegend=False,  # Don't show in legend since we're using invisible traces
-                        legendgroup=team  # Group by team to ensure consistent coloring
-                    ))
-
-        # Add scatter points for short-duration tasks (≤ 1 month, 0, or NaN)
-        # First build a mapping of task to team to ensure consistent coloring
-        task_team_mapping = {}
-
-        # Create mapping from all tasks to their teams - process both long and short duration tasks 
-        for _, row in plot_data.iterrows():
-            task_team_mapping[row['Task']] = row['Team']
-
-        # Now handle short duration tasks - create individual points for each
-        for _, row in short_duration_tasks.iterrows():
-            task = row['Task']
-            team = row['Team']
-            # Make sure we have the correct team
-            correct_team = team  # Use the team directly from the row
-
-            # Get the position for this task
-            y_pos = task_positions.get(task)
-
-            # Skip if we can't determine position
-            if y_pos is None:
-                continue
-
-            # Ensure start date is valid
-            if pd.isna(row['Start']):
-                continue
-
-            start_ts = pd.Timestamp(row['Start']) if not isinstance(row['Start'], pd.Timestamp) else row['Start']
-            finish_ts = pd.Timestamp(row['Finish']) if pd.notna(row['Finish']) else start_ts + pd.DateOffset(months=1)
-
-            # Create custom data for hover
-            custom_data = [finish_ts, row['Months'], correct_team]
-
-            # Hover template
-            hover_template = (
-                '<b>Task:</b> %{text}<br>' +
-                '<b>Start:</b> %{x|%Y-%m-%d}<br>' +
-                '<b>End:</b> %{customdata[0]|%Y-%m-%d}<br>' +
-                '<b>Team:</b> %{customdata[2]}<br>' +
-                '<b>Duration:</b> %{customdata[1]} month(s)'
-            )
-
-            # Add individual point with correct team color
-            # Set showlegend to True initially
-            should_show_in_legend = True
-
-            # Always use showlegend=False for scatter points to avoid duplicate legend entries
-            # The invisible traces at the beginning handle the legend display
+            fig.add_trace(go.Bar(
+                # Duration in milliseconds, drawn from the base
+                x=_epoch_ms(team_data['Finish']) - _epoch_ms(team_data['Start']),
+                y=team_data['Position'].to_numpy(),
+                base=team_data['Start Label'].tolist(),  # Plotly sends base as a list either way
+                orientation='h',
+                marker_color=team_colors.get(team, '#999999'),
+                # Critical items are outlined, the others get a zero-width outline
+                marker_line_color='red',
+                marker_line_width=np.where(team_data['Critical'], 3, 0),
+                name=team,
+                text=team_data['Task'].tolist(),
+                customdata=team_data[hover_columns].to_numpy(),
+                hovertemplate=(
+                    '<b>Task:</b> %{text}<br>' +
+                    '<b>Start:</b> %{customdata[0]}<br>' +
+                    '<b>End:</b> %{customdata[1]}<br>' +
+                    '<b>Team:</b> ' + team + '<br>' +
+                    '<b>Duration:</b> %{customdata[2]} months'
+                ),
+                width=0.8,
+                showlegend=False,  # Don't show in legend since we're using invisible traces
+                legendgroup=team  # Group by team to ensure consistent coloring
+            ))
 
+        # One marker trace per team for the short-duration tasks (≤ 1 month, 0, or NaN)
+        for team in short_duration_tasks['Team'].unique():
+            team_data = short_duration_tasks[short_duration_tasks['Team'] == team]
+            outline = 'rgba(0,0,0,0.5)'
+            if team_data['Critical'].any():
+                outline = np.where(team_data['Critical'], 'red', outline).tolist()
             fig.add_trace(go.Scatter(
-                x=[start_ts],
-                y=[y_pos],
+                x=_epoch_ms(team_data['Start']),
+                y=team_data['Position'].to_numpy(),
                 mode='markers',
                 marker=dict(
                     symbol='circle',
                     size=15,
-                    color=team_colors.get(correct_team, '#999999'),  # Get color directly for this team
-                    line=dict(width=3, color='rgba(0,0,0,0.5)')
+                    color=team_colors.get(team, '#999999'),
+                    line=dict(width=3, color=outline)
+                ),
+                name=team,
+                text=team_data['Task'].tolist(),
+                customdata=team_data[hover_columns].to_numpy(),
+                hovertemplate=(
+                    '<b>Task:</b> %{text}<br>' +
+                    '<b>Start:</b> %{customdata[0]}<br>' +
+                    '<b>End:</b> %{customdata[1]}<br>' +
+                    '<b>Team:</b> ' + team + '<br>' +
+                    '<b>Duration:</b> %{customdata[2]} month(s)'
                 ),
-                name=correct_team,
-                text=[task],
-                customdata=[custom_data],
-                hovertemplate=hover_template,
                 showlegend=False,  # Don't show in legend to avoid duplicates
-                legendgroup=correct_team  # Group with other elements from this team
+                legendgroup=team  # Group with other elements from this team
             ))
 
+        # Simulated finish bands and completion dates
+        if risk is not None and risk.item_finishes is not None and 'Item ID' in plot_data.columns:
+            positions = dict(zip(plot_data['Item ID'].astype(str), plot_data['Position']))
+            bands = risk.item_finishes[risk.item_finishes['Item ID'].isin(positions)]
+            if not bands.empty:
+                p50_labels = bands['P50 Finish'].dt.strftime('%Y-%m-%d')
+                fig.add_trace(go.Bar(
+                    x=_epoch_ms(bands['P80 Finish']) - _epoch_ms(bands['P50 Finish']),
+                    y=bands['Item ID'].map(positions).to_numpy(),
+                    base=p50_labels.tolist(),
+                    orientation='h',
+                    marker_color='rgba(90, 90, 90, 0.45)',
+                    width=0.3,
+                    name='P50–P80 finish',
+                    customdata=np.column_stack([p50_labels, bands['P80 Finish'].dt.strftime('%Y-%m-%d')]),
+                    hovertemplate='<b>P50 finish:</b> %{customdata[0]}<br><b>P80 finish:</b> '
+                                  '%{customdata[1]}<extra></extra>',
+                    showlegend=True
+                ))
+            markers = [(risk.p50, "P50", "#FB8C00", "dot"), (risk.p80, "P80", "#C62828", "dot"),
+                       (risk.target, "Target COD", "#2E7D32", "solid")]
+            for date, label, color, dash in markers:
+                if date is None or pd.isna(date):
+                    continue
+                fig.add_shape(type="line", x0=date, y0=-0.5, x1=date, y1=len(tasks) - 0.5,
+                              line=dict(color=color, width=2, dash=dash))
+                fig.add_annotation(x=date, y=-0.5, text=label, showarrow=False, font=dict(color=color, size=11),
+                                   yshift=-12, yanchor="top")
+
         # Add a "Today" reference line - ALWAYS show it regardless of date range
         today = pd.Timestamp('today')
 
@@ -316,23 +306,6 @@ class TimelineVisualizer:
             yanchor="bottom"    # Anchor at bottom of text
         )
 
-        # Annotations for task labels (if enabled)
-        annotations = []
-        if show_task_labels:
-            annotations = [
-                dict(
-                    x=-0.07,  # Adjusted from -0.05 for better alignment
-                    y=i,
-                    xref='paper',
-                    yref='y',
-                    text=task,  # Only include the task name, no numbers
-                    showarrow=False,
-                    font=dict(color='black', size=12),
-                    align='right',
-                    yanchor='middle'
-                ) for i, task in enumerate(tasks)
-            ]
-
         # Compute a default height based on number of tasks
         # This will be used if no custom height is provided via update_layout later
         task_count = len(tasks)
@@ -374,7 +347,6 @@ class TimelineVisualizer:
                 yaxis_title=None,
                 plot_bgcolor='white',
                 paper_bgcolor='white',
-                annotations=annotations,
                 bargap=0.2,
                 hovermode="closest"
             )
@@ -429,9 +401,14 @@ class TimelineVisualizer:
             spikethickness=1
         )
 
-        # Update Y axis to remove default tick labels and use annotations instead
+        # Task names are the y-axis tick labels (one tick per task row), not one annotation per task
         fig.update_yaxes(
-            showticklabels=False,  # Hide default tick labels, we'll use annotations instead
+            tickmode='array',
+            tickvals=np.arange(len(tasks)),
+            ticktext=tasks,
+            showticklabels=show_task_labels,
+            tickfont=dict(color='black', size=12),
+            automargin=True,  # Ensure long task names fit
             showgrid=False,
             range=[-0.5, len(tasks) - 0.5],
             # Add hover lines for task tracking
@@ -444,7 +421,10 @@ class TimelineVisualizer:
 
         return fig
 
-    def create_team_deadlines_chart(self, project_data, items_data, custom_start_date=None, custom_end_date=None, tick_interval=None):
+    @traced()
+    @FIGURE_BUILD_SECONDS.time(chart='team_deadlines')
+    def create_team_deadlines_chart(self, project_data, items_data, custom_start_date=None, custom_end_date=None, tick_interval=None,
+                                    alerts=None):
         """
         Create a chart showing the last deadline for each team across all projects.
 
@@ -454,6 +434,8 @@ class TimelineVisualizer:
         custom_start_date (datetime, optional): Custom start date for chart range
         custom_end_date (datetime, optional): Custom end date for chart range
         tick_interval (int, optional): Number of months between each x-axis tick mark
+        alerts (tuple, optional): Precomputed (alert_projects, alert_details) sequencing alerts, see
+            components.alerts.SequencingAlerts.for_projects; computed from items_data if not given
 
         Returns:
         plotly.graph_objects.Figure: A plotly figure showing team deadlines across projects
@@ -464,13 +446,10 @@ class TimelineVisualizer:
         import logging
 
         # Set up logging for this method
-        logger.info(f"Starting team deadlines chart creation with {len(project_data)} projects and {len(items_data)} items")
+        logger.info("Starting team deadlines chart creation with %d projects and %d items", len(project_data), len(items_data))
 
         # Get team colors
-        if hasattr(st.session_state, 'data_manager') and hasattr(st.session_state.data_manager, 'get_team_colors'):
-            team_colors = st.session_state.data_manager.get_team_colors()
-        else:
-            team_colors = self.team_colors
+        team_colors = self._data_manager_team_colors()
 
         # Create a dataframe to store the last deadline for each team in each project
         deadlines_data = []
@@ -483,18 +462,25 @@ class TimelineVisualizer:
         alert_projects = {}
         alert_details = []
 
-        # Process each project
-        for _, project in projects.iterrows():
-            project_id = project['ID']
-            project_name = project['Name']
-            project_iso = project['ISO']
+        # Per-project problems are logged as one summary record each, after the loop
+        projects_without_items = RowSummary(logger, "No timeline items found for projects")
+        teams_without_end_dates = RowSummary(logger, "No valid end dates for teams")
 
-            # Get items for this project
-            project_items = items_data[items_data['Project ID'] == project_id]
+        # Latest End Date per project and team in one grouped pass, instead of filtering all items
+        # for every project and team (NaT for a team whose items have no valid end dates)
+        end_dates = pd.to_datetime(items_data['End Date'], errors='coerce')
+        latest_end_dates = end_dates.groupby([items_data['Project ID'], items_data['Team']], sort=False).max()
+        latest_by_project = {}
+        for (project_id, team), latest_end_date in latest_end_dates.items():
+            latest_by_project.setdefault(project_id, {})[team] = latest_end_date
+
+        # Process each project
+        for project_id, project_name, project_iso in projects.itertuples(index=False):
+            team_end_dates = latest_by_project.get(project_id)
 
             # Skip if no items for this project
-            if project_items.empty:
-                logger.warning(f"No timeline items found for project {project_id} - {project_name}")
+            if team_end_dates is None:
+                projects_without_items.add(f"{project_id} - {project_name}")
                 continue
 
             # Store deadlines by team for this project to check sequencing
@@ -502,39 +488,25 @@ class TimelineVisualizer:
 
             # Find the last deadline for each team in this project
             for team in all_teams:
-                try:
-                    team_items = project_items[project_items['Team'] == team]
-
-                    if not team_items.empty:
-                        # Find the latest end date for this team with robust parsing
-                        try:
-                            # Convert end dates to datetime, handling various formats
-                            end_dates = pd.to_datetime(team_items['End Date'], errors='coerce')
-
-                            # Check if we have valid dates
-                            if end_dates.notna().any():
-                                latest_end_date = end_dates.max()
-
-                                # Store deadline for sequencing check
-                                project_deadlines[team] = latest_end_date
-
-                                deadlines_data.append({
-                                    'Project ID': project_id,
-                                    'Project Name': project_name,
-                                    'ISO': project_iso,
-                                    'Team': team,
-                                    'Deadline': latest_end_date
-                                })
-                            else:
-                                logger.warning(f"No valid end dates for team {team} in project {project_id}")
-                        except Exception as e:
-                            logger.error(f"Error processing end dates for team {team} in project {project_id}: {str(e)}")
-                except Exception as e:
-                    logger.error(f"Error processing team {team} for project {project_id}: {str(e)}")
+                if team not in team_end_dates:
                     continue
+                latest_end_date = team_end_dates[team]
+                if pd.notna(latest_end_date):
+                    # Store deadline for sequencing check
+                    project_deadlines[team] = latest_end_date
+
+                    deadlines_data.append({
+                        'Project ID': project_id,
+                        'Project Name': project_name,
+                        'ISO': project_iso,
+                        'Team': team,
+                        'Deadline': latest_end_date
+                    })
+                else:
+                    teams_without_end_dates.add(f"{team} in {project_id}")
 
             # Check for sequencing issues - teams ending after construction
-            if 'Construction' in project_deadlines:
+            if alerts is None and 'Construction' in project_deadlines:
                 construction_deadline = project_deadlines['Construction']
 
                 # Check critical teams that should end before construction
@@ -562,12 +534,22 @@ class TimelineVisualizer:
                 if issue_teams:
                     alert_projects[project_name] = issue_teams
 
+        projects_without_items.flush()
+        teams_without_end_dates.flush()
+
+        if alerts is not None:
+            # Only the projects shown on the chart can be marked
+            charted = {row['Project Name'] for row in deadlines_data}
+            alert_projects = {name: teams for name, teams in alerts[0].items() if name in charted}
+            alert_details = [detail for detail in alerts[1] if detail['proj_name'] in charted]
+
         # Convert to DataFrame with error handling
         try:
             deadlines_df = pd.DataFrame(deadlines_data)
 
             # Log summary of data being processed
-            logger.info(f"Created deadlines dataframe with {len(deadlines_df)} entries across {len(deadlines_df['Project Name'].unique())} projects")
+            logger.info("Created deadlines dataframe with %d entries across %s projects", len(deadlines_df),
+                        lazy(lambda: deadlines_df['Project Name'].nunique() if not deadlines_df.empty else 0))
 
             # If no data, return empty figure with message
             if deadlines_df.empty:
@@ -591,11 +573,11 @@ class TimelineVisualizer:
             required_cols = ['Project Name', 'Team', 'Deadline', 'ISO']
             missing_cols = [col for col in required_cols if col not in deadlines_df.columns]
             if missing_cols:
-                logger.error(f"Missing required columns in deadlines data: {missing_cols}")
+                logger.error("Missing required columns in deadlines data: %s", missing_cols)
                 raise ValueError(f"Missing required columns: {missing_cols}")
 
         except Exception as e:
-            logger.error(f"Error creating deadlines dataframe: {str(e)}")
+            logger.error("Error creating deadlines dataframe: %s", e)
             # Return an empty figure with error message
             error_fig = go.Figure()
             error_fig.update_layout(
@@ -633,39 +615,51 @@ class TimelineVisualizer:
 
                 if not team_data.empty:
                     fig.add_trace(go.Bar(
-                        y=team_data['Project Name'],  # Projects on y-axis
-                        x=team_data['Deadline'],      # Dates on x-axis
+                        y=team_data['Project Name'].tolist(),  # Projects on y-axis
+                        x=_epoch_ms(team_data['Deadline']),    # Dates on x-axis, as epoch milliseconds
                         name=team,
                         marker_color=team_colors.get(team, '#999999'),
                         orientation='h',              # Horizontal bars
+                        # One hover template per team, with the per-project values preformatted
+                        customdata=np.column_stack([team_data['ISO'].fillna(''),
+                                                    team_data['Deadline'].dt.strftime('%Y-%m-%d')]),
                         hovertemplate='<b>Project:</b> %{y}<br>' +
                                     '<b>Team:</b> ' + team + '<br>' +
-                                    '<b>ISO:</b> ' + team_data['ISO'] + '<br>' +
-                                    '<b>Deadline:</b> %{x|%Y-%m-%d}<br>'
+                                    '<b>ISO:</b> %{customdata[0]}<br>' +
+                                    '<b>Deadline:</b> %{customdata[1]}<br>'
                     ))
 
         # Add "Today" reference line - ALWAYS show it regardless of date range
         today = pd.Timestamp('today')
 
         # Always add the Today line, even if outside the current view
+        # (Positioned and styled in full: the alert markers below set the shape and annotation defaults)
         fig.add_shape(
             type="line",
+            xref="x",
+            yref="y",
             x0=today,
             y0=-0.5,
             x1=today,
             y1=len(deadlines_df['Project Name'].unique()) - 0.5,
             line=dict(color="red", width=2, dash="dash"),
+            opacity=1,
+            layer="above"
         )
 
         # Add "Today" annotation above the chart
         fig.add_annotation(
             x=today,
             y=len(deadlines_df['Project Name'].unique()) - 0.5,
+            xref="x",
+            yref="y",
             text="Today",
             showarrow=False,
             font=dict(color="red", size=12),
+            align="center",
             textangle=0,
             yshift=25,
+            xanchor="auto",
             yanchor="bottom"
         )
 
@@ -757,35 +751,39 @@ class TimelineVisualizer:
                 "alert_details": alert_details
             }
 
-            # Show visual indicators on the chart
-            for project_name in alert_projects:
-                # Add a semi-transparent red background rectangle for each project with issues
-                fig.add_shape(
+            # Show visual indicators on the chart, added in one layout update: adding shapes and
+            # annotations one at a time revalidates all the earlier ones each time. Their styling
+            # is set once as the template's shape and annotation defaults, so each marker only
+            # carries its project
+            fig.update_layout(
+                template_layout_shapedefaults=dict(
+                    # A semi-transparent red background rectangle for each project with issues
                     type="rect",
                     xref="paper",
                     yref="y",
                     x0=0,
                     x1=1,
-                    y0=project_name,  # Project name as y-coordinate
-                    y1=project_name,
                     fillcolor="rgba(255, 0, 0, 0.2)",  # Semi-transparent red
                     opacity=0.5,
                     layer="below",
                     line_width=0
-                )
-
-                # Add an alert icon before project names with issues
-                fig.add_annotation(
+                ),
+                template_layout_annotationdefaults=dict(
+                    # An alert icon before project names with issues
                     x=-0.06,  # Moved even further left, well before the project name
-                    y=project_name,
                     xref="paper",
                     yref="y",
                     text="⚠️",
                     showarrow=False,
                     font=dict(size=14, color="red"),
                     align="right",
-                    xanchor="right",                    yanchor="middle"
-                )
+                    xanchor="right",
+                    yanchor="middle"
+                ),
+                # Project name as y-coordinate
+                shapes=list(fig.layout.shapes) + [dict(y0=name, y1=name) for name in alert_projects],
+                annotations=list(fig.layout.annotations) + [dict(y=name) for name in alert_projects]
+            )
 
         # Return figure, alert details, and warning information
         if 'alert_details' in locals() and alert_details:
@@ -793,6 +791,74 @@ class TimelineVisualizer:
         else:
             return fig
 
+    @traced()
+    @FIGURE_BUILD_SECONDS.time(chart='team_workload')
+    def create_team_workload_heatmap(self, counts, capacity=None, value_label="Concurrent items"):
+        """
+        Heatmap of items per team and month (the frame returned by
+        TeamWorkload.monthly_counts). Cells above the team's capacity - one
+        number or a Team -> number mapping - are outlined in red.
+        """
+        if counts.empty or not len(counts.columns):
+            empty_fig = go.Figure()
+            empty_fig.update_layout(
+                title="No workload data available",
+                annotations=[{
+                    "text": "No dated items in the selected projects and date range.",
+                    "showarrow": False,
+                    "font": {"size": 14},
+                    "xref": "paper",
+                    "yref": "paper",
+                    "x": 0.5,
+                    "y": 0.5
+                }]
+            )
+            return empty_fig
+
+        teams = [str(team) for team in counts.columns]
+        z = counts.to_numpy().T
+
+        fig = go.Figure(go.Heatmap(
+            z=z,
+            x=counts.index,
+            y=teams,
+            colorscale='Blues',
+            zmin=0,
+            colorbar=dict(title=value_label),
+            hovertemplate='<b>%{y}</b><br>%{x|%b %Y}<br>' + value_label + ': %{z}<extra></extra>',
+            xgap=1,
+            ygap=1
+        ))
+
+        # Outline the over-allocated cells
+        if capacity is not None:
+            if isinstance(capacity, dict):
+                limits = np.array([capacity.get(team, np.inf) for team in counts.columns], dtype=float)
+            else:
+                limits = np.full(len(teams), float(capacity))
+            rows, cols = np.nonzero(z > limits[:, None])
+            if len(rows):
+                fig.add_trace(go.Scatter(
+                    x=_epoch_ms(counts.index[cols]),
+                    y=[teams[row] for row in rows],
+                    mode='markers',
+                    marker=dict(symbol='square-open', size=14, color='red', line=dict(width=2)),
+                    name='Over capacity',
+                    hoverinfo='skip'
+                ))
+
+        fig.update_layout(
+            height=120 + 60 * len(teams),
+            margin=dict(l=120, r=50, t=40, b=60),
+            font=dict(family="Arial, sans-serif", size=12),
+            plot_bgcolor='white',
+            paper_bgcolor='white',
+            showlegend=False
+        )
+        fig.update_xaxes(type='date', tickformat='%b %Y', showgrid=False)
+        fig.update_yaxes(autorange='reversed', showgrid=False)
+        return fig
+
     def create_dependency_chart(self, data):
         teams = data['Team'].unique()
         dependencies = []
@@ -812,6 +878,9 @@ class TimelineVisualizer:
 
         dep_df = pd.DataFrame(dependencies)
         if not dep_df.empty:
+            # plotly.express takes a while to import and is only needed here
+            import plotly.express as px
+
             fig = px.scatter(
                 dep_df,
                 title="Team Dependencies Network",
@@ -0,0 +1,177 @@
+"""
+Cross-project team workload: how many items each team has active at the
+same time, month by month, across the whole portfolio.
+
+Item dates are turned into +1/-1 endpoint deltas on a per-team day grid
+(bincount), and a running sum over the grid sweeps the concurrency of
+every day at once. A month's peak is the maximum of its days. Items active
+at any point in a month come from the same deltas binned by month. Both
+are linear in items plus days in the window; no item is compared with
+another.
+"""
+import logging
+import numpy as np
+import pandas as pd
+from components.derived_state import manager_lock
+
+# Logging is configured by the entry point (utils.logs.configure_logging)
+logger = logging.getLogger('workload')
+
+# Concurrent items a team can carry before it counts as over-allocated
+DEFAULT_CAPACITY = 10
+# Teams listed first, in the order of the Team Deadlines chart
+TEAM_ORDER = ['Construction', 'Procurement', 'Interconnection', 'Development']
+
+PEAK = 'peak'
+ACTIVE = 'active'
+
+
+class TeamWorkload:
+    """
+    Item endpoints of a set of items, ready for workload counts.
+
+    items needs Project ID, Team, Start Date and End Date columns. Items
+    with a missing date are left out; an end before the start counts as a
+    one-day item. End dates are inclusive.
+    """
+
+    def __init__(self, items):
+        # Data version the workload reflects (set by get_workload)
+        self.version = None
+
+        starts = pd.to_datetime(items['Start Date'], errors='coerce').to_numpy(dtype='datetime64[D]')
+        ends = pd.to_datetime(items['End Date'], errors='coerce').to_numpy(dtype='datetime64[D]')
+        valid = ~(np.isnat(starts) | np.isnat(ends))
+        self.skipped = int((~valid).sum())
+
+        starts = starts[valid].astype(np.int64)
+        self.starts = starts
+        self.ends = np.maximum(ends[valid].astype(np.int64), starts)
+
+        team_codes, teams = pd.factorize(items['Team'].fillna('Unknown').to_numpy()[valid])
+        order = sorted(range(len(teams)), key=lambda code: (
+            TEAM_ORDER.index(teams[code]) if teams[code] in TEAM_ORDER else len(TEAM_ORDER), str(teams[code])))
+        # Renumber the codes so that code order is display order
+        rank = np.empty(len(teams), dtype=np.int64)
+        rank[order] = np.arange(len(teams))
+        self.team_codes = rank[team_codes]
+        self.teams = [teams[code] for code in order]
+
+        self.project_codes, self.projects = pd.factorize(items['Project ID'].to_numpy()[valid])
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _select(self, project_ids):
+        """Mask of the items in the given projects (all items if None)"""
+        if project_ids is None:
+            return None
+        codes = pd.Index(self.projects).get_indexer(pd.Index(project_ids).unique())
+        return np.isin(self.project_codes, codes[codes >= 0])
+
+    def monthly_counts(self, project_ids=None, start=None, end=None, measure=PEAK):
+        """
+        Items per team and month as a frame indexed by month start, one
+        column per team.
+
+        measure PEAK counts the most items a team had running on any one day
+        of the month; ACTIVE counts every item running at some point in it.
+        The window runs from start to end (default: the items' first start
+        and last end), widened to whole months.
+        """
+        starts, ends, teams = self.starts, self.ends, self.team_codes
+        mask = self._select(project_ids)
+        if mask is not None:
+            starts, ends, teams = starts[mask], ends[mask], teams[mask]
+
+        if start is None or end is None:
+            if not len(starts):
+                return pd.DataFrame(columns=self.teams, dtype=np.int64)
+            start = start if start is not None else _to_day(starts.min())
+            end = end if end is not None else _to_day(ends.max())
+
+        first_month = np.datetime64(pd.Timestamp(start), 'M')
+        last_month = np.datetime64(pd.Timestamp(end), 'M')
+        if last_month < first_month:
+            return pd.DataFrame(columns=self.teams, dtype=np.int64)
+        months = np.arange(first_month, last_month + 1)
+        month_days = months.astype('datetime64[D]').astype(np.int64)
+        first_day = month_days[0]
+        window_end = (last_month + 1).astype('datetime64[D]').astype(np.int64) - 1
+
+        # Clip the items to the window and drop those entirely outside it
+        inside = (starts <= window_end) & (ends >= first_day)
+        starts = np.maximum(starts[inside], first_day)
+        ends = np.minimum(ends[inside], window_end)
+        teams = teams[inside]
+        team_count = len(self.teams)
+
+        if measure == PEAK:
+            # +1 on the start day and -1 the day after the end, then sweep
+            width = window_end - first_day + 2
+            deltas = (np.bincount(teams * width + (starts - first_day), minlength=team_count * width)
+                      - np.bincount(teams * width + (ends - first_day + 1), minlength=team_count * width))
+            running = np.cumsum(deltas.reshape(team_count, width)[:, :-1], axis=1)
+            counts = np.maximum.reduceat(running, month_days - first_day, axis=1) if len(running) else running
+        elif measure == ACTIVE:
+            # The same sweep on a month grid: an item counts in every month it touches
+            width = len(months) + 1
+            start_months = np.searchsorted(month_days, starts, side='right') - 1
+            end_months = np.searchsorted(month_days, ends, side='right') - 1
+            deltas = (np.bincount(teams * width + start_months, minlength=team_count * width)
+                      - np.bincount(teams * width + end_months + 1, minlength=team_count * width))
+            counts = np.cumsum(deltas.reshape(team_count, width)[:, :-1], axis=1)
+        else:
+            raise ValueError(f"Unknown workload measure: {measure}")
+
+        return pd.DataFrame(counts.T,
+                            index=pd.DatetimeIndex(months.astype('datetime64[ns]'), name='Month'),
+                            columns=self.teams)
+
+
+def _to_day(day):
+    return pd.Timestamp(np.datetime64(int(day), 'D'))
+
+
+def _capacities(teams, capacity):
+    """Per-team capacity from one number or a Team -> number mapping"""
+    if isinstance(capacity, dict):
+        return {team: capacity.get(team, DEFAULT_CAPACITY) for team in teams}
+    return {team: capacity for team in teams}
+
+
+def over_allocations(counts, capacity=DEFAULT_CAPACITY):
+    """
+    Periods in which a team's monthly count exceeds its capacity, one row
+    per run of consecutive over-allocated months: Team, From, To, Months,
+    Peak and Capacity.
+    """
+    columns = ['Team', 'From', 'To', 'Months', 'Peak', 'Capacity']
+    periods = []
+    capacities = _capacities(counts.columns, capacity)
+    for team in counts.columns:
+        values = counts[team].to_numpy()
+        over = np.concatenate(([False], values > capacities[team], [False]))
+        edges = np.flatnonzero(over[1:] != over[:-1])
+        for first, stop in zip(edges[::2], edges[1::2]):
+            periods.append((team, counts.index[first], counts.index[stop - 1], stop - first,
+                            int(values[first:stop].max()), capacities[team]))
+    return pd.DataFrame(periods, columns=columns)
+
+
+def get_workload(data_manager):
+    """
+    TeamWorkload of all items in the data manager's current snapshot,
+    kept on the data manager until the data version changes.
+    """
+    from components.data_cache import get_snapshot
+
+    with manager_lock(data_manager):
+        snapshot = get_snapshot(data_manager)
+        workload = getattr(data_manager, '_workload', None)
+        if workload is None or workload.version != snapshot.version:
+            workload = TeamWorkload(snapshot.items)
+            workload.version = snapshot.version
+            data_manager._workload = workload
+            logger.info("Built team workload of %d items (%d without dates)", len(workload), workload.skipped)
+        return workload
@@ -1,51 +1,181 @@
 
 import os
-import sys
-from http.server import BaseHTTPRequestHandler, HTTPServer
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 import threading
 import logging
+from utils import metrics
+from utils.logs import configure_logging
 
 # Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+configure_logging(level=logging.INFO)
 logger = logging.getLogger('health_check')
 
+# A storage read slower than this (in ms) makes /ready fail
+READY_THRESHOLD_MS = float(os.environ.get('READY_THRESHOLD_MS', 500))
+# How long /ready waits for a stalled read before failing (in seconds)
+READY_TIMEOUT = float(os.environ.get('READY_TIMEOUT', 5))
+# Written by serve.py once the app has warmed up; while it is set and missing, /ready fails
+WARMUP_STATUS_PATH = os.environ.get('WARMUP_STATUS_PATH')
+
+REQUESTS = metrics.REGISTRY.counter(
+    'timeline_health_requests_total', 'Requests served by the health check server', ['path', 'status'])
+READY_CHECKS = metrics.REGISTRY.counter(
+    'timeline_ready_checks_total', 'Readiness probe results (ready, slow, failed, timeout or warming_up)', ['result'])
+READY_PROBE_SECONDS = metrics.REGISTRY.histogram(
+    'timeline_ready_probe_seconds', 'Duration of the storage read made by the readiness probe')
+
+
+class StorageProbe:
+    """
+    Times a real storage read for /ready.
+
+    At most one read is in flight: concurrent /ready requests wait on the
+    same read, and a stalled database ties up one worker thread instead of
+    one per request.
+    """
+
+    def __init__(self, threshold_ms=READY_THRESHOLD_MS, timeout=READY_TIMEOUT):
+        self.threshold_ms = threshold_ms
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ready-probe')
+        self._lock = threading.Lock()
+        self._pending = None
+        self._manager = None
+
+    def _read(self):
+        if self._manager is None:
+            from components.data_storage import get_shared_data_manager
+            self._manager = get_shared_data_manager()
+        start = time.perf_counter()
+        self._manager.check_storage()
+        elapsed = time.perf_counter() - start
+        READY_PROBE_SECONDS.observe(elapsed)
+        return elapsed
+
+    def check(self):
+        """Return (ready, message) for one probe"""
+        if WARMUP_STATUS_PATH and not os.path.exists(WARMUP_STATUS_PATH):
+            READY_CHECKS.inc(result='warming_up')
+            return False, "The app is warming up"
+
+        with self._lock:
+            if self._pending is None or self._pending.done():
+                self._pending = self._executor.submit(self._read)
+            pending = self._pending
+
+        try:
+            elapsed_ms = pending.result(timeout=self.timeout) * 1000
+        except FutureTimeoutError:
+            READY_CHECKS.inc(result='timeout')
+            return False, f"Storage read did not finish within {self.timeout:.1f}s"
+        except Exception as e:
+            READY_CHECKS.inc(result='failed')
+            return False, f"Storage read failed: {e}"
+
+        if elapsed_ms > self.threshold_ms:
+            READY_CHECKS.inc(result='slow')
+            return False, f"Storage read took {elapsed_ms:.1f} ms (threshold {self.threshold_ms:.0f} ms)"
+        READY_CHECKS.inc(result='ready')
+        return True, f"Storage read took {elapsed_ms:.1f} ms"
+
+
+storage_probe = StorageProbe()
+
+_read_api = None
+_read_api_lock = threading.Lock()
+
+
+def get_read_api():
+    """The API handler, created on the first API request so pandas isn't imported before /health answers"""
+    global _read_api
+    with _read_api_lock:
+        if _read_api is None:
+            from components.api import ReadApi
+            _read_api = ReadApi()
+        return _read_api
+
+
+def collect_metrics():
+    """This server's metrics merged with the latest snapshot exported by the app"""
+    families = metrics.with_labels(metrics.REGISTRY.collect(), process='health_check')
+
+    snapshot = metrics.load_snapshot()
+    if snapshot is not None:
+        families = metrics.merge_families(families, metrics.with_labels(snapshot['families'], process='app'))
+        families.append({
+            'name': 'timeline_app_metrics_age_seconds',
+            'type': 'gauge',
+            'help': 'Seconds since the app process last exported its metrics',
+            'samples': [('', {}, round(time.time() - snapshot['updated_at'], 3))]
+        })
+    return families
+
+
 class HealthCheckHandler(BaseHTTPRequestHandler):
     def do_GET(self):
         """Handle GET requests to the health check server"""
-        if self.path == "/health":
-            self.send_response(200)
-            self.send_header('Content-type', 'text/plain')
-            self.send_header('Cache-Control', 'no-cache, no-store')
-            self.end_headers()
-            self.wfile.write(b"OK - Health check passed")
+        path = self.path.split('?', 1)[0]
+        if path == "/health":
+            self._respond(200, b"OK - Health check passed")
             logger.info("Health check request successful")
+        elif path == "/ready":
+            ready, message = storage_probe.check()
+            self._respond(200 if ready else 503, f"{'READY' if ready else 'NOT READY'} - {message}".encode())
+            if not ready:
+                logger.warning("Readiness check failed: %s", message)
+        elif path.startswith("/api/"):
+            query = self.path.split('?', 1)[1] if '?' in self.path else ''
+            status, body, headers = get_read_api().handle(path, query, self.headers.get('If-None-Match'))
+            # Clients may keep API responses, but must revalidate them with If-None-Match
+            headers['Cache-Control'] = 'no-cache'
+            self._respond(status, body, content_type='application/json', headers=headers)
+        elif path == "/metrics":
+            body = metrics.render_text(collect_metrics()).encode()
+            self._respond(200, body, content_type='text/plain; version=0.0.4; charset=utf-8')
+        else:
+            self._respond(404, b"Not found")
+            logger.info("Request to unknown path: %s", self.path)
+
+    def _respond(self, status, body, content_type='text/plain', headers=None):
+        headers = {'Cache-Control': 'no-cache, no-store', **(headers or {})}
+        self.send_response(status)
+        if status != 304:
+            self.send_header('Content-type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(body)
+        path = self.path.split('?', 1)[0]
+        if path.startswith('/api/'):
+            label = '/api'
         else:
-            self.send_response(404)
-            self.send_header('Content-type', 'text/plain')
-            self.end_headers()
-            self.wfile.write(b"Not found")
-            logger.info(f"Request to unknown path: {self.path}")
+            label = path if path in ('/health', '/ready', '/metrics') else 'other'
+        REQUESTS.inc(path=label, status=status)
 
     def log_message(self, format, *args):
         """Override to avoid duplicate logging"""
         return
 
+
+class HealthCheckServer(ThreadingHTTPServer):
+    # Each request runs in its own thread, so a slow /ready doesn't block /health
+    daemon_threads = True
+
+
 def start_health_check_server(port=8080):
-    """Start a simple HTTP server to handle health checks"""
+    """Start an HTTP server for health checks, readiness, metrics and the read-only API"""
     try:
         server_address = ('0.0.0.0', port)
-        httpd = HTTPServer(server_address, HealthCheckHandler)
-        logger.info(f"Starting health check server on 0.0.0.0:{port}")
+        httpd = HealthCheckServer(server_address, HealthCheckHandler)
+        logger.info("Starting health check server on 0.0.0.0:%s", port)
         print(f"Health check server starting on 0.0.0.0:{port}")
         httpd.serve_forever()
     except Exception as e:
-        logger.error(f"Failed to start health check server: {e}")
+        logger.error("Failed to start health check server: %s", e)
         print(f"Failed to start health check server: {e}")
 
 if __name__ == "__main__":
@@ -0,0 +1,100 @@
+import streamlit as st
+import pandas as pd
+import os
+import sys
+import logging
+
+# Add parent directory to path to allow imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.helpers import load_css
+from utils.logs import configure_logging
+from utils import profiling
+
+# Set up logging (a no-op when app.py already did)
+configure_logging()
+logger = logging.getLogger('profiles')
+
+def main():
+    st.set_page_config(
+        page_title="Profiles | Project Timeline",
+        page_icon="🔬",
+        layout="wide"
+    )
+
+    load_css()
+
+    st.title("🔬 Rerun Profiles")
+    st.markdown("Profiles captured for slow reruns, summarized by the functions that took the most time")
+
+    profile_dir = profiling.get_profile_dir()
+    sample_rate = profiling.get_sample_rate()
+    if sample_rate > 0:
+        st.info(
+            f"Profiling {sample_rate:.0%} of reruns slower than {profiling.get_threshold_ms():.0f} ms. "
+            f"The last {profiling.get_max_files()} profiles are kept in `{profile_dir}`."
+        )
+    else:
+        st.info(
+            "Profiling is off for other sessions. Set `PROFILE_RERUNS=1` (and `PROFILE_SAMPLE_RATE`) to sample reruns, "
+            f"or open the app with `?profile=1` to profile your own reruns slower than "
+            f"{profiling.get_threshold_ms():.0f} ms."
+        )
+
+    profiles = profiling.list_profiles(profile_dir)
+    if not profiles:
+        st.warning("No profiles captured yet.")
+        return
+
+    st.dataframe(
+        pd.DataFrame(profiles).drop(columns=['path']),
+        hide_index=True,
+        use_container_width=True
+    )
+
+    selected = st.selectbox(
+        "Profile",
+        options=range(len(profiles)),
+        format_func=lambda i: (
+            f"{profiles[i]['captured_at'].strftime('%Y-%m-%d %H:%M:%S')} - "
+            f"{profiles[i]['label']} ({profiles[i]['duration_ms']} ms)"
+        )
+    )
+    profile = profiles[selected]
+
+    sort_col, limit_col = st.columns([1, 1])
+    with sort_col:
+        sort = st.radio("Sort by", options=["cumulative", "total"], horizontal=True,
+                        help="Cumulative time includes the functions each one calls; total time doesn't")
+    with limit_col:
+        limit = st.slider("Functions", min_value=10, max_value=100, value=25, step=5)
+
+    summary = profiling.summarize_profile(profile['path'], limit=limit, sort=sort)
+    if not summary:
+        st.error("Could not read this profile. It may have been removed from the ring.")
+        return
+
+    st.dataframe(
+        pd.DataFrame(summary),
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            'total_ms': st.column_config.NumberColumn(format="%.1f"),
+            'cumulative_ms': st.column_config.NumberColumn(format="%.1f"),
+            'per_call_ms': st.column_config.NumberColumn(format="%.3f")
+        }
+    )
+
+    # Open locally with e.g. `python -m pstats <file>` or snakeviz
+    try:
+        with open(profile['path'], 'rb') as f:
+            st.download_button(
+                label="Download .prof file",
+                data=f.read(),
+                file_name=profile['name'],
+                mime="application/octet-stream"
+            )
+    except OSError as e:
+        logger.warning("Could not read profile %s: %s", profile['path'], e)
+
+if __name__ == "__main__":
+    main()
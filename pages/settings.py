@@ -1,5 +1,4 @@
 import streamlit as st
-import pandas as pd
 import os
 import sys
 import logging
@@ -7,17 +6,135 @@ from datetime import datetime
 
 # Add parent directory to path to allow imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.helpers import load_css
-from components.data_storage import get_data_manager
-
-# Set up logging
-logging.basicConfig(
-    filename='app.log',
-    level=logging.WARNING,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+from utils.helpers import load_css, get_user_preference, set_user_preference
+from utils import tracing
+from utils.logs import configure_logging
+from utils.jobs import get_runner
+from components.data_storage import get_data_manager, get_shared_data_manager
+
+# Set up logging (a no-op when app.py already did)
+configure_logging()
 logger = logging.getLogger('settings')
 
+# Seconds between job status refreshes while this session has a job running
+JOB_POLL_SECONDS = 1
+
+def run_migration_job(job, force):
+    """Background job: migrate the CSV files to the database"""
+    from utils.migrate_to_postgresql import migrate_data
+
+    def progress(stats):
+        # Rows loaded and throughput, updated after every chunk
+        job.update(message=str(stats))
+        job.check_cancelled()
+
+    if not migrate_data(force=force, progress=progress):
+        raise RuntimeError(
+            "Migration failed. See migration.log for details. "
+            "If tables already have data, try using the 'Force migration' option."
+        )
+    job.update(message="Migration completed successfully")
+
+def run_items_export_job(job):
+    """Background job: write all project items to a CSV file for download"""
+    job.update(0.1, "Reading items")
+    all_items = get_data_manager().get_all_items()
+    job.check_cancelled()
+
+    if all_items.empty:
+        raise RuntimeError("No items available to export.")
+
+    job.update(0.5, f"Writing {len(all_items)} items")
+    file_name = f"items_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    path = job.output_path(file_name)
+    all_items.to_csv(path, index=False)
+    job.update(message=f"Exported {len(all_items)} items")
+    return {'path': path, 'file_name': file_name, 'mime': 'text/csv'}
+
+def run_backup_job(job, incremental):
+    """Background job: write a full or incremental backup archive to the backup directory"""
+    from components.backup import create_backup
+
+    job.update(message="Fingerprinting projects" if incremental else "Writing archive")
+    stats = create_backup(get_data_manager(), incremental=incremental, check=job.check_cancelled)
+    job.update(message=str(stats))
+    return {'path': stats.path, 'file_name': os.path.basename(stats.path), 'mime': 'application/zip'}
+
+def run_restore_job(job, path):
+    """Background job: replace all projects, items and dependencies with a backup"""
+    from components.backup import restore_backup
+
+    job.update(message="Restoring")
+    stats = restore_backup(get_data_manager(), path, check=job.check_cancelled)
+    job.update(message=str(stats))
+
+def submit_job(kind, func, *args, description=None, exclusive_key=None):
+    """
+    Queue a background job and remember it in this session so its status is shown.
+    Only one job per exclusive key (default: the kind) runs at a time.
+    """
+    job = get_runner().submit(kind, func, *args, description=description,
+                              exclusive_key=exclusive_key or kind)
+    job_ids = st.session_state.setdefault('settings_jobs', [])
+    if job.id not in job_ids:
+        job_ids.append(job.id)
+    return job
+
+def read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def show_job(job):
+    """Status, progress, cancel button and result download of one job"""
+    icons = {'queued': '⏳', 'running': '🔄', 'succeeded': '✅', 'failed': '❌', 'cancelled': '⛔'}
+    info_col, action_col = st.columns([4, 1])
+    with info_col:
+        duration = f" - {job.duration:.1f}s" if job.duration is not None else ""
+        st.markdown(f"{icons.get(job.status, '')} **{job.description}** ({job.status}{duration})")
+        if job.status == 'running':
+            st.progress(job.progress or 0.0, text=job.message or None)
+        elif job.status == 'failed':
+            st.error(job.error)
+        elif job.message:
+            st.caption(job.message)
+    with action_col:
+        if not job.finished:
+            st.button("Cancel", key=f"cancel_job_{job.id}", on_click=get_runner().cancel, args=(job.id,),
+                      disabled=job.cancel_requested, use_container_width=True)
+        elif job.status == 'succeeded' and isinstance(job.result, dict) and os.path.exists(job.result['path']):
+            st.download_button(
+                label="📥 Download",
+                data=lambda path=job.result['path']: read_file(path),
+                file_name=job.result['file_name'],
+                mime=job.result['mime'],
+                key=f"download_job_{job.id}",
+                on_click="ignore",
+                use_container_width=True
+            )
+
+def show_jobs():
+    """This session's background jobs, refreshed every JOB_POLL_SECONDS while any is unfinished"""
+    job_ids = st.session_state.get('settings_jobs', [])
+    jobs = get_runner().list_jobs(job_ids)
+    if not jobs:
+        return
+
+    polling = any(not job.finished for job in jobs)
+
+    def job_list():
+        current = get_runner().list_jobs(job_ids)
+        st.subheader("Background Jobs")
+        runner = get_runner()
+        st.caption(f"{runner.active_count()} job(s) queued or running across all sessions, "
+                   f"at most {runner.max_workers} at a time.")
+        for job in current:
+            show_job(job)
+        # Stop polling once everything has finished
+        if polling and all(job.finished for job in current):
+            st.rerun()
+
+    st.fragment(job_list, run_every=JOB_POLL_SECONDS if polling else None)()
+
 def main():
     st.set_page_config(
         page_title="Settings | Project Timeline",
@@ -47,19 +164,21 @@ def main():
         stats_col1, stats_col2 = st.columns(2)
         
         try:
-            # Get database manager
-            db_manager = get_data_manager()
+            import sqlalchemy as sa
+
+            # The app's database manager (and its connection pool)
+            db_manager = get_shared_data_manager()
             
             # Get count of projects and items
             with db_manager.engine.connect() as conn:
-                project_count = conn.execute("SELECT COUNT(*) FROM projects").scalar()
-                item_count = conn.execute("SELECT COUNT(*) FROM items").scalar()
+                project_count = conn.execute(sa.select(sa.func.count()).select_from(db_manager.projects)).scalar()
+                item_count = conn.execute(sa.select(sa.func.count()).select_from(db_manager.items)).scalar()
                 
                 stats_col1.metric("Projects in Database", project_count)
                 stats_col2.metric("Timeline Items in Database", item_count)
         except Exception as e:
             st.error(f"Error retrieving database statistics: {e}")
-            logger.error(f"Error retrieving database statistics: {e}")
+            logger.error("Error retrieving database statistics: %s", e)
     else:
         st.warning(
             "PostgreSQL database is not configured. You are using CSV files for storage. "
@@ -83,21 +202,9 @@ def main():
             
         with migrate_col2:
             if st.button("Migrate from CSV to Database", use_container_width=True):
-                with st.spinner("Migrating data..."):
-                    try:
-                        from utils.migrate_to_postgresql import migrate_data
-                        success = migrate_data(force=force_migration)
-                        
-                        if success:
-                            st.success("Migration completed successfully!")
-                        else:
-                            st.error(
-                                "Migration failed. See migration.log for details. "
-                                "If tables already have data, try using the 'Force migration' option."
-                            )
-                    except Exception as e:
-                        st.error(f"Error during migration: {e}")
-                        logger.error(f"Error during migration: {e}")
+                # Runs in the background; a second click while it runs shows the same job
+                submit_job('migration', run_migration_job, force_migration,
+                           description="Migrate CSV files to the database" + (" (forced)" if force_migration else ""))
     
     # Export Data
     st.header("Export Data")
@@ -127,98 +234,112 @@ def main():
                 st.info("No projects available to export.")
         except Exception as e:
             st.error(f"Error exporting projects: {e}")
-            logger.error(f"Error exporting projects: {e}")
+            logger.error("Error exporting projects: %s", e)
     
     with export_col2:
         st.subheader("Export All Items")
         
+        # Reading and writing every item can take a while, so it runs as a background job
+        if st.button("📦 Prepare Items Export", help="Write all project items to a CSV file for download",
+                     use_container_width=True):
+            submit_job('items_export', run_items_export_job, description="Export all items as CSV")
+
+    # Backup & Restore
+    st.header("Backup & Restore")
+    st.info(
+        "Backups are written to the backup directory on the server and can be downloaded. "
+        "An incremental backup contains only the projects changed since the previous backup."
+    )
+
+    backup_col1, backup_col2 = st.columns(2)
+
+    with backup_col1:
+        if st.button("📦 Full Backup", use_container_width=True):
+            submit_job('backup', run_backup_job, False, description="Full backup")
+        if st.button("📦 Incremental Backup", use_container_width=True):
+            submit_job('backup', run_backup_job, True, description="Incremental backup")
+
+    with backup_col2:
+        from components.backup import list_backups
+
+        backups = list_backups()
+        if backups:
+            labels = {
+                backup['path']: f"{os.path.basename(backup['path'])} ({backup['projects']} projects, {backup['items']} items)"
+                for backup in backups
+            }
+            selected_backup = st.selectbox("Backup", list(labels), format_func=labels.get)
+            st.download_button(
+                label="📥 Download Backup",
+                data=lambda path=selected_backup: read_file(path),
+                file_name=os.path.basename(selected_backup),
+                mime="application/zip",
+                on_click="ignore",
+                use_container_width=True
+            )
+            confirm_restore = st.checkbox(
+                "Replace all current projects, items and dependencies with this backup",
+                key="confirm_restore"
+            )
+            if st.button("♻️ Restore Backup", disabled=not confirm_restore, use_container_width=True):
+                # Shares the migration's key: both replace the stored data
+                submit_job('restore', run_restore_job, selected_backup, exclusive_key='migration',
+                           description=f"Restore {os.path.basename(selected_backup)}")
+        else:
+            st.caption("No backups yet.")
+
+    show_jobs()
+
+    # Maintenance
+    st.header("Maintenance")
+    st.caption("Sequencing alerts (teams finishing after Construction) are updated by each save. "
+               "Rebuild them from all stored items if they look out of date.")
+    if st.button("🔁 Rebuild Sequencing Alerts"):
+        from components.alerts import rebuild_alerts
+
         try:
-            data_manager = get_data_manager()
-            project_ids = data_manager.get_project_ids()
-            
-            if project_ids:
-                # Collect all items from all projects
-                all_items = pd.DataFrame()
-                for project_id in project_ids:
-                    items = data_manager.get_project_items(project_id)
-                    if not items.empty:
-                        all_items = pd.concat([all_items, items], ignore_index=True)
-                
-                if not all_items.empty:
-                    csv_items = all_items.to_csv(index=False)
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    
-                    st.download_button(
-                        label="📥 Download All Items as CSV",
-                        data=csv_items,
-                        file_name=f"items_export_{timestamp}.csv",
-                        mime="text/csv",
-                        help="Download all project items data as a CSV file",
-                        use_container_width=True
-                    )
-                else:
-                    st.info("No items available to export.")
-            else:
-                st.info("No projects available to export items from.")
+            # The alerts the app's sessions read
+            alerts = rebuild_alerts(get_shared_data_manager())
+            st.success(f"Rebuilt sequencing alerts for {len(alerts.deadlines)} projects: "
+                       f"{len(alerts.alerts)} with alerts.")
         except Exception as e:
-            st.error(f"Error exporting items: {e}")
-            logger.error(f"Error exporting items: {e}")
+            st.error(f"Error rebuilding sequencing alerts: {e}")
+            logger.error("Error rebuilding sequencing alerts: %s", e)
 
-    # Database Backup
-    if current_storage == "PostgreSQL":
-        st.header("Database Backup & Restore")
-        st.info(
-            "Backing up your PostgreSQL database ensures you don't lose important project data. "
-            "You can download a complete backup of all your projects and timeline items."
-        )
-        
-        backup_col1, _ = st.columns([2, 1])
-        
-        with backup_col1:
-            if st.button("📦 Generate Database Backup", use_container_width=True):
-                with st.spinner("Generating backup..."):
-                    try:
-                        # Get data manager
-                        data_manager = get_data_manager()
-                        
-                        # Get all projects and items
-                        projects_df = data_manager.get_data()
-                        
-                        # Create a ZIP file with projects and items
-                        import io
-                        import zipfile
-                        
-                        zip_buffer = io.BytesIO()
-                        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                            # Add projects
-                            zip_file.writestr('projects.csv', projects_df.to_csv(index=False))
-                            
-                            # Add items for each project
-                            all_items = pd.DataFrame()
-                            for project_id in projects_df['ID']:
-                                items = data_manager.get_project_items(project_id)
-                                if not items.empty:
-                                    all_items = pd.concat([all_items, items], ignore_index=True)
-                            
-                            if not all_items.empty:
-                                zip_file.writestr('items.csv', all_items.to_csv(index=False))
-                        
-                        # Reset buffer position
-                        zip_buffer.seek(0)
-                        
-                        # Create download button
-                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        st.download_button(
-                            label="💾 Download Database Backup",
-                            data=zip_buffer,
-                            file_name=f"timeline_database_backup_{timestamp}.zip",
-                            mime="application/zip",
-                            help="Download a complete backup of your database",
-                            use_container_width=True
-                        )
-                    except Exception as e:
-                        st.error(f"Error generating backup: {e}")
-                        logger.error(f"Error generating backup: {e}")
+    # Performance
+    st.header("Performance")
+
+    performance_panel = st.toggle(
+        "Show Performance panel",
+        value=get_user_preference('performance_panel', False),
+        help="Record timing spans for data access, charts and views, and show them below each page. "
+             "Recording is off while the panel is hidden."
+    )
+    if performance_panel != get_user_preference('performance_panel', False):
+        try:
+            set_user_preference('performance_panel', performance_panel)
+            tracing.set_enabled(performance_panel)
+            st.success(f"Performance panel {'enabled' if performance_panel else 'disabled'}.")
+        except Exception as e:
+            st.error(f"Error saving setting: {e}")
+            logger.error("Error saving performance panel setting: %s", e)
+
+    if performance_panel:
+        st.caption(f"Span aggregates are exported to {tracing.get_export_path()} for scraping.")
+
+    query_tracing = st.toggle(
+        "Trace SQL queries",
+        value=get_user_preference('query_tracing', False),
+        help="Record every SQL statement per rerun and flag repeated same-shape statements (N+1 patterns). "
+             "Only applies to database storage."
+    )
+    if query_tracing != get_user_preference('query_tracing', False):
+        try:
+            set_user_preference('query_tracing', query_tracing)
+            st.success(f"SQL query tracing {'enabled' if query_tracing else 'disabled'}.")
+        except Exception as e:
+            st.error(f"Error saving setting: {e}")
+            logger.error("Error saving query tracing setting: %s", e)
 
 if __name__ == "__main__":
     main()
@@ -17,21 +17,23 @@ fi
 
 echo "Using Python: $($PYTHON_CMD --version)"
 
-# Check if required packages are installed
-$PYTHON_CMD -c "import streamlit" 2>/dev/null || $PYTHON_CMD -m pip install -r requirements.txt
+# Check if required packages are installed (find_spec locates streamlit without importing it)
+$PYTHON_CMD -c "import importlib.util, sys; sys.exit(importlib.util.find_spec('streamlit') is None)" 2>/dev/null || $PYTHON_CMD -m pip install -r requirements.txt
+
+# /ready on the health check server fails until serve.py has warmed up the app
+export WARMUP_STATUS_PATH="${WARMUP_STATUS_PATH:-warmup_status.json}"
+rm -f "$WARMUP_STATUS_PATH"
 
 # Start health check server in background on port 8080
 echo "Starting health check server on port 8080..."
 $PYTHON_CMD health_check.py &
 HEALTH_PID=$!
 
-# Wait for health check server to start
-sleep 2
 echo "Health check server started with PID $HEALTH_PID"
 
-# Start Streamlit server
+# Warm up the app (imports, data, default figures), then start the Streamlit server in the same process
 echo "Starting Streamlit server..."
-$PYTHON_CMD -m streamlit run app.py --server.address=0.0.0.0 --server.port=7860 --server.headless=true --server.enableCORS=false --server.enableXsrfProtection=false --server.enableWebsocketCompression=false
+$PYTHON_CMD serve.py --server.address=0.0.0.0 --server.port=7860 --server.headless=true --server.enableCORS=false --server.enableXsrfProtection=false --server.enableWebsocketCompression=false
 
 # Cleanup health check server when Streamlit exits
 echo "Cleaning up health check server"
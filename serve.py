@@ -0,0 +1,66 @@
+"""
+Start the Streamlit server warm.
+
+Before the server starts accepting connections, this process imports the
+app, loads the data and builds the Dashboard's default figures
+(app.warm_up). Sessions share the data manager and the figure cache, so the
+first session after a start or a scale-out finds everything ready instead
+of paying for the imports, the data load and the figure builds itself.
+
+When WARMUP_STATUS_PATH is set (run.sh sets it), a status file is written
+there once the warm-up is done, and health_check.py's /ready reports not
+ready until it exists.
+
+Usage:
+    python serve.py [streamlit run options, e.g. --server.port=7860]
+"""
+import os
+import sys
+import json
+import time
+import logging
+from utils.logs import configure_logging
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+
+configure_logging()
+logger = logging.getLogger('serve')
+
+
+def warm_up():
+    """Import the app and run app.warm_up(), returning the timings in seconds"""
+    timings = {'ok': False}
+    start = time.perf_counter()
+    try:
+        import app
+        timings['import_seconds'] = round(time.perf_counter() - start, 3)
+        app.warm_up()
+        timings['ok'] = True
+    except Exception as e:
+        # The server still starts; sessions load what they need themselves
+        logger.error("Warm-up failed: %s", e)
+    timings['total_seconds'] = round(time.perf_counter() - start, 3)
+    logger.warning("Warm-up finished in %.2fs", timings['total_seconds'])
+    return timings
+
+
+def write_status(path, timings):
+    partial = path + '.tmp'
+    with open(partial, 'w') as f:
+        json.dump({'finished_at': time.time(), **timings}, f)
+    os.replace(partial, path)
+
+
+def main():
+    timings = warm_up()
+    status_path = os.environ.get('WARMUP_STATUS_PATH')
+    if status_path:
+        write_status(status_path, timings)
+
+    from streamlit.web import cli as stcli
+    sys.argv = ['streamlit', 'run', APP_PATH, *sys.argv[1:]]
+    sys.exit(stcli.main())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Dependency links when a project whose items are predecessors of another project's items changes"""
+import pandas as pd
+import pytest
+
+from components.data_manager import DataManager
+from components.db_manager import DBManager
+
+PROJECT = {'Name': 'Project', 'ISO': 'CAISO', 'Voltage': 230.0, 'Capacity': 100.0, 'Duration': 4.0,
+           'Target COD': pd.Timestamp('2027-01-01')}
+
+
+def items(project_id, item_ids, predecessors):
+    return pd.DataFrame({
+        'Item ID': item_ids,
+        'Project ID': project_id,
+        'Item Name': [f"Item {item_id}" for item_id in item_ids],
+        'Team': 'Development',
+        'Start Date': '2026-01-01',
+        'End Date': '2026-03-01',
+        'Predecessors': predecessors
+    })
+
+
+@pytest.fixture(params=['csv', 'sqlite'])
+def manager(request, tmp_path):
+    if request.param == 'csv':
+        manager = DataManager(data_dir=str(tmp_path))
+    else:
+        manager = DBManager(db_url=f"sqlite:///{tmp_path / 'portfolio.db'}", data_dir=str(tmp_path))
+    for project_id in ('P1', 'P2'):
+        assert manager.add_project(dict(PROJECT, ID=project_id))
+    assert manager.save_project_items(items('P1', ['I1', 'I2'], ['', 'I1']))
+    assert manager.save_project_items(items('P2', ['I3', 'I4'], ['I1', 'I2, I3']))
+    return manager
+
+
+def links(manager):
+    dependencies = manager.get_all_dependencies()
+    return set(zip(dependencies['Item ID'], dependencies['Predecessor ID']))
+
+
+def test_delete_project_removes_links_to_its_items(manager):
+    assert links(manager) == {('I2', 'I1'), ('I3', 'I1'), ('I4', 'I2'), ('I4', 'I3')}
+    assert manager.delete_project('P1')
+    assert links(manager) == {('I4', 'I3')}
+
+
+def test_removed_items_lose_links_to_them(manager):
+    assert manager.save_project_items(items('P1', ['I1'], ['']))
+    assert links(manager) == {('I3', 'I1'), ('I4', 'I3')}
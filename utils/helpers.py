@@ -1,6 +1,8 @@
 import streamlit as st
 import base64
 import os
+import json
+import copy
 
 def get_base64_encoded_image(image_path):
     """Get base64 encoded version of an image"""
@@ -113,4 +115,46 @@ def load_css():
             border: 1px solid #2196F3 !important;
         }
         </style>
-    """, unsafe_allow_html=True)
\ No newline at end of file
+    """, unsafe_allow_html=True)
+def get_settings_path():
+    """Path of settings.json in the data directory (DATA_DIR, default "data")"""
+    return os.path.join(os.environ.get('DATA_DIR', 'data'), 'settings.json')
+
+_settings_cache = {}
+
+def load_settings():
+    """Load settings.json, re-reading it only when the file changes"""
+    path = get_settings_path()
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return {}
+    cached = _settings_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        try:
+            with open(path) as f:
+                cached = (mtime, json.load(f))
+        except (OSError, ValueError):
+            return {}
+        _settings_cache[path] = cached
+    return cached[1]
+
+def get_user_preference(name, default=None):
+    """Read one value from the user_preferences section of settings.json"""
+    return load_settings().get('user_preferences', {}).get(name, default)
+
+def set_setting(name, value):
+    """Write one top-level section of settings.json"""
+    settings = copy.deepcopy(load_settings())
+    settings[name] = value
+    path = get_settings_path()
+    with open(path, 'w') as f:
+        json.dump(settings, f, indent=4)
+
+def set_user_preference(name, value):
+    """Write one value to the user_preferences section of settings.json"""
+    settings = copy.deepcopy(load_settings())
+    settings.setdefault('user_preferences', {})[name] = value
+    path = get_settings_path()
+    with open(path, 'w') as f:
+        json.dump(settings, f, indent=4)
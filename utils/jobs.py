@@ -0,0 +1,233 @@
+"""
+In-process background jobs for long operations (migrations, backups, exports).
+
+Jobs run on a thread pool shared by every session in the process, so at
+most MAX_WORKERS of them (JOB_WORKERS, default 2) run at once; the rest
+wait in the queue. A job function receives its Job as the first argument.
+It reports progress with job.update() and checks job.check_cancelled()
+between steps. Cancelling a queued job removes it from the queue, and a
+running job stops at its next check.
+
+Finished jobs and their output files are kept for RESULT_TTL seconds
+(JOB_RESULT_TTL, default one hour), up to MAX_RETAINED jobs.
+"""
+import os
+import time
+import uuid
+import shutil
+import tempfile
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+# Set up logging
+logger = logging.getLogger('jobs')
+
+MAX_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+RESULT_TTL = float(os.environ.get('JOB_RESULT_TTL', 3600))
+MAX_RETAINED = 50
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobCancelled(BaseException):
+    """
+    Raised by Job.check_cancelled(). Derives from BaseException so the broad
+    `except Exception` handlers in the code a job calls don't swallow it.
+    """
+
+
+class Job:
+    """State of one submitted job, safe to read from any thread"""
+
+    def __init__(self, kind, description):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.description = description
+        self.status = QUEUED
+        self.progress = None
+        self.message = ''
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.files = []
+        self._cancel = threading.Event()
+        self._future = None
+        self._output_dir = None
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    @property
+    def duration(self):
+        """Seconds spent running so far (None while queued)"""
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.time()) - self.started_at
+
+    def update(self, progress=None, message=None):
+        """Report progress (a 0-1 fraction, or None if unknown) and/or a status message"""
+        if progress is not None:
+            self.progress = max(0.0, min(1.0, progress))
+        if message is not None:
+            self.message = message
+
+    def check_cancelled(self):
+        """Raise JobCancelled if cancellation was requested"""
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def output_path(self, filename):
+        """
+        Path for an output file in this job's own directory. The file is
+        deleted together with the job when its retention ends.
+        """
+        if self._output_dir is None:
+            self._output_dir = tempfile.mkdtemp(prefix=f"job_{self.id}_")
+        path = os.path.join(self._output_dir, filename)
+        self.files.append(path)
+        return path
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'description': self.description,
+            'status': self.status,
+            'progress': self.progress,
+            'message': self.message,
+            'error': self.error,
+            'created_at': self.created_at,
+            'duration': self.duration
+        }
+
+
+class JobRunner:
+    """Runs jobs on a bounded thread pool and keeps their state for polling"""
+
+    def __init__(self, max_workers=MAX_WORKERS, result_ttl=RESULT_TTL, max_retained=MAX_RETAINED):
+        self.max_workers = max_workers
+        self.result_ttl = result_ttl
+        self.max_retained = max_retained
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._lock = threading.Lock()
+        self._jobs = {}
+        # exclusive key -> id of the active job holding it
+        self._exclusive = {}
+
+    def submit(self, kind, func, *args, description=None, exclusive_key=None, **kwargs):
+        """
+        Queue func(job, *args, **kwargs) and return its Job.
+
+        With exclusive_key, a job with the same key that is still queued or
+        running is returned instead of starting a second one.
+        """
+        self.prune()
+        with self._lock:
+            if exclusive_key is not None:
+                active = self._jobs.get(self._exclusive.get(exclusive_key))
+                if active is not None and not active.finished:
+                    return active
+
+            job = Job(kind, description or kind)
+            self._jobs[job.id] = job
+            if exclusive_key is not None:
+                self._exclusive[exclusive_key] = job.id
+            job._future = self._executor.submit(self._run, job, func, args, kwargs)
+        logger.info("Queued job %s (%s)", job.id, job.description)
+        return job
+
+    def _run(self, job, func, args, kwargs):
+        if job.cancel_requested:
+            job.status = CANCELLED
+            job.finished_at = time.time()
+            return
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = func(job, *args, **kwargs)
+            job.status = SUCCEEDED
+            job.progress = 1.0
+        except JobCancelled:
+            job.status = CANCELLED
+            job.message = job.message or 'Cancelled'
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+            logger.exception("Job %s (%s) failed", job.id, job.description)
+        finally:
+            job.finished_at = time.time()
+            logger.info("Job %s (%s) %s in %.1fs", job.id, job.description, job.status, job.duration)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self, job_ids=None, kind=None):
+        """Retained jobs, newest first, optionally limited to some IDs or one kind"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        if job_ids is not None:
+            job_ids = set(job_ids)
+            jobs = [job for job in jobs if job.id in job_ids]
+        if kind is not None:
+            jobs = [job for job in jobs if job.kind == kind]
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    def active_count(self):
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.finished)
+
+    def cancel(self, job_id):
+        """Request cancellation; returns False if the job is unknown or already finished"""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return False
+        job._cancel.set()
+        # A job still in the queue never starts
+        if job._future is not None and job._future.cancel():
+            job.status = CANCELLED
+            job.finished_at = time.time()
+        logger.info("Cancellation requested for job %s (%s)", job.id, job.description)
+        return True
+
+    def prune(self):
+        """Forget finished jobs past their retention and delete their output files"""
+        now = time.time()
+        with self._lock:
+            finished = sorted((job for job in self._jobs.values() if job.finished),
+                              key=lambda job: job.finished_at or job.created_at)
+            expired = [job for job in finished if now - (job.finished_at or now) > self.result_ttl]
+            overflow = len(self._jobs) - len(expired) - self.max_retained
+            if overflow > 0:
+                expired += [job for job in finished if job not in expired][:overflow]
+            for job in expired:
+                del self._jobs[job.id]
+        for job in expired:
+            if job._output_dir is not None:
+                shutil.rmtree(job._output_dir, ignore_errors=True)
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_runner():
+    """The process-wide job runner shared by all sessions"""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner()
+        return _runner
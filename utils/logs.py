@@ -0,0 +1,187 @@
+"""
+Logging configuration and helpers for hot paths.
+
+Entry points (app.py, pages, health_check.py, the migration script) call
+configure_logging() once. Modules keep using logging.getLogger(name) with
+%-style arguments, so a message is only formatted if a handler emits it.
+The helpers cover the costlier cases:
+
+    lazy(func, *args)   an argument computed only when the record is formatted
+    log_rows(...)       one summary record for many offending rows
+    RowSummary          the same, for rows reported one at a time in a loop
+
+Handlers set up here rate-limit repeated records: after SAMPLE_BURST
+records with the same logger, level and message template within
+SAMPLE_INTERVAL seconds, further ones are dropped until the interval ends.
+The next record that gets through notes how many were dropped. Errors are
+never dropped.
+
+Environment variables:
+    LOG_LEVEL  level name for the root logger (default: the entry point's level)
+    LOG_FILE   also append records to this file
+"""
+import os
+import sys
+import time
+import threading
+import logging
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# Records per (logger, level, template) allowed within SAMPLE_INTERVAL seconds
+SAMPLE_BURST = 10
+SAMPLE_INTERVAL = 60.0
+# Example rows included in a row summary
+MAX_EXAMPLES = 5
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+class SamplingFilter(logging.Filter):
+    """Drops repeats of the same message template beyond a burst per interval"""
+
+    def __init__(self, burst=SAMPLE_BURST, interval=SAMPLE_INTERVAL):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self._lock = threading.Lock()
+        # key -> [window start, records in window, records dropped]
+        self._windows = {}
+
+    def filter(self, record):
+        if record.levelno >= logging.ERROR:
+            return True
+        # The filter is shared by all handlers; decide once per record
+        decision = getattr(record, '_sampled', None)
+        if decision is not None:
+            return decision
+        record._sampled = self._sample(record)
+        return record._sampled
+
+    def _sample(self, record):
+        key = (record.name, record.levelno, record.msg if isinstance(record.msg, str) else type(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                dropped = window[2] if window is not None else 0
+                self._windows[key] = [now, 1, 0]
+            elif window[1] < self.burst:
+                window[1] += 1
+                dropped = 0
+            else:
+                window[2] += 1
+                return False
+
+        if dropped:
+            record.msg = f"{record.msg} ({dropped} similar records dropped in the previous {self.interval:.0f}s)"
+        return True
+
+
+def configure_logging(level=logging.WARNING, filename=None, stream=sys.stdout, force=False):
+    """
+    Set up the root logger once per process: a stream handler, plus a file
+    handler when filename or LOG_FILE is given. Later calls are ignored
+    unless force is set.
+    """
+    global _configured
+    with _configure_lock:
+        if _configured and not force:
+            return
+        level = os.environ.get('LOG_LEVEL', '').upper() or level
+        filename = os.environ.get('LOG_FILE') or filename
+
+        handlers = []
+        if stream is not None:
+            handlers.append(logging.StreamHandler(stream))
+        if filename:
+            try:
+                handlers.append(logging.FileHandler(filename))
+            except OSError as e:
+                print(f"Could not open log file {filename}: {e}", file=sys.stderr)
+
+        sampler = SamplingFilter()
+        for handler in handlers:
+            handler.addFilter(sampler)
+        logging.basicConfig(level=level, format=LOG_FORMAT, handlers=handlers, force=True)
+        _configured = True
+
+
+class lazy:
+    """
+    Log argument whose value is computed only when the record is formatted:
+
+        logger.debug("Values: %s", lazy(df['Start Date'].tolist))
+    """
+
+    __slots__ = ('func', 'args')
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+    def __str__(self):
+        return str(self.func(*self.args))
+
+    __repr__ = __str__
+
+
+def _format_examples(rows, columns, max_examples):
+    examples = rows[columns].head(max_examples).to_dict('records')
+    text = '; '.join(', '.join(f"{column}={example[column]!r}" for column in columns) for example in examples)
+    if len(rows) > max_examples:
+        text += f"; and {len(rows) - max_examples} more"
+    return text
+
+
+def log_rows(logger, level, message, rows, columns, max_examples=MAX_EXAMPLES):
+    """
+    Log one record for a DataFrame of offending rows: the message, the row
+    count and the first few rows as examples. Nothing is built unless the
+    logger emits at this level.
+    """
+    if rows.empty or not logger.isEnabledFor(level):
+        return
+    logger.log(level, "%s: %d rows (e.g. %s)", message, len(rows),
+               lazy(_format_examples, rows, columns, max_examples))
+
+
+class RowSummary:
+    """
+    Collects rows reported one at a time in a loop and logs a single summary
+    when the block ends:
+
+        with RowSummary(logger, "No timeline items for project") as missing:
+            for project_id in ids:
+                ...
+                missing.add(project_id)
+    """
+
+    def __init__(self, logger, message, level=logging.WARNING, max_examples=MAX_EXAMPLES):
+        self.logger = logger
+        self.message = message
+        self.level = level
+        self.max_examples = max_examples
+        self.count = 0
+        self.examples = []
+
+    def add(self, example):
+        self.count += 1
+        if len(self.examples) < self.max_examples:
+            self.examples.append(example)
+
+    def flush(self):
+        if self.count and self.logger.isEnabledFor(self.level):
+            examples = '; '.join(str(example) for example in self.examples)
+            if self.count > len(self.examples):
+                examples += f"; and {self.count - len(self.examples)} more"
+            self.logger.log(self.level, "%s: %d rows (e.g. %s)", self.message, self.count, examples)
+        self.count = 0
+        self.examples = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+        return False
@@ -0,0 +1,332 @@
+"""
+Process metrics in the Prometheus text exposition format.
+
+Counters, gauges and histograms are kept in a registry. Each metric
+family can be rendered as text for /metrics, or written to a JSON
+snapshot. The Streamlit process exports its snapshot to a file
+(METRICS_EXPORT_PATH, default app_metrics.json), and health_check.py serves
+that snapshot together with its own metrics.
+"""
+import os
+import json
+import time
+import bisect
+import threading
+import functools
+import logging
+
+# Set up logging
+logger = logging.getLogger('metrics')
+
+# Latency buckets in seconds, from 1ms to 30s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Seconds between snapshot exports from the app process
+EXPORT_INTERVAL = 10.0
+
+
+def _label_key(labelnames, labels):
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {sorted(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _labels(self, key):
+        return dict(zip(self.labelnames, key))
+
+    def family(self):
+        """This metric as a family dict: name, type, help and (suffix, labels, value) samples"""
+        return {'name': self.name, 'type': self.type, 'help': self.documentation, 'samples': self.samples()}
+
+
+class Counter(_Metric):
+    """A monotonically increasing count"""
+
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [('', self._labels(key), value) for key, value in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    """A value that can go up and down, or be computed when collected"""
+
+    type = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        # callback() returns a list of (labels dict, value) pairs
+        self.callback = callback
+
+    def set(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self):
+        if self.callback is not None:
+            try:
+                return [('', labels, value) for labels, value in self.callback()]
+            except Exception as e:
+                logger.warning("Could not collect gauge %s: %s", self.name, e)
+                return []
+        with self._lock:
+            return [('', self._labels(key), value) for key, value in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets, plus their sum and count"""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (last slot is +Inf), sum
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def time(self, **labels):
+        """Decorator observing the duration of each call"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - start, **labels)
+            return wrapper
+        return decorator
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(state[0]), state[1]) for key, state in sorted(self._values.items())]
+
+        samples = []
+        for key, counts, total in items:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                samples.append(('_bucket', dict(labels, le=_format_value(bound)), cumulative))
+            samples.append(('_sum', labels, total))
+            samples.append(('_count', labels, cumulative))
+        return samples
+
+
+class Registry:
+    """A set of metrics that are collected and rendered together"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def unregister(self, name):
+        with self._lock:
+            self._metrics.pop(name, None)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), callback=None):
+        return self.register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def collect(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return [metric.family() for metric in metrics]
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if value == float('-inf'):
+        return '-Inf'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def render_text(families):
+    """Render metric families in the Prometheus text exposition format (version 0.0.4)"""
+    lines = []
+    for family in families:
+        help_text = family['help'].replace('\\', '\\\\').replace('\n', '\\n')
+        lines.append(f"# HELP {family['name']} {help_text}")
+        lines.append(f"# TYPE {family['name']} {family['type']}")
+        for suffix, labels, value in family['samples']:
+            label_text = ','.join(f'{name}="{_escape_label(label)}"' for name, label in labels.items())
+            label_text = f"{{{label_text}}}" if label_text else ''
+            lines.append(f"{family['name']}{suffix}{label_text} {_format_value(value)}")
+    return '\n'.join(lines) + '\n'
+
+
+def with_labels(families, **labels):
+    """Copy of families with extra labels added to every sample"""
+    return [
+        dict(family, samples=[(suffix, dict(sample_labels, **labels), value)
+                              for suffix, sample_labels, value in family['samples']])
+        for family in families
+    ]
+
+
+def merge_families(*family_lists):
+    """Combine family lists, joining the samples of families with the same name"""
+    merged = {}
+    for families in family_lists:
+        for family in families:
+            if family['name'] in merged:
+                merged[family['name']]['samples'].extend(family['samples'])
+            else:
+                merged[family['name']] = dict(family, samples=list(family['samples']))
+    return list(merged.values())
+
+
+REGISTRY = Registry()
+
+# Metrics recorded by the app
+DATA_LOAD_SECONDS = REGISTRY.histogram(
+    'timeline_data_load_seconds', 'Time spent loading projects and items from storage',
+    ['backend', 'operation'])
+DATA_SAVE_SECONDS = REGISTRY.histogram(
+    'timeline_data_save_seconds', 'Time spent writing projects and items to storage',
+    ['backend', 'operation'])
+FIGURE_BUILD_SECONDS = REGISTRY.histogram(
+    'timeline_figure_build_seconds', 'Time spent building Plotly figures',
+    ['chart'])
+CACHE_REQUESTS = REGISTRY.counter(
+    'timeline_cache_requests_total', 'Cache lookups by cache and result (hit or miss)',
+    ['cache', 'result'])
+DB_POOL_CHECKOUTS = REGISTRY.counter(
+    'timeline_db_pool_checkouts_total', 'Connections checked out of the database pool')
+
+_pools = []
+
+
+def _pool_stats():
+    stats = []
+    for pool in list(_pools):
+        for stat in ('checkedout', 'overflow', 'size'):
+            value = getattr(pool, stat, None)
+            if callable(value):
+                stats.append(({'stat': stat}, value()))
+    return stats
+
+
+DB_POOL_CONNECTIONS = REGISTRY.gauge(
+    'timeline_db_pool_connections', 'Database pool connections checked out, in overflow, and pool size',
+    ['stat'], callback=_pool_stats)
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def observe_methods(histogram, methods, **labels):
+    """Class decorator timing the named methods into histogram, labelled with operation=<method>"""
+    def decorator(cls):
+        for method in methods:
+            setattr(cls, method, histogram.time(operation=method, **labels)(getattr(cls, method)))
+        return cls
+    return decorator
+
+
+def instrument_engine(engine):
+    """Count pool checkouts and report pool occupancy for a SQLAlchemy engine"""
+    from sqlalchemy import event
+
+    event.listen(engine, 'checkout', lambda *args: DB_POOL_CHECKOUTS.inc())
+    _pools.append(engine.pool)
+
+
+def get_export_path():
+    """File the app's metrics snapshot is written to (METRICS_EXPORT_PATH, default app_metrics.json)"""
+    return os.environ.get('METRICS_EXPORT_PATH', 'app_metrics.json')
+
+
+def export_snapshot(path=None, registry=REGISTRY):
+    """Write the registry's families to a JSON snapshot, replacing it atomically"""
+    path = path or get_export_path()
+    document = {'updated_at': time.time(), 'pid': os.getpid(), 'families': registry.collect()}
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'w') as f:
+            json.dump(document, f)
+        os.replace(temp_path, path)
+        return True
+    except OSError as e:
+        logger.warning("Could not export metrics to %s: %s", path, e)
+        return False
+
+
+def load_snapshot(path=None):
+    """Read a snapshot written by export_snapshot (None if missing or unreadable)"""
+    path = path or get_export_path()
+    try:
+        with open(path) as f:
+            document = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # JSON turns the sample tuples into lists
+    for family in document.get('families', []):
+        family['samples'] = [tuple(sample) for sample in family['samples']]
+    return document
+
+
+_exporter_lock = threading.Lock()
+_exporter = None
+
+
+def start_exporter(interval=EXPORT_INTERVAL):
+    """Export the snapshot every `interval` seconds from a daemon thread (once per process)"""
+    global _exporter
+    with _exporter_lock:
+        if _exporter is not None:
+            return _exporter
+
+        def run():
+            while True:
+                export_snapshot()
+                time.sleep(interval)
+
+        _exporter = threading.Thread(target=run, name='metrics-exporter', daemon=True)
+        _exporter.start()
+        logger.info("Exporting metrics to %s every %.0fs", get_export_path(), interval)
+        return _exporter
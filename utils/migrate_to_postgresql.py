@@ -1,5 +1,4 @@
 import os
-import pandas as pd
 import logging
 import sys
 import argparse
@@ -7,24 +6,27 @@ import argparse
 # Add parent directory to path to allow imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('migration.log'),
-        logging.StreamHandler()
-    ]
-)
+from utils.logs import configure_logging
+from components.bulk_loader import CsvBulkLoader, CHUNK_ROWS, LOAD_LOCK
+
+# Logging is configured in __main__ when run as a script
 logger = logging.getLogger('migration')
 
-def migrate_data(force=False):
+def migrate_data(force=False, data_dir=None, chunk_rows=CHUNK_ROWS, progress=None):
     """
-    Migrate data from CSV files to PostgreSQL database
-    
+    Migrate data from CSV files to the database (DATABASE_URL)
+
+    The CSV files are streamed in chunks and bulk loaded (COPY on PostgreSQL).
+    Progress is checkpointed per chunk, so running the migration again after
+    an interruption resumes where it stopped.
+
     Args:
-        force (bool): If True, overwrite existing data in database. If False, only migrate if tables are empty.
-    
+        force (bool): If True, overwrite existing data in database. If False, only migrate if tables are empty
+            (or resume an interrupted migration).
+        data_dir (str): Directory with projects.csv and items.csv (default: DATA_DIR or data)
+        chunk_rows (int): CSV rows loaded per transaction
+        progress (callable): Called with the LoadStats of a table after every chunk
+
     Returns:
         bool: True if migration was successful, False otherwise
     """
@@ -33,93 +35,70 @@ def migrate_data(force=False):
         if not os.environ.get('DATABASE_URL'):
             logger.error("DATABASE_URL environment variable not set. Cannot migrate to database.")
             return False
-            
-        logger.info("Starting migration from CSV to PostgreSQL...")
-        
-        # Import database manager
+
+        data_dir = data_dir or os.environ.get('DATA_DIR', 'data')
+        logger.info("Starting migration from CSV files in %s...", data_dir)
+
+        if not os.path.exists(os.path.join(data_dir, 'projects.csv')):
+            logger.error("projects.csv not found, cannot migrate")
+            return False
+
+        # Import database manager - the migration does the CSV import itself
         try:
             from components.db_manager import DBManager
-            db_manager = DBManager()
+            db_manager = DBManager(data_dir=data_dir, import_csv=False)
             logger.info("Database manager initialized successfully")
         except Exception as e:
-            logger.error(f"Error initializing database manager: {e}")
+            logger.error("Error initializing database manager: %s", e)
             return False
-        
-        # Check if projects table has data (if not forcing migration)
-        if not force:
-            with db_manager.engine.connect() as connection:
-                project_count = connection.execute(
-                    "SELECT COUNT(*) FROM projects"
-                ).scalar()
-                
-                if project_count > 0:
-                    logger.info(f"Database already has {project_count} projects. Use --force to overwrite.")
-                    return False
-        
-        # If forcing migration, clear existing data
-        if force:
-            logger.info("Forcing migration - clearing existing database data")
-            with db_manager.engine.connect() as connection:
-                connection.execute("DELETE FROM items")
-                connection.execute("DELETE FROM projects")
-                connection.commit()
-        
-        # Read CSV files
-        try:
-            projects_df = pd.read_csv("data/projects.csv")
-            logger.info(f"Read {len(projects_df)} projects from CSV")
-            
-            try:
-                items_df = pd.read_csv("data/items.csv")
-                logger.info(f"Read {len(items_df)} items from CSV")
-            except FileNotFoundError:
-                items_df = pd.DataFrame()
-                logger.warning("items.csv not found, creating empty dataframe")
-        except FileNotFoundError:
-            logger.error("projects.csv not found, cannot migrate")
-            return False
-        
-        # Process projects data
-        projects_df = projects_df.rename(columns={"Target COD": "Target_COD"})
-        projects_df['Target_COD'] = pd.to_datetime(projects_df['Target_COD'], format='mixed')
-        
-        # Insert projects into database
-        projects_df.to_sql('projects', db_manager.engine, if_exists='append', index=False)
-        logger.info(f"Migrated {len(projects_df)} projects to database")
-        
-        # Process items data if it exists
-        if not items_df.empty:
-            items_df = items_df.rename(columns={
-                "Item ID": "Item_ID",
-                "Project ID": "Project_ID",
-                "Item Name": "Item_Name",
-                "Start Date": "Start_Date",
-                "End Date": "End_Date"
-            })
-            
-            # Convert date columns
-            items_df['Start_Date'] = pd.to_datetime(items_df['Start_Date'], format='mixed')
-            items_df['End_Date'] = pd.to_datetime(items_df['End_Date'], format='mixed')
-            
-            # Insert items into database
-            items_df.to_sql('items', db_manager.engine, if_exists='append', index=False)
-            logger.info(f"Migrated {len(items_df)} items to database")
-        
-        logger.info("Migration completed successfully")
+
+        loader = CsvBulkLoader(db_manager, data_dir=data_dir, chunk_rows=chunk_rows, progress=progress)
+
+        # Waits for any other load in this process (e.g. a startup import) to finish
+        with LOAD_LOCK:
+            if force:
+                # If forcing migration, clear existing data
+                logger.info("Forcing migration - clearing existing database data")
+                loader.clear()
+            elif not loader.needs_load('projects') and not loader.needs_load('items'):
+                # Tables already have data and there is no interrupted migration to resume
+                logger.info("Database already has data. Use --force to overwrite.")
+                return False
+
+            results = loader.load_all(only_empty=not force)
+
+        total_rows = sum(stats.rows for stats in results)
+        total_seconds = sum(stats.seconds for stats in results)
+        for stats in results:
+            logger.info("Migrated %s", stats)
+        logger.info("Migration completed successfully: %s rows in %.2fs", format(total_rows, ','), total_seconds)
         return True
-    
+
     except Exception as e:
-        logger.error(f"Error during migration: {e}")
-        import traceback
-        logger.error(traceback.format_exc())
+        logger.exception("Error during migration: %s", e)
         return False
 
 if __name__ == "__main__":
+    configure_logging(level=logging.INFO, filename='migration.log', stream=sys.stderr)
+
     parser = argparse.ArgumentParser(description="Migrate data from CSV to PostgreSQL")
     parser.add_argument('--force', action='store_true', help='Force migration even if tables have data')
+    parser.add_argument('--data-dir', help='Directory with projects.csv and items.csv (default: DATA_DIR or data)')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help='CSV rows loaded per transaction')
     args = parser.parse_args()
-    
-    success = migrate_data(force=args.force)
+
+    last_table = []
+
+    def print_progress(stats):
+        # One updating line per table
+        if last_table and last_table[-1] != stats.table:
+            print()
+        last_table.append(stats.table)
+        print(f"\r{stats}", end='', flush=True)
+
+    success = migrate_data(force=args.force, data_dir=args.data_dir, chunk_rows=args.chunk_rows,
+                           progress=print_progress)
+    print()
     if success:
         print("Migration completed successfully")
     else:
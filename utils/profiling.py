@@ -0,0 +1,234 @@
+"""
+On-demand cProfile capture for slow reruns.
+
+Profiling is enabled for the whole process with the PROFILE_RERUNS
+environment variable, or for one browser session with the ?profile=1
+query parameter. A sampled fraction of reruns runs under cProfile (a
+deterministic profiler). If the profiled rerun takes longer than the
+threshold, the profile is written to a ring of .prof files: once the ring
+is full, the oldest file is deleted.
+
+Settings (environment variables):
+    PROFILE_RERUNS       1 to profile reruns in every session (default off)
+    PROFILE_SAMPLE_RATE  fraction of reruns profiled (default 0.05; 1 with ?profile=1)
+    PROFILE_THRESHOLD_MS minimum rerun duration to keep a profile (default 1000)
+    PROFILE_DIR          directory for the .prof files (default profiles)
+    PROFILE_MAX_FILES    number of profiles kept (default 20)
+
+Fragments decorated with @profiled are sampled the same way when they
+rerun on their own; inside a rerun that is already being profiled (or
+was not sampled) they add nothing.
+
+Reruns that are not sampled are not profiled at all, and only one rerun
+is profiled at a time per process. This keeps the overhead low enough to
+leave profiling on in production with a small sample rate.
+"""
+import os
+import re
+import time
+import random
+import pstats
+import functools
+import cProfile
+import threading
+import logging
+from datetime import datetime
+
+# Set up logging
+logger = logging.getLogger('profiling')
+
+PROFILE_SUFFIX = '.prof'
+# <timestamp>_<label>_<duration>ms.prof, as written by save_profile
+_FILENAME = re.compile(r'^(\d{8}-\d{6}-\d{6})_(.+)_(\d+)ms\.prof$')
+
+# cProfile can't profile two reruns of the same process at once reliably, and
+# Python 3.12+ refuses a second active profiler outright
+_profiler_lock = threading.Lock()
+_ring_lock = threading.Lock()
+# Per thread: whether a profile_rerun block is open (sampled or not)
+_local = threading.local()
+
+
+def _env_flag(name):
+    return os.environ.get(name, '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def get_profile_dir():
+    """Directory profiles are written to (PROFILE_DIR, default profiles)"""
+    return os.environ.get('PROFILE_DIR', 'profiles')
+
+
+def get_threshold_ms():
+    return float(os.environ.get('PROFILE_THRESHOLD_MS', 1000))
+
+
+def get_max_files():
+    return max(1, int(os.environ.get('PROFILE_MAX_FILES', 20)))
+
+
+def get_sample_rate(requested=False):
+    """
+    Fraction of reruns to profile: PROFILE_SAMPLE_RATE when PROFILE_RERUNS
+    is set, every rerun when the session asked for it with ?profile=1, else 0.
+    """
+    if requested:
+        return 1.0
+    if _env_flag('PROFILE_RERUNS'):
+        return min(1.0, max(0.0, float(os.environ.get('PROFILE_SAMPLE_RATE', 0.05))))
+    return 0.0
+
+
+def _slug(label):
+    return re.sub(r'[^A-Za-z0-9]+', '-', label).strip('-').lower() or 'rerun'
+
+
+def save_profile(profiler, label, duration_ms, profile_dir=None, max_files=None):
+    """Write a finished profile into the ring and drop the oldest files beyond max_files"""
+    profile_dir = profile_dir or get_profile_dir()
+    max_files = max_files or get_max_files()
+    filename = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}_{_slug(label)}_{duration_ms:.0f}ms{PROFILE_SUFFIX}"
+    path = os.path.join(profile_dir, filename)
+    try:
+        os.makedirs(profile_dir, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        profiler.dump_stats(temp_path)
+        os.replace(temp_path, path)
+    except OSError as e:
+        logger.warning("Could not write profile to %s: %s", path, e)
+        return None
+
+    with _ring_lock:
+        for old in list_profiles(profile_dir)[max_files:]:
+            try:
+                os.remove(old['path'])
+            except OSError as e:
+                logger.warning("Could not remove old profile %s: %s", old['path'], e)
+    logger.info("Saved profile of %s (%.0f ms) to %s", label, duration_ms, path)
+    return path
+
+
+class profile_rerun:
+    """
+    Context manager profiling one rerun when it is sampled.
+
+    The profile is kept only if the block took at least threshold_ms.
+    `.path` holds the saved file afterwards (None if nothing was kept).
+    """
+
+    def __init__(self, label, requested=False, threshold_ms=None):
+        self.label = label
+        self.sample_rate = get_sample_rate(requested)
+        self.threshold_ms = get_threshold_ms() if threshold_ms is None else threshold_ms
+        self.profiler = None
+        self.path = None
+        self._start = None
+        self._outermost = False
+
+    def __enter__(self):
+        # A block inside another (a fragment within a full rerun) was sampled with it
+        if getattr(_local, 'active', False):
+            return self
+        _local.active = self._outermost = True
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return self
+        # Skip rather than wait if another session's rerun is being profiled
+        if not _profiler_lock.acquire(blocking=False):
+            return self
+        self.profiler = cProfile.Profile()
+        try:
+            self.profiler.enable()
+        except ValueError as e:
+            # Another profiler (e.g. a debugger) is already active
+            logger.info("Profiling skipped for %s: %s", self.label, e)
+            self.profiler = None
+            _profiler_lock.release()
+            return self
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._outermost:
+            _local.active = False
+        if self.profiler is None:
+            return False
+        try:
+            self.profiler.disable()
+        finally:
+            _profiler_lock.release()
+        duration_ms = (time.perf_counter() - self._start) * 1000
+        if duration_ms >= self.threshold_ms:
+            self.path = save_profile(self.profiler, self.label, duration_ms)
+        return False
+
+
+def profiled(label, requested=None):
+    """
+    Decorator running each call under profile_rerun(label), so a fragment
+    rerunning on its own is sampled like a full rerun. requested() is called
+    on every call, e.g. to read the ?profile=1 query parameter.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with profile_rerun(label, requested=requested() if requested is not None else False):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def list_profiles(profile_dir=None):
+    """Saved profiles, newest first, with the label and duration from their file names"""
+    profile_dir = profile_dir or get_profile_dir()
+    try:
+        names = os.listdir(profile_dir)
+    except OSError:
+        return []
+
+    profiles = []
+    for name in names:
+        match = _FILENAME.match(name)
+        if not match:
+            continue
+        path = os.path.join(profile_dir, name)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            # Removed by another process pruning the ring
+            continue
+        profiles.append({
+            'name': name,
+            'path': path,
+            'captured_at': datetime.strptime(match.group(1), '%Y%m%d-%H%M%S-%f'),
+            'label': match.group(2),
+            'duration_ms': int(match.group(3)),
+            'size_bytes': size
+        })
+    profiles.sort(key=lambda profile: profile['captured_at'], reverse=True)
+    return profiles
+
+
+def summarize_profile(path, limit=25, sort='cumulative'):
+    """
+    The top `limit` functions of a saved profile by cumulative (or total)
+    time, as a list of dicts. Returns an empty list if the file can't be read.
+    """
+    try:
+        stats = pstats.Stats(path)
+    except (OSError, EOFError, TypeError, ValueError) as e:
+        logger.warning("Could not read profile %s: %s", path, e)
+        return []
+
+    rows = []
+    for (filename, line, function), (primitive_calls, calls, total, cumulative, _callers) in stats.stats.items():
+        rows.append({
+            'function': function,
+            'location': f"{filename}:{line}" if line else filename,
+            'calls': calls,
+            'primitive_calls': primitive_calls,
+            'total_ms': total * 1000,
+            'cumulative_ms': cumulative * 1000,
+            'per_call_ms': cumulative / calls * 1000 if calls else 0.0
+        })
+    key = 'total_ms' if sort == 'total' else 'cumulative_ms'
+    rows.sort(key=lambda row: row[key], reverse=True)
+    return rows[:limit]
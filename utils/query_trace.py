@@ -0,0 +1,341 @@
+"""
+Opt-in SQL query tracing built on SQLAlchemy engine events.
+
+While enabled, every statement an instrumented engine runs is recorded
+(statement, normalized shape, duration, rows) in the active query logs.
+A log normally covers one rerun. Statements with the same shape repeated
+N_PLUS_ONE_THRESHOLD times or more in one log are reported as N+1
+offenders, e.g. get_project_items called once per project in a loop.
+
+Listeners are only attached while tracing is enabled, so a disabled tracer
+adds nothing to query execution.
+
+Query budgets can be checked from a test or CI job:
+    python -m utils.query_trace --view Dashboard --max-queries 10
+"""
+import os
+import re
+import sys
+import time
+import weakref
+import functools
+import threading
+import logging
+from collections import Counter
+
+# Add parent directory to path to allow imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import tracing
+
+# Set up logging
+logger = logging.getLogger('query_trace')
+
+# Same-shape statements per log at which a pattern is flagged as N+1
+N_PLUS_ONE_THRESHOLD = 5
+
+_enabled = False
+# Open query_budget blocks, which keep tracing on regardless of the setting
+_forced = 0
+_enabled_lock = threading.Lock()
+_engines = weakref.WeakSet()
+_local = threading.local()
+# Logs that record statements from every thread (used around AppTest runs)
+_global_logs = []
+
+_WHITESPACE = re.compile(r'\s+')
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%\(\w+\)s|%s|:\w+|\$\d+|\?')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+
+
+def normalize_statement(statement):
+    """Shape of a statement: literals and bind parameters replaced by ?, IN lists collapsed"""
+    shape = _WHITESPACE.sub(' ', statement).strip()
+    shape = _STRING_LITERAL.sub('?', shape)
+    shape = _PLACEHOLDER.sub('?', shape)
+    shape = _NUMBER_LITERAL.sub('?', shape)
+    return _PLACEHOLDER_LIST.sub('(?...)', shape)
+
+
+class QueryRecord:
+    __slots__ = ('statement', 'shape', 'start', 'duration', 'rows', 'executemany')
+
+    def __init__(self, statement, start, duration, rows, executemany):
+        self.statement = statement
+        self.shape = normalize_statement(statement)
+        self.start = start
+        self.duration = duration
+        self.rows = rows
+        self.executemany = executemany
+
+    def to_dict(self):
+        return {
+            'statement': self.statement,
+            'shape': self.shape,
+            'duration_ms': self.duration * 1000,
+            'rows': self.rows,
+            'executemany': self.executemany
+        }
+
+
+class QueryLog:
+    """The statements recorded during one rerun (or one capture block)"""
+
+    def __init__(self, label=None):
+        self.label = label
+        self.queries = []
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        with self._lock:
+            self.queries.append(record)
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def total_ms(self):
+        return sum(query.duration for query in self.queries) * 1000
+
+    def offenders(self, threshold=N_PLUS_ONE_THRESHOLD):
+        """Shapes executed at least `threshold` times, most frequent first"""
+        counts = Counter(query.shape for query in self.queries)
+        offenders = []
+        for shape, count in counts.most_common():
+            if count < threshold:
+                break
+            total = sum(query.duration for query in self.queries if query.shape == shape)
+            offenders.append({'shape': shape, 'count': count, 'total_ms': total * 1000})
+        return offenders
+
+    def to_dict(self):
+        return {
+            'label': self.label,
+            'count': self.count,
+            'total_ms': self.total_ms,
+            'queries': [query.to_dict() for query in self.queries],
+            'offenders': self.offenders()
+        }
+
+    def report(self):
+        """Multi-line summary used in budget failures and logs"""
+        lines = [f"{self.count} queries, {self.total_ms:.1f} ms total"]
+        for offender in self.offenders():
+            lines.append(f"  N+1: {offender['count']}x {offender['shape']}")
+        shapes = Counter(query.shape for query in self.queries)
+        for shape, count in shapes.most_common(10):
+            lines.append(f"  {count:>4}x {shape}")
+        return '\n'.join(lines)
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_trace_start = time.perf_counter()
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_query_trace_start', None)
+    if start is None:
+        return
+    duration = time.perf_counter() - start
+    logs = list(getattr(_local, 'logs', ())) + _global_logs
+    # Drivers report -1 for SELECT row counts they don't know yet (e.g. SQLite)
+    rows = cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else None
+    if logs:
+        record = QueryRecord(statement, start, duration, rows, executemany)
+        for log in logs:
+            log.add(record)
+    tracing.add_span(f"sql {statement.split(None, 1)[0].upper() if statement else ''}", start, duration, rows)
+
+
+def _attach(engine):
+    from sqlalchemy import event
+    if not event.contains(engine, 'before_cursor_execute', _before_execute):
+        event.listen(engine, 'before_cursor_execute', _before_execute)
+        event.listen(engine, 'after_cursor_execute', _after_execute)
+
+
+def _detach(engine):
+    from sqlalchemy import event
+    if event.contains(engine, 'before_cursor_execute', _before_execute):
+        event.remove(engine, 'before_cursor_execute', _before_execute)
+        event.remove(engine, 'after_cursor_execute', _after_execute)
+
+
+def instrument_engine(engine):
+    """Register an engine; its statements are recorded whenever tracing is enabled"""
+    with _enabled_lock:
+        _engines.add(engine)
+        if is_enabled():
+            _attach(engine)
+
+
+def is_enabled():
+    return _enabled or _forced > 0
+
+
+def _update_listeners():
+    """Attach or detach the listeners on every registered engine (caller holds the lock)"""
+    for engine in list(_engines):
+        if is_enabled():
+            _attach(engine)
+        else:
+            _detach(engine)
+
+
+def set_enabled(enabled):
+    """Turn query tracing on or off (the Settings page preference)"""
+    global _enabled
+    with _enabled_lock:
+        if bool(enabled) == _enabled:
+            return
+        _enabled = bool(enabled)
+        _update_listeners()
+    logger.info("Query tracing %s", 'enabled' if enabled else 'disabled')
+
+
+def _force(delta):
+    global _forced
+    with _enabled_lock:
+        _forced += delta
+        _update_listeners()
+
+
+class capture_queries:
+    """
+    Context manager collecting the statements run inside the block.
+
+    Captures nest; a statement is added to every open log. With
+    all_threads=True statements from any thread are collected, which is
+    needed when the code under test runs on another thread (AppTest).
+    """
+
+    def __init__(self, label=None, all_threads=False):
+        self.log = QueryLog(label)
+        self.all_threads = all_threads
+
+    def __enter__(self):
+        if self.all_threads:
+            _global_logs.append(self.log)
+        else:
+            if not hasattr(_local, 'logs'):
+                _local.logs = []
+            _local.logs.append(self.log)
+        return self.log
+
+    def __exit__(self, *exc_info):
+        if self.all_threads:
+            _global_logs.remove(self.log)
+        else:
+            _local.logs.remove(self.log)
+        return False
+
+
+def captured(label, on_log=None):
+    """
+    Decorator collecting the statements of each call made outside any open
+    capture into a log of its own, so fragment-only reruns are recorded too.
+    on_log(log) is called with the finished log. Does nothing while disabled.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not is_enabled() or getattr(_local, 'logs', None):
+                return func(*args, **kwargs)
+            with capture_queries(label) as log:
+                result = func(*args, **kwargs)
+            if on_log is not None:
+                on_log(log)
+            return result
+        return wrapper
+    return decorator
+
+
+def warn_offenders(log, threshold=N_PLUS_ONE_THRESHOLD):
+    """Log a warning for each N+1 pattern in a finished log"""
+    for offender in log.offenders(threshold):
+        logger.warning("N+1 query pattern in %s: %dx (%.1f ms) %s", log.label or 'rerun',
+                       offender['count'], offender['total_ms'], offender['shape'])
+
+
+class QueryBudgetExceeded(AssertionError):
+    def __init__(self, label, max_queries, log):
+        self.log = log
+        super().__init__(f"{label} ran {log.count} queries, budget is {max_queries}\n{log.report()}")
+
+
+class query_budget:
+    """
+    Context manager asserting that the block runs at most max_queries statements.
+
+    Keeps tracing on for the duration of the block, whatever the setting.
+    """
+
+    def __init__(self, max_queries, label='block', all_threads=False):
+        self.max_queries = max_queries
+        self.capture = capture_queries(label, all_threads=all_threads)
+
+    def __enter__(self):
+        _force(1)
+        return self.capture.__enter__()
+
+    def __exit__(self, exc_type, *exc_info):
+        self.capture.__exit__(exc_type, *exc_info)
+        _force(-1)
+        if exc_type is None and self.capture.log.count > self.max_queries:
+            raise QueryBudgetExceeded(self.capture.log.label, self.max_queries, self.capture.log)
+        return False
+
+
+def assert_query_budget(func, max_queries, *args, **kwargs):
+    """Call func(*args, **kwargs) and fail if it runs more than max_queries statements"""
+    with query_budget(max_queries, label=getattr(func, '__name__', 'function')):
+        return func(*args, **kwargs)
+
+
+def assert_view_query_budget(view, max_queries, app_path=None, timeout=120):
+    """
+    Open the app with AppTest, switch to `view` and fail if that rerun runs
+    more than max_queries statements.
+
+    The app must be configured for database storage (DATABASE_URL). Returns
+    the QueryLog of the view's rerun.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    app_path = app_path or os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+    app = AppTest.from_file(app_path, default_timeout=timeout)
+    app.run()
+    with query_budget(max_queries, label=f"view {view}", all_threads=True) as log:
+        app.button_group(key="view_selector").set_value(view).run()
+    if app.exception:
+        raise AssertionError(f"View {view} raised: {app.exception[0].message}")
+    return log
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Check the number of SQL queries a view runs")
+    parser.add_argument('--view', action='append', required=True,
+                        help='View to check (Dashboard, Critical Path, Add Project, Edit Project); repeatable')
+    parser.add_argument('--max-queries', type=int, required=True, help='Query budget per view rerun')
+    args = parser.parse_args()
+
+    if not os.environ.get('DATABASE_URL'):
+        parser.error("Set DATABASE_URL - query budgets only apply to database storage")
+
+    # Use the importable module, which is the one the app's engines register with
+    from utils.query_trace import assert_view_query_budget
+
+    failed = False
+    for view_name in args.view:
+        try:
+            view_log = assert_view_query_budget(view_name, args.max_queries)
+            print(f"{view_name}: OK - {view_log.report()}")
+        except AssertionError as e:
+            failed = True
+            print(f"{view_name}: FAILED - {e}")
+    sys.exit(1 if failed else 0)
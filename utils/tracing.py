@@ -0,0 +1,324 @@
+"""
+Lightweight span instrumentation for app reruns.
+
+A trace covers one script rerun (or one fragment rerun) and holds the
+spans recorded while it was active: name, start offset, duration, nesting
+depth and row count. Spans are also folded into process-wide aggregates
+that are periodically written to a JSON file for scraping.
+
+Tracing is off by default. While it is off, a traced call costs one flag
+check before calling straight through.
+"""
+import os
+import json
+import time
+import threading
+import functools
+import logging
+from collections import deque
+
+# Set up logging
+logger = logging.getLogger('tracing')
+
+# Durations kept per span name for the recent percentiles
+RECENT_SAMPLES = 200
+# Minimum seconds between aggregate exports
+EXPORT_INTERVAL = 5.0
+
+_enabled = False
+_local = threading.local()
+_aggregates_lock = threading.Lock()
+_aggregates = {}
+_last_export = 0.0
+
+
+def is_enabled():
+    return _enabled
+
+
+def set_enabled(enabled):
+    """Turn span recording on or off for the whole process"""
+    global _enabled
+    if bool(enabled) != _enabled:
+        logger.info("Span tracing %s", 'enabled' if enabled else 'disabled')
+    _enabled = bool(enabled)
+
+
+def get_export_path():
+    """File the aggregates are exported to (PERF_METRICS_PATH, default perf_metrics.json)"""
+    return os.environ.get('PERF_METRICS_PATH', 'perf_metrics.json')
+
+
+def count_rows(value):
+    """Row count of a DataFrame, Series, array or list (None for anything else)"""
+    if hasattr(value, 'shape') or isinstance(value, list):
+        return len(value)
+    return None
+
+
+class Span:
+    """One timed operation inside a trace"""
+
+    __slots__ = ('name', 'start', 'duration', 'depth', 'rows')
+
+    def __init__(self, name, start, depth):
+        self.name = name
+        self.start = start
+        self.duration = None
+        self.depth = depth
+        self.rows = None
+
+    def to_dict(self, origin):
+        return {
+            'name': self.name,
+            'start_ms': (self.start - origin) * 1000,
+            'duration_ms': (self.duration or 0) * 1000,
+            'depth': self.depth,
+            'rows': self.rows
+        }
+
+
+class Trace:
+    """The spans recorded during one rerun, in start order"""
+
+    def __init__(self, label):
+        self.label = label
+        self.started_at = time.time()
+        self.origin = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self.depth = 0
+
+    def to_dict(self):
+        return {
+            'label': self.label,
+            'started_at': self.started_at,
+            'duration_ms': (self.duration or 0) * 1000,
+            'spans': [span.to_dict(self.origin) for span in self.spans]
+        }
+
+
+def current_trace():
+    """The trace active on this thread, or None"""
+    return getattr(_local, 'trace', None)
+
+
+class _NullSpan:
+    """Stand-in yielded when nothing is being recorded"""
+
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _SpanContext:
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.span = Span(name, time.perf_counter(), trace.depth)
+
+    def __enter__(self):
+        self.trace.spans.append(self.span)
+        self.trace.depth += 1
+        return self.span
+
+    def __exit__(self, *exc_info):
+        self.span.duration = time.perf_counter() - self.span.start
+        self.trace.depth -= 1
+        _record_aggregate(self.span)
+        return False
+
+
+def span(name):
+    """
+    Context manager timing a block as a span of the current trace.
+
+    Set `.rows` on the yielded span to record a row count. Does nothing when
+    tracing is off or no trace is active.
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    trace = getattr(_local, 'trace', None)
+    if trace is None:
+        return _NULL_SPAN
+    return _SpanContext(trace, name)
+
+
+def add_span(name, start, duration, rows=None):
+    """
+    Record an already-timed operation (perf_counter start, seconds) in the
+    current trace, nested under the span that is open. Used for events
+    reported by callbacks, such as SQL statements.
+    """
+    if not _enabled:
+        return
+    trace_now = getattr(_local, 'trace', None)
+    if trace_now is None:
+        return
+    finished = Span(name, start, trace_now.depth)
+    finished.duration = duration
+    finished.rows = rows
+    trace_now.spans.append(finished)
+    _record_aggregate(finished)
+
+
+class trace:
+    """
+    Context manager collecting the spans of one rerun.
+
+    on_finish(trace) is called with the finished trace. If a trace is already
+    active (a fragment rendered inside a full rerun), the block simply joins it.
+    """
+
+    def __init__(self, label, on_finish=None):
+        self.label = label
+        self.on_finish = on_finish
+        self.trace = None
+
+    def __enter__(self):
+        if not _enabled or current_trace() is not None:
+            return current_trace()
+        self.trace = Trace(self.label)
+        _local.trace = self.trace
+        return self.trace
+
+    def __exit__(self, *exc_info):
+        if self.trace is None:
+            return False
+        self.trace.duration = time.perf_counter() - self.trace.origin
+        _local.trace = None
+        if self.on_finish is not None:
+            try:
+                self.on_finish(self.trace)
+            except Exception as e:
+                logger.warning("Could not store trace %s: %s", self.label, e)
+        maybe_export()
+        return False
+
+
+def traced(name=None, on_trace=None):
+    """
+    Decorator recording each call as a span.
+
+    The row count is taken from the result, or from the largest DataFrame
+    argument when the result isn't tabular (e.g. a figure, or True from a save).
+    With on_trace, a call made outside any trace starts its own trace, so
+    fragment-only reruns are recorded too.
+    """
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+
+            root = None
+            if on_trace is not None and current_trace() is None:
+                root = trace(span_name, on_finish=on_trace)
+                root.__enter__()
+            try:
+                trace_now = current_trace()
+                if trace_now is None:
+                    return func(*args, **kwargs)
+                with _SpanContext(trace_now, span_name) as current:
+                    result = func(*args, **kwargs)
+                    current.rows = count_rows(result)
+                    if current.rows is None:
+                        current.rows = max((len(arg) for arg in args if hasattr(arg, 'columns')), default=None)
+                    return result
+            finally:
+                if root is not None:
+                    root.__exit__(None, None, None)
+
+        return wrapper
+    return decorator
+
+
+def trace_methods(prefix):
+    """Class decorator applying @traced to every public method defined on the class"""
+    def decorator(cls):
+        for attr, value in list(vars(cls).items()):
+            if attr.startswith('_') or not callable(value):
+                continue
+            setattr(cls, attr, traced(f"{prefix}.{attr}")(value))
+        return cls
+    return decorator
+
+
+def _record_aggregate(finished_span):
+    with _aggregates_lock:
+        stats = _aggregates.get(finished_span.name)
+        if stats is None:
+            stats = _aggregates[finished_span.name] = {
+                'count': 0, 'total_s': 0.0, 'max_s': 0.0, 'rows': 0,
+                'recent': deque(maxlen=RECENT_SAMPLES)
+            }
+        stats['count'] += 1
+        stats['total_s'] += finished_span.duration
+        stats['max_s'] = max(stats['max_s'], finished_span.duration)
+        stats['rows'] += finished_span.rows or 0
+        stats['recent'].append(finished_span.duration)
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def get_aggregates():
+    """Per-span totals since start plus p50/p95 over the recent samples"""
+    with _aggregates_lock:
+        snapshot = {name: dict(stats, recent=sorted(stats['recent'])) for name, stats in _aggregates.items()}
+
+    aggregates = {}
+    for name, stats in sorted(snapshot.items()):
+        recent = stats['recent']
+        aggregates[name] = {
+            'count': stats['count'],
+            'total_ms': stats['total_s'] * 1000,
+            'mean_ms': stats['total_s'] / stats['count'] * 1000,
+            'max_ms': stats['max_s'] * 1000,
+            'rows': stats['rows'],
+            'recent_p50_ms': _percentile(recent, 0.5) * 1000,
+            'recent_p95_ms': _percentile(recent, 0.95) * 1000
+        }
+    return aggregates
+
+
+def reset_aggregates():
+    with _aggregates_lock:
+        _aggregates.clear()
+
+
+def export_aggregates(path=None):
+    """Write the aggregates to a JSON file, replacing it atomically"""
+    path = path or get_export_path()
+    document = {'updated_at': time.time(), 'spans': get_aggregates()}
+    temp_path = f"{path}.tmp"
+    try:
+        with open(temp_path, 'w') as f:
+            json.dump(document, f, indent=2)
+        os.replace(temp_path, path)
+        return True
+    except OSError as e:
+        logger.warning("Could not export span aggregates to %s: %s", path, e)
+        return False
+
+
+def maybe_export():
+    """Export the aggregates if the last export is older than EXPORT_INTERVAL"""
+    global _last_export
+    now = time.monotonic()
+    if now - _last_export < EXPORT_INTERVAL:
+        return False
+    _last_export = now
+    return export_aggregates()